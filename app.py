@@ -1,30 +1,196 @@
-from flask import Flask, request, jsonify, render_template
+import functools
+from flask import Flask, Response, request, jsonify, render_template, g, stream_with_context
 from flask_cors import CORS
-from utils.description_service import generate_meta_description, paraphrase_description
-from utils.title_service import generate_title
+from utils.description_service import paraphrase_description
 from utils.url_service import extract_meta_from_url
-from utils.keyword_service import generate_keywords
+from utils.generation_service import generate_seo_content, resolve_generation_mode, resolve_parallelism, response_fields
 from utils.product_description_service import generate_product_description
-from utils.constants import DEFAULT_COMPANY_NAME
+from utils.batch_service import (
+    iter_ndjson, resolve_batch_concurrency, stream_results, process_batch_item, process_url_item
+)
+from utils.concurrency import BoundedExecutor
+from utils.constants import (
+    DEFAULT_COMPANY_NAME, GENERATION_WORKERS, BATCH_WORKERS, IDEMPOTENCY_KEY_MAX_LENGTH, RESULTS_PAGE_SIZE,
+    RESULTS_MAX_PAGE_SIZE
+)
+from utils.cache_service import get_response_cache, set_cache_bypass, reset_cache_bypass, is_cache_bypassed
+from utils.deadline import (
+    DeadlineExceeded, carry_deadline, current_budget, deadline, reset_deadline, resolve_deadline, set_deadline
+)
+from utils.job_queue import get_job_queue
+from utils.job_handlers import validate_payload
+from utils.page_cache import get_page_cache
+from utils.llm_dispatcher import count_llm_calls, get_dispatcher, llm_priority
+from utils.stream_service import stream_analyze_url, stream_product_description
+from utils.metrics import (
+    start_request, finish_request, current_timeline, track_stream, render_prometheus, record_event, record_saved_calls
+)
+from utils.coalescing import coalesce
+from utils.idempotency import IdempotencyError, get_idempotency_store, request_fingerprint
+from utils.startup import configure_logging, start_warm_up
+from utils.results_store import (
+    EXPORT_FORMATS, RESULT_KINDS, export_csv, export_ndjson, get_results_store, parse_time, record_result
+)
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
+configure_logging()
 
 app = Flask(__name__)
 CORS(app, resources={
     r"/api/*": {
         "origins": "*",
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
+        "methods": ["GET", "POST", "DELETE", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Cache-Control", "Idempotency-Key", "X-Request-Deadline"],
+        "expose_headers": ["Server-Timing", "Idempotent-Replayed"]
     }
 })
 
+# Shared pool the independent generators fan out on; workers run inside the app context
+generation_executor = BoundedExecutor(GENERATION_WORKERS, context_factory=app.app_context)
+# Separate pool for batch items so items never wait on their own field tasks
+batch_executor = BoundedExecutor(BATCH_WORKERS, context_factory=app.app_context, thread_name_prefix='seo-batch')
+
+@app.before_request
+def start_metrics():
+    g.metrics_token = start_request(request.endpoint)
+
+@app.before_request
+def apply_cache_bypass():
+    # Clients force fresh generations with "Cache-Control: no-cache" or {"no_cache": true}
+    data = request.get_json(silent=True)
+    bypass = 'no-cache' in request.headers.get('Cache-Control', '').lower() or bool(request.args.get('no_cache'))
+    if isinstance(data, dict) and data.get('no_cache'):
+        bypass = True
+    g.cache_bypass_token = set_cache_bypass(bypass)
+
+@app.teardown_request
+def clear_cache_bypass(exc):
+    token = g.pop('cache_bypass_token', None)
+    if token is not None:
+        reset_cache_bypass(token)
+
+@app.before_request
+def apply_deadline():
+    # Clients choose how long they wait with "X-Request-Deadline: <seconds>" or {"deadline": <seconds>}
+    data = request.get_json(silent=True)
+    requested = request.headers.get('X-Request-Deadline')
+    if isinstance(data, dict) and data.get('deadline') is not None:
+        requested = data['deadline']
+    try:
+        seconds = resolve_deadline(requested)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'deadline must be a positive number of seconds'}), 400
+    g.deadline_token = set_deadline(seconds)
+
+@app.teardown_request
+def clear_deadline(exc):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        reset_deadline(token)
+
+@app.after_request
+def add_server_timing(response):
+    g.response_status = response.status_code
+    timeline = current_timeline()
+    if timeline is None:
+        return response
+    if response.is_streamed:
+        # The body is still to be produced, so its stages only show up in /metrics
+        response.response = track_stream(response.response, response.status_code)
+        g.metrics_streamed = True
+    else:
+        response.headers['Server-Timing'] = timeline.server_timing()
+    return response
+
+@app.teardown_request
+def finish_metrics(exc):
+    finish_request(g.pop('metrics_token', None), g.pop('response_status', 500 if exc else None),
+                   observe=not g.pop('metrics_streamed', False))
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_exceeded(e):
+    # The request's deadline passed before a step that has no fallback
+    return jsonify({'error': str(e)}), 504
+
+def idempotent(view):
+    """Replay the stored response of a POST sent again with the same Idempotency-Key header."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        store = get_idempotency_store() if key and request.method == 'POST' else None
+        if store is None:
+            return view(*args, **kwargs)
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({'error': f"Idempotency-Key must be at most {IDEMPOTENCY_KEY_MAX_LENGTH} characters"}), 400
+
+        fingerprint = request_fingerprint(request.method, request.path, request.query_string.decode('latin-1'),
+                                          request.get_data(cache=True))
+        try:
+            stored = store.acquire(key, fingerprint)
+        except IdempotencyError as e:
+            return jsonify({'error': str(e)}), e.status
+        if stored is not None:
+            record_event('idempotent_replay')
+            record_saved_calls('idempotent_replay', stored['llm_calls'])
+            response = Response(stored['body'], status=stored['status'], content_type=stored['content_type'])
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            with count_llm_calls() as counter:
+                response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            store.release(key)
+            raise
+        # Server errors and streamed bodies are not stored, so a retry runs again
+        if response.status_code >= 500 or response.is_streamed:
+            store.release(key)
+        else:
+            store.complete(key, response.status_code, response.content_type, response.get_data(), counter.calls)
+        return response
+    return wrapper
+
+def enqueue_job(job_type, payload, callback_url=None):
+    """Validate and queue a background job, returning the 202 response that points at its status."""
+    try:
+        payload = validate_payload(job_type, payload)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    if callback_url is not None and not (isinstance(callback_url, str) and callback_url.startswith(('http://', 'https://'))):
+        return jsonify({'error': 'callback_url must be an http(s) URL'}), 400
+
+    # Jobs keep the request's cache bypass
+    payload['no_cache'] = is_cache_bypassed()
+    job_id = get_job_queue().submit(job_type, payload, callback_url=callback_url)
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f"/api/jobs/{job_id}"
+    }), 202
+
+def result_filters(args):
+    """Read the results lookup filters from the query string."""
+    kind = args.get('kind')
+    if kind is not None and kind not in RESULT_KINDS:
+        raise ValueError(f"kind must be one of: {', '.join(RESULT_KINDS)}")
+    return {
+        'sku': args.get('sku'),
+        'url': args.get('url'),
+        'company_name': args.get('company_name'),
+        'kind': kind,
+        'since': parse_time(args.get('since')),
+        'until': parse_time(args.get('until')),
+        'after': int(args.get('after', 0)),
+    }
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/api/analyze-url', methods=['POST', 'OPTIONS'])
+@idempotent
 def analyze_url():
     if request.method == 'OPTIONS':
         return '', 200
@@ -35,32 +201,72 @@ def analyze_url():
         if not url:
             return jsonify({'error': 'URL is required'}), 400
 
-        # Extract metadata from URL
-        meta_data = extract_meta_from_url(url)
-        if not meta_data:
-            return jsonify({'error': 'Failed to extract metadata from URL'}), 400
+        try:
+            mode = resolve_generation_mode(data.get('mode'))
+            parallelism = resolve_parallelism(data.get('parallelism'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
 
         # Get company name from request or use default
         company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
-        
-        # Generate title, description, and keywords
-        generated_title = generate_title(meta_data['content'], company_name)
-        generated_description = generate_meta_description(meta_data['content'], company_name)
-        generated_keywords = generate_keywords(meta_data['content'], company_name=company_name)
 
-        return jsonify({
-            'original_title': meta_data['title'],
-            'original_description': meta_data.get('description', ''),
-            'original_content': meta_data['content'],
-            'generated_title': generated_title,
-            'generated_description': generated_description,
-            'generated_keywords': generated_keywords
-        })
+        def analyze():
+            # Extract metadata from URL
+            meta_data = extract_meta_from_url(url)
+            if not meta_data:
+                return None
+
+            # Generate title, description, and keywords
+            generated = generate_seo_content(
+                meta_data['content'], company_name, mode,
+                executor=generation_executor, parallelism=parallelism
+            )
+            record_result('seo', generated, company_name, url=url, source='analyze_url')
+            return {
+                'original_title': meta_data['title'],
+                'original_description': meta_data.get('description', ''),
+                'original_content': meta_data['content'],
+                **response_fields(generated)
+            }
+
+        # Identical requests already running share their result
+        result = coalesce('analyze_url', analyze, url=url, company_name=company_name, mode=mode)
+        if result is None:
+            return jsonify({'error': 'Failed to extract metadata from URL'}), 400
+
+        return jsonify(result)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         app.logger.error(f"Error in analyze_url: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def event_stream(events):
+    """Wrap an event generator in a Server-Sent Events response that proxies do not buffer."""
+    return Response(stream_with_context(carry_deadline(events)), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/analyze-url/stream', methods=['POST'])
+def analyze_url_stream():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('url'):
+        return jsonify({'error': 'URL is required'}), 400
+
+    try:
+        mode = resolve_generation_mode(data.get('mode'))
+        parallelism = resolve_parallelism(data.get('parallelism'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Get company name from request or use default
+    company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
+
+    return event_stream(stream_analyze_url(data['url'], company_name, mode, generation_executor, parallelism))
+
 @app.route('/api/generate-content', methods=['POST'])
+@idempotent
 def generate_content():
     try:
         data = request.json
@@ -68,24 +274,118 @@ def generate_content():
         if not content:
             return jsonify({'error': 'Content is required'}), 400
 
+        try:
+            mode = resolve_generation_mode(data.get('mode'))
+            parallelism = resolve_parallelism(data.get('parallelism'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+
         # Get company name from request or use default
         company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
         
-        # Generate title, description, and keywords
-        generated_title = generate_title(content, company_name)
-        generated_description = generate_meta_description(content, company_name)
-        generated_keywords = generate_keywords(content, company_name=company_name)
+        def generate():
+            generated = generate_seo_content(
+                content, company_name, mode,
+                executor=generation_executor, parallelism=parallelism
+            )
+            record_result('seo', generated, company_name, sku=data.get('sku') or data.get('id'),
+                          source='generate_content')
+            return generated
 
-        return jsonify({
-            'generated_title': generated_title,
-            'generated_description': generated_description,
-            'generated_keywords': generated_keywords
-        })
+        # Generate title, description, and keywords; identical requests already running share the result
+        generated = coalesce('generate_content', generate, content=content, company_name=company_name, mode=mode,
+                             sku=data.get('sku') or data.get('id'))
+
+        return jsonify(response_fields(generated))
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         app.logger.error(f"Error in generate_content: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/generate-content/batch', methods=['POST'])
+def generate_content_batch():
+    try:
+        mode = resolve_generation_mode(request.args.get('mode'))
+        parallelism = resolve_parallelism(request.args.get('parallelism'))
+        concurrency = resolve_batch_concurrency(request.args.get('concurrency'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    # Products with a sku or id whose content did not change get their stored fields back
+    incremental = request.args.get('incremental') in ('1', 'true')
+
+    if request.args.get('async'):
+        # Queue the whole batch; the result holds one entry per product
+        if request.is_json:
+            products = request.get_json(silent=True)
+        else:
+            products = []
+            for index, item in iter_ndjson(request.stream):
+                if isinstance(item, Exception):
+                    return jsonify({'error': f"Line {index + 1}: {str(item)}"}), 400
+                products.append(item)
+        if not isinstance(products, list):
+            return jsonify({'error': 'Expected a JSON array of products'}), 400
+        return enqueue_job('batch', {
+            'products': products, 'mode': mode, 'parallelism': parallelism, 'concurrency': concurrency,
+            'incremental': incremental
+        }, request.args.get('callback_url'))
+
+    # Accept a JSON array of products or an NDJSON upload with one product per line
+    if request.is_json:
+        products = request.get_json(silent=True)
+        if not isinstance(products, list):
+            return jsonify({'error': 'Expected a JSON array of products'}), 400
+        items = enumerate(products)
+    else:
+        items = iter_ndjson(request.stream)
+
+    # Bulk work yields the LLM quota to interactive requests; each item gets the request's time budget
+    budget = current_budget()
+
+    def process(item):
+        with llm_priority('batch'), deadline(budget):
+            return process_batch_item(item, mode, generation_executor, parallelism, incremental)
+
+    results = stream_results(items, process, batch_executor, concurrency)
+    return Response(stream_with_context(results), mimetype='application/x-ndjson')
+
+@app.route('/api/analyze-urls', methods=['POST'])
+@idempotent
+def analyze_urls():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('urls'), list) or not data['urls']:
+        return jsonify({'error': 'A list of URLs is required'}), 400
+
+    try:
+        mode = resolve_generation_mode(data.get('mode'))
+        parallelism = resolve_parallelism(data.get('parallelism'))
+        concurrency = resolve_batch_concurrency(data.get('concurrency'))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Get company name from request or use default
+    company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
+
+    if data.get('async'):
+        return enqueue_job('analyze_urls', {
+            'urls': data['urls'], 'company_name': company_name, 'mode': mode,
+            'parallelism': parallelism, 'concurrency': concurrency, 'incremental': bool(data.get('incremental'))
+        }, data.get('callback_url'))
+
+    budget = current_budget()
+
+    def process(item):
+        with llm_priority('batch'), deadline(budget):
+            return process_url_item(item, company_name, mode, generation_executor, parallelism,
+                                    bool(data.get('incremental')))
+
+    # Pages are fetched concurrently through the shared pooled fetcher, then generated
+    results = stream_results(enumerate(data['urls']), process, batch_executor, concurrency)
+    return Response(stream_with_context(results), mimetype='application/x-ndjson')
+
 @app.route('/api/paraphrase', methods=['POST'])
+@idempotent
 def paraphrase():
     try:
         data = request.json
@@ -97,16 +397,20 @@ def paraphrase():
         company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
         
         # Generate paraphrased text
-        paraphrased_text = paraphrase_description(text, company_name)
+        paraphrased_text = coalesce('paraphrase', lambda: paraphrase_description(text, company_name),
+                                    text=text, company_name=company_name)
 
         return jsonify({
             'paraphrased_text': paraphrased_text
         })
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         app.logger.error(f"Error in paraphrase: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/product-description', methods=['POST'])
+@idempotent
 def product_description():
     try:
         data = request.json
@@ -116,16 +420,133 @@ def product_description():
 
         # Get company name from request or use default
         company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
+
+        if data.get('async'):
+            return enqueue_job('product_description', {
+                'product_info': product_info, 'company_name': company_name
+            }, data.get('callback_url'))
         
+        def generate():
+            product_description = generate_product_description(product_info, company_name)
+            record_result('product_description', {'product_description': product_description}, company_name,
+                          sku=data.get('sku') or data.get('id'), source='product_description')
+            return product_description
+
         # Generate product description
-        product_description = generate_product_description(product_info, company_name)
+        product_description = coalesce('product_description', generate, product_info=product_info,
+                                       company_name=company_name, sku=data.get('sku') or data.get('id'))
 
         return jsonify({
             'product_description': product_description
         })
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         app.logger.error(f"Error in product_description: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/product-description/stream', methods=['POST'])
+def product_description_stream():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('product_info'):
+        return jsonify({'error': 'Product information is required'}), 400
+
+    # Get company name from request or use default
+    company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
+
+    return event_stream(stream_product_description(data['product_info'], company_name))
+
+@app.route('/api/jobs', methods=['POST'])
+@idempotent
+def submit_job():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data.get('type'):
+        return jsonify({'error': 'Job type is required'}), 400
+    return enqueue_job(data['type'], data.get('payload'), data.get('callback_url'))
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/results', methods=['GET'])
+def list_results():
+    store = get_results_store()
+    if store is None:
+        return jsonify({'error': 'The results store is disabled'}), 503
+    try:
+        filters = result_filters(request.args)
+        limit = max(1, min(int(request.args.get('limit', RESULTS_PAGE_SIZE)), RESULTS_MAX_PAGE_SIZE))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Pages are keyed by the last id, so the next page is as cheap to read as the first
+    results = store.query(limit=limit, **filters)
+    return jsonify({
+        'results': results,
+        'next_after': results[-1]['id'] if len(results) == limit else None
+    })
+
+@app.route('/api/results/<int:result_id>', methods=['GET'])
+def get_result(result_id):
+    store = get_results_store()
+    if store is None:
+        return jsonify({'error': 'The results store is disabled'}), 503
+    result = store.get(result_id)
+    if result is None:
+        return jsonify({'error': 'Result not found'}), 404
+    return jsonify(result)
+
+@app.route('/api/export', methods=['GET'])
+def export_results():
+    store = get_results_store()
+    if store is None:
+        return jsonify({'error': 'The results store is disabled'}), 503
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    try:
+        filters = result_filters(request.args)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Rows are read a page at a time as the client consumes the body
+    results = store.iter_results(**filters)
+    if export_format == 'csv':
+        return Response(stream_with_context(export_csv(results)), mimetype='text/csv', headers={
+            'Content-Disposition': 'attachment; filename="results.csv"'
+        })
+    return Response(stream_with_context(export_ndjson(results)), mimetype='application/x-ndjson', headers={
+        'Content-Disposition': 'attachment; filename="results.ndjson"'
+    })
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    stats = {}
+    for name, cache in (('responses', get_response_cache()), ('pages', get_page_cache())):
+        stats[name] = {'enabled': True, **cache.stats()} if cache else {'enabled': False}
+    return jsonify(stats)
+
+@app.route('/api/llm/stats', methods=['GET'])
+def llm_stats():
+    return jsonify(get_dispatcher().stats())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+# The Gemini client and the other heavy libraries load in the background (see SEO_STARTUP)
+start_warm_up()
+
 if __name__ == '__main__':
     app.run(debug=False, port=5000, threaded=True)
@@ -0,0 +1,279 @@
+"""
+Asyncio-native server for the web page and the four core API routes.
+
+Serves `/`, `/api/analyze-url`, `/api/generate-content`, `/api/paraphrase` and
+`/api/product-description` with the same request and response formats as
+app.py. Pages are fetched with httpx and the Gemini calls are awaited, so a
+request waiting on the shop or the model holds no thread and one worker keeps
+many requests in flight. The other endpoints (batch, streaming, jobs, results,
+stats) are only served by app.py, which stays the WSGI entry point for Passenger.
+
+Run with:
+    uvicorn asgi:app --port 5000
+"""
+import functools
+import logging
+import os
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse
+from starlette.routing import Route
+
+from utils.async_fetcher import AsyncPageFetcher, aextract_meta_from_url
+from utils.cache_service import bypass_cache, is_cache_bypassed
+from utils.coalescing import acoalesce
+from utils.constants import DEFAULT_COMPANY_NAME
+from utils.deadline import DeadlineExceeded, deadline, resolve_deadline
+from utils.description_service import aparaphrase_description
+from utils.generation_service import agenerate_seo_content, resolve_generation_mode, resolve_parallelism, response_fields
+from utils.job_handlers import validate_payload
+from utils.job_queue import get_job_queue
+from utils.metrics import current_timeline, finish_request, start_request
+from utils.product_description_service import agenerate_product_description
+from utils.results_store import record_result
+from utils.startup import configure_logging, start_warm_up
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+configure_logging()
+
+INDEX_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'index.html')
+
+
+def error(message, status):
+    return JSONResponse({'error': message}, status_code=status)
+
+
+def endpoint(view):
+    """
+    Run a view with the per-request state app.py sets up in its request hooks.
+
+    The view is called with the request and its JSON body (an empty dict when
+    there is none), inside the request's metrics timeline, cache bypass and deadline.
+    A view that runs out of time is answered with a 504.
+    """
+    @functools.wraps(view)
+    async def wrapper(request: Request):
+        metrics_token = start_request(view.__name__)
+        status = 500
+        try:
+            try:
+                data = await request.json()
+            except ValueError:
+                data = None
+            data = data if isinstance(data, dict) else {}
+
+            # Clients force fresh generations with "Cache-Control: no-cache" or {"no_cache": true}
+            bypass = ('no-cache' in request.headers.get('Cache-Control', '').lower()
+                      or bool(request.query_params.get('no_cache')) or bool(data.get('no_cache')))
+            # Clients choose how long they wait with "X-Request-Deadline: <seconds>" or {"deadline": <seconds>}
+            requested = request.headers.get('X-Request-Deadline')
+            if data.get('deadline') is not None:
+                requested = data['deadline']
+            try:
+                seconds = resolve_deadline(requested)
+            except (TypeError, ValueError):
+                response = error('deadline must be a positive number of seconds', 400)
+            else:
+                try:
+                    with bypass_cache(bypass), deadline(seconds):
+                        response = await view(request, data)
+                except DeadlineExceeded as e:
+                    # The deadline passed before a step that has no fallback
+                    response = error(str(e), 504)
+
+            status = response.status_code
+            timeline = current_timeline()
+            if timeline is not None:
+                response.headers['Server-Timing'] = timeline.server_timing()
+            return response
+        finally:
+            finish_request(metrics_token, status)
+    return wrapper
+
+
+async def index(request: Request):
+    return FileResponse(INDEX_PAGE)
+
+
+@endpoint
+async def analyze_url(request: Request, data):
+    url = data.get('url')
+    if not url:
+        return error('URL is required', 400)
+
+    try:
+        mode = resolve_generation_mode(data.get('mode'))
+        parallelism = resolve_parallelism(data.get('parallelism'))
+    except (TypeError, ValueError) as e:
+        return error(str(e), 400)
+
+    # Get company name from request or use default
+    company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
+
+    async def analyze():
+        meta_data = await aextract_meta_from_url(url, request.app.state.fetcher)
+        if not meta_data:
+            return None
+
+        generated = await agenerate_seo_content(meta_data['content'], company_name, mode, parallelism=parallelism)
+        record_result('seo', generated, company_name, url=url, source='analyze_url')
+        return {
+            'original_title': meta_data['title'],
+            'original_description': meta_data.get('description', ''),
+            'original_content': meta_data['content'],
+            **response_fields(generated)
+        }
+
+    try:
+        # Identical requests already running share their result
+        result = await acoalesce('analyze_url', analyze, url=url, company_name=company_name, mode=mode)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logging.error(f"Error in analyze_url: {str(e)}")
+        return error(str(e), 500)
+    if result is None:
+        return error('Failed to extract metadata from URL', 400)
+    return JSONResponse(result)
+
+
+@endpoint
+async def generate_content(request: Request, data):
+    content = data.get('content')
+    if not content:
+        return error('Content is required', 400)
+
+    try:
+        mode = resolve_generation_mode(data.get('mode'))
+        parallelism = resolve_parallelism(data.get('parallelism'))
+    except (TypeError, ValueError) as e:
+        return error(str(e), 400)
+
+    # Get company name from request or use default
+    company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
+    sku = data.get('sku') or data.get('id')
+
+    async def generate():
+        generated = await agenerate_seo_content(content, company_name, mode, parallelism=parallelism)
+        record_result('seo', generated, company_name, sku=sku, source='generate_content')
+        return generated
+
+    try:
+        generated = await acoalesce('generate_content', generate, content=content, company_name=company_name,
+                                    mode=mode, sku=sku)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logging.error(f"Error in generate_content: {str(e)}")
+        return error(str(e), 500)
+    return JSONResponse(response_fields(generated))
+
+
+@endpoint
+async def paraphrase(request: Request, data):
+    text = data.get('text')
+    if not text:
+        return error('Text is required', 400)
+
+    # Get company name from request or use default
+    company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
+
+    try:
+        paraphrased_text = await acoalesce('paraphrase', lambda: aparaphrase_description(text, company_name),
+                                           text=text, company_name=company_name)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logging.error(f"Error in paraphrase: {str(e)}")
+        return error(str(e), 500)
+    return JSONResponse({'paraphrased_text': paraphrased_text})
+
+
+@endpoint
+async def product_description(request: Request, data):
+    product_info = data.get('product_info')
+    if not product_info:
+        return error('Product information is required', 400)
+
+    # Get company name from request or use default
+    company_name = data.get('company_name', DEFAULT_COMPANY_NAME)
+    sku = data.get('sku') or data.get('id')
+
+    if data.get('async'):
+        return enqueue_job('product_description', {
+            'product_info': product_info, 'company_name': company_name
+        }, data.get('callback_url'))
+
+    async def generate():
+        description = await agenerate_product_description(product_info, company_name)
+        record_result('product_description', {'product_description': description}, company_name,
+                      sku=sku, source='product_description')
+        return description
+
+    try:
+        description = await acoalesce('product_description', generate, product_info=product_info,
+                                      company_name=company_name, sku=sku)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logging.error(f"Error in product_description: {str(e)}")
+        return error(str(e), 500)
+    return JSONResponse({'product_description': description})
+
+
+def enqueue_job(job_type, payload, callback_url=None):
+    """Validate and queue a background job, returning the 202 response that points at its status."""
+    try:
+        payload = validate_payload(job_type, payload)
+    except (TypeError, ValueError) as e:
+        return error(str(e), 400)
+    if callback_url is not None and not (isinstance(callback_url, str) and callback_url.startswith(('http://', 'https://'))):
+        return error('callback_url must be an http(s) URL', 400)
+
+    # Jobs keep the request's cache bypass
+    payload['no_cache'] = is_cache_bypassed()
+    job_id = get_job_queue().submit(job_type, payload, callback_url=callback_url)
+    return JSONResponse({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': f"/api/jobs/{job_id}"
+    }, status_code=202)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # The fetcher's connection pool belongs to this worker's event loop
+    app.state.fetcher = AsyncPageFetcher()
+    # Each worker process loads the Gemini client and the other heavy libraries once it is up
+    start_warm_up()
+    try:
+        yield
+    finally:
+        await app.state.fetcher.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/api/analyze-url', analyze_url, methods=['POST']),
+        Route('/api/generate-content', generate_content, methods=['POST']),
+        Route('/api/paraphrase', paraphrase, methods=['POST']),
+        Route('/api/product-description', product_description, methods=['POST']),
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=['*'],
+            allow_methods=['GET', 'POST', 'DELETE', 'OPTIONS'],
+            allow_headers=['Content-Type', 'Cache-Control', 'X-Request-Deadline'],
+            expose_headers=['Server-Timing'],
+        )
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,161 @@
+"""
+Benchmark concurrent requests per worker: the threaded Flask server vs. the async server.
+
+Both servers run in this process, one at a time, against a fake Gemini model
+whose calls take --min-latency to --max-latency seconds under a quota the
+benchmark never reaches. At each --clients level, that many clients post
+/api/generate-content at once (three model calls per request). The report
+shows throughput, latency percentiles, how many threads the server used and
+how many fields were not generated before the request deadline.
+
+Run from the project root:
+    python -m benchmarks.bench_asgi --clients 10 50 200 --min-latency 1 --max-latency 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+
+# Every request must reach the fake model
+os.environ.setdefault('SEO_CACHE_ENABLED', '0')
+os.environ.setdefault('SEO_DUPLICATE_CHECK', 'off')
+os.environ.setdefault('SEO_RESULTS_ENABLED', '0')
+
+import httpx  # noqa: E402
+import uvicorn  # noqa: E402
+from werkzeug.serving import make_server  # noqa: E402
+
+from utils.ai_backends import FakeLLM  # noqa: E402
+from utils.constants import GENERATION_WORKERS  # noqa: E402
+from utils.llm_dispatcher import LLMDispatcher, set_dispatcher  # noqa: E402
+
+# A quota the benchmark never reaches, so only the servers are measured
+QUOTA = 1000000
+CONTENT = "Converse Chuck Taylor summer canvas shoes for men, breathable and lightweight"
+
+
+def respond(prompt):
+    if 'SEO keywords' in prompt:
+        return 'converse shoes, canvas sneakers, summer shoes, men shoes, lightweight sneakers, ক্যানভাস জুতা'
+    if 'meta description' in prompt.lower():
+        return 'Shop breathable Converse canvas shoes for summer, light and comfortable for every day.'
+    return 'Shoes Canvas Summer Converse Men'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class FlaskServer:
+    name = 'flask threaded'
+
+    def __enter__(self):
+        import app
+        self.server = make_server('127.0.0.1', free_port(), app.app, threaded=True)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+
+
+class AsyncServer:
+    name = 'asgi (uvicorn)'
+
+    def __enter__(self):
+        import asgi
+        port = free_port()
+        self.server = uvicorn.Server(uvicorn.Config(asgi.app, host='127.0.0.1', port=port, log_level='warning',
+                                                    backlog=4096))
+        self.url = f"http://127.0.0.1:{port}"
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def load(url, clients, level):
+    latencies = []
+    errors = 0
+
+    async def one(client, index):
+        nonlocal errors
+        start = time.perf_counter()
+        response = await client.post(f"{url}/api/generate-content",
+                                     json={'content': f"{CONTENT}. Size {level}-{index}."})
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(client, index) for index in range(clients)))
+        return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run(server_type, llm, args):
+    with server_type() as server:
+        for clients in args.clients:
+            baseline = threading.active_count()
+            calls = llm.calls
+            peak = baseline
+            done = threading.Event()
+
+            def sample():
+                nonlocal peak
+                while not done.wait(0.05):
+                    peak = max(peak, threading.active_count())
+
+            sampler = threading.Thread(target=sample, daemon=True)
+            sampler.start()
+            latencies, errors, elapsed = asyncio.run(load(server.url, clients, clients))
+            done.set()
+            sampler.join()
+            # Fields cut off by the deadline get their fallbacks without a model call
+            missed = clients * 3 - (llm.calls - calls)
+            p50 = statistics.median(latencies) if latencies else 0
+            p95 = percentile(latencies, 0.95) if latencies else 0
+            print(f"{server.name:<15} {clients:4d} clients  {len(latencies) / elapsed:6.1f} req/s  "
+                  f"p50 {p50:5.1f} s  p95 {p95:5.1f} s  wall {elapsed:5.1f} s  "
+                  f"threads +{max(0, peak - baseline - 1):<4d} fields missed {missed:<4d} errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--min-latency', type=float, default=1.0)
+    parser.add_argument('--max-latency', type=float, default=5.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    llm = FakeLLM(latency=args.min_latency, max_latency=args.max_latency, respond=respond, seed=args.seed)
+    set_dispatcher(LLMDispatcher(model_factory=llm.model, requests_per_minute=QUOTA, tokens_per_minute=QUOTA * 1000,
+                                 max_concurrency=QUOTA))
+    print(f"Flask fans each request's fields out on a shared pool of {GENERATION_WORKERS} threads "
+          f"(SEO_GENERATION_WORKERS)")
+    run(FlaskServer, llm, args)
+    run(AsyncServer, llm, args)
+
+
+if __name__ == '__main__':
+    main()
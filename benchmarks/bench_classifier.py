@@ -0,0 +1,78 @@
+"""
+Benchmark the compiled taxonomy matcher against per-keyword substring scans.
+
+The previous classification lowercased the whole content and scanned it once per
+keyword, in every generator of a request. The benchmark grows a taxonomy of
+synthetic category terms and times classifying one product content both ways.
+
+Run from the project root:
+    python -m benchmarks.bench_classifier --sizes 5 100 1000 5000 --repeat 50
+"""
+import argparse
+import random
+import string
+import time
+
+from utils.pattern_matcher import PatternMatcher
+from utils.product_context import build_product_context
+
+CONTENT = (
+    "Sergel 20mg Capsule (Esomeprazole) by Healthcare Pharmaceuticals. Each capsule contains "
+    "esomeprazole magnesium trihydrate equivalent to 20 mg esomeprazole. Used for gastroesophageal "
+    "reflux disease, healing of erosive esophagitis and H. pylori eradication. সারজেল ২০ মি.গ্রা. ক্যাপসুল "
+    "খাবারের আগে সেবন করুন। Store below 30°C, keep away from children. "
+) * 8
+
+
+def synthetic_terms(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    terms = []
+    for index in range(count):
+        words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9)))
+                 for _ in range(rng.randint(1, 3))]
+        terms.append((' '.join(words), f"category_{index % 40}"))
+    return terms
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 100, 1000, 5000])
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'terms':>7} {'substring ms':>13} {'matcher ms':>11} {'build ms':>9} {'speedup':>8}")
+    for size in args.sizes:
+        terms = synthetic_terms(size)
+
+        def substring_scan():
+            lowered = CONTENT.lower()
+            return {label for term, label in terms if term in lowered}
+
+        start = time.perf_counter()
+        matcher = PatternMatcher(terms)
+        matcher.build()
+        build = time.perf_counter() - start
+
+        baseline = best_of(substring_scan, args.repeat)
+        elapsed = best_of(lambda: matcher.count_labels(CONTENT), args.repeat)
+        print(f"{size:7d} {baseline * 1000:13.3f} {elapsed * 1000:11.3f} {build * 1000:9.1f} {baseline / elapsed:7.2f}x")
+
+    # A separate-mode request used to scan the content once per generator (and again when padding keywords)
+    legacy = best_of(lambda: [any(k in CONTENT.lower() for k in ('medicine', 'tablet', 'capsule', 'syrup', 'injection'))
+                              for _ in range(4)], args.repeat)
+    context = best_of(lambda: build_product_context(CONTENT), args.repeat)
+    print(f"\nper request: 4 keyword scans {legacy * 1000:.3f} ms, "
+          f"one ProductContext over the full taxonomy {context * 1000:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
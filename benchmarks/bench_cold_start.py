@@ -0,0 +1,137 @@
+"""
+Benchmark the cold start of an app process, from spawn to its first answers.
+
+For each start-up mode (SEO_STARTUP), a fresh server process is spawned the
+way Passenger spawns one, and the benchmark times how long the process takes
+to import the app and listen, to answer the page and to answer a first
+/api/generate-content request. The Gemini client library is imported and
+configured as in production; only its calls are answered by a fake model that
+takes --latency seconds. With --max-ready/--max-first-response the benchmark
+exits with an error when the median of the default mode exceeds them, so it
+can guard the start-up time in CI.
+
+Run from the project root:
+    python -m benchmarks.bench_cold_start --runs 5 --max-ready 1.5 --max-first-response 4
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from utils.constants import STARTUP_MODE, STARTUP_MODES
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTENT = "Napa Extra 500mg+65mg Tablet, paracetamol and caffeine for fast relief of headache and fever"
+
+
+def respond(prompt):
+    if 'SEO keywords' in prompt:
+        return 'napa extra, paracetamol caffeine, headache relief, fever tablet, নাপা এক্সট্রা'
+    if 'meta description' in prompt.lower():
+        return 'Buy Napa Extra 500mg+65mg tablets for fast relief of headache and fever.'
+    return 'Napa Extra 500mg+65mg Tablet'
+
+
+def serve(port, latency):
+    """Child process: import the app as a fresh worker does and serve it."""
+    start = time.perf_counter()
+    import logging
+    from utils.ai_service import get_genai
+    from utils.llm_dispatcher import LLMDispatcher, set_dispatcher
+
+    def model_factory(model_name):
+        # The real client library is loaded as in production; only the calls are faked
+        get_genai()
+        from utils.ai_backends import FakeLLM
+        return FakeLLM(latency=latency, respond=respond).model(model_name)
+
+    # Installed before the app is imported, so the warm-up thread builds the fake model
+    set_dispatcher(LLMDispatcher(model_factory=model_factory))
+    import app
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', port, app.app, threaded=True)
+    logging.getLogger().setLevel(logging.CRITICAL)
+    print(f"ready {time.perf_counter() - start:.4f}", flush=True)
+    server.serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def cold_start(mode, args, data_dir):
+    """Spawn one server process and return the seconds from spawn to each milestone."""
+    port = free_port()
+    env = dict(os.environ, SEO_STARTUP=mode, SEO_DATA_DIR=data_dir, SEO_CACHE_ENABLED='0',
+               SEO_RESULTS_ENABLED='0', SEO_DUPLICATE_CHECK='off', PYTHONWARNINGS='ignore')
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_cold_start', '--serve', str(port),
+                                '--latency', str(args.latency)],
+                               cwd=PROJECT_ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        line = process.stdout.readline()
+        if not line.startswith('ready'):
+            raise RuntimeError(f"The {mode} server did not start")
+        timings = {'import': float(line.split()[1]), 'ready': time.perf_counter() - start}
+        url = f"http://127.0.0.1:{port}"
+        requests.get(f"{url}/", timeout=60).raise_for_status()
+        timings['page'] = time.perf_counter() - start
+        time.sleep(args.idle)
+        sent = time.perf_counter()
+        requests.post(f"{url}/api/generate-content", json={'content': CONTENT}, timeout=60).raise_for_status()
+        timings['generation'] = time.perf_counter() - sent
+        timings['first_response'] = time.perf_counter() - start
+        return timings
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', nargs='+', choices=STARTUP_MODES, default=list(STARTUP_MODES))
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.2, help='Seconds each fake Gemini call takes')
+    parser.add_argument('--idle', type=float, default=0.0,
+                        help='Seconds between the page and the first generation request')
+    parser.add_argument('--max-ready', type=float, help='Budget in seconds from spawn to listening')
+    parser.add_argument('--max-first-response', type=float,
+                        help='Budget in seconds from spawn to the first generation response')
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.latency)
+        return
+
+    medians = {}
+    with tempfile.TemporaryDirectory() as data_dir:
+        for mode in args.modes:
+            runs = [cold_start(mode, args, data_dir) for _ in range(args.runs)]
+            medians[mode] = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+            m = medians[mode]
+            print(f"{mode:<6} import {m['import']:5.2f} s  ready {m['ready']:5.2f} s  page {m['page']:5.2f} s  "
+                  f"generation {m['generation']:5.2f} s  spawn to first response {m['first_response']:5.2f} s")
+
+    default = medians.get(STARTUP_MODE)
+    failures = []
+    if default and args.max_ready is not None and default['ready'] > args.max_ready:
+        failures.append(f"ready after {default['ready']:.2f} s, budget {args.max_ready:.2f} s")
+    if default and args.max_first_response is not None and default['first_response'] > args.max_first_response:
+        failures.append(f"first response after {default['first_response']:.2f} s, "
+                        f"budget {args.max_first_response:.2f} s")
+    if failures:
+        print(f"Cold start of the {STARTUP_MODE} mode over budget: " + '; '.join(failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark the prompt tokens content condensation saves on product pages.
+
+Each fixture page, and a bloated copy of it where every block is repeated the
+way nested selectors repeat it and wrapped in store chrome, goes through SEO
+generation against a fake model twice: with the content as extracted and with
+it condensed. The benchmark reports the content tokens, the prompt tokens sent
+to the model, their cost and the model latency they would add, estimated from
+the prompt length.
+
+Run from the project root:
+    python -m benchmarks.bench_condenser --price 0.075 --ms-per-1k-tokens 40
+"""
+import argparse
+import glob
+import os
+import time
+
+# The two runs send the same prompts when a page is already under the budget; keep the cache out of it
+os.environ.setdefault('SEO_CACHE_ENABLED', '0')
+os.environ.setdefault('SEO_DUPLICATE_CHECK', 'off')
+
+from utils.ai_backends import FakeLLM  # noqa: E402
+from utils import condenser  # noqa: E402
+from utils.condenser import condense  # noqa: E402
+from utils.generation_service import generate_seo_content  # noqa: E402
+from utils.llm_dispatcher import LLMDispatcher, estimate_tokens, set_dispatcher  # noqa: E402
+from utils.url_service import parse_page  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+CHROME = [
+    "Add to Cart.", "Buy Now.", "Add to Wishlist.", "In Stock.", "Call us on our hotline 16778 to order.",
+    "Sign in or register for faster checkout.", "Subscribe to our newsletter for offers.",
+    "We use cookies to improve your experience.", "Follow us on Facebook and Instagram.",
+    "Be the first to review this product.", "Related products.", "Customers also viewed.",
+    "© 2024 All rights reserved.",
+]
+
+
+def bloat(content: str, repeats: int = 3) -> str:
+    """Repeat the content as nested blocks do and surround it with store chrome."""
+    return ' '.join(CHROME[:6] + [content] * repeats + CHROME[6:])
+
+
+def load_pages():
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, 'pages', '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            content = parse_page(f.read())['content']
+        name = os.path.splitext(os.path.basename(path))[0]
+        pages.append((name, content))
+        pages.append((f"{name} (bloated)", bloat(content)))
+    return pages
+
+
+def prompt_tokens(content: str, enabled: bool) -> int:
+    """Generate the SEO fields with condensation on or off and return the prompt tokens sent."""
+    condenser.CONDENSE_ENABLED = enabled
+    dispatcher = LLMDispatcher(model_factory=FakeLLM(latency=0).model)
+    set_dispatcher(dispatcher)
+    generate_seo_content(content, 'Prachine Bangla Online')
+    return dispatcher.stats()['prompt_tokens']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--price', type=float, default=0.075, help='Dollars per million input tokens')
+    parser.add_argument('--ms-per-1k-tokens', type=float, default=40, help='Model latency added per 1k prompt tokens')
+    args = parser.parse_args()
+
+    print(f"{'page':<34} {'content':>15} {'prompt tokens':>17} {'condense ms':>12}")
+    totals = [0, 0]
+    for name, content in load_pages():
+        start = time.perf_counter()
+        condensed = condense(content)
+        condense_ms = (time.perf_counter() - start) * 1000
+        raw, condensed_prompts = prompt_tokens(content, False), prompt_tokens(content, True)
+        totals[0] += raw
+        totals[1] += condensed_prompts
+        print(f"{name:<34} {estimate_tokens(content):>6} -> {condensed.tokens_after:<5} "
+              f"{raw:>7} -> {condensed_prompts:<6} {condense_ms:>12.1f}")
+
+    pages = len(load_pages())
+    for label, tokens in (('raw', totals[0]), ('condensed', totals[1])):
+        cost = tokens / 1e6 * args.price * 1000
+        latency = tokens / pages / 1000 * args.ms_per_1k_tokens
+        print(f"{label:<10} {tokens:>7,} prompt tokens, ${cost:.4f} per 1k runs of these pages, "
+              f"+{latency:.0f} ms model latency per page")
+    print(f"saved      {1 - totals[1] / totals[0]:.0%} of prompt tokens")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark the tolerant product description parser against the old regex fallback chain.
+
+The corpus in fixtures/description_responses.json holds model responses as they
+come back in practice: fenced or wrapped in prose, with raw line breaks and
+unescaped quotes inside strings, trailing or missing commas, and cut off at the
+token limit. A response counts as parsed when every section matches what a
+reader would take from it. CPU time is per response, best of --repeat runs;
+"stream" feeds the same responses in 20-character chunks and reads the
+sections after every chunk, as the streaming endpoint does.
+
+Run from the project root:
+    python -m benchmarks.bench_description_parser
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+from utils.json_repair import JSONStreamParser, parse_json
+from utils.product_description_service import response_sections
+from utils.stream_service import partial_sections
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+SECTIONS = ('short_description', 'long_description', 'features', 'benefits')
+
+
+def legacy_parse(response):
+    """The parser product descriptions used before: json.loads, then regexes and line scans."""
+    cleaned_response = response
+    if '{' in response and '}' in response:
+        cleaned_response = response[response.find('{'):response.rfind('}') + 1]
+    try:
+        data = json.loads(cleaned_response)
+        return {
+            "short_description": data.get("short_description", ""),
+            "long_description": data.get("long_description", ""),
+            "features": data.get("features", []),
+            "benefits": data.get("benefits", [])
+        }
+    except json.JSONDecodeError:
+        short_desc, long_desc, features, benefits = "", "", [], []
+        match = re.search(r'"short_description"\s*:\s*"([^"]+)"', response)
+        if match:
+            short_desc = match.group(1).strip()
+        match = re.search(r'"long_description"\s*:\s*"([^"]+)"', response)
+        if match:
+            long_desc = match.group(1).strip()
+        if not long_desc and '"long_description"' in response:
+            try:
+                long_desc = response.split('"long_description"')[1].split('"features"')[0].split('"')[1].strip()
+            except Exception:
+                pass
+        match = re.findall(r'"features"\s*:\s*\[([^\]]+)\]', response)
+        if match:
+            features = [item.strip() for item in re.findall(r'"([^"]+)"', match[0])]
+        match = re.findall(r'"benefits"\s*:\s*\[([^\]]+)\]', response)
+        if match:
+            benefits = [item.strip() for item in re.findall(r'"([^"]+)"', match[0])]
+        if not short_desc and 'short description' in response.lower():
+            lines = response.split('\n')
+            for i, line in enumerate(lines):
+                if 'short description' in line.lower() and i + 1 < len(lines):
+                    short_desc = lines[i + 1].strip()
+                    break
+        if not long_desc and 'detailed description' in response.lower():
+            lines = response.split('\n')
+            for i, line in enumerate(lines):
+                if 'detailed description' in line.lower() and i + 1 < len(lines):
+                    long_desc_lines = []
+                    j = i + 1
+                    while j < len(lines) and 'features' not in lines[j].lower() and 'benefits' not in lines[j].lower():
+                        long_desc_lines.append(lines[j].strip())
+                        j += 1
+                    long_desc = ' '.join(long_desc_lines)
+                    break
+        if not short_desc and not long_desc and features and benefits:
+            short_desc = "Premium quality product with exceptional features."
+            long_desc = "This exceptional product combines quality, functionality, and style. Perfect for your needs."
+        return {"short_description": short_desc, "long_description": long_desc, "features": features,
+                "benefits": benefits}
+
+
+def tolerant_parse(response):
+    return response_sections(parse_json(response)[0], response)
+
+
+def stream_parse(response, chunk_size=20):
+    parser = JSONStreamParser()
+    for offset in range(0, len(response), chunk_size):
+        parser.feed(response[offset:offset + chunk_size])
+        for _ in partial_sections(parser):
+            pass
+    return response_sections(parser.finish(), response)
+
+
+def matches(parsed, expected):
+    def norm(value):
+        return value.strip() if isinstance(value, str) else [item.strip() for item in value]
+    return [norm(parsed.get(name, '')) == norm(expected[name]) for name in SECTIONS]
+
+
+def best_time(fn, responses, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.process_time()
+        for response in responses:
+            fn(response)
+        best = min(best, time.process_time() - start)
+    return best / len(responses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--verbose', action='store_true', help='List the responses each parser gets wrong')
+    args = parser.parse_args()
+
+    with open(os.path.join(FIXTURES, 'description_responses.json'), encoding='utf-8') as f:
+        cases = json.load(f)
+    responses = [case['response'] for case in cases]
+
+    print(f"{'parser':<10} {'responses':>10} {'sections':>9} {'cpu µs':>8}")
+    for name, fn in (('legacy', legacy_parse), ('tolerant', tolerant_parse), ('stream', stream_parse)):
+        parsed = sections = 0
+        for case in cases:
+            result = matches(fn(case['response']), case['expected'])
+            parsed += all(result)
+            sections += sum(result)
+            if args.verbose and not all(result):
+                print(f"  {name} misses: {case['name']}")
+        cpu = best_time(fn, responses, args.repeat) * 1e6
+        print(f"{name:<10} {parsed:>5}/{len(cases):<4} {sections:>4}/{len(cases) * len(SECTIONS):<4} {cpu:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark the LLM dispatcher against direct model calls under a tight quota.
+
+A fake model accepts only a few calls in flight and answers the rest with 429.
+A burst of batch prompts is followed shortly by a few interactive ones; the
+benchmark reports API calls, 429s and failures, and the latency of each lane.
+
+Run from the project root:
+    python -m benchmarks.bench_dispatcher --batch 40 --interactive 8 --quota 6 --latency 0.2
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Unique prompts never hit the response cache; keep it out of the measurement
+os.environ.setdefault('SEO_CACHE_ENABLED', '0')
+
+from utils.ai_backends import FakeLLM  # noqa: E402
+from utils.ai_service import AIServiceError, GENERATION_CONFIG, SAFETY_SETTINGS, generate_content  # noqa: E402
+from utils.llm_dispatcher import LLMDispatcher, llm_priority, set_dispatcher  # noqa: E402
+
+
+def legacy_generate(llm: FakeLLM, prompt: str, max_retries: int = 3) -> str:
+    """The previous behaviour: a new model per call and immediate retries."""
+    model = llm.model('gemini-1.5-flash')
+    for attempt in range(max_retries):
+        try:
+            response = model.generate_content(prompt, generation_config=GENERATION_CONFIG,
+                                              safety_settings=SAFETY_SETTINGS)
+            return response.text
+        except Exception as e:
+            if attempt == max_retries - 1:
+                raise AIServiceError(f"Failed to generate content: {str(e)}")
+
+
+def run(name: str, generate, llm: FakeLLM, args) -> None:
+    latencies = {'batch': [], 'interactive': []}
+    failures = 0
+    lock = threading.Lock()
+
+    def call(lane: str, index: int) -> None:
+        nonlocal failures
+        if lane == 'interactive':
+            time.sleep(args.interactive_delay)
+        start = time.perf_counter()
+        try:
+            with llm_priority(lane):
+                generate(f"{lane} prompt {index} {time.time()}")
+        except AIServiceError:
+            with lock:
+                failures += 1
+            return
+        with lock:
+            latencies[lane].append(time.perf_counter() - start)
+
+    jobs = [('batch', i) for i in range(args.batch)] + [('interactive', i) for i in range(args.interactive)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        list(pool.map(lambda job: call(*job), jobs))
+    elapsed = time.perf_counter() - start
+
+    stats = llm.stats()
+    print(f"{name:<11} {elapsed:6.2f}s  {stats['calls']:4d} calls  {stats['throttled']:4d} x 429  "
+          f"{failures:3d} failed  peak {stats['peak_in_flight']} in flight")
+    for lane, values in latencies.items():
+        if values:
+            print(f"{'':<11} {lane:<12} p50 {statistics.median(values):6.2f}s  max {max(values):6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--batch', type=int, default=40)
+    parser.add_argument('--interactive', type=int, default=8)
+    parser.add_argument('--quota', type=int, default=6, help='calls the fake API accepts in flight')
+    parser.add_argument('--latency', type=float, default=0.2, help='fake API latency in seconds')
+    parser.add_argument('--interactive-delay', type=float, default=0.3,
+                        help='seconds after the batch burst that interactive prompts arrive')
+    args = parser.parse_args()
+
+    llm = FakeLLM(latency=args.latency, max_concurrency=args.quota, seed=1)
+    run('direct', lambda prompt: legacy_generate(llm, prompt), llm, args)
+
+    llm = FakeLLM(latency=args.latency, max_concurrency=args.quota, seed=1)
+    set_dispatcher(LLMDispatcher(model_factory=llm.model, backoff_base=args.latency))
+    run('dispatcher', generate_content, llm, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark near-duplicate lookups in the MinHash/LSH index against comparing every pair.
+
+Synthetic meta descriptions follow the "Get [Product] ([বাংলা নাম]) at ..." template
+with a random product and random benefit sentences; one in ten is a light edit
+of an earlier one. The benchmark times inserting them, querying each new text
+against the index, and the same queries done by scanning every stored text.
+
+Run from the project root:
+    python -m benchmarks.bench_duplicate_index --sizes 1000 5000 20000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from utils.duplicate_index import DuplicateIndex, shingle_hashes
+
+PRODUCTS = ['Napa', 'Sergel', 'Seclo', 'Fexo', 'Maxpro', 'Monas', 'Zimax', 'Ceftron', 'Canvas Sneakers', 'Power Bank']
+BENEFITS = [
+    'Fast relief from fever and headache.', 'Trusted quality with genuine sourcing.', 'Home delivery across Bangladesh.',
+    'Gentle on the stomach for daily use.', 'Recommended by doctors nationwide.', 'Long lasting comfort all day.',
+    'Best price with cash on delivery.', 'জ্বর ও ব্যথায় দ্রুত আরাম।', 'আসল পণ্য, দ্রুত ডেলিভারি।', 'Lightweight and durable build.',
+]
+
+
+def synthetic_descriptions(count: int, seed: int = 5):
+    rng = random.Random(seed)
+    texts = []
+    for index in range(count):
+        if texts and rng.random() < 0.1:
+            # A near-duplicate: an earlier description with one word changed
+            words = rng.choice(texts).split()
+            words[rng.randrange(len(words))] = rng.choice(['quick', 'original', 'affordable'])
+            texts.append(' '.join(words))
+            continue
+        product = f"{rng.choice(PRODUCTS)} {rng.randint(1, 999)}mg {index}"
+        texts.append(f"Get {product} ({product}) at Prachine Bangla Online Pharmacy. "
+                     + ' '.join(rng.sample(BENEFITS, 3)))
+    return texts
+
+
+def jaccard(first: set, second: set) -> float:
+    return len(first & second) / len(first | second) if first or second else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--threshold', type=float, default=0.8)
+    args = parser.parse_args()
+
+    print(f"{'texts':>7} {'insert ms':>10} {'lsh query ms':>13} {'scan query ms':>14} {'lsh hits':>9} {'scan hits':>10}")
+    for size in args.sizes:
+        texts = synthetic_descriptions(size)
+        queries = texts[-args.queries:]
+        with tempfile.TemporaryDirectory() as directory:
+            index = DuplicateIndex(os.path.join(directory, 'duplicates.sqlite3'))
+            start = time.perf_counter()
+            for number, text in enumerate(texts[:-args.queries]):
+                index.add('description', str(number), text)
+            insert_ms = (time.perf_counter() - start) * 1000 / (size - args.queries)
+
+            start = time.perf_counter()
+            found = sum(1 for text in queries if index.find('description', text, args.threshold))
+            lsh_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        # The scan compares exact shingle sets; the index estimates the same similarity from signatures
+        shingles = [set(shingle_hashes(text).tolist()) for text in texts[:-args.queries]]
+        start = time.perf_counter()
+        exact = 0
+        for text in queries:
+            query = set(shingle_hashes(text).tolist())
+            if any(jaccard(query, other) >= args.threshold for other in shingles):
+                exact += 1
+        scan_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{size:>7} {insert_ms:>10.2f} {lsh_ms:>13.2f} {scan_ms:>14.2f} {found:>9} {exact:>10}")
+
+
+if __name__ == '__main__':
+    main()
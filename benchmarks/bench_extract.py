@@ -0,0 +1,55 @@
+"""
+Benchmark single-pass streaming extraction against the BeautifulSoup tree path.
+
+Run from the project root:
+    python -m benchmarks.bench_extract --repeat 20
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.stub_origin import load_pages
+from utils.html_extractor import available_backends, extract_page
+from utils.url_service import parse_page
+
+CHUNK_SIZE = 16384
+
+
+def chunked(html: str):
+    for start in range(0, len(html), CHUNK_SIZE):
+        yield html[start:start + CHUNK_SIZE]
+
+
+def measure(fn, repeat: int):
+    """Return (best seconds per run, peak traced memory in bytes, result)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'page':<28} {'path':<20} {'ms':>8} {'peak MB':>8} {'speedup':>8}  same output")
+    for name, body in load_pages().items():
+        html = body.decode('utf-8')
+        baseline, peak, expected = measure(lambda: parse_page(html), args.repeat)
+        print(f"{name:<28} {'soup (current)':<20} {baseline * 1000:8.2f} {peak / 1e6:8.2f} {'1.00x':>8}")
+        for backend in available_backends():
+            elapsed, peak, record = measure(lambda: extract_page(chunked(html), backend), args.repeat)
+            same = record == expected
+            print(f"{'':<28} {'stream/' + backend:<20} {elapsed * 1000:8.2f} {peak / 1e6:8.2f} "
+                  f"{baseline / elapsed:7.2f}x  {'yes' if same else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
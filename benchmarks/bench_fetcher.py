@@ -0,0 +1,61 @@
+"""
+Benchmark the pooled PageFetcher against the old per-call session.
+
+Run from the project root:
+    python -m benchmarks.bench_fetcher --requests 300 --threads 8 --latency 0.005
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import certifi
+import requests
+
+from benchmarks.stub_origin import StubOrigin
+from utils.url_service import DEFAULT_HEADERS, PageFetcher
+
+
+def fetch_with_new_session(url: str) -> int:
+    """The previous behaviour: a fresh session (and connection) for every call."""
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    response = session.get(url, timeout=30, verify=certifi.where())
+    response.raise_for_status()
+    return len(response.content)
+
+
+def run(name: str, fetch, urls, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        total_bytes = sum(pool.map(fetch, urls))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<14} {len(urls) / elapsed:8.1f} req/s  {elapsed:6.2f}s  {total_bytes / 1e6:6.1f} MB")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.005, help='stub server latency per response in seconds')
+    args = parser.parse_args()
+
+    with StubOrigin(latency=args.latency) as origin:
+        names = sorted(n for n in origin.pages if 'heavy' not in n)
+        urls = [origin.url_for(names[i % len(names)]) for i in range(args.requests)]
+
+        connections = origin.connections
+        baseline = run('per-call', fetch_with_new_session, urls, args.threads)
+        print(f"{'':<14} {origin.connections - connections} connections opened")
+
+        fetcher = PageFetcher(per_host_concurrency=args.threads)
+        connections = origin.connections
+        pooled = run('pooled', lambda url: len(fetcher.fetch(url).content), urls, args.threads)
+        print(f"{'':<14} {origin.connections - connections} connections opened")
+        fetcher.close()
+
+    print(f"speedup: {baseline / pooled:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark hedged Gemini calls and request deadlines against a fake model with a slow tail.
+
+Most fake calls answer in --latency seconds, but --tail-rate of them stall for
+--tail-latency seconds, as overloaded API backends do. The same calls are made
+through the dispatcher with hedging off and on, reporting latency percentiles
+and how many extra calls hedging sent. Then whole SEO generations run against
+the same model without a deadline and with a --deadline budget, reporting how
+long the requests took and how many fields fell back.
+
+Run from the project root:
+    python -m benchmarks.bench_hedging --calls 400 --tail-rate 0.02 --deadline 1
+"""
+import argparse
+import logging
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Every call must reach the fake model
+os.environ.setdefault('SEO_CACHE_ENABLED', '0')
+os.environ.setdefault('SEO_DUPLICATE_CHECK', 'off')
+
+from utils.ai_backends import FakeLLM  # noqa: E402
+from utils.concurrency import BoundedExecutor  # noqa: E402
+from utils.deadline import deadline  # noqa: E402
+from utils.generation_service import generate_seo_content  # noqa: E402
+from utils.llm_dispatcher import LLMDispatcher, set_dispatcher  # noqa: E402
+from utils.metrics import count_events  # noqa: E402
+
+# A quota the benchmark never reaches, so only the model's latency is measured
+QUOTA = 1000000
+CONTENT = "Napa Extra 500mg+65mg Tablet. Paracetamol with caffeine for fast relief from headache and fever."
+
+
+def slow_tail(args, seed):
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def respond(prompt):
+        with lock:
+            stall = rng.random() < args.tail_rate
+        if stall:
+            time.sleep(args.tail_latency)
+        return 'Napa Extra 500mg+65mg Tablet|নাপা এক্সট্রা ৫০০ মি.গ্রা. ট্যাবলেট'
+    return respond
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run_calls(args, hedge):
+    llm = FakeLLM(latency=args.latency, respond=slow_tail(args, args.seed))
+    dispatcher = LLMDispatcher(model_factory=llm.model, requests_per_minute=QUOTA, tokens_per_minute=QUOTA * 1000,
+                               max_concurrency=args.concurrency * 2, hedge=hedge)
+    latencies = []
+
+    def call(index):
+        start = time.perf_counter()
+        dispatcher.generate(f"prompt {index}", 'gemini-1.5-flash')
+        latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(call, range(args.calls)))
+    stats = dispatcher.stats()
+    # The first calls only collect latencies; hedging starts once enough were timed
+    steady = latencies[len(latencies) // 5:]
+    print(f"hedge {'on ' if hedge else 'off'}  p50 {statistics.median(steady) * 1000:6.0f} ms  "
+          f"p95 {percentile(steady, 0.95) * 1000:6.0f} ms  p99 {percentile(steady, 0.99) * 1000:6.0f} ms  "
+          f"max {max(steady) * 1000:6.0f} ms  model calls {llm.calls} ({stats['hedged']} hedges, "
+          f"{stats['hedge_wins']} won)")
+
+
+def run_requests(args, budget):
+    llm = FakeLLM(latency=args.latency, respond=slow_tail(args, args.seed + 1))
+    set_dispatcher(LLMDispatcher(model_factory=llm.model, requests_per_minute=QUOTA, tokens_per_minute=QUOTA * 1000,
+                                 max_concurrency=args.concurrency * 3))
+    executor = BoundedExecutor(args.concurrency * 3)
+    durations = []
+    fallbacks = 0
+    lock = threading.Lock()
+
+    def request(index):
+        nonlocal fallbacks
+        start = time.perf_counter()
+        with deadline(budget), count_events() as events:
+            generate_seo_content(f"{CONTENT} Pack {index}.", executor=executor)
+        with lock:
+            durations.append(time.perf_counter() - start)
+            fallbacks += sum(count for event, count in events.items() if event.startswith('deadline_exceeded'))
+
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(request, range(args.requests)))
+    executor.shutdown(wait=False)
+    label = f"{budget:g}s" if budget else 'none'
+    print(f"deadline {label:<5} {args.requests} requests  p50 {statistics.median(durations) * 1000:6.0f} ms  "
+          f"max {max(durations) * 1000:6.0f} ms  {fallbacks} fields fell back")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=400)
+    parser.add_argument('--requests', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--tail-rate', type=float, default=0.02)
+    parser.add_argument('--tail-latency', type=float, default=2.0)
+    parser.add_argument('--deadline', type=float, default=1.0)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    # Fields that miss the deadline are logged as errors; the summary counts them
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    run_calls(args, hedge=False)
+    run_calls(args, hedge=True)
+    run_requests(args, None)
+    run_requests(args, args.deadline)
+
+
+if __name__ == '__main__':
+    main()
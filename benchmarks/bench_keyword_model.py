@@ -0,0 +1,88 @@
+"""
+Benchmark fitting, loading and scoring the local keyword model.
+
+A synthetic catalog is generated from the medicine title fixtures and the saved
+product pages: every document is one fixture with a random product line, pack
+size and a few sentences of filler, so phrases recur across products the way
+they do in a real shop. The model is fitted in batches (the incremental update
+path), saved, loaded back and used to rank the keywords of each saved page.
+
+Run from the project root:
+    python -m benchmarks.bench_keyword_model --docs 20000
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import tempfile
+import time
+
+from utils.keyword_model import KeywordModel
+from utils.url_service import parse_page
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+FILLER = [
+    "Take as directed by your physician.", "Store in a cool and dry place.", "Keep out of reach of children.",
+    "Genuine product with fast home delivery.", "Cash on delivery available across Bangladesh.",
+    "খাবারের পরে সেবন করুন।", "শিশুদের নাগালের বাইরে রাখুন।", "ঠান্ডা ও শুকনো স্থানে সংরক্ষণ করুন।",
+    "Breathable fabric for everyday comfort.", "Durable build with one year warranty.",
+]
+LINES = ['Pain relief', 'Antacid', 'Antihistamine', 'Antibiotic', 'Vitamin supplement', 'Footwear', 'Electronics']
+
+
+def synthetic_catalog(count: int, seed: int = 11):
+    with open(os.path.join(FIXTURES, 'medicine_titles.json'), encoding='utf-8') as f:
+        seeds = [case['content'] for case in json.load(f)]
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ' '.join([
+            rng.choice(seeds), f"{rng.choice(LINES)}.", f"Pack of {rng.choice([10, 14, 20, 30])}.",
+            *rng.sample(FILLER, 3)
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--docs', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    model = KeywordModel()
+    documents = list(synthetic_catalog(args.docs))
+    start = time.perf_counter()
+    for offset in range(0, len(documents), args.batch):
+        model.partial_fit(documents[offset:offset + args.batch])
+    fit_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'keyword_model.npz')
+        start = time.perf_counter()
+        model.save(path)
+        save_seconds = time.perf_counter() - start
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        model = KeywordModel.load(path)
+        load_seconds = time.perf_counter() - start
+
+    print(f"fit      {args.docs} docs in {fit_seconds:.2f}s ({args.docs / fit_seconds:,.0f} docs/s), "
+          f"{len(model):,} phrases")
+    print(f"save     {save_seconds * 1000:.0f} ms, {size / 1024:,.0f} KiB")
+    print(f"load     {load_seconds * 1000:.0f} ms")
+
+    for page in sorted(glob.glob(os.path.join(FIXTURES, 'pages', '*.html'))):
+        with open(page, encoding='utf-8') as f:
+            content = parse_page(f.read())['content']
+        best = float('inf')
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            keywords = model.keywords(content, 7)
+            best = min(best, time.perf_counter() - start)
+        print(f"score    {os.path.basename(page)} ({len(content):,} chars) in {best * 1000:.2f} ms: "
+              f"{', '.join(keywords)}")
+
+
+if __name__ == '__main__':
+    main()
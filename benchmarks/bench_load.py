@@ -0,0 +1,313 @@
+"""
+Offline end-to-end load test of the four core endpoints.
+
+The server runs in a child process with the "replay" AI backend: prompts
+get their answer recorded in benchmarks/fixtures/llm_responses.json after
+--latency seconds (up to --max-latency), and a --failure-rate/--throttle-rate
+share of calls fail with a 503/429. A prompt that was not recorded fails and
+the run exits with an error; --fake uses canned answers (the "fake" backend)
+instead of recordings. Product
+pages are served by the local stub origin. Caches and request coalescing are
+off, so every request does the whole work. At each --concurrency level,
+--requests requests are sent to each endpoint in turn by that many clients,
+and throughput and p50/p95/p99 latency are reported per endpoint.
+
+--output saves the results as JSON; --baseline compares a run with saved
+results and exits with an error when an endpoint is slower by more than
+--tolerance. --record runs every request once against the real Gemini API
+(the "record" backend) to record the fixtures.
+
+Run from the project root:
+    python -m benchmarks.bench_load --concurrency 1 10 --requests 50 --output load.json
+    python -m benchmarks.bench_load --concurrency 1 10 --requests 50 --baseline load.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+from benchmarks.stub_origin import FIXTURES_DIR, StubOrigin
+from utils.constants import AI_FIXTURES_FILE
+from utils.html_extractor import extract_page
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ('analyze-url', 'generate-content', 'paraphrase', 'product-description')
+# The fake model has no quota; set SEO_LLM_RPM, SEO_LLM_TPM and SEO_LLM_MAX_CONCURRENCY to measure under real limits
+QUOTA = 1000000
+# Latency changes smaller than this are noise, whatever the tolerance
+MIN_LATENCY_CHANGE = 0.01
+
+
+def serve(port, server_name):
+    """Child process: serve the app until the benchmark closes stdin, then print the fake model's counters."""
+    import logging
+    if server_name == 'asgi':
+        import uvicorn
+        import asgi
+        server = uvicorn.Server(uvicorn.Config(asgi.app, host='127.0.0.1', port=port, log_level='warning',
+                                               backlog=4096))
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        while not server.started:
+            time.sleep(0.01)
+
+        def stop():
+            server.should_exit = True
+            thread.join()
+    else:
+        from werkzeug.serving import make_server
+        import app
+        server = make_server('127.0.0.1', port, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        stop = server.shutdown
+    logging.getLogger().setLevel(logging.CRITICAL)
+    print('ready', flush=True)
+    sys.stdin.read()
+    stop()
+
+    from utils.ai_backends import get_offline_llm, get_recording_fixtures
+    from utils.constants import AI_BACKEND
+    stats = {'recorded': len(get_recording_fixtures())} if AI_BACKEND == 'record' else get_offline_llm().stats()
+    print(json.dumps(stats), flush=True)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """The app served by a child process with the given AI backend."""
+
+    def __init__(self, args, backend, data_dir):
+        self.args = args
+        self.backend = backend
+        self.data_dir = data_dir
+
+    def __enter__(self):
+        args = self.args
+        port = free_port()
+        self.url = f"http://127.0.0.1:{port}"
+        env = {
+            'SEO_LLM_RPM': str(QUOTA), 'SEO_LLM_TPM': str(QUOTA * 1000), 'SEO_LLM_MAX_CONCURRENCY': str(QUOTA),
+            **os.environ,
+            'SEO_AI_BACKEND': self.backend, 'SEO_AI_FIXTURES_FILE': args.fixtures,
+            'SEO_AI_LATENCY': str(args.latency), 'SEO_AI_MAX_LATENCY': str(args.max_latency),
+            'SEO_AI_FAILURE_RATE': str(args.failure_rate), 'SEO_AI_THROTTLE_RATE': str(args.throttle_rate),
+            # Everything is loaded before the first request, and nothing is stored between runs
+            'SEO_STARTUP': 'eager', 'SEO_DATA_DIR': self.data_dir, 'PYTHONWARNINGS': 'ignore',
+        }
+        if not args.cache:
+            env.update(SEO_CACHE_ENABLED='0', SEO_PAGE_CACHE_ENABLED='0', SEO_COALESCING_ENABLED='0')
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'benchmarks.bench_load', '--serve', str(port), '--server', args.server],
+            cwd=PROJECT_ROOT, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            text=True
+        )
+        if self.process.stdout.readline().strip() != 'ready':
+            raise RuntimeError('The server did not start')
+        return self
+
+    def stop(self):
+        """Stop the server and return its fake model's counters."""
+        output, _ = self.process.communicate('', timeout=60)
+        lines = output.strip().splitlines()
+        return json.loads(lines[-1]) if lines else {}
+
+    def __exit__(self, *exc):
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+
+def workload(origin):
+    """Request bodies per endpoint: the saved pages, and the medicine fixtures' and pages' text."""
+    with open(os.path.join(FIXTURES_DIR, 'medicine_titles.json'), encoding='utf-8') as f:
+        texts = [item['content'] for item in json.load(f)]
+    for html in origin.pages.values():
+        texts.append(extract_page([html.decode('utf-8')])['content'])
+    return {
+        'analyze-url': [{'url': origin.url_for(name)} for name in origin.pages],
+        'generate-content': [{'content': text} for text in texts],
+        'paraphrase': [{'text': text} for text in texts],
+        'product-description': [{'product_info': text} for text in texts],
+    }
+
+
+async def drive(url, bodies, concurrency, count):
+    """Send ``count`` requests from ``concurrency`` clients, cycling through the bodies."""
+    latencies = []
+    errors = 0
+    indexes = itertools.count()
+
+    async def client_loop(client):
+        nonlocal errors
+        for index in indexes:
+            if index >= count:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.post(url, json=bodies[index % len(bodies)])
+                ok = response.status_code == 200
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=300) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - start
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+def summarize(concurrency, latencies, errors, elapsed):
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput': round(len(latencies) / elapsed, 3),
+        'p50': round(percentile(latencies, 0.50), 4),
+        'p95': round(percentile(latencies, 0.95), 4),
+        'p99': round(percentile(latencies, 0.99), 4),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every endpoint against the baseline and return the regressions."""
+    if results['config'] != baseline.get('config'):
+        print('Note: the baseline was run with other settings: ' + json.dumps(baseline.get('config')))
+    regressions = []
+    print(f"\n{'vs. baseline':<26} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for key, now in results['results'].items():
+        before = baseline.get('results', {}).get(key)
+        if not before:
+            continue
+        changes = []
+        for metric in ('throughput', 'p50', 'p95', 'p99'):
+            change = (now[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+            changes.append(f"{change:+8.0%}")
+            if metric == 'throughput':
+                worse = change < -tolerance
+            else:
+                worse = change > tolerance and now[metric] - before[metric] > MIN_LATENCY_CHANGE
+            if worse:
+                regressions.append(f"{key} {metric} {before[metric]} -> {now[metric]}")
+        if now['errors'] > before['errors']:
+            regressions.append(f"{key} errors {before['errors']} -> {now['errors']}")
+        print(f"{key:<26} {' '.join(changes)}")
+    return regressions
+
+
+def record(args, bodies, data_dir):
+    """Send every request once through the "record" backend."""
+    with Server(args, 'record', data_dir) as server:
+        for endpoint in ENDPOINTS:
+            latencies, errors, _ = asyncio.run(drive(f"{server.url}/api/{endpoint}", bodies[endpoint], 1,
+                                                     len(bodies[endpoint])))
+            print(f"{endpoint:<20} {len(latencies)} requests recorded, {errors} errors")
+        stats = server.stop()
+    print(f"{stats.get('recorded', 0)} responses in {args.fixtures}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--server', choices=['flask', 'asgi'], default='flask')
+    parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[10])
+    parser.add_argument('--requests', type=int, default=100, help='Requests per endpoint and concurrency level')
+    parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per endpoint before the runs')
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds each Gemini call takes')
+    parser.add_argument('--max-latency', type=float, default=0.0, help='Random call latency up to this many seconds')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of calls failing with a 503')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of calls failing with a 429')
+    parser.add_argument('--origin-latency', type=float, default=0.0, help='Seconds the stub origin takes per page')
+    parser.add_argument('--cache', action='store_true', help='Keep the caches and request coalescing on')
+    parser.add_argument('--fixtures', default=AI_FIXTURES_FILE)
+    parser.add_argument('--record', action='store_true', help='Record the fixtures with the real Gemini API')
+    parser.add_argument('--fake', action='store_true', help='Answer with canned responses instead of the fixtures')
+    parser.add_argument('--output', help='Save the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare with the results saved in this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Largest accepted slowdown against the baseline (0.25 = 25%%)')
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.server)
+        return
+    if not (args.record or args.fake or os.path.exists(args.fixtures)):
+        sys.exit(f"No recorded responses at {args.fixtures}: record them with --record (needs a Gemini API key), "
+                 f"or run with --fake for canned answers")
+
+    with StubOrigin(latency=args.origin_latency) as origin, tempfile.TemporaryDirectory() as data_dir:
+        bodies = workload(origin)
+        if args.record:
+            record(args, bodies, data_dir)
+            return
+
+        results = {}
+        with Server(args, 'fake' if args.fake else 'replay', data_dir) as server:
+            for endpoint in args.endpoints:
+                asyncio.run(drive(f"{server.url}/api/{endpoint}", bodies[endpoint], 1, args.warmup))
+            print(f"{'endpoint':<20} {'clients':>7} {'requests':>8} {'errors':>6} {'req/s':>8} "
+                  f"{'p50 s':>7} {'p95 s':>7} {'p99 s':>7}")
+            for concurrency in args.concurrency:
+                for endpoint in args.endpoints:
+                    summary = summarize(concurrency, *asyncio.run(
+                        drive(f"{server.url}/api/{endpoint}", bodies[endpoint], concurrency, args.requests)
+                    ))
+                    results[f"{endpoint}@{concurrency}"] = summary
+                    print(f"{endpoint:<20} {concurrency:7d} {summary['requests']:8d} {summary['errors']:6d} "
+                          f"{summary['throughput']:8.1f} {summary['p50']:7.3f} {summary['p95']:7.3f} "
+                          f"{summary['p99']:7.3f}")
+            llm = server.stop()
+    print(f"Gemini calls: {llm.get('calls', 0)} ({llm.get('replayed', 0)} replayed, "
+          f"{llm.get('unrecorded', 0)} not recorded, "
+          f"{llm.get('failed', 0) + llm.get('throttled', 0)} failed by injection)")
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'config': {
+            'server': args.server, 'requests': args.requests, 'latency': args.latency,
+            'max_latency': args.max_latency, 'failure_rate': args.failure_rate, 'throttle_rate': args.throttle_rate,
+            'origin_latency': args.origin_latency, 'cache': args.cache, 'fake': args.fake,
+        },
+        'llm': llm,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results saved to {args.output}")
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+        print('No regressions against the baseline')
+    if llm.get('unrecorded'):
+        sys.exit(f"{llm['unrecorded']} prompts have no recorded response in {args.fixtures}; "
+                 f"record them again with --record")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark the local medicine name parser against the Gemini extraction it replaces.
+
+Every case in benchmarks/fixtures/medicine_titles.json is parsed locally. A case
+is a hit when the parse is confident enough to skip the model; hits are checked
+against the expected English and Bangla names. Cases expected to need the model
+have null names.
+
+Run from the project root:
+    python -m benchmarks.bench_medicine_parser --repeat 200
+"""
+import argparse
+import json
+import os
+import time
+
+from utils.constants import MEDICINE_PARSER_MIN_CONFIDENCE
+from utils.medicine_parser import get_brand_dictionary, parse_medicine_name
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'medicine_titles.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--min-confidence', type=float, default=MEDICINE_PARSER_MIN_CONFIDENCE)
+    parser.add_argument('--verbose', action='store_true', help='print every miss and mismatch')
+    args = parser.parse_args()
+
+    with open(FIXTURE, encoding='utf-8') as f:
+        cases = json.load(f)
+    get_brand_dictionary()
+
+    hits = exact = english_only = wrong_hits = 0
+    for case in cases:
+        parsed = parse_medicine_name(case['content'])
+        confident = parsed is not None and parsed.confidence >= args.min_confidence
+        expected = (case['name_en'], case['name_bn'])
+        if not confident:
+            if args.verbose and case['name_en']:
+                print(f"to model  {case['content'][:50]!r} ({parsed.confidence if parsed else 'no parse'})")
+            continue
+        hits += 1
+        if case['name_en'] is None:
+            wrong_hits += 1
+            if args.verbose:
+                print(f"false hit {case['content'][:50]!r} -> {parsed.name_en}")
+        elif (parsed.name_en, parsed.name_bn) == expected:
+            exact += 1
+        elif parsed.name_en == expected[0]:
+            english_only += 1
+            if args.verbose:
+                print(f"bangla    {parsed.name_bn} != {expected[1]}")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for case in cases:
+            parse_medicine_name(case['content'])
+    per_parse = (time.perf_counter() - start) / (args.repeat * len(cases))
+
+    needs_model = sum(1 for case in cases if case['name_en'] is None)
+    print(f"cases            {len(cases)} ({needs_model} expected to need the model)")
+    print(f"local hits       {hits} ({hits / len(cases):.0%} of all cases, "
+          f"{hits / max(1, len(cases) - needs_model):.0%} of parseable ones) -> {hits} Gemini calls avoided")
+    print(f"exact on hits    {exact}/{hits} (English right but Bangla spelled differently: {english_only}, "
+          f"false hits: {wrong_hits})")
+    print(f"parse time       {per_parse * 1e6:.1f} us per title")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark writing to the results store from several processes and exporting it.
+
+Every writer process records synthetic SEO results into one database, the way
+the web and job workers do. The benchmark then times a lookup by SKU, the
+first and the last page of the full listing, and a CSV export of every row,
+tracing the peak memory the export allocates.
+
+Run from the project root:
+    python -m benchmarks.bench_results_store --rows 200000 --writers 4
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import tracemalloc
+
+from utils.results_store import ResultsStore, export_csv
+
+KEYWORDS = ['napa', 'paracetamol', 'fever relief', 'pain relief', 'Prachine Bangla Online medicine']
+
+
+def write_rows(path: str, writer: int, rows: int) -> None:
+    store = ResultsStore(path)
+    for number in range(rows):
+        sku = f"W{writer}-{number}"
+        store.add('seo', {
+            'title': f"Napa {number}mg Tablet and নাপা ট্যাবলেট from Prachine Bangla Online",
+            'description': f"Get Napa {number}mg (নাপা) at Prachine Bangla Online Pharmacy. Fast relief from fever.",
+            'keywords': KEYWORDS,
+        }, 'Prachine Bangla Online', sku=sku, url=f"https://shop.example/products/{sku}", source='bench')
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return value, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000, help='Rows in total, split across the writers')
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--page', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'results.sqlite3')
+        ResultsStore(path)
+        per_writer = args.rows // args.writers
+        processes = [multiprocessing.Process(target=write_rows, args=(path, writer, per_writer))
+                     for writer in range(args.writers)]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        seconds = time.perf_counter() - start
+        total = per_writer * args.writers
+        print(f"insert   {total:,} rows from {args.writers} processes in {seconds:.1f}s ({total / seconds:,.0f} rows/s)")
+
+        store = ResultsStore(path)
+        found, lookup_ms = timed(lambda: store.query(sku=f"W0-{per_writer // 2}"))
+        print(f"lookup   by sku in {lookup_ms:.2f} ms ({len(found)} row)")
+        _, first_ms = timed(lambda: store.query(limit=args.page))
+        _, last_ms = timed(lambda: store.query(after=total - args.page, limit=args.page))
+        print(f"page     first {first_ms:.2f} ms, last {last_ms:.2f} ms ({args.page} rows)")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in export_csv(store.iter_results()))
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"export   {size / 1024 / 1024:,.1f} MiB of CSV in {seconds:.1f}s, peak {peak / 1024 / 1024:.1f} MiB allocated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Local stub origin that serves the saved product pages for offline benchmarks.
+
+Pages in ``fixtures/pages/<name>.html`` are served at ``/product/<name>`` over
+HTTP/1.1 keep-alive, with an optional artificial latency per response. Every
+page carries an ETag and answers matching conditional requests with 304.
+
+The origin also serves a small store: ``/robots.txt``, a sitemap index at
+``/sitemap.xml`` pointing to a gzip-compressed product sitemap and a plain
+sitemap of non-product pages.
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+PAGES_DIR = os.path.join(FIXTURES_DIR, 'pages')
+
+
+def load_pages(pages_dir: str = PAGES_DIR) -> Dict[str, bytes]:
+    """Load every saved page keyed by its name without the extension."""
+    pages = {}
+    for filename in sorted(os.listdir(pages_dir)):
+        if filename.endswith('.html'):
+            with open(os.path.join(pages_dir, filename), 'rb') as f:
+                pages[filename[:-len('.html')]] = f.read()
+    return pages
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Threaded server that ignores clients closing a connection mid-response."""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+class StubOrigin:
+    """Threaded HTTP server bound to an ephemeral localhost port."""
+
+    def __init__(self, latency: float = 0.0, pages: Optional[Dict[str, bytes]] = None, port: int = 0):
+        self.latency = latency
+        self.pages = pages if pages is not None else load_pages()
+        self.requests = 0
+        self.not_modified = 0
+        self.paths = []
+        self.files: Dict[str, tuple] = {}
+        self.connections = 0
+        origin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately; without this keep-alive stalls on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                origin.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                origin.requests += 1
+                origin.paths.append(self.path)
+                if origin.latency:
+                    threading.Event().wait(origin.latency)
+                path = self.path.split('?', 1)[0]
+                body = None
+                content_type = 'text/html; charset=utf-8'
+                if path.startswith('/product/'):
+                    body = origin.pages.get(path[len('/product/'):])
+                elif path in origin.files:
+                    body, content_type = origin.files[path]
+                if body is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    origin.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = QuietHTTPServer(('127.0.0.1', port), Handler)
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, name: str) -> str:
+        """Return the URL of a saved page."""
+        return f"{self.base_url}/product/{name}"
+
+    def _build_site(self) -> None:
+        base = self.base_url
+        urlset = '<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n{}</urlset>\n'
+        products = ''.join(f"  <url><loc>{self.url_for(name)}?utm_source=sitemap</loc></url>\n" for name in self.pages)
+        products += f"  <url><loc>{self.url_for('private-preview')}</loc></url>\n"
+        pages = f"  <url><loc>{base}/about</loc></url>\n  <url><loc>{base}/contact</loc></url>\n"
+        index = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            f"  <sitemap><loc>{base}/sitemap-products.xml.gz</loc></sitemap>\n"
+            f"  <sitemap><loc>{base}/sitemap-pages.xml</loc></sitemap>\n"
+            '</sitemapindex>\n'
+        )
+        self.files.update({
+            '/robots.txt': (b'User-agent: *\nDisallow: /product/private-\n', 'text/plain'),
+            '/sitemap.xml': (index.encode('utf-8'), 'application/xml'),
+            '/sitemap-products.xml.gz': (gzip.compress(urlset.format(products).encode('utf-8')), 'application/gzip'),
+            '/sitemap-pages.xml': (urlset.format(pages).encode('utf-8'), 'application/xml'),
+        })
+
+    def __enter__(self) -> 'StubOrigin':
+        self._build_site()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the saved product pages as a local stub store.')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+    with StubOrigin(latency=args.latency, port=args.port) as origin:
+        print(f"Serving {len(origin.pages)} pages at {origin.base_url} (sitemap: {origin.base_url}/sitemap.xml)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
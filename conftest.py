@@ -0,0 +1,15 @@
+"""
+Test configuration: the tests run offline, against the fake AI backend and temporary data directories.
+"""
+import os
+import tempfile
+
+# Set before any utils module reads its constants
+DATA_DIR = os.environ.setdefault('SEO_DATA_DIR', tempfile.mkdtemp(prefix='seo-tests-'))
+os.environ.setdefault('SEO_LOG_FILE', os.path.join(DATA_DIR, 'stderr.log'))
+os.environ.setdefault('SEO_AI_BACKEND', 'fake')
+os.environ.setdefault('SEO_AI_LATENCY', '0.01')
+os.environ.setdefault('SEO_STARTUP', 'lazy')
+
+# test_api.py drives a server running on localhost:5000
+collect_ignore = ['test_api.py']
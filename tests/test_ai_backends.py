@@ -0,0 +1,40 @@
+import pytest
+
+from utils.ai_backends import FakeLLM, MissingRecording, RecordingModel, ResponseFixtures
+from utils.ai_service import AIServiceError, generate_content, stream_content
+from utils.llm_dispatcher import LLMDispatcher, set_dispatcher
+
+
+@pytest.fixture
+def use_model():
+    def use(model_factory):
+        set_dispatcher(LLMDispatcher(model_factory=model_factory, backoff_base=0.001))
+    yield use
+    set_dispatcher(None)
+
+
+def test_recorded_responses_are_replayed(tmp_path, use_model):
+    path = str(tmp_path / 'llm_responses.json')
+    gemini = FakeLLM(latency=0, respond=lambda prompt: f"Answer to {prompt}")
+    fixtures = ResponseFixtures(path)
+    use_model(lambda model_name: RecordingModel(gemini.model(model_name), model_name, fixtures))
+    assert generate_content('recorded prompt', use_cache=False) == 'Answer to recorded prompt'
+    assert ''.join(stream_content('recorded stream', use_cache=False)) == 'Answer to recorded stream'
+
+    replay = FakeLLM(latency=0, respond=lambda prompt: 'made up', fixtures=ResponseFixtures(path))
+    use_model(replay.model)
+    assert generate_content('recorded prompt', use_cache=False) == 'Answer to recorded prompt'
+    assert ''.join(stream_content('recorded stream', use_cache=False)) == 'Answer to recorded stream'
+    assert (replay.stats()['replayed'], replay.stats()['unrecorded']) == (2, 0)
+
+
+def test_prompt_that_was_not_recorded_fails_without_a_retry(tmp_path, use_model):
+    replay = FakeLLM(latency=0, respond=lambda prompt: 'made up',
+                     fixtures=ResponseFixtures(str(tmp_path / 'llm_responses.json')))
+    use_model(replay.model)
+
+    with pytest.raises(AIServiceError, match='No recorded response'):
+        generate_content('new prompt', use_cache=False)
+    with pytest.raises(MissingRecording):
+        replay.model('model').generate_content('new prompt')
+    assert (replay.stats()['calls'], replay.stats()['unrecorded']) == (2, 2)
@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from utils import ai_service
+from utils.ai_backends import FakeLLM
+from utils.ai_service import AIServiceError, agenerate_content, generate_content, make_safe_prompt, stream_content
+from utils.deadline import deadline
+from utils.llm_dispatcher import LLMDispatcher, set_dispatcher
+
+
+class BadRequest(Exception):
+    code = 400
+
+
+def generate(prompt, **kwargs):
+    return generate_content(prompt, **kwargs)
+
+
+def agenerate(prompt, **kwargs):
+    return asyncio.run(agenerate_content(prompt, **kwargs))
+
+
+def stream(prompt, **kwargs):
+    return ''.join(stream_content(prompt, **kwargs))
+
+
+@pytest.fixture(params=[generate, agenerate, stream], ids=['generate', 'agenerate', 'stream'])
+def run(request):
+    return request.param
+
+
+@pytest.fixture
+def events(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(ai_service, 'record_event', lambda event, **labels: recorded.append((event, labels)))
+    return recorded
+
+
+@pytest.fixture
+def use_llm():
+    def use(**kwargs):
+        llm = FakeLLM(latency=0, **kwargs)
+        set_dispatcher(LLMDispatcher(model_factory=llm.model, backoff_base=0.001))
+        return llm
+    yield use
+    set_dispatcher(None)
+
+
+def test_throttled_call_is_retried(run, events, use_llm):
+    # With this seed the first call is throttled and the second is not
+    llm = use_llm(throttle_rate=0.5, seed=1, respond=lambda prompt: 'Generated text')
+
+    assert run(f'throttled {run.__name__}', use_cache=False) == 'Generated text'
+    assert llm.stats()['calls'] == 2
+    assert events == [('llm_retry', {'reason': 'throttled'})]
+
+
+def test_blocked_response_is_asked_again_with_a_safer_prompt(run, events, use_llm):
+    prompt = f'blocked {run.__name__}'
+    prompts = []
+    use_llm(respond=lambda sent: prompts.append(sent) or ('' if sent == prompt else 'Safe text'))
+
+    assert run(prompt, use_cache=False) == 'Safe text'
+    assert prompts == [prompt, make_safe_prompt(prompt)]
+    assert events == [('llm_retry', {'reason': 'blocked'})]
+
+
+def test_client_error_is_not_retried(run, events, use_llm):
+    def respond(prompt):
+        raise BadRequest('400 Invalid argument')
+    llm = use_llm(respond=respond)
+
+    with pytest.raises(AIServiceError, match='Failed to generate content: 400 Invalid argument'):
+        run(f'bad request {run.__name__}', use_cache=False)
+    assert llm.stats()['calls'] == 1
+    assert events == []
+
+
+def test_retries_give_up_after_max_retries(run, events, use_llm):
+    llm = use_llm(throttle_rate=1)
+
+    with pytest.raises(AIServiceError, match='Failed to generate content: 429'):
+        run(f'always throttled {run.__name__}', max_retries=2, use_cache=False)
+    assert llm.stats()['calls'] == 2
+    assert events == [('llm_retry', {'reason': 'throttled'})]
+
+
+def test_stored_response_is_served_from_the_cache(run, events, use_llm):
+    llm = use_llm(respond=lambda prompt: 'Cached text')
+    prompt = f'cached {run.__name__}'
+
+    assert run(prompt) == 'Cached text'
+    assert run(prompt) == 'Cached text'
+    assert run(prompt, use_cache=False) == 'Cached text'
+    assert llm.stats()['calls'] == 2
+    assert events == [('llm_cache', {'result': 'hit'})]
+
+
+def test_no_call_is_made_after_the_deadline(run, events, use_llm):
+    llm = use_llm()
+
+    with deadline(0), pytest.raises(AIServiceError, match='Request deadline exceeded'):
+        run(f'late {run.__name__}', use_cache=False)
+    assert llm.stats()['calls'] == 0
+    assert events == [('deadline_exceeded', {'stage': 'llm'})]
+
+
+def test_stream_that_breaks_off_midway_is_not_retried(events, monkeypatch, use_llm):
+    llm = use_llm(respond=lambda prompt: 'x' * 100)
+    chunks = iter([False, False, True])
+    monkeypatch.setattr(ai_service, 'expired', lambda: next(chunks, True))
+
+    pieces = []
+    with pytest.raises(AIServiceError, match='Content generation stopped midway'):
+        for piece in stream_content('broken stream', use_cache=False):
+            pieces.append(piece)
+    assert pieces == ['x' * 32]
+    assert llm.stats()['calls'] == 1
+    assert events == []
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+import app as app_module
+from benchmarks.stub_origin import StubOrigin
+from utils import batch_service
+
+
+def generate_seo_content(content, company_name, mode=None, **kwargs):
+    return {'title': f'Generated for {company_name}', 'description': content[:40], 'keywords': ['generated']}
+
+
+@pytest.fixture
+def origin():
+    with StubOrigin() as origin:
+        yield origin
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(batch_service, 'generate_seo_content', generate_seo_content)
+    return app_module.app.test_client()
+
+
+def analyze(client, body):
+    response = client.post('/api/analyze-urls', json=body)
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return {line['index']: line for line in lines}
+
+
+def test_each_url_is_fetched_and_generated(client, origin):
+    lines = analyze(client, {'urls': [
+        origin.url_for('napa-extra-heavy'),
+        {'url': origin.url_for('fexomin-120-tablet'), 'id': 'fex-120', 'company_name': 'Beximco'},
+    ], 'company_name': 'Arogga', 'concurrency': 2})
+
+    assert sorted(lines) == [0, 1]
+    assert (lines[0]['status'], lines[0]['url']) == ('ok', origin.url_for('napa-extra-heavy'))
+    assert lines[0]['original_title']
+    assert lines[0]['generated_title'] == 'Generated for Arogga'
+    assert (lines[1]['id'], lines[1]['generated_title']) == ('fex-120', 'Generated for Beximco')
+    assert sorted(path for path in origin.paths if path.startswith('/product/')) == [
+        '/product/fexomin-120-tablet', '/product/napa-extra-heavy',
+    ]
+
+
+def test_bad_urls_are_reported_inline(client, origin):
+    lines = analyze(client, {'urls': [origin.url_for('converse-summer-shoes'), f'{origin.base_url}/missing', {}]})
+
+    assert lines[0]['status'] == 'ok'
+    assert (lines[1]['status'], lines[1]['code'], lines[1]['error']) == (
+        'error', 400, 'Failed to extract metadata from URL'
+    )
+    assert (lines[2]['code'], lines[2]['error']) == (400, 'URL is required')
+
+
+@pytest.mark.parametrize('body', [{}, {'urls': []}, {'urls': 'https://shop.example/napa'}])
+def test_a_list_of_urls_is_required(client, body):
+    response = client.post('/api/analyze-urls', json=body)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'A list of URLs is required'}
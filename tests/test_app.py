@@ -0,0 +1,61 @@
+import pytest
+
+import app as app_module
+from utils.batch_service import iter_results
+from utils.concurrency import BoundedExecutor
+from utils.deadline import DeadlineExceeded
+
+
+def out_of_time(*args, **kwargs):
+    raise DeadlineExceeded('Request deadline of 1s exceeded before the test')
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+@pytest.mark.parametrize('route, target, body', [
+    ('/api/generate-content', 'generate_seo_content', {'content': 'Napa Extra 500mg Tablet'}),
+    ('/api/paraphrase', 'paraphrase_description', {'text': 'Fast relief from headache'}),
+    ('/api/product-description', 'generate_product_description', {'product_info': 'Napa Extra 500mg Tablet'}),
+])
+def test_deadline_exceeded_is_answered_with_504(client, monkeypatch, route, target, body):
+    monkeypatch.setattr(app_module, target, out_of_time)
+
+    response = client.post(route, json=body)
+
+    assert response.status_code == 504
+    assert 'deadline' in response.get_json()['error']
+
+
+def test_async_server_answers_deadline_exceeded_with_504(monkeypatch):
+    pytest.importorskip('httpx')
+    from starlette.testclient import TestClient
+    import asgi
+
+    async def aout_of_time(*args, **kwargs):
+        out_of_time()
+
+    monkeypatch.setattr(asgi, 'aparaphrase_description', aout_of_time)
+
+    response = TestClient(asgi.app).post('/api/paraphrase', json={'text': 'Fast relief from headache'})
+
+    assert response.status_code == 504
+
+
+def test_batch_items_past_the_deadline_report_504():
+    def process(item):
+        if item == 'late':
+            out_of_time()
+        if item == 'bad':
+            raise ValueError('bad item')
+        return {'title': item}
+
+    executor = BoundedExecutor(2)
+    lines = {line['index']: line for line in iter_results(enumerate(['ok', 'late', 'bad']), process, executor, 2)}
+    executor.shutdown()
+
+    assert lines[0]['status'] == 'ok'
+    assert (lines[1]['status'], lines[1]['code']) == ('error', 504)
+    assert (lines[2]['status'], lines[2]['code']) == ('error', 500)
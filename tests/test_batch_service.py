@@ -0,0 +1,75 @@
+import json
+import time
+
+import pytest
+
+import app as app_module
+from utils import batch_service
+
+
+def generate_seo_content(content, company_name, mode=None, **kwargs):
+    # The first product finishes last, so the lines arrive out of order
+    if content == 'Napa Extra 500mg Tablet':
+        time.sleep(0.1)
+    if content == 'Broken':
+        raise RuntimeError('model unavailable')
+    return {'title': content, 'description': f'{content} by {company_name}', 'keywords': [content.lower()]}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(batch_service, 'generate_seo_content', generate_seo_content)
+    return app_module.app.test_client()
+
+
+def post_ndjson(client, lines, query=''):
+    body = ''.join(line + '\n' for line in lines)
+    response = client.post(f'/api/generate-content/batch{query}', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_each_line_is_answered_with_its_index(client):
+    lines = post_ndjson(client, [
+        json.dumps({'content': 'Napa Extra 500mg Tablet', 'id': 'napa'}),
+        json.dumps({'content': 'Fexomin 120mg Tablet', 'sku': 'fex-120'}),
+        json.dumps({'content': 'Ace Plus', 'company_name': 'Beximco'}),
+    ], '?concurrency=3')
+
+    assert lines[-1]['index'] == 0
+    by_index = {line['index']: line for line in lines}
+    assert sorted(by_index) == [0, 1, 2]
+    assert by_index[0]['id'] == 'napa'
+    assert by_index[1]['generated_title'] == 'Fexomin 120mg Tablet'
+    assert by_index[2]['generated_description'] == 'Ace Plus by Beximco'
+    assert all(line['status'] == 'ok' for line in lines)
+
+
+def test_bad_items_are_reported_inline(client):
+    lines = post_ndjson(client, [
+        json.dumps({'content': 'Fexomin 120mg Tablet'}),
+        '{"content": ',
+        json.dumps({'sku': 'no-content'}),
+        '',
+        json.dumps(['not', 'an', 'object']),
+        json.dumps({'content': 'Broken', 'id': 'broken'}),
+    ])
+    by_index = {line['index']: line for line in lines}
+
+    assert by_index[0]['status'] == 'ok'
+    assert (by_index[1]['code'], by_index[1]['error'].split(':')[0]) == (400, 'Invalid JSON')
+    assert (by_index[2]['code'], by_index[2]['error']) == (400, 'Content is required')
+    # The blank line is skipped without taking an index
+    assert (by_index[3]['code'], by_index[3]['error']) == (400, 'Item must be a JSON object')
+    assert (by_index[4]['status'], by_index[4]['code'], by_index[4]['id']) == ('error', 500, 'broken')
+    assert len(lines) == 5
+
+
+def test_json_array_is_accepted_too(client):
+    response = client.post('/api/generate-content/batch', json=[{'content': 'Fexomin 120mg Tablet'}, {}])
+    lines = sorted((json.loads(line) for line in response.get_data(as_text=True).splitlines()),
+                   key=lambda line: line['index'])
+
+    assert [(line['index'], line['status']) for line in lines] == [(0, 'ok'), (1, 'error')]
+    assert client.post('/api/generate-content/batch', json={'content': 'x'}).status_code == 400
@@ -0,0 +1,68 @@
+import time
+
+from utils import ai_service
+from utils.ai_backends import FakeLLM
+from utils.cache_service import ResponseCache, bypass_cache, make_cache_key
+from utils.llm_dispatcher import LLMDispatcher, set_dispatcher
+
+
+def test_lookups_fall_through_the_memory_lru_to_the_shared_database(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    cache = ResponseCache(path, memory_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, f"value {key}")
+
+    assert [cache.get(key) for key in ('c', 'a', 'missing')] == ['value c', 'value a', None]
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['disk_hits'], stats['misses']) == (1, 1, 1)
+    assert (stats['memory_entries'], stats['disk_entries']) == (2, 3)
+    # Another worker process shares the database tier
+    assert ResponseCache(path).get('b') == 'value b'
+
+
+def test_expired_entries_are_not_served(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), ttl=-1)
+    cache.set('a', 'value a')
+
+    assert cache.get('a') is None
+    assert cache.evict() == 1
+
+
+def test_eviction_drops_the_least_recently_used_rows_over_the_bounds(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.sqlite3'), memory_entries=0, max_disk_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, f"value {key}")
+        time.sleep(0.002)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get('a') == 'value a'
+
+    assert cache.evict() == 1
+    assert [cache.get(key) for key in ('a', 'b', 'c')] == ['value a', None, 'value c']
+
+    cache.max_disk_entries = 10
+    cache.max_disk_bytes = len('value c'.encode('utf-8'))
+    assert cache.evict() == 1
+    assert cache.stats()['disk_entries'] == 1
+
+
+def test_make_cache_key_depends_on_every_setting():
+    key = make_cache_key('prompt', 'model', {'temperature': 0.5}, {})
+    assert key == make_cache_key('prompt', 'model', {'temperature': 0.5}, {})
+    assert key != make_cache_key('prompt', 'model', {'temperature': 0.7}, {})
+    assert key != make_cache_key('prompt', 'other-model', {'temperature': 0.5}, {})
+
+
+def test_bypassed_lookup_still_stores_the_fresh_response():
+    llm = FakeLLM(latency=0, respond=lambda prompt: f"Answer {llm.calls}")
+    set_dispatcher(LLMDispatcher(model_factory=llm.model))
+    prompt = 'Cache bypass prompt for a copper bottle'
+    try:
+        with bypass_cache():
+            first = ai_service.generate_content(prompt)
+            fresh = ai_service.generate_content(prompt)
+        cached = ai_service.generate_content(prompt)
+    finally:
+        set_dispatcher(None)
+
+    assert (first, fresh, cached) == ('Answer 1', 'Answer 2', 'Answer 2')
+    assert llm.stats()['calls'] == 2
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.ai_backends import FakeLLM
+from utils.coalescing import AsyncSingleFlight, SingleFlight, coalesce
+from utils.deadline import DeadlineExceeded, deadline
+from utils.description_service import paraphrase_description
+from utils.llm_dispatcher import LLMDispatcher, set_dispatcher
+
+
+def wait_until(condition, timeout=2):
+    stop = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < stop, 'condition not met in time'
+        time.sleep(0.005)
+
+
+def test_identical_requests_share_one_llm_call():
+    llm = FakeLLM(latency=0.2, respond=lambda prompt: 'Paraphrased description')
+    set_dispatcher(LLMDispatcher(model_factory=llm.model))
+    text = 'Coalesced paraphrase of a fast charging power bank'
+    results = []
+
+    def paraphrase():
+        results.append(coalesce('paraphrase', lambda: paraphrase_description(text, 'Shop'),
+                                text=text, company_name='Shop'))
+
+    try:
+        leader = threading.Thread(target=paraphrase)
+        leader.start()
+        wait_until(lambda: llm.stats()['calls'] == 1)
+        # Extra whitespace normalizes to the same key
+        text = f"  {text} "
+        follower = threading.Thread(target=paraphrase)
+        follower.start()
+        leader.join(2)
+        follower.join(2)
+    finally:
+        set_dispatcher(None)
+
+    assert len(results) == 2 and results[0] == results[1]
+    assert llm.stats()['calls'] == 1
+
+
+def test_follower_waits_no_longer_than_its_own_deadline():
+    flights = SingleFlight()
+    release = threading.Event()
+    leader = threading.Thread(target=flights.do, args=('key', lambda: release.wait(2) and 'leader'))
+    leader.start()
+    wait_until(lambda: 'key' in flights._flights)
+
+    started = time.monotonic()
+    try:
+        with deadline(0.05), pytest.raises(DeadlineExceeded, match='identical request'):
+            flights.do('key', lambda: 'follower')
+    finally:
+        release.set()
+        leader.join(2)
+    assert time.monotonic() - started < 1
+
+
+def test_follower_with_time_left_runs_again_when_the_leader_ran_out():
+    flights = SingleFlight()
+    release = threading.Event()
+
+    def lead():
+        release.wait(2)
+        raise DeadlineExceeded('Request deadline of 1s exceeded before generation')
+
+    errors = []
+
+    def run_leader():
+        try:
+            flights.do('key', lead)
+        except DeadlineExceeded as e:
+            errors.append(e)
+
+    leader = threading.Thread(target=run_leader)
+    leader.start()
+    wait_until(lambda: 'key' in flights._flights)
+    result = []
+    follower = threading.Thread(target=lambda: result.append(flights.do('key', lambda: 'follower')))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(2)
+    follower.join(2)
+
+    assert result == ['follower'] and len(errors) == 1
+
+
+def test_async_follower_waits_no_longer_than_its_own_deadline():
+    flights = AsyncSingleFlight()
+
+    async def lead():
+        await asyncio.sleep(0.3)
+        return 'leader'
+
+    async def follow():
+        with deadline(0.05):
+            return await flights.do('key', lambda: asyncio.sleep(0, 'follower'))
+
+    async def main():
+        leader = asyncio.ensure_future(flights.do('key', lead))
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded, match='identical request'):
+            await follow()
+        return await leader
+
+    assert asyncio.run(main()) == 'leader'
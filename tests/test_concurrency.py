@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.concurrency import BoundedExecutor, arun_fields, run_fields
+from utils.deadline import deadline
+
+
+def broken():
+    raise RuntimeError('model unavailable')
+
+
+@pytest.fixture
+def executor():
+    executor = BoundedExecutor(max_workers=4)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.parametrize('parallelism', [1, 3])
+def test_failing_field_gets_its_fallback_and_the_others_are_kept(executor, parallelism):
+    tasks = {'title': lambda: 'Napa Extra', 'description': broken, 'keywords': lambda: ['napa']}
+    fallbacks = {'description': lambda: 'Fallback description.'}
+
+    results = run_fields(tasks, executor, parallelism, fallbacks)
+
+    assert results == {'title': 'Napa Extra', 'description': 'Fallback description.', 'keywords': ['napa']}
+    assert list(results) == ['title', 'description', 'keywords']
+
+
+def test_failing_field_without_a_fallback_is_none(executor):
+    assert run_fields({'title': broken, 'keywords': lambda: ['napa']}, executor, 2) == {
+        'title': None, 'keywords': ['napa'],
+    }
+
+
+def test_async_failing_field_gets_its_fallback():
+    async def title():
+        return 'Napa Extra'
+
+    async def description():
+        broken()
+
+    results = asyncio.run(arun_fields({'title': title, 'description': description}, 2,
+                                      {'description': lambda: 'Fallback description.'}))
+
+    assert results == {'title': 'Napa Extra', 'description': 'Fallback description.'}
+
+
+def test_fields_unfinished_at_the_deadline_get_their_fallbacks(executor):
+    tasks = {'title': lambda: 'Napa Extra', 'description': lambda: time.sleep(0.5) or 'Too late'}
+
+    with deadline(0.1):
+        results = run_fields(tasks, executor, 2, {'description': lambda: 'Fallback description.'})
+
+    assert results == {'title': 'Napa Extra', 'description': 'Fallback description.'}
@@ -0,0 +1,49 @@
+from utils import condenser
+from utils.condenser import condense, condense_content, split_sentences
+from utils.llm_dispatcher import estimate_tokens
+
+NAME = 'Napa Extra 500mg Tablet.'
+COMPOSITION = 'Each tablet contains Paracetamol 500mg and Caffeine 65mg.'
+INDICATIONS = 'Napa Extra is used for fever, headache and toothache relief.'
+FILLER = ' '.join(f'Our store opened branch number {index} in the city last year with new staff.' for index in range(30))
+# The page as extracted: the product block is repeated by a nested selector, with store chrome around it
+PAGE = f'{NAME} Add to cart. {COMPOSITION} {FILLER} {INDICATIONS} {NAME} {COMPOSITION} Privacy policy.'
+
+
+def test_product_sentences_are_kept_within_the_budget():
+    condensed = condense(PAGE, budget=60)
+
+    assert condensed.tokens_after <= 60 < condensed.tokens_before
+    assert condensed.tokens_after == estimate_tokens(condensed.text)
+    # The name, composition and indications are kept, in the order of the page
+    kept = split_sentences(condensed.text)
+    assert [kept[0], kept[1], kept[-1]] == [NAME, COMPOSITION, INDICATIONS]
+    assert 'Add to cart' not in condensed.text and 'Privacy' not in condensed.text
+    # 33 distinct sentences are left once the repeats and the chrome are gone
+    assert condensed.dropped == {'duplicate': 2, 'boilerplate': 2, 'budget': 33 - len(kept)}
+
+
+def test_without_a_budget_content_is_only_deduplicated():
+    condensed = condense(PAGE, budget=0)
+
+    assert condensed.text == f'{NAME} {COMPOSITION} {FILLER} {INDICATIONS}'
+    assert condensed.dropped['budget'] == 0
+
+
+def test_sentence_repeated_inside_a_longer_block_is_dropped():
+    nested = f'{INDICATIONS} Keep out of reach of children. {INDICATIONS}'
+    condensed = condense(f'{NAME} {nested} Store below 30°C. Keep out of reach of children.', budget=0)
+
+    assert condensed.text == f'{NAME} {INDICATIONS} Keep out of reach of children. Store below 30°C.'
+
+
+def test_long_runs_without_punctuation_are_split():
+    table = ' '.join(f'spec{index}' for index in range(100))
+
+    assert [len(sentence.split()) for sentence in split_sentences(table, max_words=40)] == [40, 40, 20]
+
+
+def test_condensation_can_be_turned_off(monkeypatch):
+    monkeypatch.setattr(condenser, 'CONDENSE_ENABLED', False)
+
+    assert condense_content(PAGE) == PAGE
@@ -0,0 +1,67 @@
+import pytest
+
+from benchmarks.stub_origin import StubOrigin
+from utils.crawl_service import CrawlJob, CrawlStore
+
+
+@pytest.fixture
+def origin():
+    # Serves robots.txt (disallowing /product/private-*) and a sitemap index with a gzip product sitemap
+    with StubOrigin() as origin:
+        yield origin
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CrawlStore(str(tmp_path / 'crawl.sqlite3'))
+
+
+def crawl(origin, store, **options):
+    return CrawlJob(f"{origin.base_url}/sitemap.xml", rate=0, generate=False, store=store, **options)
+
+
+def product_paths(origin):
+    return [path.split('?')[0] for path in origin.paths if path.startswith('/product/')]
+
+
+def test_crawl_filters_urls_and_honors_robots(origin, store):
+    job = crawl(origin, store, include=[r'/product/'], exclude=[r'converse'])
+
+    progress = job.run()
+    assert (progress['done'], progress['skipped'], progress['error'], progress['total']) == (2, 1, 0, 3)
+    results = {item['url'].split('?')[0]: item for item in store.results(job.job_id)}
+    assert set(results) == {origin.url_for('fexomin-120-tablet'), origin.url_for('napa-extra-heavy'),
+                            origin.url_for('private-preview')}
+    assert results[origin.url_for('private-preview')] == {
+        'url': origin.url_for('private-preview'), 'status': 'skipped', 'error': 'Disallowed by robots.txt'
+    }
+    assert results[origin.url_for('napa-extra-heavy')]['original_title']
+    # Disallowed pages are never requested
+    assert sorted(product_paths(origin)) == ['/product/fexomin-120-tablet', '/product/napa-extra-heavy']
+
+
+def test_discovery_stops_at_max_urls(origin, store):
+    job = crawl(origin, store, max_urls=2)
+
+    assert job.run()['total'] == 2
+
+
+def test_stopped_crawl_resumes_with_the_pending_urls_only(origin, store):
+    job = crawl(origin, store, include=[r'/product/'], concurrency=1)
+
+    first = job.run(should_stop=lambda: store.progress(job.job_id)['done'] >= 1)
+    assert store.get_job(job.job_id)['status'] == 'stopped'
+    assert first['pending'] > 0
+    pending = [url.split('?')[0] for url in store.pending_urls(job.job_id)]
+    crawled = product_paths(origin)
+    sitemaps = origin.paths.count('/sitemap.xml')
+
+    origin.paths.clear()
+    resumed = CrawlJob.resume(job.job_id, store).run()
+    assert store.get_job(job.job_id)['status'] == 'completed'
+    assert resumed['pending'] == 0 and resumed['total'] == first['total']
+    # Only the pending URLs are fetched, and the sitemap is not read again
+    assert [origin.base_url + path for path in product_paths(origin)] == \
+        [url for url in pending if 'private-' not in url]
+    assert not set(product_paths(origin)) & set(crawled)
+    assert sitemaps == 1 and '/sitemap.xml' not in origin.paths
@@ -0,0 +1,73 @@
+import pytest
+
+from utils import duplicate_index, generation_service
+from utils.duplicate_index import DuplicateIndex, MinHasher, product_key
+
+NAPA = 'Buy Napa Extra 500mg Tablet online at Arogga. Fast relief from fever and headache, delivered to your door.'
+# The same text generated for another product
+NAPA_ONE = NAPA.replace('Napa Extra', 'Napa One')
+SECLO = 'Seclo 20mg Capsule controls stomach acid for heartburn and ulcers. Order from Arogga pharmacy today.'
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DuplicateIndex(str(tmp_path / 'duplicates.sqlite3'))
+
+
+def test_signatures_estimate_the_jaccard_similarity():
+    hasher = MinHasher()
+
+    assert hasher.similarity(hasher.signature(NAPA), hasher.signature(NAPA.upper() + '!')) == 1
+    assert hasher.similarity(hasher.signature(NAPA), hasher.signature(NAPA_ONE)) >= 0.8
+    assert hasher.similarity(hasher.signature(NAPA), hasher.signature(SECLO)) < 0.2
+
+
+def test_near_duplicate_is_found_above_the_threshold(index):
+    index.add('description', 'napa', NAPA)
+    index.add('description', 'seclo', SECLO)
+    index.add('title', 'napa-one', NAPA_ONE)
+
+    matches = index.find('description', NAPA_ONE, threshold=0.8)
+
+    assert [(match.key, match.text) for match in matches] == [('napa', NAPA)]
+    assert matches[0].similarity >= 0.8
+    assert index.find('description', NAPA_ONE, threshold=0.99) == []
+    # A product's own entry is not a duplicate of itself
+    assert index.find('description', NAPA, exclude_key='napa') == []
+
+
+def test_adding_a_key_again_replaces_its_text(index):
+    index.add('description', 'napa', NAPA)
+    index.add('description', 'napa', SECLO)
+
+    assert index.count('description') == 1
+    assert index.find('description', NAPA) == []
+    assert [match.key for match in index.find('description', SECLO)] == ['napa']
+
+
+def test_report_groups_near_duplicates_largest_first(index):
+    for key, text in (('napa', NAPA), ('seclo', SECLO), ('napa-one', NAPA_ONE), ('napa-2', NAPA + ' Best price.'),
+                      ('seclo-2', SECLO.replace('today', 'now')), ('fexo', 'Fexomin 120mg for hay fever.')):
+        index.add('description', key, text)
+
+    report = index.report('description')
+
+    assert [sorted(member.key for member in cluster) for cluster in report] == [
+        ['napa', 'napa-2', 'napa-one'], ['seclo', 'seclo-2'],
+    ]
+    assert report[0][0].similarity == 1
+    assert index.report('title') == []
+
+
+def test_generated_near_duplicates_are_flagged(index, monkeypatch):
+    monkeypatch.setattr(generation_service, '_duplicate_check', 'flag')
+    monkeypatch.setattr(duplicate_index, 'get_duplicate_index', lambda: index)
+
+    assert generation_service.review_duplicates('description', NAPA, 'Napa Extra 500mg Tablet') == (NAPA, [])
+    value, matches = generation_service.review_duplicates('description', NAPA_ONE, 'Napa One 500mg Tablet')
+
+    assert value == NAPA_ONE
+    assert [match['text'] for match in matches] == [NAPA]
+    assert index.count('description') == 2
+    assert index.find('description', NAPA_ONE, exclude_key=product_key('Napa One 500mg Tablet'))[0].key == \
+        product_key('Napa Extra 500mg Tablet')
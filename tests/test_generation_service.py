@@ -0,0 +1,44 @@
+import pytest
+
+from utils import generation_service
+from utils.fingerprint_store import UNCHANGED
+from utils.metrics import count_events, record_event
+
+FIELDS = {'title': 'Napa Extra 500mg Tablet', 'description': 'Fast relief.', 'keywords': ['napa']}
+
+
+def generating(*events):
+    def generate_seo_content(*args, **kwargs):
+        for event, field in events:
+            record_event(event, field=field)
+        return dict(FIELDS)
+    return generate_seo_content
+
+
+@pytest.mark.parametrize('product_id, events', [
+    ('sku:real', []),
+    # A bundle field asked for again and a short keyword list topped up still give real fields
+    ('sku:retried', [('fallback', 'bundle_title'), ('fallback', 'keywords_short')]),
+])
+def test_generated_fields_are_kept(monkeypatch, product_id, events):
+    monkeypatch.setattr(generation_service, 'generate_seo_content', generating(*events))
+
+    assert generation_service.generate_if_changed(product_id, 'Napa Extra 500mg Tablet')[1] == 'new'
+    assert generation_service.generate_if_changed(product_id, 'Napa Extra 500mg Tablet') == (FIELDS, UNCHANGED)
+
+
+def test_placeholder_fields_are_generated_again(monkeypatch):
+    monkeypatch.setattr(generation_service, 'generate_seo_content',
+                        generating(('fallback', 'title'), ('placeholder', 'title')))
+
+    assert generation_service.generate_if_changed('sku:placeholder', 'Napa Extra 500mg Tablet')[1] == 'new'
+    assert generation_service.generate_if_changed('sku:placeholder', 'Napa Extra 500mg Tablet')[1] == 'new'
+
+
+def test_fallback_fields_record_placeholders():
+    with count_events() as events:
+        generation_service.fallback_title('Napa Extra 500mg Tablet')
+        generation_service.fallback_meta_description('Napa Extra 500mg Tablet')
+        generation_service.fallback_keywords('Napa Extra 500mg Tablet')
+
+    assert events['placeholder'] == 3
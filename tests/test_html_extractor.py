@@ -0,0 +1,40 @@
+import pytest
+
+from benchmarks.stub_origin import load_pages
+from utils.html_extractor import StreamingExtractor, available_backends, extract_page
+from utils.url_service import parse_page
+
+PAGES = {name: body.decode('utf-8') for name, body in load_pages().items()}
+PAGES.update({
+    'noscript': (
+        '<html><head><title>Napa Extra</title></head><body><h1>Napa Extra 500mg Tablet</h1>'
+        '<div class="details"><noscript>Enable JavaScript to see the price of this tablet.</noscript>'
+        'Details of the tablet and its dosage for adults.</div></body></html>'
+    ),
+    'script-style-template': (
+        '<html><body><div class="product-info">Paracetamol 500mg and Caffeine 65mg tablets.'
+        '<script>var price = 25;</script><style>.price { color: red; }</style>'
+        '<template>Hidden template row of the product table</template></div></body></html>'
+    ),
+})
+
+
+def chunked(html, size=64):
+    return (html[start:start + size] for start in range(0, len(html), size))
+
+
+@pytest.mark.parametrize('backend', available_backends())
+@pytest.mark.parametrize('name', sorted(PAGES))
+def test_single_pass_extraction_matches_the_tree(name, backend):
+    assert extract_page(chunked(PAGES[name]), backend) == parse_page(PAGES[name])
+
+
+def test_noscript_text_is_page_content():
+    content = extract_page([PAGES['noscript']])['content']
+
+    assert content == ('Napa Extra 500mg Tablet Enable JavaScript to see the price of this tablet. '
+                       'Details of the tablet and its dosage for adults.')
+
+
+def test_default_backend_does_not_depend_on_what_is_installed():
+    assert StreamingExtractor().backend == 'html.parser'
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+import app as app_module
+from utils.ai_backends import FakeLLM
+from utils.idempotency import IdempotencyStore, request_fingerprint
+from utils.llm_dispatcher import LLMDispatcher, set_dispatcher
+
+BODY = {'text': 'Idempotent paraphrase of a stainless steel kettle', 'company_name': 'Shop'}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = IdempotencyStore(str(tmp_path / 'idempotency.sqlite3'))
+    monkeypatch.setattr(app_module, 'get_idempotency_store', lambda: store)
+    return store
+
+
+@pytest.fixture
+def llm():
+    llm = FakeLLM(latency=0, respond=lambda prompt: 'Paraphrased kettle description')
+    set_dispatcher(LLMDispatcher(model_factory=llm.model))
+    yield llm
+    set_dispatcher(None)
+
+
+def post(body, key):
+    return app_module.app.test_client().post('/api/paraphrase', data=json.dumps(body),
+                                             content_type='application/json', headers={'Idempotency-Key': key})
+
+
+def test_request_sent_again_with_its_key_is_replayed(store, llm):
+    # A text of its own, so the response cache does not answer it
+    body = {**BODY, 'text': 'Idempotent paraphrase of a cast iron pan'}
+    first = post(body, 'replayed-key')
+    second = post(body, 'replayed-key')
+
+    assert first.status_code == second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert 'Idempotent-Replayed' not in first.headers
+    assert second.headers['Idempotent-Replayed'] == 'true'
+    assert llm.stats()['calls'] == 1
+
+
+def test_key_reused_for_a_different_request_is_rejected(store, llm):
+    assert post(BODY, 'reused-key').status_code == 200
+    calls = llm.stats()['calls']
+
+    response = post({**BODY, 'text': 'Another product'}, 'reused-key')
+    assert response.status_code == 422
+    assert llm.stats()['calls'] == calls
+
+
+def test_retry_while_the_original_still_runs_gets_a_conflict(store, llm, monkeypatch):
+    monkeypatch.setattr('utils.idempotency.POLL_INTERVAL', 0.01)
+    fingerprint = request_fingerprint('POST', '/api/paraphrase', '', json.dumps(BODY).encode('utf-8'))
+    # The original request holds the key
+    assert store.acquire('running-key', fingerprint) is None
+    store.wait = 0.05
+
+    response = post(BODY, 'running-key')
+    assert response.status_code == 409
+    assert llm.stats()['calls'] == 0
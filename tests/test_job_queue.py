@@ -0,0 +1,113 @@
+import time
+
+import pytest
+
+from utils.job_queue import JobQueue, run_job
+from utils.sqlite_store import connect
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.sqlite3'))
+
+
+def claim_expired(queue, worker_id):
+    # A lease of 0 seconds runs out at once, as if the worker had crashed
+    job = queue.claim(worker_id, visibility_timeout=0)
+    time.sleep(0.01)
+    return job
+
+
+def test_job_whose_lease_expired_is_claimed_again(queue):
+    job_id = queue.submit('generate_content', {'content': 'kettle'})
+    assert claim_expired(queue, 'crashed')['id'] == job_id
+
+    job = queue.claim('second')
+    assert (job['id'], job['status'], job['attempts']) == (job_id, 'running', 2)
+    assert queue.claim('third') is None
+
+
+def test_worker_that_lost_its_lease_cannot_finish_the_job(queue):
+    job_id = queue.submit('generate_content', {'content': 'kettle'})
+    claim_expired(queue, 'slow')
+    queue.claim('second')
+
+    queue.complete(job_id, 'slow', {'title': 'stale'})
+    assert queue.fail(job_id, 'slow', 'stale error') == 'unknown'
+    assert (queue.get(job_id)['status'], queue.get(job_id)['result']) == ('running', None)
+
+    queue.complete(job_id, 'second', {'title': 'Kettle'})
+    assert (queue.get(job_id)['status'], queue.get(job_id)['result']) == ('succeeded', {'title': 'Kettle'})
+
+
+def test_lost_job_with_no_attempts_left_fails(queue):
+    job_id = queue.submit('generate_content', {'content': 'kettle'}, max_attempts=1)
+    claim_expired(queue, 'crashed')
+
+    assert queue.claim('second') is None
+    assert (queue.get(job_id)['status'], queue.get(job_id)['error']) == ('failed', 'Worker lost')
+
+
+def test_failed_job_is_retried_after_a_backoff_until_its_attempts_run_out(queue):
+    job_id = queue.submit('flaky', {}, max_attempts=2)
+
+    def flaky(payload, context):
+        raise RuntimeError('origin unavailable')
+
+    assert run_job(queue, queue.claim('worker'), 'worker', {'flaky': flaky}) == 'queued'
+    job = queue.get(job_id)
+    assert (job['status'], job['attempts'], job['error']) == ('queued', 1, 'origin unavailable')
+    # Still backing off
+    assert queue.claim('worker') is None
+
+    connect(queue.path).execute('UPDATE jobs SET run_after = 0 WHERE id = ?', (job_id,))
+    assert run_job(queue, queue.claim('worker'), 'worker', {'flaky': flaky}) == 'failed'
+    job = queue.get(job_id)
+    assert (job['status'], job['attempts'], job['error']) == ('failed', 2, 'origin unavailable')
+
+
+def test_cancelled_queued_job_is_never_claimed(queue):
+    job_id = queue.submit('generate_content', {'content': 'kettle'})
+
+    assert queue.cancel(job_id)['status'] == 'cancelled'
+    assert queue.claim('worker') is None
+
+
+def test_job_cancelled_before_its_handler_starts_does_not_run(queue):
+    job_id = queue.submit('crawl', {})
+    job = queue.claim('worker')
+    queue.cancel(job_id)
+    calls = []
+
+    assert run_job(queue, job, 'worker', {'crawl': lambda payload, context: calls.append(payload)}) == 'cancelled'
+    assert calls == []
+    assert queue.get(job_id)['status'] == 'cancelled'
+
+
+def test_running_job_stops_when_cancelled(queue):
+    job_id = queue.submit('crawl', {})
+    steps = []
+
+    def crawl(payload, context):
+        for step in range(3):
+            steps.append(step)
+            if step == 1:
+                assert queue.cancel(context.job_id)['status'] == 'running'
+            context.heartbeat()
+            context.check_cancelled()
+        return {'done': True}
+
+    assert run_job(queue, queue.claim('worker'), 'worker', {'crawl': crawl}) == 'cancelled'
+    assert steps == [0, 1]
+    assert (queue.get(job_id)['status'], queue.get(job_id)['result']) == ('cancelled', None)
+
+
+def test_handler_that_ignores_a_cancel_still_ends_cancelled(queue):
+    job_id = queue.submit('crawl', {})
+
+    def crawl(payload, context):
+        queue.cancel(context.job_id)
+        return {'done': True}
+
+    assert run_job(queue, queue.claim('worker'), 'worker', {'crawl': crawl}) == 'cancelled'
+    assert queue.get(job_id)['status'] == 'cancelled'
@@ -0,0 +1,55 @@
+import json
+import os
+
+import pytest
+
+from utils.json_repair import JSONStreamParser, parse_json
+from utils.product_description_service import (
+    fallback_product_description, generate_product_description, parse_product_description, response_sections
+)
+from utils.stream_service import partial_sections
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+
+with open(os.path.join(FIXTURES, 'description_responses.json'), encoding='utf-8') as f:
+    CASES = [pytest.param(case, id=case['name']) for case in json.load(f)]
+
+
+def normalized(sections):
+    return {name: value.strip() if isinstance(value, str) else [item.strip() for item in value]
+            for name, value in sections.items()}
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_tolerant_parse(case):
+    assert normalized(parse_product_description(case['response'])) == normalized(case['expected'])
+
+
+@pytest.mark.parametrize('case', CASES)
+def test_stream_parse(case):
+    # Fed in chunks, with the sections read after every chunk as the streaming endpoint does
+    parser = JSONStreamParser()
+    response = case['response']
+    for offset in range(0, len(response), 20):
+        parser.feed(response[offset:offset + 20])
+        list(partial_sections(parser))
+
+    assert normalized(response_sections(parser.finish(), response)) == normalized(case['expected'])
+
+
+@pytest.mark.parametrize('text, value, repaired', [
+    ('{"a": [1, 2]}', {'a': [1, 2]}, False),
+    ('Here you go: {"a": "line\none"} Hope it helps!', {'a': 'line\none'}, True),
+    ('{"a": [1, 2,], }', {'a': [1, 2]}, True),
+    ('{"a": "cut off', {'a': 'cut off'}, True),
+    ('no JSON here', None, True),
+])
+def test_parse_json_reports_repairs(text, value, repaired):
+    assert parse_json(text) == (value, repaired)
+
+
+def test_answer_without_any_description_gets_the_fallback(monkeypatch):
+    monkeypatch.setattr('utils.ai_service.generate_content', lambda *args, **kwargs: 'Sorry, I cannot help with that.')
+
+    assert generate_product_description('Slim 10000mAh power bank') == \
+        fallback_product_description('Slim 10000mAh power bank')
@@ -0,0 +1,94 @@
+import pytest
+
+from utils import keyword_model
+from utils.constants import KEYWORD_HYBRID_CANDIDATES
+from utils.keyword_model import KeywordModel, iter_phrases
+from utils.keyword_service import generate_keywords
+
+CATALOG = [
+    'Napa Extra 500mg Tablet. Paracetamol and caffeine tablet for fever and headache. Buy online.',
+    'Ace Plus 500mg Tablet. Paracetamol and caffeine tablet for pain relief. Buy online.',
+    'Fexomin 120mg Tablet. Fexofenadine tablet for allergy relief. Buy online.',
+    'Seclo 20mg Capsule. Omeprazole capsule for acidity. Buy online.',
+]
+CONTENT = 'Napa Extra 500mg Tablet. Napa Extra contains paracetamol and caffeine. Napa Extra relieves headache. Buy online.'
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = KeywordModel().partial_fit(CATALOG)
+    monkeypatch.setattr(keyword_model, '_model', model)
+    return model
+
+
+def test_phrases_do_not_start_or_end_with_numbers_or_stopwords():
+    phrases = set(iter_phrases('Relief of fever with Napa 500 tablet'))
+
+    assert {'relief', 'relief of fever', 'napa 500 tablet', 'fever'} <= phrases
+    assert not phrases & {'500', 'of fever', 'napa 500', 'relief of'}
+
+
+def test_brand_ranks_above_words_every_product_repeats(model):
+    keywords = model.keywords(CONTENT, 3)
+
+    assert keywords[0] == 'napa extra'
+    assert 'online' not in keywords
+    # A phrase inside a better one is left out
+    assert 'napa' not in keywords
+
+
+def test_partial_fit_and_save_keep_the_document_frequencies(model, tmp_path):
+    model.partial_fit(['Napa 500mg Tablet. Paracetamol tablet for fever.'])
+    path = str(tmp_path / 'keywords.npz')
+    model.save(path)
+    loaded = KeywordModel.load(path)
+
+    assert (loaded.n_docs, len(loaded)) == (5, len(model))
+    assert loaded.doc_freq[loaded.vocabulary['paracetamol']] == 3
+    assert loaded.keywords(CONTENT, 5) == model.keywords(CONTENT, 5)
+
+
+def test_prune_keeps_the_most_common_phrases(model):
+    model.prune(2)
+
+    assert model.phrases == ['tablet', 'online']
+    assert list(model.doc_freq) == [3, 4]
+
+
+def test_local_mode_makes_no_llm_call(model, monkeypatch):
+    def generate_content(*args, **kwargs):
+        raise AssertionError('local keywords called the LLM')
+
+    monkeypatch.setattr('utils.ai_service.generate_content', generate_content)
+
+    keywords = generate_keywords(CONTENT, 7, 'Arogga', mode='local')
+
+    assert len(keywords) == 7
+    assert keywords[0] == 'napa extra'
+    assert 'napa extra Arogga' in keywords
+    assert sum('Arogga' in keyword for keyword in keywords) == 3
+
+
+def test_hybrid_mode_prompts_with_the_ranked_phrases(model, monkeypatch):
+    prompts = []
+
+    def generate_content(prompt, **kwargs):
+        prompts.append(prompt)
+        return 'napa extra, paracetamol tablet, fever medicine, Arogga napa, Arogga pharmacy, Arogga medicine'
+
+    monkeypatch.setattr('utils.ai_service.generate_content', generate_content)
+    content = CONTENT + ' Storage: keep below 30°C.' * 40
+
+    keywords = generate_keywords(content, 6, 'Arogga', mode='hybrid')
+
+    assert keywords[:2] == ['napa extra', 'paracetamol tablet']
+    assert len(prompts) == 1
+    candidates = ', '.join(model.keywords(content, KEYWORD_HYBRID_CANDIDATES))
+    assert f'Candidate keywords from our catalog (prefer these): {candidates}' in prompts[0]
+    # The page is cut down to its start; the candidates stand in for the rest
+    assert 0 < prompts[0].count('keep below') < 40
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError, match="Unknown keyword mode 'tfidf'"):
+        generate_keywords(CONTENT, mode='tfidf')
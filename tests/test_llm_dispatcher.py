@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+from utils import ai_service
+from utils.ai_backends import FakeLLM, ResourceExhausted
+from utils.constants import LLM_HEDGE_MIN_SAMPLES
+from utils.llm_dispatcher import DispatcherTimeout, LLMDispatcher, llm_priority, set_dispatcher
+
+
+def test_unhedged_call_with_timeout_runs_on_the_callers_thread():
+    threads = []
+    llm = FakeLLM(latency=0, respond=lambda prompt: threads.append(threading.current_thread()) or 'ok')
+    dispatcher = LLMDispatcher(model_factory=llm.model, hedge=False)
+
+    assert dispatcher.generate('prompt', 'model', timeout=5).text == 'ok'
+    assert threads == [threading.current_thread()]
+
+
+def test_slow_call_is_hedged_and_the_first_answer_wins():
+    slow = threading.Event()
+
+    def respond(prompt):
+        if prompt == 'slow' and not slow.is_set():
+            slow.set()
+            time.sleep(1)
+            return 'primary'
+        return 'hedge' if prompt == 'slow' else 'ok'
+
+    dispatcher = LLMDispatcher(model_factory=FakeLLM(latency=0, respond=respond).model, hedge=True)
+    for _ in range(LLM_HEDGE_MIN_SAMPLES):
+        dispatcher.generate('fast', 'model')
+
+    started = time.monotonic()
+    assert dispatcher.generate('slow', 'model', timeout=5).text == 'hedge'
+    assert time.monotonic() - started < 0.5
+    stats = dispatcher.stats()
+    assert (stats['hedged'], stats['hedge_wins']) == (1, 1)
+
+
+def wait_until(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'condition not met in time'
+        time.sleep(0.005)
+
+
+def test_throttled_call_halves_the_concurrency_limit():
+    llm = FakeLLM(latency=0, throttle_rate=1)
+    dispatcher = LLMDispatcher(model_factory=llm.model, max_concurrency=8, min_concurrency=1)
+
+    with pytest.raises(ResourceExhausted):
+        dispatcher.generate('prompt', 'model')
+    stats = dispatcher.stats()
+    assert (stats['throttled'], stats['errors'], stats['concurrency_limit']) == (1, 0, 4)
+    assert llm.stats()['throttled'] == 1
+
+
+def test_interactive_calls_go_ahead_of_batch_calls():
+    release = threading.Event()
+    answered = []
+
+    def respond(prompt):
+        if prompt == 'holding':
+            release.wait(2)
+        answered.append(prompt)
+        return prompt
+
+    dispatcher = LLMDispatcher(model_factory=FakeLLM(latency=0, respond=respond).model, max_concurrency=1)
+
+    def call(prompt, lane):
+        with llm_priority(lane):
+            dispatcher.generate(prompt, 'model')
+
+    threads = [threading.Thread(target=call, args=('holding', 'interactive'))]
+    threads[0].start()
+    wait_until(lambda: dispatcher.stats()['in_flight'] == 1)
+    for prompt, lane in [('batch', 'batch'), ('interactive', 'interactive')]:
+        threads.append(threading.Thread(target=call, args=(prompt, lane)))
+        threads[-1].start()
+        wait_until(lambda: dispatcher.stats()['queued'][lane] == 1)
+    release.set()
+    for thread in threads:
+        thread.join(2)
+
+    assert answered == ['holding', 'interactive', 'batch']
+
+
+def test_call_waits_no_longer_than_the_queue_timeout():
+    release = threading.Event()
+    dispatcher = LLMDispatcher(model_factory=FakeLLM(latency=0, respond=lambda prompt: release.wait(2) and 'ok').model,
+                               max_concurrency=1, queue_timeout=0.05)
+    holder = threading.Thread(target=dispatcher.generate, args=('holding', 'model'))
+    holder.start()
+    wait_until(lambda: dispatcher.stats()['in_flight'] == 1)
+
+    try:
+        with pytest.raises(DispatcherTimeout):
+            dispatcher.generate('waiting', 'model')
+    finally:
+        release.set()
+        holder.join(2)
+    stats = dispatcher.stats()
+    assert (stats['timeouts'], stats['queued']['interactive']) == (1, 0)
+
+
+def test_generate_content_retries_a_throttled_call(monkeypatch):
+    # With this seed the first call is throttled and the second is not
+    llm = FakeLLM(latency=0, throttle_rate=0.5, seed=1, respond=lambda prompt: 'Generated text')
+    events = []
+    monkeypatch.setattr(ai_service, 'record_event', lambda event, **labels: events.append((event, labels)))
+    set_dispatcher(LLMDispatcher(model_factory=llm.model, backoff_base=0.001))
+    try:
+        assert ai_service.generate_content('retried prompt', use_cache=False) == 'Generated text'
+    finally:
+        set_dispatcher(None)
+
+    assert (llm.stats()['calls'], llm.stats()['throttled']) == (2, 1)
+    assert events == [('llm_retry', {'reason': 'throttled'})]
@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+from utils.constants import MEDICINE_PARSER_MIN_CONFIDENCE
+from utils.medicine_parser import BrandDictionary, get_brand_dictionary, parse_medicine_name
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures')
+
+with open(os.path.join(FIXTURES, 'medicine_titles.json'), encoding='utf-8') as f:
+    CASES = json.load(f)
+
+
+def confident(parsed):
+    return parsed is not None and parsed.confidence >= MEDICINE_PARSER_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize('case', [case for case in CASES if case['name_en']], ids=lambda case: case['content'][:40])
+def test_parseable_titles_skip_the_model(case):
+    parsed = parse_medicine_name(case['content'])
+
+    assert confident(parsed)
+    assert parsed.name_en == case['name_en']
+    brand_bn, known = get_brand_dictionary().lookup(parsed.brand)
+    if known:
+        assert parsed.name_bn == case['name_bn']
+    else:
+        # Transliteration may spell the brand differently; strength and form must still match
+        words = len(brand_bn.split())
+        assert parsed.name_bn.split()[words:] == case['name_bn'].split()[words:]
+
+
+@pytest.mark.parametrize('case', [case for case in CASES if not case['name_en']], ids=lambda case: case['content'][:40])
+def test_other_titles_go_to_the_model(case):
+    assert not confident(parse_medicine_name(case['content']))
+
+
+def test_unknown_brand_with_strength_and_form_is_transliterated():
+    # 0.2 + 0.3 + 0.35 is exactly the default threshold: intended, so new brands need no dictionary entry
+    parsed = parse_medicine_name('Zentrofen 20mg Capsule', BrandDictionary())
+
+    assert parsed.confidence == pytest.approx(0.85)
+    assert confident(parsed)
+    assert parsed.name_en == 'Zentrofen 20mg Capsule'
+    assert parsed.name_bn.endswith(' ২০ মি.গ্রা. ক্যাপসুল')
+
+
+@pytest.mark.parametrize('content, brands', [
+    ('Zentrofen Capsule', BrandDictionary()),
+    ('Zentrofen 20mg', BrandDictionary()),
+    ('Zentrofen Capsule', BrandDictionary({'Zentrofen': 'জেন্ট্রোফেন'})),
+    ('Zentrofen 20mg', BrandDictionary({'Zentrofen': 'জেন্ট্রোফেন'})),
+])
+def test_parses_missing_the_strength_or_form_go_to_the_model(content, brands):
+    assert not confident(parse_medicine_name(content, brands))
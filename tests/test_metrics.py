@@ -0,0 +1,98 @@
+import re
+import time
+
+import pytest
+
+import app as app_module
+from utils.metrics import Histogram, Timeline, record_event, timed
+
+
+def paraphrase_description(text, company_name):
+    with timed('llm'):
+        time.sleep(0.01)
+    with timed('llm'):
+        record_event('llm_retry', reason='metrics-test')
+    return f'Paraphrased {text}'
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def sample(exposition, line):
+    """Return the value of one series in a /metrics exposition, or 0 when it is absent."""
+    match = re.search(rf'^{re.escape(line)} (\S+)$', exposition, re.M)
+    return float(match.group(1)) if match else 0
+
+
+def test_server_timing_lists_stages_events_and_total(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'paraphrase_description', paraphrase_description)
+
+    response = client.post('/api/paraphrase', json={'text': 'Fast relief from Server-Timing'})
+
+    assert response.status_code == 200
+    entries = response.headers['Server-Timing'].split(', ')
+    assert re.fullmatch(r'llm;dur=\d+\.\d;desc="2 calls"', entries[0])
+    assert float(entries[0].split('=')[1].split(';')[0]) >= 10
+    assert 'llm_retry.metrics-test;desc="1"' in entries
+    assert re.fullmatch(r'total;dur=\d+\.\d', entries[-1])
+
+
+def test_requests_stages_and_events_are_exported(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'paraphrase_description', paraphrase_description)
+    before = client.get('/metrics').get_data(as_text=True)
+
+    client.post('/api/paraphrase', json={'text': 'Fast relief from /metrics'})
+    response = client.get('/metrics')
+    after = response.get_data(as_text=True)
+
+    assert response.mimetype == 'text/plain'
+    for name, kind in (('seo_request_duration_seconds', 'histogram'), ('seo_events_total', 'counter')):
+        assert f'# TYPE {name} {kind}' in after
+    for line in ('seo_request_duration_seconds_count{endpoint="paraphrase",status="200"}',
+                 'seo_request_duration_seconds_bucket{endpoint="paraphrase",status="200",le="+Inf"}'):
+        assert sample(after, line) == sample(before, line) + 1
+    stage = 'seo_stage_duration_seconds_count{endpoint="paraphrase",stage="llm"}'
+    assert sample(after, stage) == sample(before, stage) + 2
+    event = 'seo_events_total{endpoint="paraphrase",event="llm_retry",reason="metrics-test"}'
+    assert sample(after, event) == sample(before, event) + 1
+
+
+def test_streamed_responses_are_measured_over_the_whole_body(client, monkeypatch):
+    def stream_product_description(product_info, company_name):
+        with timed('llm'):
+            yield 'event: done\ndata: {}\n\n'
+
+    monkeypatch.setattr(app_module, 'stream_product_description', stream_product_description)
+    line = 'seo_stage_duration_seconds_count{endpoint="product_description_stream",stage="llm"}'
+    before = sample(client.get('/metrics').get_data(as_text=True), line)
+
+    response = client.post('/api/product-description/stream', json={'product_info': 'Napa Extra'})
+    response.get_data()
+
+    # The body runs after the headers are sent, so only /metrics sees its stages
+    assert 'Server-Timing' not in response.headers
+    assert sample(client.get('/metrics').get_data(as_text=True), line) == before + 1
+
+
+def test_stage_without_repeats_has_no_call_count():
+    timeline = Timeline('test')
+    timeline.add_stage('fetch', 0.002)
+    timeline.add_event('page_cache.hit')
+
+    assert timeline.server_timing().startswith('fetch;dur=2.0, page_cache.hit;desc="1", total;dur=')
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe((('endpoint', 'test'),), value)
+
+    assert histogram.render('latency') == [
+        'latency_bucket{endpoint="test",le="0.1"} 1',
+        'latency_bucket{endpoint="test",le="1"} 2',
+        'latency_bucket{endpoint="test",le="+Inf"} 3',
+        'latency_sum{endpoint="test"} 5.550000',
+        'latency_count{endpoint="test"} 3',
+    ]
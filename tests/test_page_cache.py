@@ -0,0 +1,33 @@
+import time
+
+from utils import page_cache
+from utils.page_cache import PageCache
+
+RECORD = {'title': 'Napa Extra', 'description': 'Fast relief.', 'content': 'Paracetamol 500mg'}
+
+
+def test_stale_pages_and_their_aliases_are_evicted(tmp_path):
+    cache = PageCache(str(tmp_path / 'pages.sqlite3'), max_stale=60)
+    cache.put('https://shop.example/napa?ref=home', RECORD, None, None, 'https://shop.example/napa')
+    cache.put('https://shop.example/fresh', RECORD, None, None)
+    page_cache.connect(cache.path).execute(
+        'UPDATE pages SET validated_at = ? WHERE url = ?', (time.time() - 120, 'https://shop.example/napa')
+    )
+
+    assert cache.evict() == 1
+    assert cache.get('https://shop.example/napa?ref=home') is None
+    assert cache.resolve('https://shop.example/napa?ref=home') == 'https://shop.example/napa?ref=home'
+    assert cache.get('https://shop.example/fresh')['record'] == RECORD
+    assert cache.stats()['evictions'] == 1
+
+
+def test_least_recently_validated_pages_go_past_the_row_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(page_cache, 'EVICTION_INTERVAL', 5)
+    cache = PageCache(str(tmp_path / 'pages.sqlite3'), max_entries=3)
+    for index in range(4):
+        cache.put(f'https://shop.example/{index}', RECORD, None, None)
+    cache.touch('https://shop.example/0')
+    cache.put('https://shop.example/4', RECORD, None, None)
+
+    assert cache.stats()['entries'] == 3
+    assert [index for index in range(5) if cache.get(f'https://shop.example/{index}')] == [0, 3, 4]
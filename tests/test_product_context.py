@@ -0,0 +1,51 @@
+import pytest
+
+from utils.constants import DEFAULT_PHARMACY_NAME, DEFAULT_SHOP_NAME
+from utils.pattern_matcher import PatternMatcher
+from utils.product_context import build_product_context
+
+
+@pytest.mark.parametrize('content', [
+    'Napa Extra 500mg Tablet',
+    'Seclo 20mg Capsule (Omeprazole)',
+    'Ace Syrup 100ml',
+    'Liquid Paraffin Emulsion 200ml',
+    'Napa Paracetamol Tablet 500mg | Fever medicine',
+    'নাপা ট্যাবলেট',
+    'নাপা ট্যাবলেটটি খাওয়ার নিয়ম',
+])
+def test_medicines(content):
+    context = build_product_context(content)
+
+    assert (context.category, context.is_medicine) == ('medicine', True)
+    assert context.display_company_name == DEFAULT_PHARMACY_NAME
+
+
+@pytest.mark.parametrize('content, category', [
+    ('Hydrating Facial Emulsion 50ml', 'beauty'),
+    ('Vitamin C Ampoule serum 30ml', 'beauty'),
+    ('Dettol Antiseptic Liquid 500ml', 'home'),
+    ('Samsung Galaxy Tab A8 10.5 inch Android tablet 4GB RAM 64GB', 'electronics'),
+    ('Ketoconazole Shampoo 100ml', 'beauty'),
+])
+def test_products_named_with_dosage_forms_are_not_medicines(content, category):
+    context = build_product_context(content)
+
+    assert (context.category, context.is_medicine) == (category, False)
+    assert context.display_company_name == DEFAULT_SHOP_NAME
+
+
+def test_medicine_has_to_lead_outright():
+    # One medicine term and one beauty term
+    context = build_product_context('Ointment and lip balm gift box')
+
+    assert context.categories == {'medicine': 1, 'beauty': 1}
+    assert not context.is_medicine
+
+
+def test_terms_match_whole_words_only():
+    matcher = PatternMatcher([('gel', 'medicine'), ('চা', 'grocery')])
+
+    assert matcher.count_labels('angel gel') == {'medicine': 1}
+    assert matcher.count_labels('চাকরি বাচা') == {}
+    assert matcher.count_labels('দার্জিলিং চা, ১০০ গ্রাম') == {'grocery': 1}
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+
+import pytest
+
+import app as app_module
+from utils.results_store import ResultsStore, export_csv, parse_time
+from utils.sqlite_store import connect
+
+SEO = {'title': 'Napa Extra 500mg Tablet', 'description': 'Fast relief.', 'keywords': ['napa', 'paracetamol']}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ResultsStore(str(tmp_path / 'results.sqlite3'))
+    store.add('seo', SEO, 'Arogga', sku='napa', source='batch')
+    store.add('seo', SEO, 'Arogga', url='shop.example/napa', source='analyze_urls')
+    store.add('product_description', {'product_description': {'features': ['Fast']}}, 'Arogga', sku='napa')
+    store.add('seo', SEO, 'Beximco', sku='ace', source='batch')
+    store.add('seo', SEO, 'Arogga', sku='napa', source='batch')
+    # Spread the rows a day apart, oldest first
+    connect(store.path).execute("UPDATE results SET created_at = ? + id * 86400", (parse_time('2026-01-01'),))
+    monkeypatch.setattr(app_module, 'get_results_store', lambda: store)
+    return store
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def ids(results):
+    return [item['id'] for item in results]
+
+
+def test_filters_combine(store):
+    assert ids(store.query(sku='napa')) == [1, 3, 5]
+    assert ids(store.query(sku='napa', kind='seo')) == [1, 5]
+    assert ids(store.query(company_name='Beximco')) == [4]
+    # URLs are matched normalized, with their scheme
+    assert ids(store.query(url='https://shop.example/napa')) == [2]
+    assert ids(store.query(since=parse_time('2026-01-03'), until=parse_time('2026-01-05'))) == [2, 3]
+    assert store.get(1)['keywords'] == ['napa', 'paracetamol']
+    assert store.get(1)['created_at'] == '2026-01-02T00:00:00Z'
+
+
+def test_pages_continue_after_the_last_id(client, store):
+    first = client.get('/api/results?company_name=Arogga&limit=2').get_json()
+    second = client.get(f"/api/results?company_name=Arogga&limit=2&after={first['next_after']}").get_json()
+
+    assert (ids(first['results']), first['next_after']) == ([1, 2], 2)
+    assert (ids(second['results']), second['next_after']) == ([3, 5], 5)
+    assert client.get('/api/results?after=5').get_json() == {'results': [], 'next_after': None}
+    assert client.get('/api/results?kind=title').status_code == 400
+
+
+def test_export_reads_the_store_a_page_at_a_time(store, monkeypatch):
+    pages = []
+    query = store.query
+    monkeypatch.setattr(store, 'query', lambda **kwargs: pages.append(kwargs['after']) or query(**kwargs))
+
+    assert ids(store.iter_results(batch_size=2, kind='seo')) == [1, 2, 4, 5]
+    assert pages == [0, 2, 5]
+
+
+def test_ndjson_export(client, store):
+    response = client.get('/api/export?sku=napa')
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="results.ndjson"'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert ids(lines) == [1, 3, 5]
+    assert lines[1]['product_description'] == {'features': ['Fast']}
+
+
+def test_csv_export(client, store):
+    response = client.get('/api/export?format=csv&kind=seo&since=2026-01-03')
+
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['id'] for row in rows] == ['2', '4', '5']
+    assert rows[0]['url'] == 'https://shop.example/napa'
+    assert rows[0]['keywords'] == 'napa, paracetamol'
+    assert client.get('/api/export?format=xlsx').status_code == 400
+
+
+def test_csv_is_written_in_chunks(store):
+    chunks = list(export_csv(store.iter_results(), batch_size=2))
+
+    # The header and two rows, two more rows, then the last row
+    assert [chunk.count('\n') for chunk in chunks] == [3, 2, 1]
@@ -0,0 +1,56 @@
+import json
+
+from utils import ai_service
+from utils.ai_service import AIServiceError
+from utils.keyword_service import fallback_keywords
+from utils.description_service import fallback_meta_description
+from utils.metrics import count_events
+from utils.seo_bundle_service import generate_seo_bundle
+from utils.title_service import fallback_title
+
+CONTENT = 'Stainless steel electric kettle 1.8 litre with auto shut-off and boil-dry protection'
+
+
+def answering(answer):
+    prompts = []
+
+    def generate_content(prompt, *args, **kwargs):
+        prompts.append(prompt)
+        return answer(prompt)
+    return generate_content, prompts
+
+
+def test_failed_fused_call_uses_the_local_fallbacks(monkeypatch):
+    def answer(prompt):
+        raise AIServiceError('Failed to generate content: 429 Resource has been exhausted')
+    generate_content, prompts = answering(answer)
+    monkeypatch.setattr(ai_service, 'generate_content', generate_content)
+
+    with count_events() as events:
+        bundle = generate_seo_bundle(CONTENT, 'Shop')
+
+    assert len(prompts) == 1
+    assert bundle == {
+        'title': fallback_title(CONTENT, 'Shop'),
+        'description': fallback_meta_description(CONTENT),
+        'keywords': fallback_keywords(CONTENT, 'Shop'),
+    }
+    assert events['placeholder'] == 3
+
+
+def test_field_missing_from_the_fused_response_gets_its_own_call(monkeypatch):
+    def answer(prompt):
+        if prompt.lstrip().startswith('Generate SEO metadata'):
+            return json.dumps({'product_info': 'Electric Kettle 1.8L Auto Shut-off',
+                               'meta_description': 'Get the Electric Kettle at Shop with fast boiling.'})
+        return 'electric kettle, steel kettle, Shop kettle, Shop online, Shop deals, kettle 1.8 litre'
+    generate_content, prompts = answering(answer)
+    monkeypatch.setattr(ai_service, 'generate_content', generate_content)
+
+    with count_events() as events:
+        bundle = generate_seo_bundle(CONTENT, 'Shop')
+
+    assert len(prompts) == 2
+    assert 'Electric Kettle' in bundle['title']
+    assert 'electric kettle' in bundle['keywords']
+    assert events.get('placeholder', 0) == 0
@@ -0,0 +1,23 @@
+import os
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_after(module, *names):
+    # A fresh interpreter, since this one has long imported everything
+    code = (f"import sys, threading, {module}; "
+            f"print(' '.join(name for name in {names!r} if name in sys.modules)); "
+            f"print(' '.join(thread.name for thread in threading.enumerate()))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT, env={**os.environ, 'SEO_STARTUP': 'lazy'},
+                            capture_output=True, text=True, check=True)
+    loaded, threads = result.stdout.splitlines()
+    return loaded.split(), threads.split()
+
+
+def test_importing_the_app_loads_no_heavy_library():
+    loaded, threads = imported_after('app', 'google.generativeai', 'bs4', 'requests', 'numpy', 'utils.crawl_service')
+
+    assert loaded == []
+    assert threads == ['MainThread']
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+import app as app_module
+from benchmarks.stub_origin import StubOrigin
+from utils import stream_service
+from utils.ai_service import AIServiceError
+
+DESCRIPTION = json.dumps({
+    'short_description': 'Napa Extra relieves pain fast.',
+    'features': ['Paracetamol 500mg', 'Caffeine 65mg'],
+})
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def read_events(response):
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['X-Accel-Buffering'] == 'no'
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        if block:
+            event, data = block.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def test_analyze_url_streams_the_page_then_each_field(client, monkeypatch):
+    def iter_seo_content(content, company_name, mode=None, executor=None, parallelism=None):
+        yield 'keywords', ['napa']
+        yield 'title', f'Napa Extra | {company_name}'
+        yield 'duplicates', {'title': [{'id': 'sku:napa'}]}
+
+    monkeypatch.setattr(stream_service, 'iter_seo_content', iter_seo_content)
+    with StubOrigin() as origin:
+        response = client.post('/api/analyze-url/stream',
+                               json={'url': origin.url_for('napa-extra-heavy'), 'company_name': 'Arogga'})
+        events = read_events(response)
+
+    assert [event for event, _ in events] == ['stage', 'meta', 'stage', 'field', 'field', 'duplicates', 'done']
+    assert [data for event, data in events if event == 'stage'] == [{'stage': 'fetching'}, {'stage': 'generating'}]
+    assert events[1][1]['original_title']
+    assert events[3][1] == {'name': 'generated_keywords', 'value': ['napa']}
+    done = events[-1][1]
+    assert done['generated_title'] == 'Napa Extra | Arogga'
+    assert done['duplicates'] == {'title': [{'id': 'sku:napa'}]}
+    assert done['original_title'] == events[1][1]['original_title']
+
+
+def test_analyze_url_that_cannot_be_fetched_ends_with_an_error(client):
+    with StubOrigin() as origin:
+        events = read_events(client.post('/api/analyze-url/stream', json={'url': f'{origin.base_url}/missing'}))
+
+    assert events == [('stage', {'stage': 'fetching'}), ('error', {'error': 'Failed to extract metadata from URL'})]
+
+
+def test_product_description_streams_deltas_and_growing_sections(client, monkeypatch):
+    pieces = [DESCRIPTION[:30], DESCRIPTION[30:60], DESCRIPTION[60:]]
+    monkeypatch.setattr(stream_service, 'stream_content', lambda prompt, **kwargs: iter(pieces))
+
+    events = read_events(client.post('/api/product-description/stream', json={'product_info': 'Napa Extra'}))
+
+    assert [data['text'] for event, data in events if event == 'delta'] == pieces
+    assert events[0][0] == 'delta' and events[-1][0] == 'done'
+    sections = [data for event, data in events if event == 'section']
+    assert sections[0]['complete'] is False
+    short = [section for section in sections if section['name'] == 'short_description']
+    assert short[-1] == {'name': 'short_description', 'value': 'Napa Extra relieves pain fast.', 'complete': True}
+    assert sections[-1] == {'name': 'features', 'value': ['Paracetamol 500mg', 'Caffeine 65mg'], 'complete': True}
+    done = events[-1][1]
+    assert done['fallback'] is False
+    assert done['product_description']['features'] == ['Paracetamol 500mg', 'Caffeine 65mg']
+
+
+def test_product_description_falls_back_when_the_ai_service_fails(client, monkeypatch):
+    def stream_content(prompt, **kwargs):
+        raise AIServiceError('Failed to generate content: 503')
+        yield
+
+    monkeypatch.setattr(stream_service, 'stream_content', stream_content)
+
+    events = read_events(client.post('/api/product-description/stream', json={'product_info': 'Napa Extra'}))
+
+    assert [event for event, _ in events] == ['done']
+    assert events[0][1]['fallback'] is True
+    assert any(events[0][1]['product_description'].values())
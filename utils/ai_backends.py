@@ -0,0 +1,336 @@
+"""
+Offline AI backends: a fake Gemini model, and recording and replay of real responses.
+
+A FakeLLM plays the API: every model created from it shares one quota. A call
+takes ``latency`` seconds (or a random time up to ``max_latency``), calls beyond
+``max_concurrency`` in flight (or a random ``throttle_rate`` share of calls)
+fail with the same 429 ResourceExhausted error the real client raises, and a
+random ``failure_rate`` share fails with a 503 after the latency. Answers come
+from recorded fixtures when it replays them, otherwise from ``respond``; a
+prompt that was not recorded fails with MissingRecording, so a replayed run
+never passes on made-up answers.
+
+``ai_service.create_model`` builds the models of the backend SEO_AI_BACKEND
+names; the benchmarks plug a FakeLLM into the dispatcher directly:
+    set_dispatcher(LLMDispatcher(model_factory=FakeLLM(latency=0.2).model))
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .constants import (
+    AI_BACKEND, AI_FIXTURES_FILE, AI_LATENCY, AI_MAX_LATENCY, AI_THROTTLE_RATE, AI_FAILURE_RATE
+)
+
+try:
+    from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+except ImportError:  # pragma: no cover - google-generativeai always brings api_core
+    class ResourceExhausted(Exception):
+        code = 429
+
+    class ServiceUnavailable(Exception):
+        code = 503
+
+
+class MissingRecording(Exception):
+    """Raised when a replayed prompt has no recorded response."""
+    # Like a 404, it is not retried: asking again would not find it either
+    code = 404
+
+
+class ResponseFixtures:
+    """
+    Recorded response texts by model and prompt, kept in a JSON file.
+
+    Args:
+        path (str): The fixtures file; it is created on the first recorded response
+    """
+
+    def __init__(self, path: str = AI_FIXTURES_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._responses: Dict[str, Dict[str, str]] = {}
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self._responses = json.load(f)
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    @staticmethod
+    def key(model_name: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model_name}\n{prompt}".encode('utf-8')).hexdigest()
+
+    def get(self, model_name: str, prompt: str) -> Optional[str]:
+        """Return the recorded text of a prompt, or None when it was not recorded."""
+        entry = self._responses.get(self.key(model_name, prompt))
+        return entry['text'] if entry else None
+
+    def put(self, model_name: str, prompt: str, text: str) -> None:
+        """Record a response and save the file."""
+        with self._lock:
+            self._responses[self.key(model_name, prompt)] = {'model': model_name, 'prompt': prompt, 'text': text}
+            # The file is replaced whole, so a reader never sees half of it
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._responses, f, ensure_ascii=False, indent=1, sort_keys=True)
+            os.replace(temp_path, self.path)
+
+
+class FakeLLM:
+    """Shared quota, answers and counters for the fake models."""
+
+    def __init__(self, latency: float = 0.1, max_concurrency: int = 0, throttle_rate: float = 0.0,
+                 respond: Optional[Callable[[str], str]] = None, seed: Optional[int] = None,
+                 max_latency: Optional[float] = None, failure_rate: float = 0.0,
+                 fixtures: Optional[ResponseFixtures] = None):
+        self.latency = latency
+        self.max_latency = max_latency
+        self.max_concurrency = max_concurrency
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        self.respond = respond or (lambda prompt: f"Generated for: {prompt[:40]}")
+        self.fixtures = fixtures
+        self.random = random.Random(seed)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        self.failed = 0
+        self.replayed = 0
+        self.unrecorded = 0
+        self._lock = threading.Lock()
+
+    def model(self, model_name: str) -> 'FakeModel':
+        """Model factory for ``LLMDispatcher``."""
+        return FakeModel(self, model_name)
+
+    def call_latency(self) -> float:
+        """Return how long the next call takes."""
+        if self.max_latency is None:
+            return self.latency
+        with self._lock:
+            return self.random.uniform(self.latency, self.max_latency)
+
+    def answer(self, model_name: str, prompt: str) -> str:
+        """Return the recorded answer to a prompt when replaying fixtures, or else the ``respond`` answer."""
+        if self.fixtures is None:
+            return self.respond(prompt)
+        text = self.fixtures.get(model_name, prompt)
+        with self._lock:
+            if text is not None:
+                self.replayed += 1
+            else:
+                self.unrecorded += 1
+        if text is None:
+            raise MissingRecording(f"No recorded response to this prompt in {self.fixtures.path}: {prompt[:80]!r}")
+        return text
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'calls': self.calls, 'throttled': self.throttled, 'failed': self.failed,
+                    'replayed': self.replayed, 'unrecorded': self.unrecorded, 'peak_in_flight': self.peak_in_flight}
+
+
+class FakeModel:
+    """Mimics ``genai.GenerativeModel.generate_content``, including ``stream=True``, and ``generate_content_async``."""
+
+    def __init__(self, llm: FakeLLM, model_name: str):
+        self.llm = llm
+        self.model_name = model_name
+
+    def generate_content(self, prompt: str, generation_config: Any = None, safety_settings: Any = None,
+                         stream: bool = False, **kwargs) -> Any:
+        fail = self._admit()
+        if stream:
+            return self._stream(prompt, fail)
+        try:
+            time.sleep(self.llm.call_latency())
+            self._check(fail)
+            text = self.llm.answer(self.model_name, prompt)
+        finally:
+            self._leave()
+        return _response(prompt, text)
+
+    async def generate_content_async(self, prompt: str, generation_config: Any = None, safety_settings: Any = None,
+                                     **kwargs) -> Any:
+        fail = self._admit()
+        try:
+            await asyncio.sleep(self.llm.call_latency())
+            self._check(fail)
+            text = self.llm.answer(self.model_name, prompt)
+        finally:
+            self._leave()
+        return _response(prompt, text)
+
+    def _stream(self, prompt: str, fail: bool) -> Iterator[SimpleNamespace]:
+        # The latency is spread over the chunks, like tokens arriving over time
+        try:
+            text = self.llm.answer(self.model_name, prompt)
+            pieces = [text[i:i + 32] for i in range(0, len(text), 32)] or ['']
+            for index, piece in enumerate(pieces):
+                time.sleep(self.llm.call_latency() / len(pieces))
+                if index == 0:
+                    self._check(fail)
+                yield SimpleNamespace(text=piece, usage_metadata=None)
+        finally:
+            self._leave()
+
+    def _admit(self) -> bool:
+        # Returns whether the call fails once its latency has passed
+        llm = self.llm
+        with llm._lock:
+            llm.calls += 1
+            over_quota = llm.max_concurrency and llm.in_flight >= llm.max_concurrency
+            if over_quota or llm.random.random() < llm.throttle_rate:
+                llm.throttled += 1
+                raise ResourceExhausted('429 Resource has been exhausted (e.g. check quota).')
+            llm.in_flight += 1
+            llm.peak_in_flight = max(llm.peak_in_flight, llm.in_flight)
+            return llm.failure_rate > 0 and llm.random.random() < llm.failure_rate
+
+    def _check(self, fail: bool) -> None:
+        if fail:
+            with self.llm._lock:
+                self.llm.failed += 1
+            raise ServiceUnavailable('503 The model is overloaded. Please try again later.')
+
+    def _leave(self) -> None:
+        with self.llm._lock:
+            self.llm.in_flight -= 1
+
+
+def _response(prompt: str, text: str) -> SimpleNamespace:
+    tokens = len(prompt) // 4 + len(text) // 4
+    return SimpleNamespace(text=text, usage_metadata=SimpleNamespace(total_token_count=tokens))
+
+
+class RecordingModel:
+    """Wraps a Gemini model client, recording the text of every complete response."""
+
+    def __init__(self, model: Any, model_name: str, fixtures: ResponseFixtures):
+        self.model = model
+        self.model_name = model_name
+        self.fixtures = fixtures
+
+    def generate_content(self, prompt: str, stream: bool = False, **kwargs) -> Any:
+        response = self.model.generate_content(prompt, stream=stream, **kwargs)
+        if stream:
+            return self._record_stream(prompt, response)
+        self._record(prompt, response)
+        return response
+
+    async def generate_content_async(self, prompt: str, **kwargs) -> Any:
+        response = await self.model.generate_content_async(prompt, **kwargs)
+        self._record(prompt, response)
+        return response
+
+    def _record_stream(self, prompt: str, chunks: Iterator[Any]) -> Iterator[Any]:
+        pieces = []
+        for chunk in chunks:
+            pieces.append(getattr(chunk, 'text', '') or '')
+            yield chunk
+        self.fixtures.put(self.model_name, prompt, ''.join(pieces))
+
+    def _record(self, prompt: str, response: Any) -> None:
+        try:
+            text = response.text
+        except (AttributeError, ValueError):
+            # Blocked responses have no text and are asked again
+            return
+        try:
+            self.fixtures.put(self.model_name, prompt, text)
+        except OSError as e:
+            logging.error(f"Could not record the response: {str(e)}")
+
+
+# Canned answers
+
+# The product text follows these labels in the prompts, or starts the first quoted line
+PRODUCT_PATTERN = re.compile(r'(?:Content|Product Information):\s*(.+)|^"(.+)', re.MULTILINE)
+COMPANY_PATTERN = re.compile(r'(?:include|brand name) "([^"]+)"')
+
+
+def canned_response(prompt: str) -> str:
+    """
+    Answer one of the app's prompts with text shaped like Gemini's answer.
+
+    The answer names the product the prompt is about, so titles, descriptions
+    and keywords look plausible and go through the same parsing as real ones.
+    """
+    match = PRODUCT_PATTERN.search(prompt)
+    line = (match.group(1) or match.group(2)).strip(' "') if match else 'Product'
+    name = ' '.join(line.split()[:5]) or 'Product'
+    company = COMPANY_PATTERN.search(prompt)
+    company = company.group(1) if company else 'our shop'
+
+    if prompt.startswith('Extract medicine information'):
+        return f"{name}|{name} (বাংলা)"
+    if prompt.startswith('Extract product information'):
+        return name
+    if 'SEO keywords' in prompt:
+        words = name.lower().split()
+        return ', '.join([name.lower(), *words[:4], f"{company} {words[0]}", f"{company} online",
+                          f"buy {words[0]} from {company}", 'অনলাইন শপ', 'সেরা দাম'])
+    meta_description = (f"Get {name} ({name} বাংলা) at {company}: genuine quality, clear information on "
+                        f"uses and benefits, fair prices and fast home delivery across Bangladesh.")
+    if 'Generate SEO metadata' in prompt:
+        title = {'name_en': name, 'name_bn': f"{name} (বাংলা)"} if '"name_en"' in prompt else {'product_info': name}
+        return json.dumps({**title, 'meta_description': meta_description,
+                           'keywords': [name.lower(), f"{company} {name.split()[0].lower()}", 'অনলাইন শপ']},
+                          ensure_ascii=False)
+    if 'product description' in prompt:
+        return json.dumps({
+            'short_description': f"{name} offers dependable quality for everyday use.",
+            'long_description': f"{name} is made to a high standard.\n\nIt is easy to use and lasts.",
+            'features': [f"Genuine {name}", 'Quality checked', 'Easy to use'],
+            'benefits': ['Reliable results', 'Good value', 'Fast delivery'],
+        }, ensure_ascii=False)
+    # Meta descriptions and paraphrases
+    return meta_description
+
+
+_offline_llm: Optional[FakeLLM] = None
+_offline_lock = threading.Lock()
+
+
+def get_offline_llm() -> FakeLLM:
+    """Return the process-wide fake of the "replay" and "fake" backends, configured from the constants."""
+    global _offline_llm
+    if _offline_llm is None:
+        with _offline_lock:
+            if _offline_llm is None:
+                fixtures = ResponseFixtures(AI_FIXTURES_FILE) if AI_BACKEND == 'replay' else None
+                if fixtures is not None and len(fixtures):
+                    logging.info(f"Replaying {len(fixtures)} recorded responses from {AI_FIXTURES_FILE}")
+                elif fixtures is not None:
+                    logging.warning(f"No recorded responses in {AI_FIXTURES_FILE}: every AI call will fail")
+                max_latency = AI_MAX_LATENCY if AI_MAX_LATENCY > AI_LATENCY else None
+                _offline_llm = FakeLLM(latency=AI_LATENCY, max_latency=max_latency, throttle_rate=AI_THROTTLE_RATE,
+                                       failure_rate=AI_FAILURE_RATE, respond=canned_response, fixtures=fixtures)
+    return _offline_llm
+
+
+_fixtures: Optional[ResponseFixtures] = None
+_fixtures_lock = threading.Lock()
+
+
+def get_recording_fixtures() -> ResponseFixtures:
+    """Return the process-wide fixtures the "record" backend writes to."""
+    global _fixtures
+    if _fixtures is None:
+        with _fixtures_lock:
+            if _fixtures is None:
+                _fixtures = ResponseFixtures(AI_FIXTURES_FILE)
+    return _fixtures
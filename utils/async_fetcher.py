@@ -0,0 +1,211 @@
+"""
+Page fetching for the async server.
+
+Works like ``url_service``: one pooled client per worker, a cap on concurrent
+requests per host, retries with backoff, an unverified retry on SSL errors, and
+the page cache with conditional revalidation. Every wait (for the host, the
+shop's answer, the backoff) is awaited on the event loop instead of holding a
+thread. The client is bound to the event loop it was created on, so the server
+creates it at startup and closes it at shutdown.
+"""
+import asyncio
+import logging
+import ssl
+import traceback
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import certifi
+import httpx
+
+from .cache_service import is_cache_bypassed
+from .constants import (
+    FETCH_TIMEOUT, FETCH_RETRIES, FETCH_POOL_HOSTS, FETCH_POOL_SIZE, FETCH_PER_HOST_CONCURRENCY,
+    FETCH_MAX_BYTES, HTML_PARSER_BACKEND
+)
+from .deadline import DeadlineExceeded, can_wait, check_deadline, clamp_timeout, expired
+from .html_extractor import extract_page
+from .metrics import record_event, timed
+from .page_cache import canonicalize_url, get_page_cache
+from .url_service import DEFAULT_HEADERS, body_decoder, normalize_url, parse_page, resolve_canonical_url
+
+
+class AsyncPageFetcher:
+    """Long-lived page fetcher for one event loop."""
+
+    def __init__(self, pool_hosts: int = FETCH_POOL_HOSTS, pool_size: int = FETCH_POOL_SIZE,
+                 per_host_concurrency: int = FETCH_PER_HOST_CONCURRENCY, timeout: int = FETCH_TIMEOUT,
+                 retries: int = FETCH_RETRIES):
+        self.timeout = timeout
+        self.retries = retries
+        self.per_host_concurrency = per_host_concurrency
+        limits = httpx.Limits(max_connections=pool_hosts * pool_size, max_keepalive_connections=pool_hosts * pool_size)
+        self.client = httpx.AsyncClient(headers=DEFAULT_HEADERS, limits=limits, verify=certifi.where(),
+                                        follow_redirects=True)
+        # Only used for the shops whose certificates fail verification
+        self.unverified_client = httpx.AsyncClient(headers=DEFAULT_HEADERS, limits=limits, verify=False,
+                                                   follow_redirects=True)
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc.lower()
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return limit
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        """
+        Fetch a URL with retries, falling back to an unverified request on SSL errors.
+
+        Only the headers are read here; the caller reads the body and must close
+        the response with ``aclose()``.
+        """
+        retries = self.retries
+        backoff_factor = 0.5
+
+        host_limit = self._host_limit(url)
+        try:
+            await asyncio.wait_for(host_limit.acquire(), clamp_timeout(None))
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded(f"Request deadline exceeded waiting for a connection to {urlsplit(url).netloc}")
+
+        def last_attempt(attempt: int) -> bool:
+            # Within a request deadline, a failed attempt is only retried if the backoff leaves time for it
+            return attempt == retries - 1 or not can_wait(backoff_factor * (2 ** attempt))
+
+        try:
+            for attempt in range(retries):
+                check_deadline('fetching the page')
+                try:
+                    return await self._send(self.client, url, headers)
+                except httpx.ConnectError as e:
+                    if not _is_ssl_error(e):
+                        logging.error(f"Connection Error on attempt {attempt + 1}: {str(e)}")
+                        if last_attempt(attempt):
+                            raise
+                    else:
+                        logging.warning(f"SSL verification failed for {url}, retrying without verification")
+                        try:
+                            check_deadline('fetching the page without SSL verification')
+                            return await self._send(self.unverified_client, url, headers)
+                        except httpx.HTTPError as e:
+                            logging.error(f"Request failed without SSL verification: {str(e)}")
+                            if last_attempt(attempt):
+                                raise
+                except httpx.TimeoutException as e:
+                    logging.error(f"Timeout Error on attempt {attempt + 1}: {str(e)}")
+                    if last_attempt(attempt):
+                        raise
+                except httpx.HTTPError as e:
+                    logging.error(f"Request Error on attempt {attempt + 1}: {str(e)}")
+                    if last_attempt(attempt):
+                        raise
+                await asyncio.sleep(backoff_factor * (2 ** attempt))
+        finally:
+            host_limit.release()
+
+    async def _send(self, client: httpx.AsyncClient, url: str, headers: Optional[Dict[str, str]]) -> httpx.Response:
+        request = client.build_request('GET', url, headers=headers, timeout=clamp_timeout(self.timeout))
+        response = await client.send(request, stream=True)
+        # Like requests' raise_for_status: a 304 answer to a revalidation is not an error
+        if response.status_code >= 400:
+            await response.aclose()
+            raise httpx.HTTPStatusError(f"{response.status_code} error for url: {url}",
+                                        request=request, response=response)
+        return response
+
+    async def aclose(self) -> None:
+        """Close every pooled connection."""
+        await self.client.aclose()
+        await self.unverified_client.aclose()
+
+
+def _is_ssl_error(error: BaseException) -> bool:
+    # httpx reports certificate failures as connection errors caused by an SSLError
+    while error is not None:
+        if isinstance(error, ssl.SSLError):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+async def read_decoded_chunks(response: httpx.Response, max_bytes: int = FETCH_MAX_BYTES,
+                              chunk_size: int = 16384) -> List[str]:
+    """Read and decode the body of a streamed response, at most ``max_bytes`` bytes of it."""
+    decoder = body_decoder(response.charset_encoding)
+    pieces = []
+    received = 0
+    async for chunk in response.aiter_bytes(chunk_size):
+        check_deadline('the page was read')
+        chunk = chunk[:max_bytes - received]
+        received += len(chunk)
+        text = decoder.decode(chunk)
+        if text:
+            pieces.append(text)
+        if received >= max_bytes:
+            logging.warning(f"Stopped reading {response.url} at {max_bytes} bytes")
+            break
+    text = decoder.decode(b'', final=True)
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+async def aextract_meta_from_url(url: str, fetcher: AsyncPageFetcher) -> Optional[Dict[str, str]]:
+    """Like ``extract_meta_from_url``, fetching the page with the async fetcher."""
+    try:
+        url = normalize_url(url)
+        cache = get_page_cache()
+        cache_url = canonicalize_url(url)
+        entry = cache.get(cache_url) if cache else None
+
+        if entry and cache.is_fresh(entry) and not is_cache_bypassed():
+            cache.count('hits')
+            record_event('page_cache', result='hit')
+            return dict(entry['record'])
+
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        with timed('fetch'):
+            response = await fetcher.fetch(url, headers=headers or None)
+        try:
+            if entry and response.status_code == 304:
+                cache.touch(entry['url'])
+                cache.count('revalidated')
+                record_event('page_cache', result='revalidated')
+                return dict(entry['record'])
+
+            # The body is read before it is parsed; parsing a page takes milliseconds
+            with timed('extract'):
+                pieces = await read_decoded_chunks(response)
+                if HTML_PARSER_BACKEND == 'soup':
+                    record = parse_page(''.join(pieces))
+                else:
+                    record = extract_page(pieces, HTML_PARSER_BACKEND)
+        finally:
+            await response.aclose()
+
+        canonical_url = resolve_canonical_url(cache_url, record.pop('canonical_url', ''))
+        if cache:
+            cache.count('misses')
+            record_event('page_cache', result='miss')
+            cache.put(
+                cache_url, record,
+                response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                canonical_url
+            )
+        return record
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logging.error(f"Error extracting meta tags: {str(e)}")
+        logging.error(traceback.format_exc())
+        if expired():
+            raise DeadlineExceeded(f"Request deadline exceeded while fetching {url}") from e
+        return None
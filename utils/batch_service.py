@@ -0,0 +1,161 @@
+"""
+Service for generating SEO content for many products or URLs in one streamed request.
+"""
+import json
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, Optional, Tuple
+
+from .concurrency import BoundedExecutor, imap_bounded
+from .constants import DEFAULT_COMPANY_NAME, BATCH_CONCURRENCY
+from .deadline import DeadlineExceeded
+from .fingerprint_store import UNCHANGED
+from .generation_service import generate_if_changed, generate_seo_content, response_fields
+from .results_store import record_result
+from .url_service import extract_meta_from_url, normalize_url
+
+
+class BatchItemError(ValueError):
+    """Raised for a batch item that cannot be processed."""
+    pass
+
+
+def resolve_batch_concurrency(concurrency: Optional[int]) -> int:
+    """Clamp a requested per-batch concurrency to between 1 and the configured limit."""
+    if concurrency is None:
+        return BATCH_CONCURRENCY
+    return max(1, min(int(concurrency), BATCH_CONCURRENCY))
+
+
+def iter_ndjson(stream: IO[bytes]) -> Iterator[Tuple[int, Any]]:
+    """
+    Read an NDJSON body line by line and yield ``(index, item)`` pairs.
+
+    A line that is not valid JSON is yielded as a BatchItemError so it can be
+    reported inline without stopping the rest of the batch.
+    """
+    index = 0
+    for raw_line in stream:
+        line = raw_line.decode('utf-8', errors='replace').strip() if isinstance(raw_line, bytes) else raw_line.strip()
+        if not line:
+            continue
+        try:
+            yield index, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield index, BatchItemError(f"Invalid JSON: {str(e)}")
+        index += 1
+
+
+def process_batch_item(item: Any, mode: Optional[str] = None, executor: Optional[BoundedExecutor] = None,
+                       parallelism: Optional[int] = None, incremental: bool = False) -> Dict[str, Any]:
+    """
+    Generate the SEO fields for one batch item of the form {content, company_name, id, sku}.
+
+    With ``incremental``, an item with a sku (or id) whose content and settings did
+    not change since it was last generated gets its stored fields back.
+    """
+    if isinstance(item, BatchItemError):
+        raise item
+    if not isinstance(item, dict):
+        raise BatchItemError('Item must be a JSON object')
+    content = item.get('content')
+    if not content or not isinstance(content, str):
+        raise BatchItemError('Content is required')
+
+    company_name = item.get('company_name') or DEFAULT_COMPANY_NAME
+    product_id = item.get('sku') or item.get('id')
+    if incremental and product_id is not None:
+        generated, change = generate_if_changed(f"sku:{product_id}", content, company_name, mode,
+                                                executor=executor, parallelism=parallelism)
+        if change != UNCHANGED:
+            record_result('seo', generated, company_name, sku=product_id, source='batch')
+        return {**response_fields(generated), 'change': change}
+    generated = generate_seo_content(content, company_name, mode, executor=executor, parallelism=parallelism)
+    record_result('seo', generated, company_name, sku=product_id, source='batch')
+    return response_fields(generated)
+
+
+def process_url_item(item: Any, company_name: str = DEFAULT_COMPANY_NAME, mode: Optional[str] = None,
+                     executor: Optional[BoundedExecutor] = None, parallelism: Optional[int] = None,
+                     incremental: bool = False) -> Dict[str, Any]:
+    """
+    Fetch one URL (a string or {url, company_name, id}) and generate its SEO fields.
+
+    With ``incremental``, a page whose content and settings did not change since it
+    was last generated gets its stored fields back.
+    """
+    if isinstance(item, BatchItemError):
+        raise item
+    if isinstance(item, dict):
+        url = item.get('url')
+        company_name = item.get('company_name') or company_name
+    else:
+        url = item
+    if not url or not isinstance(url, str):
+        raise BatchItemError('URL is required')
+
+    meta_data = extract_meta_from_url(url)
+    if not meta_data:
+        raise BatchItemError('Failed to extract metadata from URL')
+
+    result = {
+        'original_title': meta_data['title'],
+        'original_description': meta_data.get('description', ''),
+        'original_content': meta_data['content'],
+    }
+    if incremental:
+        generated, result['change'] = generate_if_changed(
+            normalize_url(url), meta_data['content'], company_name, mode, executor=executor, parallelism=parallelism
+        )
+    else:
+        generated = generate_seo_content(meta_data['content'], company_name, mode, executor=executor, parallelism=parallelism)
+    if result.get('change') != UNCHANGED:
+        record_result('seo', generated, company_name, sku=item.get('id') if isinstance(item, dict) else None,
+                      url=url, source='analyze_urls')
+    result.update(response_fields(generated))
+    return result
+
+
+def error_code(error: BaseException) -> int:
+    """Return the HTTP status a single-item request failing with ``error`` is answered with."""
+    if isinstance(error, BatchItemError):
+        return 400
+    if isinstance(error, DeadlineExceeded):
+        return 504
+    return 500
+
+
+def iter_results(items: Iterable[Tuple[int, Any]], process: Callable[[Any], Dict[str, Any]],
+                 executor: BoundedExecutor, concurrency: int) -> Iterator[Dict[str, Any]]:
+    """
+    Process ``(index, item)`` pairs concurrently and yield one result per item as it completes.
+
+    Results arrive in completion order; each carries the item's ``index`` plus
+    its ``id`` and ``url`` (when given) so clients can match them up. Errors are
+    reported inline with ``"status": "error"`` and the ``code`` the item would
+    have been answered with on its own.
+    """
+    def run(indexed_item: Tuple[int, Any]) -> Dict[str, Any]:
+        return process(indexed_item[1])
+
+    for (index, item), result, error in imap_bounded(executor, run, items, concurrency):
+        line = {'index': index}
+        if isinstance(item, dict):
+            for key in ('id', 'url'):
+                if item.get(key) is not None:
+                    line[key] = item[key]
+        elif isinstance(item, str):
+            line['url'] = item
+        if error is None:
+            line['status'] = 'ok'
+            line.update(result)
+        else:
+            line['status'] = 'error'
+            line['code'] = error_code(error)
+            line['error'] = str(error)
+        yield line
+
+
+def stream_results(items: Iterable[Tuple[int, Any]], process: Callable[[Any], Dict[str, Any]],
+                   executor: BoundedExecutor, concurrency: int) -> Iterator[str]:
+    """Like ``iter_results``, but yield each result as an NDJSON line."""
+    for line in iter_results(items, process, executor, concurrency):
+        yield json.dumps(line, ensure_ascii=False) + '\n'
@@ -0,0 +1,241 @@
+"""
+Two-tier cache for AI responses.
+
+Responses are content-addressed by the prompt, model name, generation config and
+safety settings. Lookups go to a bounded in-process LRU first and then to a
+SQLite database that every worker process shares.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .constants import (
+    CACHE_ENABLED, CACHE_DB_FILE, CACHE_MEMORY_ENTRIES, CACHE_TTL_SECONDS,
+    CACHE_MAX_DISK_ENTRIES, CACHE_MAX_DISK_BYTES
+)
+from .sqlite_store import connect, get_db_path, transaction
+
+# Per-request flag: when set, lookups are skipped but fresh responses are still stored
+_bypass = ContextVar('cache_bypass', default=False)
+
+# Run the disk eviction check once every this many writes
+EVICTION_INTERVAL = 100
+
+
+def make_cache_key(prompt: str, model_name: str, generation_config: Dict[str, Any],
+                   safety_settings: Dict[str, Any]) -> str:
+    """Build a stable content-addressed key for a generation request."""
+    payload = json.dumps({
+        'prompt': prompt,
+        'model': model_name,
+        'generation_config': generation_config,
+        'safety_settings': safety_settings,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def set_cache_bypass(enabled: bool):
+    """Enable or disable the cache bypass for the current context and return a reset token."""
+    return _bypass.set(bool(enabled))
+
+
+def reset_cache_bypass(token) -> None:
+    """Restore the bypass flag saved by ``set_cache_bypass``."""
+    _bypass.reset(token)
+
+
+@contextmanager
+def bypass_cache(enabled: bool = True) -> Iterator[None]:
+    """Skip cache lookups inside the ``with`` block."""
+    token = set_cache_bypass(enabled)
+    try:
+        yield
+    finally:
+        reset_cache_bypass(token)
+
+
+def is_cache_bypassed() -> bool:
+    """Check whether cache lookups are bypassed for the current context."""
+    return _bypass.get()
+
+
+class ResponseCache:
+    """Bounded in-memory LRU in front of a shared SQLite table, both with TTL."""
+
+    def __init__(self, path: str, memory_entries: int = CACHE_MEMORY_ENTRIES,
+                 ttl: int = CACHE_TTL_SECONDS, max_disk_entries: int = CACHE_MAX_DISK_ENTRIES,
+                 max_disk_bytes: int = CACHE_MAX_DISK_BYTES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._disk_enabled = True
+        self._counters = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'disk_errors': 0,
+        }
+        self._init_db()
+
+    def _init_db(self) -> None:
+        try:
+            conn = connect(self.path)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)')
+        except (sqlite3.Error, OSError) as e:
+            # The memory tier keeps working without the shared disk tier
+            logging.error(f"Disabling disk cache at {self.path}: {str(e)}")
+            self._disk_enabled = False
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def _remember(self, key: str, value: str, expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (value, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value for ``key`` or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return entry[0]
+                del self._memory[key]
+
+        if self._disk_enabled:
+            try:
+                conn = connect(self.path)
+                row = conn.execute(
+                    'SELECT value, expires_at FROM responses WHERE key = ? AND expires_at > ?',
+                    (key, now)
+                ).fetchone()
+                if row is not None:
+                    conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+                    self._remember(key, row['value'], row['expires_at'])
+                    self._count('disk_hits')
+                    return row['value']
+            except sqlite3.Error as e:
+                logging.error(f"Disk cache read failed: {str(e)}")
+                self._count('disk_errors')
+
+        self._count('misses')
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        """Store ``value`` in both tiers."""
+        now = time.time()
+        expires_at = now + self.ttl
+        self._remember(key, value, expires_at)
+        self._count('stores')
+
+        if not self._disk_enabled:
+            return
+        try:
+            conn = connect(self.path)
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, value, size, created_at, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, value, len(value.encode('utf-8')), now, expires_at, now)
+            )
+            with self._lock:
+                self._writes += 1
+                due = self._writes % EVICTION_INTERVAL == 0
+            if due:
+                self.evict()
+        except sqlite3.Error as e:
+            logging.error(f"Disk cache write failed: {str(e)}")
+            self._count('disk_errors')
+
+    def evict(self) -> int:
+        """Drop expired rows, then the least recently used ones until the disk tier fits its bounds."""
+        conn = connect(self.path)
+        with transaction(conn):
+            removed = conn.execute('DELETE FROM responses WHERE expires_at <= ?', (time.time(),)).rowcount
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+            if count > self.max_disk_entries or total > self.max_disk_bytes:
+                # Walk the oldest rows and drop them until both limits hold
+                excess_count = max(0, count - self.max_disk_entries)
+                excess_bytes = max(0, total - self.max_disk_bytes)
+                victims = []
+                for row in conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+                    if excess_count <= 0 and excess_bytes <= 0:
+                        break
+                    victims.append((row['key'],))
+                    excess_count -= 1
+                    excess_bytes -= row['size']
+                conn.executemany('DELETE FROM responses WHERE key = ?', victims)
+                removed += len(victims)
+        self._count('evictions', removed)
+        return removed
+
+    def clear(self) -> None:
+        """Remove every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self._disk_enabled:
+            connect(self.path).execute('DELETE FROM responses')
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters for this process together with the tier sizes."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+        if self._disk_enabled:
+            try:
+                count, total = connect(self.path).execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+                ).fetchone()
+                stats['disk_entries'] = count
+                stats['disk_bytes'] = total
+            except sqlite3.Error:
+                pass
+        return stats
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache, or None when caching is disabled."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(get_db_path(CACHE_DB_FILE))
+    return _cache
@@ -0,0 +1,177 @@
+"""
+Single-flight coalescing of duplicate in-flight requests.
+
+A double-clicked "Analyze" button or a client retrying after a timeout starts the
+same pipeline again while the first one is still running. Requests with the same
+normalized inputs share one computation instead: the first runs it, and the
+others wait for it, no longer than their own deadline, and get the same result
+(or the same exception). Coalescing is per process; the Idempotency-Key store covers retries across
+workers.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import threading
+from concurrent.futures import Future, wait
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .cache_service import is_cache_bypassed
+from .constants import COALESCING_ENABLED
+from .deadline import DeadlineExceeded, current_budget, expired, time_left
+from .llm_dispatcher import count_llm_calls
+from .metrics import record_event, record_saved_calls
+from .page_cache import canonicalize_url
+
+
+def normalize_input(name: str, value: Any) -> Any:
+    """Normalize one request input so trivially different requests share a key."""
+    if not isinstance(value, str):
+        return value
+    if name == 'url':
+        return canonicalize_url(value)
+    return re.sub(r'\s+', ' ', value).strip()
+
+
+def coalescing_key(endpoint: str, **inputs: Any) -> str:
+    """Build the key of a computation from its endpoint and inputs."""
+    payload = json.dumps({
+        'endpoint': endpoint,
+        # Forced fresh generations never join a computation that may use the cache
+        'no_cache': is_cache_bypassed(),
+        'inputs': {name: normalize_input(name, value) for name, value in inputs.items()},
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class _Flight:
+    def __init__(self):
+        self.future: Future = Future()
+        self.calls = 0
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time and shares its outcome."""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Return ``fn()``, or the result of the identical computation already running."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            record_event('coalesced')
+            if not wait([flight.future], timeout=time_left()).done:
+                raise _waited_too_long()
+            if isinstance(flight.future.exception(), DeadlineExceeded) and not expired():
+                # The first request ran out of its own, shorter deadline; this one still has time
+                return self.do(key, fn)
+            result = flight.future.result()
+            record_saved_calls('coalesced', flight.calls)
+            return result
+
+        try:
+            with count_llm_calls() as counter:
+                result = fn()
+        except BaseException as e:
+            self._finish(key, flight, counter.calls)
+            flight.future.set_exception(e)
+            raise
+        self._finish(key, flight, counter.calls)
+        flight.future.set_result(result)
+        return result
+
+    def _finish(self, key: str, flight: _Flight, calls: int) -> None:
+        # Requests arriving from now on start a new computation
+        flight.calls = calls
+        with self._lock:
+            self._flights.pop(key, None)
+
+
+class _AsyncFlight:
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.calls = 0
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines on one event loop.
+
+    The computation runs as its own task in the first caller's context, so it
+    goes on for the others if the first client disconnects.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _AsyncFlight] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Return ``await fn()``, or the result of the identical computation already running."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = _AsyncFlight()
+            flight.task = asyncio.ensure_future(self._run(key, flight, fn))
+            return await asyncio.shield(flight.task)
+
+        record_event('coalesced')
+        try:
+            result = await asyncio.wait_for(asyncio.shield(flight.task), time_left())
+        except DeadlineExceeded:
+            if expired():
+                raise
+            # The first request ran out of its own, shorter deadline; this one still has time
+            return await self.do(key, fn)
+        except asyncio.TimeoutError:
+            if not flight.task.done():
+                raise _waited_too_long()
+            raise
+        record_saved_calls('coalesced', flight.calls)
+        return result
+
+    async def _run(self, key: str, flight: _AsyncFlight, fn: Callable[[], Awaitable[Any]]) -> Any:
+        with count_llm_calls() as counter:
+            try:
+                return await fn()
+            finally:
+                flight.calls = counter.calls
+                self._flights.pop(key, None)
+
+
+def _waited_too_long() -> DeadlineExceeded:
+    record_event('deadline_exceeded', stage='coalesce')
+    return DeadlineExceeded(f"Request deadline of {current_budget():g}s exceeded waiting for an identical request")
+
+
+_single_flight = SingleFlight()
+_async_single_flight = AsyncSingleFlight()
+
+
+def coalesce(endpoint: str, fn: Callable[[], Any], **inputs: Any) -> Any:
+    """
+    Run ``fn`` once for concurrent requests to ``endpoint`` with the same inputs.
+
+    Args:
+        endpoint (str): Name of the computation, part of the key
+        fn (Callable): Computes the result from the inputs
+        **inputs: The inputs the result depends on (url, content, company_name, mode...)
+
+    Returns:
+        The result of ``fn``, possibly computed for another request
+    """
+    if not COALESCING_ENABLED:
+        return fn()
+    return _single_flight.do(coalescing_key(endpoint, **inputs), fn)
+
+
+
+async def acoalesce(endpoint: str, fn: Callable[[], Awaitable[Any]], **inputs: Any) -> Any:
+    """Like ``coalesce``, for a coroutine function run by the async server."""
+    if not COALESCING_ENABLED:
+        return await fn()
+    return await _async_single_flight.do(coalescing_key(endpoint, **inputs), fn)
@@ -0,0 +1,196 @@
+"""
+Bounded thread pool for running independent generators concurrently.
+"""
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
+from typing import Any, Awaitable, Callable, ContextManager, Dict, Iterable, Iterator, Optional, Tuple
+
+from .deadline import expired, time_left
+from .metrics import record_event
+
+
+class BoundedExecutor:
+    """
+    Shared thread pool that runs tasks in the submitting thread's context.
+
+    Each task runs inside a copy of the caller's ``contextvars`` (cache bypass,
+    per-request settings) and inside ``context_factory()``, which the app uses
+    to push its Flask app context in worker threads.
+    """
+
+    def __init__(self, max_workers: int, context_factory: Optional[Callable[[], ContextManager]] = None,
+                 thread_name_prefix: str = 'seo-worker'):
+        self.max_workers = max_workers
+        self.context_factory = context_factory or nullcontext
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """Submit ``fn`` to the pool with the caller's context attached."""
+        context = contextvars.copy_context()
+        context_factory = self.context_factory
+
+        def run():
+            with context_factory():
+                return fn(*args, **kwargs)
+
+        return self._pool.submit(context.run, run)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work and release the worker threads."""
+        self._pool.shutdown(wait=wait)
+
+
+def run_fields(tasks: Dict[str, Callable[[], Any]], executor: Optional[BoundedExecutor] = None,
+               parallelism: int = 1, fallbacks: Optional[Dict[str, Callable[[], Any]]] = None) -> Dict[str, Any]:
+    """
+    Run named tasks with at most ``parallelism`` of them in flight at once.
+
+    A task that raises is isolated: its error is logged and its fallback
+    (if any) provides the value, while the other fields are kept intact.
+    Tasks not finished when the request deadline passes get their fallbacks
+    too; those already running finish in the background.
+
+    Args:
+        tasks (Dict[str, Callable]): Field name to zero-argument callable
+        executor (BoundedExecutor): Shared pool to run on, or None to run the tasks in turn
+        parallelism (int): Maximum number of this request's tasks running concurrently
+        fallbacks (Dict[str, Callable]): Field name to zero-argument fallback callable
+
+    Returns:
+        Dict[str, Any]: Field name to result, in the order of ``tasks``
+    """
+    results = dict(iter_fields(tasks, executor, parallelism, fallbacks))
+    return {name: results[name] for name in tasks}
+
+
+def iter_fields(tasks: Dict[str, Callable[[], Any]], executor: Optional[BoundedExecutor] = None,
+                parallelism: int = 1, fallbacks: Optional[Dict[str, Callable[[], Any]]] = None
+                ) -> Iterator[Tuple[str, Any]]:
+    """Like ``run_fields``, but yield ``(name, result)`` pairs as each task completes."""
+    fallbacks = fallbacks or {}
+
+    def fail(name: str, error: BaseException) -> Any:
+        return _fail(name, error, fallbacks)
+
+    def late(name: str) -> Any:
+        return _late(name, fallbacks)
+
+    if executor is None or parallelism <= 1 or len(tasks) <= 1:
+        for name, task in tasks.items():
+            if expired():
+                yield name, late(name)
+                continue
+            try:
+                result = task()
+            except Exception as e:
+                result = fail(name, e)
+            yield name, result
+        return
+
+    pending = iter(tasks.items())
+    in_flight = {}
+
+    def submit_next() -> bool:
+        item = next(pending, None)
+        if item is None:
+            return False
+        in_flight[executor.submit(item[1])] = item[0]
+        return True
+
+    for _ in range(parallelism):
+        if not submit_next():
+            break
+
+    while in_flight:
+        done, _ = wait(in_flight, timeout=time_left(), return_when=FIRST_COMPLETED)
+        if not done:
+            # Out of time: the running tasks are left to finish and the rest are never started
+            for name in list(in_flight.values()) + [name for name, _ in pending]:
+                yield name, late(name)
+            return
+        for future in done:
+            name = in_flight.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                result = fail(name, e)
+            submit_next()
+            yield name, result
+
+
+async def arun_fields(tasks: Dict[str, Callable[[], Awaitable[Any]]], parallelism: int = 1,
+                      fallbacks: Optional[Dict[str, Callable[[], Any]]] = None) -> Dict[str, Any]:
+    """
+    Like ``run_fields`` for coroutines: await the tasks concurrently on the running event loop.
+
+    At most ``parallelism`` of them run at once. Tasks not finished when the
+    request deadline passes are cancelled and get their fallbacks.
+    """
+    fallbacks = fallbacks or {}
+    limit = asyncio.Semaphore(max(1, parallelism))
+
+    async def run(task: Callable[[], Awaitable[Any]]) -> Any:
+        async with limit:
+            return await task()
+
+    running = {name: asyncio.ensure_future(run(task)) for name, task in tasks.items()}
+    if running:
+        await asyncio.wait(running.values(), timeout=time_left())
+    results = {}
+    for name, future in running.items():
+        if not future.done():
+            future.cancel()
+            results[name] = _late(name, fallbacks)
+        elif future.exception() is not None:
+            results[name] = _fail(name, future.exception(), fallbacks)
+        else:
+            results[name] = future.result()
+    return results
+
+
+def _fail(name: str, error: BaseException, fallbacks: Dict[str, Callable[[], Any]]) -> Any:
+    logging.error(f"Generating '{name}' failed: {str(error)}")
+    fallback = fallbacks.get(name)
+    return fallback() if fallback else None
+
+
+def _late(name: str, fallbacks: Dict[str, Callable[[], Any]]) -> Any:
+    record_event('deadline_exceeded', stage=name)
+    return _fail(name, TimeoutError('not generated before the request deadline'), fallbacks)
+
+
+def imap_bounded(executor: BoundedExecutor, fn: Callable[[Any], Any], items: Iterable[Any],
+                 limit: int) -> Iterator[Tuple[Any, Any, Optional[BaseException]]]:
+    """
+    Apply ``fn`` to items concurrently and yield ``(item, result, error)`` as each one completes.
+
+    Items are pulled from ``items`` lazily and at most ``limit`` are in flight at
+    once, so memory stays flat however long the input is.
+    """
+    pending = iter(items)
+    in_flight = {}
+
+    def submit_next() -> bool:
+        item = next(pending, _DONE)
+        if item is _DONE:
+            return False
+        in_flight[executor.submit(fn, item)] = item
+        return True
+
+    for _ in range(max(1, limit)):
+        if not submit_next():
+            break
+
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            item = in_flight.pop(future)
+            error = future.exception()
+            yield item, (None if error else future.result()), error
+            submit_next()
+
+
+_DONE = object()
@@ -0,0 +1,179 @@
+"""
+Condensation of product content before it goes into the prompts.
+
+The extracted page content concatenates every block that matched a selector,
+so nested blocks repeat the same sentences, and it carries cart buttons,
+delivery and cookie notices. It is condensed once per request: sentences are
+deduplicated, boilerplate is dropped and, when the rest is longer than the
+token budget, the sentences most relevant to the product (its name, taxonomy
+terms, strengths and sizes) are kept in their original order.
+
+Print a report of the tokens saved on pages or text files with:
+    python -m utils.condenser https://example.com/product/napa page.txt
+"""
+import argparse
+import math
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+from .constants import CONDENSE_ENABLED, CONDENSE_TOKEN_BUDGET, CONDENSE_MAX_SENTENCE_WORDS
+from .tokenizer import STOPWORDS, tokenize
+from .llm_dispatcher import estimate_tokens
+from .metrics import instrument, record_content_tokens
+from .product_context import get_classifier
+
+SENTENCE_END = re.compile(r'(?<=[.!?।])\s+')
+NORMALIZE_PATTERN = re.compile(r'[^\wঀ-৿]+')
+SPEC_PATTERN = re.compile(
+    r'\d+(?:\.\d+)?\s*(?:mg|mcg|ml|gm?|kg|mah|w|v|cm|mm|inch|gb|tb|%|মি\.?\s*গ্রা|মি\.?\s*লি)', re.IGNORECASE
+)
+# Store chrome that says nothing about the product
+BOILERPLATE_PATTERN = re.compile(r'|'.join([
+    r'\badd to (?:cart|bag|wishlist|compare)\b', r'\bbuy now\b', r'\b(?:sign|log) ?in\b', r'\bregister\b',
+    r'\bcookies?\b', r'\bprivacy policy\b', r'\bterms (?:and|&) conditions\b', r'\ball rights reserved\b', '©',
+    r'\bcopyright\b', r'\bnewsletter\b', r'\bsubscribe\b', r'\bfollow us\b', r'\bshare (?:on|this)\b',
+    r'\b(?:facebook|twitter|instagram|whatsapp|pinterest)\b', r'\bwrite a review\b', r'\bbe the first to review\b',
+    r'\brelated products\b', r'\byou may also like\b', r'\bcustomers also\b', r'\breturn policy\b',
+    r'\btrack (?:your )?order\b', r'\bhotline\b', r'\bcall us\b', r'\b(?:in|out of) stock\b', r'\bquantity\b',
+    'কার্টে যোগ', 'এখনই কিনুন', 'অর্ডার করুন',
+]), re.IGNORECASE)
+# Longer sentences that merely mention a cart or a cookie are kept
+BOILERPLATE_MAX_WORDS = 25
+# Short fragments repeated from nested blocks are not worth deduplicating by containment
+MIN_CONTAINED_CHARS = 30
+
+
+class Condensed(NamedTuple):
+    """Condensed content and what condensing it removed."""
+    text: str
+    tokens_before: int
+    tokens_after: int
+    dropped: Dict[str, int]
+
+
+def split_sentences(text: str, max_words: int = CONDENSE_MAX_SENTENCE_WORDS) -> List[str]:
+    """Split content into sentences, cutting runs without sentence punctuation every ``max_words`` words."""
+    sentences = []
+    for sentence in SENTENCE_END.split(' '.join((text or '').split())):
+        words = sentence.split()
+        for start in range(0, len(words), max_words):
+            sentences.append(' '.join(words[start:start + max_words]))
+    return [sentence for sentence in sentences if sentence]
+
+
+def _normalize(sentence: str) -> str:
+    return ' '.join(NORMALIZE_PATTERN.sub(' ', sentence.lower()).split())
+
+
+def _terms(text: str) -> set:
+    return {token for tokens in tokenize(text) for token in tokens if token not in STOPWORDS and len(token) > 1}
+
+
+def relevance(sentence: str, name_terms: set) -> float:
+    """Score how much a sentence says about the product, per estimated token."""
+    score = 0.5 + 2 * len(_terms(sentence) & name_terms)
+    score += sum(get_classifier().count_labels(sentence.lower()).values())
+    score += len(SPEC_PATTERN.findall(sentence))
+    return score / math.sqrt(estimate_tokens(sentence))
+
+
+@instrument('condense')
+def condense(content: str, budget: int = CONDENSE_TOKEN_BUDGET, title: Optional[str] = None) -> Condensed:
+    """
+    Deduplicate product content, drop boilerplate and cut it to a token budget.
+
+    Args:
+        content (str): The extracted product content
+        budget (int): Maximum estimated tokens of the result (0 for no limit)
+        title (str): The page title, used with the first sentence to tell what the product is
+
+    Returns:
+        Condensed: The condensed text with its estimated token counts before and after
+    """
+    tokens_before = estimate_tokens(content) if content else 0
+    dropped = {'duplicate': 0, 'boilerplate': 0, 'budget': 0}
+    kept: List[str] = []
+    seen = set()
+    for sentence in split_sentences(content):
+        normalized = _normalize(sentence)
+        if not normalized or normalized in seen:
+            dropped['duplicate'] += 1
+            continue
+        if len(sentence.split()) <= BOILERPLATE_MAX_WORDS and BOILERPLATE_PATTERN.search(sentence):
+            dropped['boilerplate'] += 1
+            continue
+        seen.add(normalized)
+        kept.append(sentence)
+
+    # A sentence repeated inside a longer one (a nested block's text) says nothing new
+    normalized_kept = [_normalize(sentence) for sentence in kept]
+    unique = []
+    for index, sentence in enumerate(kept):
+        normalized = normalized_kept[index]
+        if len(normalized) >= MIN_CONTAINED_CHARS and any(
+                normalized in other and normalized != other for other in normalized_kept):
+            dropped['duplicate'] += 1
+            continue
+        unique.append(sentence)
+
+    tokens = [estimate_tokens(sentence) for sentence in unique]
+    if budget and sum(tokens) > budget and unique:
+        # The product name usually opens the content and is always kept
+        name_terms = _terms(unique[0]) | _terms(title or '')
+        ranked = sorted(range(1, len(unique)), key=lambda i: (-relevance(unique[i], name_terms), i))
+        chosen = {0}
+        total = tokens[0]
+        for index in ranked:
+            if total + tokens[index] <= budget:
+                chosen.add(index)
+                total += tokens[index]
+        dropped['budget'] = len(unique) - len(chosen)
+        unique = [sentence for index, sentence in enumerate(unique) if index in chosen]
+
+    text = ' '.join(unique)
+    return Condensed(text, tokens_before, estimate_tokens(text) if text else 0, dropped)
+
+
+def condense_content(content: str, title: Optional[str] = None) -> str:
+    """Return the content the generators are prompted with, recording the tokens condensation saved."""
+    if not CONDENSE_ENABLED or not content:
+        return content
+    condensed = condense(content, title=title)
+    record_content_tokens(condensed.tokens_before, condensed.tokens_after)
+    return condensed.text or content
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the tokens condensation saves on product pages.')
+    parser.add_argument('sources', nargs='+', help='Product page URLs or text files of extracted content')
+    parser.add_argument('--budget', type=int, default=CONDENSE_TOKEN_BUDGET)
+    parser.add_argument('--show', action='store_true', help='Print the condensed text')
+    args = parser.parse_args()
+
+    from .url_service import extract_meta_from_url
+
+    total_before = total_after = 0
+    for source in args.sources:
+        if source.startswith(('http://', 'https://')):
+            meta_data = extract_meta_from_url(source)
+            if not meta_data:
+                print(f"{source}: could not extract the page")
+                continue
+            content, title = meta_data['content'], meta_data['title']
+        else:
+            with open(source, encoding='utf-8') as f:
+                content, title = f.read(), None
+        condensed = condense(content, args.budget, title)
+        total_before += condensed.tokens_before
+        total_after += condensed.tokens_after
+        removed = ', '.join(f"{count} {reason}" for reason, count in condensed.dropped.items() if count)
+        print(f"{source}: {condensed.tokens_before:,} -> {condensed.tokens_after:,} tokens"
+              f"{f' (dropped {removed})' if removed else ''}")
+        if args.show:
+            print(condensed.text)
+    if len(args.sources) > 1 and total_before:
+        print(f"total: {total_before:,} -> {total_after:,} tokens ({1 - total_after / total_before:.0%} saved)")
+
+
+if __name__ == '__main__':
+    main()
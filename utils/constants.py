@@ -1,4 +1,5 @@
 """Constants used across the application."""
+import os
 
 # Title constants
 MAX_TITLE_LENGTH = 80
@@ -7,8 +8,224 @@ MAX_DESCRIPTION_LENGTH = 160
 # Product types
 MEDICINE_KEYWORDS = ['medicine', 'tablet', 'capsule', 'syrup', 'injection']
 
+# Product classification
+# Category terms (dosage forms, device types, apparel...) matched in one pass over the content;
+# SEO_TAXONOMY_FILE points at a JSON file of {"category": ["term", ...]} to use instead.
+# Text is treated as Bengali when more than BENGALI_TEXT_RATIO of its characters are Bengali
+MEDICINE_CATEGORY = 'medicine'
+TAXONOMY_FILE = os.getenv('SEO_TAXONOMY_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'product_taxonomy.json'))
+BENGALI_TEXT_RATIO = 0.15
+
+# Keywords
+# "llm" asks Gemini, "local" ranks the content's phrases with the TF-IDF model fitted on the catalog (no AI call)
+# and "hybrid" sends Gemini the best local phrases with a shortened content instead of the whole page.
+# Without a fitted model (see utils/keyword_model.py) local phrases are ranked by frequency and length alone
+KEYWORD_MODES = ('llm', 'local', 'hybrid')
+DEFAULT_KEYWORD_MODE = os.getenv('SEO_KEYWORD_MODE', 'llm')
+KEYWORD_MODEL_FILE = os.getenv('SEO_KEYWORD_MODEL_FILE', 'keyword_model.npz')
+KEYWORD_MODEL_MAX_PHRASES = int(os.getenv('SEO_KEYWORD_MODEL_MAX_PHRASES', '200000'))
+KEYWORD_MAX_WORDS = 4
+KEYWORD_HYBRID_CANDIDATES = int(os.getenv('SEO_KEYWORD_HYBRID_CANDIDATES', '20'))
+KEYWORD_HYBRID_CONTENT_CHARS = int(os.getenv('SEO_KEYWORD_HYBRID_CONTENT_CHARS', '300'))
+
 # Company names
 # Default company names that can be overridden by user input
 DEFAULT_COMPANY_NAME = "Prachine Bangla Online"
 DEFAULT_PHARMACY_NAME = "Prachine Bangla Online Pharmacy"
 DEFAULT_SHOP_NAME = "Prachine Bangla Online Shop"
+
+# Local storage
+# Directory for the SQLite stores shared by all worker processes
+DATA_DIR = os.getenv('SEO_DATA_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'var'))
+
+# AI response cache
+CACHE_ENABLED = os.getenv('SEO_CACHE_ENABLED', '1') == '1'
+CACHE_DB_FILE = 'ai_cache.sqlite3'
+CACHE_MEMORY_ENTRIES = int(os.getenv('SEO_CACHE_MEMORY_ENTRIES', '512'))
+CACHE_TTL_SECONDS = int(os.getenv('SEO_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+CACHE_MAX_DISK_ENTRIES = int(os.getenv('SEO_CACHE_MAX_DISK_ENTRIES', '50000'))
+CACHE_MAX_DISK_BYTES = int(os.getenv('SEO_CACHE_MAX_DISK_BYTES', str(256 * 1024 * 1024)))
+
+# Generation modes
+# "separate" makes one AI call per field, "fused" asks for all fields in one call
+GENERATION_MODES = ('separate', 'fused')
+DEFAULT_GENERATION_MODE = os.getenv('SEO_GENERATION_MODE', 'separate')
+
+# Concurrent generation
+# Size of the shared generator thread pool and the per-request limit on fields generated at once
+GENERATION_WORKERS = int(os.getenv('SEO_GENERATION_WORKERS', '16'))
+GENERATION_PARALLELISM = int(os.getenv('SEO_GENERATION_PARALLELISM', '3'))
+
+# Batch generation
+# Size of the shared batch item pool and the per-request limit on items processed at once
+BATCH_WORKERS = int(os.getenv('SEO_BATCH_WORKERS', '8'))
+BATCH_CONCURRENCY = int(os.getenv('SEO_BATCH_CONCURRENCY', '4'))
+
+# Page fetching
+# Connection pools are kept per host; each host also gets a cap on concurrent requests
+FETCH_TIMEOUT = int(os.getenv('SEO_FETCH_TIMEOUT', '30'))
+FETCH_RETRIES = 3
+FETCH_POOL_HOSTS = int(os.getenv('SEO_FETCH_POOL_HOSTS', '32'))
+FETCH_POOL_SIZE = int(os.getenv('SEO_FETCH_POOL_SIZE', '8'))
+FETCH_PER_HOST_CONCURRENCY = int(os.getenv('SEO_FETCH_PER_HOST_CONCURRENCY', '4'))
+
+# Request deadlines
+# Interactive requests must be answered within SEO_REQUEST_DEADLINE seconds unless the client asks for another
+# budget (X-Request-Deadline header or "deadline" field), capped at SEO_REQUEST_MAX_DEADLINE. Batch items get
+# the budget each. Fetches and Gemini calls get the time left, retries stop when it runs out and the fields
+# not generated by then get their fallbacks
+REQUEST_DEADLINE = float(os.getenv('SEO_REQUEST_DEADLINE', '60'))
+REQUEST_MAX_DEADLINE = float(os.getenv('SEO_REQUEST_MAX_DEADLINE', '120'))
+
+# Page cache
+# Pages younger than PAGE_CACHE_MAX_AGE are served without contacting the shop; older ones
+# are revalidated with ETag/Last-Modified, and entries older than PAGE_CACHE_MAX_STALE are dropped;
+# past PAGE_CACHE_MAX_ENTRIES pages, the least recently validated ones are dropped too
+PAGE_CACHE_ENABLED = os.getenv('SEO_PAGE_CACHE_ENABLED', '1') == '1'
+PAGE_CACHE_DB_FILE = 'page_cache.sqlite3'
+PAGE_CACHE_MAX_AGE = int(os.getenv('SEO_PAGE_CACHE_MAX_AGE', '3600'))
+PAGE_CACHE_MAX_STALE = int(os.getenv('SEO_PAGE_CACHE_MAX_STALE', str(30 * 24 * 3600)))
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv('SEO_PAGE_CACHE_MAX_ENTRIES', '20000'))
+
+# Query parameters that only track the visitor and never change the page
+TRACKING_QUERY_PARAMS = {
+    'gclid', 'dclid', 'fbclid', 'msclkid', 'yclid', 'igshid', 'mc_cid', 'mc_eid',
+    '_ga', '_gl', 'ref', 'ref_src', 'spm', 'srsltid'
+}
+TRACKING_QUERY_PREFIXES = ('utm_',)
+
+# HTML extraction
+# Pages are streamed and parsed in one pass; bodies beyond FETCH_MAX_BYTES are not read.
+# HTML_PARSER_BACKEND is "html.parser", "lxml" (not in requirements.txt), "auto" (lxml when installed, else
+# html.parser) or "soup" (full BeautifulSoup tree)
+FETCH_MAX_BYTES = int(os.getenv('SEO_FETCH_MAX_BYTES', str(3 * 1024 * 1024)))
+HTML_PARSER_BACKEND = os.getenv('SEO_HTML_PARSER', 'html.parser')
+
+# Catalog crawl
+# Requests per second per host, URLs processed at once, and sitemap recursion limits
+CRAWL_DB_FILE = 'crawl.sqlite3'
+CRAWL_RATE = float(os.getenv('SEO_CRAWL_RATE', '1.0'))
+CRAWL_CONCURRENCY = int(os.getenv('SEO_CRAWL_CONCURRENCY', '4'))
+CRAWL_MAX_SITEMAPS = int(os.getenv('SEO_CRAWL_MAX_SITEMAPS', '1000'))
+CRAWL_ROBOTS_TTL = 3600
+CRAWL_USER_AGENT = 'SEOToolsBot'
+
+# Background jobs
+# Worker processes, lease length before a silent worker's job is handed to another one, and retry backoff
+JOB_DB_FILE = 'jobs.sqlite3'
+JOB_WORKERS = int(os.getenv('SEO_JOB_WORKERS', '2'))
+JOB_VISIBILITY_TIMEOUT = int(os.getenv('SEO_JOB_VISIBILITY_TIMEOUT', '120'))
+JOB_MAX_ATTEMPTS = int(os.getenv('SEO_JOB_MAX_ATTEMPTS', '3'))
+JOB_RETRY_BACKOFF = float(os.getenv('SEO_JOB_RETRY_BACKOFF', '5'))
+JOB_POLL_INTERVAL = 1.0
+
+# Gemini dispatcher
+# Quota of the API key (requests and tokens per minute), bounds of the adaptive concurrency limit and retry backoff.
+# Calls are served by lane in LLM_PRIORITY_LANES order, so interactive requests go ahead of batch work.
+LLM_REQUESTS_PER_MINUTE = int(os.getenv('SEO_LLM_RPM', '300'))
+LLM_TOKENS_PER_MINUTE = int(os.getenv('SEO_LLM_TPM', '1000000'))
+LLM_MAX_CONCURRENCY = int(os.getenv('SEO_LLM_MAX_CONCURRENCY', '8'))
+LLM_MIN_CONCURRENCY = 1
+LLM_BACKOFF_BASE = float(os.getenv('SEO_LLM_BACKOFF_BASE', '1'))
+LLM_BACKOFF_MAX = 30.0
+LLM_QUEUE_TIMEOUT = float(os.getenv('SEO_LLM_QUEUE_TIMEOUT', '120'))
+LLM_PRIORITY_LANES = ('interactive', 'batch')
+# Hedged calls: when a call has not answered after the LLM_HEDGE_QUANTILE of recent call latencies (once
+# LLM_HEDGE_MIN_SAMPLES calls were timed), the same call is sent again and the first answer wins
+LLM_HEDGE_ENABLED = os.getenv('SEO_LLM_HEDGE', '0') == '1'
+LLM_HEDGE_QUANTILE = float(os.getenv('SEO_LLM_HEDGE_QUANTILE', '0.95'))
+LLM_HEDGE_MIN_SAMPLES = 20
+LLM_LATENCY_WINDOW = 200
+CHARS_PER_TOKEN = 4
+# Bengali script takes about a token per two characters
+BENGALI_CHARS_PER_TOKEN = 2
+
+# Metrics
+# Per-stage timings in the Server-Timing header and Prometheus histograms at /metrics (bucket bounds in seconds)
+METRICS_ENABLED = os.getenv('SEO_METRICS_ENABLED', '1') == '1'
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Duplicate requests
+# Concurrent requests with the same inputs share one computation; responses of requests sent with an
+# Idempotency-Key are replayed for IDEMPOTENCY_TTL seconds, and a retry arriving while the original is
+# still running waits up to IDEMPOTENCY_WAIT seconds for it
+COALESCING_ENABLED = os.getenv('SEO_COALESCING_ENABLED', '1') == '1'
+IDEMPOTENCY_ENABLED = os.getenv('SEO_IDEMPOTENCY_ENABLED', '1') == '1'
+IDEMPOTENCY_DB_FILE = 'idempotency.sqlite3'
+IDEMPOTENCY_TTL = int(os.getenv('SEO_IDEMPOTENCY_TTL', str(24 * 3600)))
+IDEMPOTENCY_WAIT = int(os.getenv('SEO_IDEMPOTENCY_WAIT', '120'))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Near-duplicate detection
+# Generated titles and descriptions are indexed with MinHash/LSH. DUPLICATE_CHECK is "off", "flag" (report
+# texts at least DUPLICATE_THRESHOLD similar to another product's) or "regenerate" (ask once more, then flag).
+# LSH_BANDS must divide MINHASH_PERMUTATIONS; 16 bands of 8 rows catch pairs that are about 0.7 similar or more.
+DUPLICATE_CHECK_MODES = ('off', 'flag', 'regenerate')
+DUPLICATE_CHECK = os.getenv('SEO_DUPLICATE_CHECK', 'off')
+DUPLICATE_THRESHOLD = float(os.getenv('SEO_DUPLICATE_THRESHOLD', '0.8'))
+DUPLICATE_DB_FILE = 'duplicates.sqlite3'
+DUPLICATE_SHINGLE_SIZE = 5
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 16
+# Fields of generation results that are indexed
+INDEXED_FIELDS = ('title', 'description')
+
+# Incremental regeneration
+# Fingerprints of the content, settings, prompt template version and model each product was generated from
+FINGERPRINT_DB_FILE = 'fingerprints.sqlite3'
+
+# Structured output
+# Product descriptions are requested as JSON matching a declared schema (Gemini's JSON mode); set to 0
+# to ask for JSON in the prompt only. Either way the response is parsed tolerantly
+STRUCTURED_OUTPUT = os.getenv('SEO_STRUCTURED_OUTPUT', '1') == '1'
+
+# Content condensation
+# Page content is deduplicated and stripped of boilerplate once per request, then cut to the
+# CONDENSE_TOKEN_BUDGET estimated tokens most relevant to the product before it goes into the prompts.
+# Runs of text without sentence punctuation (spec tables) are split every CONDENSE_MAX_SENTENCE_WORDS words
+CONDENSE_ENABLED = os.getenv('SEO_CONDENSE_ENABLED', '1') == '1'
+CONDENSE_TOKEN_BUDGET = int(os.getenv('SEO_CONDENSE_TOKEN_BUDGET', '600'))
+CONDENSE_MAX_SENTENCE_WORDS = 40
+
+# Medicine titles
+# Brand, strength and dosage form are parsed locally and transliterated into Bangla; Gemini is only asked
+# when the parse is less confident than MEDICINE_PARSER_MIN_CONFIDENCE (0-1). At the default a parse needs both
+# the strength and the form, and a brand missing from the dictionary then just passes (0.2 + 0.3 + 0.35) and is
+# transliterated; above 0.85 only dictionary brands skip Gemini. SEO_MEDICINE_BRANDS_FILE points at a JSON file
+# of {"brand": "বাংলা নাম"} to use instead of the bundled dictionary
+MEDICINE_PARSER_ENABLED = os.getenv('SEO_MEDICINE_PARSER_ENABLED', '1') == '1'
+MEDICINE_PARSER_MIN_CONFIDENCE = float(os.getenv('SEO_MEDICINE_PARSER_MIN_CONFIDENCE', '0.85'))
+MEDICINE_BRANDS_FILE = os.getenv('SEO_MEDICINE_BRANDS_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'medicine_brands.json'))
+
+# Results store
+# Every generated title, description, keyword list and product description is recorded by SKU or URL,
+# company name and time. Lookups return RESULTS_PAGE_SIZE rows per page (at most RESULTS_MAX_PAGE_SIZE);
+# exports read RESULTS_EXPORT_BATCH_SIZE rows per query
+RESULTS_ENABLED = os.getenv('SEO_RESULTS_ENABLED', '1') == '1'
+RESULTS_DB_FILE = 'results.sqlite3'
+RESULTS_PAGE_SIZE = 100
+RESULTS_MAX_PAGE_SIZE = 1000
+RESULTS_EXPORT_BATCH_SIZE = 1000
+
+# Process start-up
+# The Gemini client, NumPy/SciPy and BeautifulSoup are imported on first use. STARTUP_MODE "warm" loads them,
+# the model client and the stores in a background thread as soon as a process starts serving, "eager" before
+# the app finishes importing and "lazy" only when a request needs them
+STARTUP_MODES = ('eager', 'warm', 'lazy')
+STARTUP_MODE = os.getenv('SEO_STARTUP', 'warm')
+# Errors of the servers are logged to this file, relative to the working directory
+LOG_FILE = os.getenv('SEO_LOG_FILE', 'stderr.log')
+
+# AI backend
+# "gemini" calls the Gemini API; "record" calls it and saves every response to AI_FIXTURES_FILE by model and
+# prompt; "replay" answers from that file without network access (a prompt that was not recorded fails), and
+# "fake" with canned answers shaped like Gemini's. Replayed and fake calls take AI_LATENCY
+# seconds (a random time up to AI_MAX_LATENCY when it is higher); AI_THROTTLE_RATE of them fail with a 429 and
+# AI_FAILURE_RATE with a 503, which the dispatcher retries
+AI_BACKENDS = ('gemini', 'record', 'replay', 'fake')
+AI_BACKEND = os.getenv('SEO_AI_BACKEND', 'gemini')
+AI_FIXTURES_FILE = os.getenv('SEO_AI_FIXTURES_FILE', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'fixtures', 'llm_responses.json'))
+AI_LATENCY = float(os.getenv('SEO_AI_LATENCY', '0.5'))
+AI_MAX_LATENCY = float(os.getenv('SEO_AI_MAX_LATENCY', '0'))
+AI_THROTTLE_RATE = float(os.getenv('SEO_AI_THROTTLE_RATE', '0'))
+AI_FAILURE_RATE = float(os.getenv('SEO_AI_FAILURE_RATE', '0'))
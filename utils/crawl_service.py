@@ -0,0 +1,471 @@
+"""
+Service for crawling a store's sitemap and generating SEO content for every product.
+
+A crawl job discovers product URLs from a sitemap or sitemap index (plain or
+gzip-compressed), filters them with include/exclude patterns and analyzes each
+one through ``extract_meta_from_url`` and the generators. Robots.txt is honored
+and cached per host, and requests to the same host are spaced by a politeness
+delay. Progress is checkpointed in SQLite, so a killed job started again with
+the same id picks up with the URLs it has not finished yet.
+"""
+import argparse
+import gzip
+import io
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from .concurrency import BoundedExecutor, imap_bounded
+from .constants import (
+    CRAWL_DB_FILE, CRAWL_RATE, CRAWL_CONCURRENCY, CRAWL_MAX_SITEMAPS, CRAWL_ROBOTS_TTL,
+    CRAWL_USER_AGENT, DEFAULT_COMPANY_NAME
+)
+from .fingerprint_store import UNCHANGED
+from .generation_service import generate_if_changed, generate_seo_content, response_fields
+from .llm_dispatcher import llm_priority
+from .results_store import record_result
+from .sqlite_store import connect, get_db_path, transaction
+from .url_service import PageFetcher, extract_meta_from_url, get_page_fetcher, normalize_url
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+
+def decode_sitemap(data: bytes) -> bytes:
+    """Decompress a gzip-compressed sitemap; plain sitemaps are returned unchanged."""
+    if data[:2] == GZIP_MAGIC:
+        return gzip.decompress(data)
+    return data
+
+
+def parse_sitemap(data: bytes) -> Tuple[bool, List[str]]:
+    """
+    Parse a sitemap document.
+
+    Returns:
+        Tuple[bool, List[str]]: Whether the document is a sitemap index, and its <loc> URLs
+    """
+    is_index = False
+    locations = []
+    for event, element in ET.iterparse(io.BytesIO(decode_sitemap(data)), events=('start', 'end')):
+        # Compare local names so any sitemap namespace (or none) works
+        name = element.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            if name == 'sitemapindex':
+                is_index = True
+            continue
+        if name == 'loc' and element.text and element.text.strip():
+            locations.append(element.text.strip())
+        elif name in ('url', 'sitemap'):
+            element.clear()
+    return is_index, locations
+
+
+class RobotsCache:
+    """Per-host robots.txt rules, fetched once and kept for a while."""
+
+    def __init__(self, fetcher: PageFetcher, user_agent: str = CRAWL_USER_AGENT, ttl: int = CRAWL_ROBOTS_TTL):
+        self.fetcher = fetcher
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self._rules: Dict[str, Tuple[float, Optional[RobotFileParser]]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, url: str) -> Optional[RobotFileParser]:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            cached = self._rules.get(origin)
+            if cached and time.time() - cached[0] < self.ttl:
+                return cached[1]
+            parser = None
+            try:
+                response = self.fetcher.session.get(origin + '/robots.txt', timeout=self.fetcher.timeout)
+                if response.status_code == 200:
+                    parser = RobotFileParser()
+                    parser.parse(response.text.splitlines())
+            except Exception as e:
+                logging.warning(f"Could not fetch robots.txt for {origin}: {str(e)}")
+            # A missing or unreachable robots.txt allows everything
+            self._rules[origin] = (time.time(), parser)
+            return parser
+
+    def allowed(self, url: str) -> bool:
+        """Check whether robots.txt allows crawling ``url``."""
+        parser = self._get(url)
+        return parser is None or parser.can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> float:
+        """Return the host's Crawl-delay, or 0."""
+        parser = self._get(url)
+        delay = parser.crawl_delay(self.user_agent) if parser else None
+        return float(delay) if delay else 0.0
+
+
+class HostThrottle:
+    """Spaces requests to the same host at least ``delay`` seconds apart."""
+
+    def __init__(self):
+        self._next_slot: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str, delay: float) -> None:
+        """Block until the next request slot for the URL's host."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + delay
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class CrawlStore:
+    """SQLite checkpoint of crawl jobs and the status of every discovered URL."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_db_path(CRAWL_DB_FILE)
+        conn = connect(self.path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_jobs (
+                job_id TEXT PRIMARY KEY,
+                sitemap_url TEXT NOT NULL,
+                config TEXT NOT NULL,
+                status TEXT NOT NULL,
+                discovered INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_urls (
+                job_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job_id, url)
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_crawl_urls_status ON crawl_urls (job_id, status, position)')
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = connect(self.path).execute('SELECT * FROM crawl_jobs WHERE job_id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['config'] = json.loads(job['config'])
+        return job
+
+    def create_job(self, job_id: str, sitemap_url: str, config: Dict[str, Any]) -> None:
+        now = time.time()
+        connect(self.path).execute(
+            'INSERT INTO crawl_jobs (job_id, sitemap_url, config, status, created_at, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (job_id, sitemap_url, json.dumps(config), 'discovering', now, now)
+        )
+
+    def set_job_status(self, job_id: str, status: str, discovered: Optional[bool] = None) -> None:
+        conn = connect(self.path)
+        if discovered is None:
+            conn.execute('UPDATE crawl_jobs SET status = ?, updated_at = ? WHERE job_id = ?',
+                         (status, time.time(), job_id))
+        else:
+            conn.execute('UPDATE crawl_jobs SET status = ?, discovered = ?, updated_at = ? WHERE job_id = ?',
+                         (status, int(discovered), time.time(), job_id))
+
+    def add_urls(self, job_id: str, urls: List[str]) -> None:
+        conn = connect(self.path)
+        now = time.time()
+        with transaction(conn):
+            start = conn.execute('SELECT COUNT(*) FROM crawl_urls WHERE job_id = ?', (job_id,)).fetchone()[0]
+            conn.executemany(
+                'INSERT OR IGNORE INTO crawl_urls (job_id, url, position, status, updated_at) VALUES (?, ?, ?, ?, ?)',
+                [(job_id, url, start + i, 'pending', now) for i, url in enumerate(urls)]
+            )
+
+    def pending_urls(self, job_id: str) -> Iterator[str]:
+        """Yield URLs still to be processed, in discovery order."""
+        rows = connect(self.path).execute(
+            "SELECT url FROM crawl_urls WHERE job_id = ? AND status = 'pending' ORDER BY position", (job_id,)
+        ).fetchall()
+        for row in rows:
+            yield row['url']
+
+    def finish_url(self, job_id: str, url: str, status: str, result: Optional[Dict[str, Any]] = None,
+                   error: Optional[str] = None) -> None:
+        connect(self.path).execute(
+            'UPDATE crawl_urls SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ? AND url = ?',
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error,
+             time.time(), job_id, url)
+        )
+
+    def progress(self, job_id: str) -> Dict[str, int]:
+        rows = connect(self.path).execute(
+            'SELECT status, COUNT(*) AS count FROM crawl_urls WHERE job_id = ? GROUP BY status', (job_id,)
+        ).fetchall()
+        counts = {'pending': 0, 'done': 0, 'unchanged': 0, 'error': 0, 'skipped': 0}
+        counts.update({row['status']: row['count'] for row in rows})
+        counts['total'] = sum(counts.values())
+        return counts
+
+    def results(self, job_id: str) -> Iterator[Dict[str, Any]]:
+        """Yield the processed URLs of a job with their result or error."""
+        rows = connect(self.path).execute(
+            "SELECT url, status, result, error FROM crawl_urls WHERE job_id = ? AND status != 'pending' "
+            'ORDER BY position', (job_id,)
+        )
+        for row in rows:
+            item = {'url': row['url'], 'status': row['status']}
+            if row['result']:
+                item.update(json.loads(row['result']))
+            if row['error']:
+                item['error'] = row['error']
+            yield item
+
+
+class CrawlJob:
+    """
+    A resumable sitemap crawl.
+
+    Args:
+        sitemap_url (str): URL of a sitemap.xml or sitemap index (optionally gzip-compressed)
+        job_id (str): Identifier used to checkpoint and resume; generated when omitted
+        include (List[str]): Regular expressions a product URL must match (any of them)
+        exclude (List[str]): Regular expressions that drop a product URL
+        rate (float): Maximum requests per second per host
+        concurrency (int): Number of URLs processed at once
+        company_name (str): Company name passed to the generators
+        mode (str): Generation mode, or None for the default
+        generate (bool): Whether to generate SEO content or only extract the pages
+        respect_robots (bool): Whether to honor robots.txt
+        max_urls (int): Stop discovering after this many URLs (0 for no limit)
+        incremental (bool): Reuse the fields of products whose content and settings did not change
+        dry_run (bool): Only record which products would be regenerated, and why
+    """
+
+    def __init__(self, sitemap_url: str, job_id: Optional[str] = None, include: Optional[List[str]] = None,
+                 exclude: Optional[List[str]] = None, rate: float = CRAWL_RATE, concurrency: int = CRAWL_CONCURRENCY,
+                 company_name: str = DEFAULT_COMPANY_NAME, mode: Optional[str] = None, generate: bool = True,
+                 respect_robots: bool = True, max_urls: int = 0, incremental: bool = True, dry_run: bool = False,
+                 store: Optional[CrawlStore] = None, fetcher: Optional[PageFetcher] = None):
+        self.sitemap_url = normalize_url(sitemap_url)
+        self.job_id = job_id or uuid.uuid4().hex
+        self.config = {
+            'include': include or [],
+            'exclude': exclude or [],
+            'rate': rate,
+            'concurrency': concurrency,
+            'company_name': company_name,
+            'mode': mode,
+            'generate': generate,
+            'respect_robots': respect_robots,
+            'max_urls': max_urls,
+            'incremental': incremental,
+            'dry_run': dry_run,
+        }
+        self.store = store or CrawlStore()
+        self.fetcher = fetcher or get_page_fetcher()
+        self.robots = RobotsCache(self.fetcher)
+        self.throttle = HostThrottle()
+
+    @classmethod
+    def resume(cls, job_id: str, store: Optional[CrawlStore] = None, **overrides) -> 'CrawlJob':
+        """Recreate a checkpointed job with its stored configuration."""
+        store = store or CrawlStore()
+        job = store.get_job(job_id)
+        if job is None:
+            raise KeyError(f"Unknown crawl job '{job_id}'")
+        config = dict(job['config'], **overrides)
+        return cls(job['sitemap_url'], job_id=job_id, store=store, **config)
+
+    def _wanted(self, url: str) -> bool:
+        include = self.config['include']
+        if include and not any(re.search(pattern, url) for pattern in include):
+            return False
+        return not any(re.search(pattern, url) for pattern in self.config['exclude'])
+
+    def _polite(self, url: str) -> None:
+        delay = 1.0 / self.config['rate'] if self.config['rate'] > 0 else 0.0
+        if self.config['respect_robots']:
+            delay = max(delay, self.robots.crawl_delay(url))
+        self.throttle.wait(url, delay)
+
+    def discover(self) -> Iterator[str]:
+        """Yield product URLs from the sitemap, following sitemap indexes breadth-first."""
+        queue = [self.sitemap_url]
+        seen = set()
+        while queue and len(seen) < CRAWL_MAX_SITEMAPS:
+            sitemap_url = queue.pop(0)
+            if sitemap_url in seen:
+                continue
+            seen.add(sitemap_url)
+            try:
+                self._polite(sitemap_url)
+                is_index, locations = parse_sitemap(self.fetcher.fetch(sitemap_url).content)
+            except Exception as e:
+                logging.error(f"Failed to read sitemap {sitemap_url}: {str(e)}")
+                continue
+            if is_index:
+                queue.extend(urljoin(sitemap_url, location) for location in locations)
+            else:
+                for location in locations:
+                    url = urljoin(sitemap_url, location)
+                    if self._wanted(url):
+                        yield url
+
+    def _process(self, url: str) -> None:
+        try:
+            if self.config['respect_robots'] and not self.robots.allowed(url):
+                self.store.finish_url(self.job_id, url, 'skipped', error='Disallowed by robots.txt')
+                return
+            self._polite(url)
+            meta_data = extract_meta_from_url(url, self.fetcher)
+            if not meta_data:
+                self.store.finish_url(self.job_id, url, 'error', error='Failed to extract metadata from URL')
+                return
+            result = {
+                'original_title': meta_data['title'],
+                'original_description': meta_data.get('description', ''),
+            }
+            if self.config['generate']:
+                with llm_priority('batch'):
+                    if self.config['incremental'] or self.config['dry_run']:
+                        generated, result['change'] = generate_if_changed(
+                            url, meta_data['content'], self.config['company_name'], self.config['mode'],
+                            dry_run=self.config['dry_run']
+                        )
+                    else:
+                        generated = generate_seo_content(meta_data['content'], self.config['company_name'], self.config['mode'])
+                if generated is not None:
+                    result.update(response_fields(generated))
+                    if result.get('change') != UNCHANGED:
+                        record_result('seo', generated, self.config['company_name'], url=url, source='crawl')
+            self.store.finish_url(self.job_id, url, 'unchanged' if result.get('change') == UNCHANGED else 'done', result)
+        except Exception as e:
+            logging.error(f"Crawl of {url} failed: {str(e)}")
+            self.store.finish_url(self.job_id, url, 'error', error=str(e))
+
+    def run(self, on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+            should_stop: Optional[Callable[[], bool]] = None) -> Dict[str, int]:
+        """
+        Run (or resume) the crawl and return the final progress counts.
+
+        Args:
+            on_progress (Callable): Called with the progress counts after each URL
+            should_stop (Callable): Polled between URLs; returning True stops the crawl early
+        """
+        job = self.store.get_job(self.job_id)
+        if job is None:
+            self.store.create_job(self.job_id, self.sitemap_url, self.config)
+            job = self.store.get_job(self.job_id)
+
+        if not job['discovered']:
+            self.store.set_job_status(self.job_id, 'discovering')
+            batch = []
+            count = 0
+            max_urls = self.config['max_urls']
+            for url in self.discover():
+                batch.append(url)
+                count += 1
+                if len(batch) >= 500:
+                    self.store.add_urls(self.job_id, batch)
+                    batch = []
+                if max_urls and count >= max_urls:
+                    break
+            self.store.add_urls(self.job_id, batch)
+            self.store.set_job_status(self.job_id, 'crawling', discovered=True)
+        else:
+            self.store.set_job_status(self.job_id, 'crawling')
+
+        stopped = False
+
+        def pending() -> Iterator[str]:
+            nonlocal stopped
+            for url in self.store.pending_urls(self.job_id):
+                if should_stop and should_stop():
+                    stopped = True
+                    return
+                yield url
+
+        concurrency = max(1, self.config['concurrency'])
+        executor = BoundedExecutor(concurrency, thread_name_prefix='seo-crawl')
+        reported_at = 0.0
+        try:
+            for _ in imap_bounded(executor, self._process, pending(), concurrency):
+                if on_progress and time.monotonic() - reported_at >= 1.0:
+                    reported_at = time.monotonic()
+                    on_progress(self.store.progress(self.job_id))
+        finally:
+            executor.shutdown()
+
+        progress = self.store.progress(self.job_id)
+        self.store.set_job_status(self.job_id, 'stopped' if stopped else 'completed')
+        if on_progress:
+            on_progress(progress)
+        return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl a sitemap and generate SEO content for every product.')
+    parser.add_argument('sitemap_url', nargs='?', help='sitemap.xml or sitemap index URL (omit when resuming)')
+    parser.add_argument('--job-id', help='checkpoint id; an existing id resumes that job')
+    parser.add_argument('--include', action='append', default=[], help='regex a product URL must match')
+    parser.add_argument('--exclude', action='append', default=[], help='regex that drops a product URL')
+    parser.add_argument('--rate', type=float, default=CRAWL_RATE, help='requests per second per host')
+    parser.add_argument('--concurrency', type=int, default=CRAWL_CONCURRENCY)
+    parser.add_argument('--company-name', default=DEFAULT_COMPANY_NAME)
+    parser.add_argument('--mode', choices=['separate', 'fused'])
+    parser.add_argument('--max-urls', type=int, default=0)
+    parser.add_argument('--no-generate', action='store_true', help='only extract pages')
+    parser.add_argument('--ignore-robots', action='store_true')
+    parser.add_argument('--full', action='store_true', help='regenerate every product, even unchanged ones')
+    parser.add_argument('--dry-run', action='store_true', help='only report which products would be regenerated')
+    parser.add_argument('--output', help='write the results as NDJSON to this file when done')
+    args = parser.parse_args()
+
+    store = CrawlStore()
+    if args.job_id and store.get_job(args.job_id):
+        job = CrawlJob.resume(args.job_id, store)
+        print(f"Resuming crawl {job.job_id}")
+    elif args.sitemap_url:
+        job = CrawlJob(
+            args.sitemap_url, job_id=args.job_id, include=args.include, exclude=args.exclude,
+            rate=args.rate, concurrency=args.concurrency, company_name=args.company_name, mode=args.mode,
+            generate=not args.no_generate, respect_robots=not args.ignore_robots, max_urls=args.max_urls,
+            incremental=not args.full, dry_run=args.dry_run, store=store
+        )
+        print(f"Starting crawl {job.job_id}")
+    else:
+        parser.error('a sitemap URL is required for a new crawl')
+
+    def report(progress):
+        print(f"\r{progress['done']} done, {progress['unchanged']} unchanged, {progress['error']} errors, "
+              f"{progress['skipped']} skipped, {progress['pending']} pending of {progress['total']}", end='', flush=True)
+
+    job.run(on_progress=report)
+    print()
+    if job.config['dry_run']:
+        changes: Dict[str, int] = {}
+        for item in store.results(job.job_id):
+            if 'change' in item:
+                changes[item['change']] = changes.get(item['change'], 0) + 1
+        # Products that would be regenerated, by what changed
+        reasons = ', '.join(f"{change}: {count}" for change, count in changes.items() if change != UNCHANGED)
+        print(f"Would regenerate {reasons or 'nothing'}; {changes.get(UNCHANGED, 0)} unchanged")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for item in store.results(job.job_id):
+                f.write(json.dumps(item, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+Per-request deadlines.
+
+A request's deadline is kept in a contextvar, so the executors' worker threads
+see it too. Page fetches, waits for LLM capacity and Gemini calls are given the
+time left instead of their full timeouts, retries are only started when they
+can still finish, and the field generators fall back once it has passed.
+Code running outside a request (background jobs, crawls) has no deadline.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterable, Iterator, Optional
+
+from .constants import REQUEST_DEADLINE, REQUEST_MAX_DEADLINE
+
+# Monotonic time the current request must be answered by, and the budget it was given
+_deadline: ContextVar[Optional[float]] = ContextVar('request_deadline', default=None)
+_budget: ContextVar[Optional[float]] = ContextVar('request_budget', default=None)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request's deadline passes before a step that has no fallback is done."""
+    pass
+
+
+def resolve_deadline(seconds: Any) -> float:
+    """Return the requested budget in seconds, or the default, capped at the server maximum."""
+    if seconds is None or seconds == '':
+        return min(REQUEST_DEADLINE, REQUEST_MAX_DEADLINE)
+    seconds = float(seconds)
+    if not seconds > 0:
+        raise ValueError('deadline must be a positive number of seconds')
+    return min(seconds, REQUEST_MAX_DEADLINE)
+
+
+def set_deadline(seconds: Optional[float]):
+    """Give the current context ``seconds`` from now (None for no deadline) and return a reset token."""
+    expires = time.monotonic() + seconds if seconds is not None else None
+    return _deadline.set(expires), _budget.set(seconds)
+
+
+def reset_deadline(token) -> None:
+    """Restore the deadline saved by ``set_deadline``."""
+    deadline_token, budget_token = token
+    _budget.reset(budget_token)
+    _deadline.reset(deadline_token)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Run the enclosed block with a fresh deadline ``seconds`` from now."""
+    token = set_deadline(seconds)
+    try:
+        yield
+    finally:
+        reset_deadline(token)
+
+
+def carry_deadline(iterable: Iterable[Any]) -> Iterator[Any]:
+    """
+    Iterate ``iterable`` under the current deadline.
+
+    A streamed response body is produced after the request's teardown has
+    cleared the deadline; wrapping the body when the response is built keeps it.
+    """
+    expires, budget = _deadline.get(), _budget.get()
+
+    def run() -> Iterator[Any]:
+        token = _deadline.set(expires), _budget.set(budget)
+        try:
+            yield from iterable
+        finally:
+            reset_deadline(token)
+
+    return run()
+
+
+def current_budget() -> Optional[float]:
+    """Return the budget the current deadline was set with, or None without a deadline."""
+    return _budget.get()
+
+
+def time_left() -> Optional[float]:
+    """Return the seconds left before the deadline (at least 0), or None without a deadline."""
+    expires = _deadline.get()
+    if expires is None:
+        return None
+    return max(0.0, expires - time.monotonic())
+
+
+def expired() -> bool:
+    """Check whether the current deadline has passed."""
+    left = time_left()
+    return left is not None and left <= 0
+
+
+def clamp_timeout(timeout: Optional[float]) -> Optional[float]:
+    """Shrink a timeout to the time left before the deadline."""
+    left = time_left()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def can_wait(seconds: float) -> bool:
+    """Check whether waiting ``seconds`` still leaves time before the deadline for another attempt."""
+    left = time_left()
+    return left is None or left > seconds
+
+
+def check_deadline(step: str) -> None:
+    """Raise DeadlineExceeded if the deadline has passed before ``step``."""
+    if expired():
+        raise DeadlineExceeded(f"Request deadline of {current_budget():g}s exceeded before {step}")
@@ -3,54 +3,81 @@ Service for generating meta descriptions.
 """
 from typing import Optional
 
-from .ai_service import generate_content, AIServiceError
-from .constants import MAX_DESCRIPTION_LENGTH, MEDICINE_KEYWORDS, DEFAULT_PHARMACY_NAME, DEFAULT_SHOP_NAME, DEFAULT_COMPANY_NAME
+from .ai_service import AIServiceError, LLMCall, Steps, arun_steps, run_steps
+from .constants import MAX_DESCRIPTION_LENGTH, DEFAULT_COMPANY_NAME
 from .text_processor import smart_truncate
 from .prompt_templates import get_meta_description_prompt, get_paraphrase_prompt
+from .metrics import instrument, record_event
+from .product_context import ProductContext, build_product_context
 
 
-def is_medicine_product(content: str) -> bool:
-    """Determine if the content is about a medicine product."""
-    return any(keyword in content.lower() for keyword in MEDICINE_KEYWORDS)
+@instrument('gen_description')
+def generate_meta_description(content: str, company_name: str = DEFAULT_COMPANY_NAME,
+                              context: Optional[ProductContext] = None) -> str:
+    """Generate SEO-optimized meta description."""
+    return run_steps(meta_description_steps(content, company_name, context))
 
 
-def get_company_name(content: str, company_name: str = DEFAULT_COMPANY_NAME) -> str:
-    """Get appropriate company name based on content type."""
-    # If a custom company name is provided, use it
-    if company_name and company_name != DEFAULT_COMPANY_NAME:
-        return company_name
-    # Otherwise use default pharmacy or shop name based on content
-    return DEFAULT_PHARMACY_NAME if is_medicine_product(content) else DEFAULT_SHOP_NAME
+@instrument('gen_description')
+async def agenerate_meta_description(content: str, company_name: str = DEFAULT_COMPANY_NAME,
+                                     context: Optional[ProductContext] = None) -> str:
+    """Like ``generate_meta_description``, awaiting the Gemini call."""
+    return await arun_steps(meta_description_steps(content, company_name, context))
 
 
-def generate_meta_description(content: str, company_name: str = DEFAULT_COMPANY_NAME) -> str:
-    """Generate SEO-optimized meta description."""
+def meta_description_steps(content: str, company_name: str = DEFAULT_COMPANY_NAME,
+                           context: Optional[ProductContext] = None) -> Steps[str]:
+    """Steps of ``generate_meta_description``."""
     if not content:
         return ""
     
-    # Create a prompt for generating meta description
-    company = get_company_name(content, company_name)
+    # Create a prompt for generating meta description; the context resolves the pharmacy or shop name
+    company = (context or build_product_context(content, company_name)).display_company_name
     prompt = get_meta_description_prompt(content, company, MAX_DESCRIPTION_LENGTH)
     
     try:
-        description = generate_content(prompt)
-        truncated_description = smart_truncate(description, MAX_DESCRIPTION_LENGTH)
-
-        # Ensure description is close to the maximum length
-        if len(truncated_description) < MAX_DESCRIPTION_LENGTH:
-            # Add supplementary content to extend the description
-            extra_content = content[:MAX_DESCRIPTION_LENGTH - len(truncated_description)].strip()
-            truncated_description = f"{truncated_description} {extra_content}".strip()
-        
-        return smart_truncate(truncated_description, MAX_DESCRIPTION_LENGTH)
+        description = yield LLMCall(prompt)
+        return finalize_meta_description(description, content)
     except AIServiceError as e:
-        # Fallback description without company name
-        fallback = f"Find quality products. {content[:MAX_DESCRIPTION_LENGTH - 20]}..."
-        return smart_truncate(fallback, MAX_DESCRIPTION_LENGTH)
+        return fallback_meta_description(content)
+
+
+def finalize_meta_description(description: str, content: str) -> str:
+    """Truncate a generated description and pad it from the content up to the maximum length."""
+    truncated_description = smart_truncate(description, MAX_DESCRIPTION_LENGTH)
+
+    # Ensure description is close to the maximum length
+    if len(truncated_description) < MAX_DESCRIPTION_LENGTH:
+        # Add supplementary content to extend the description
+        extra_content = content[:MAX_DESCRIPTION_LENGTH - len(truncated_description)].strip()
+        truncated_description = f"{truncated_description} {extra_content}".strip()
+    
+    return smart_truncate(truncated_description, MAX_DESCRIPTION_LENGTH)
 
 
+def fallback_meta_description(content: str) -> str:
+    """Build a description without the AI service."""
+    record_event('fallback', field='description')
+    record_event('placeholder', field='description')
+    # Fallback description without company name
+    fallback = f"Find quality products. {content[:MAX_DESCRIPTION_LENGTH - 20]}..."
+    return smart_truncate(fallback, MAX_DESCRIPTION_LENGTH)
+
+
+@instrument('gen_paraphrase')
 def paraphrase_description(description: str, company_name: str = DEFAULT_COMPANY_NAME) -> str:
     """Paraphrase existing meta description."""
+    return run_steps(paraphrase_steps(description, company_name))
+
+
+@instrument('gen_paraphrase')
+async def aparaphrase_description(description: str, company_name: str = DEFAULT_COMPANY_NAME) -> str:
+    """Like ``paraphrase_description``, awaiting the Gemini call."""
+    return await arun_steps(paraphrase_steps(description, company_name))
+
+
+def paraphrase_steps(description: str, company_name: str = DEFAULT_COMPANY_NAME) -> Steps[str]:
+    """Steps of ``paraphrase_description``."""
     if not description:
         return ""
     
@@ -58,9 +85,10 @@ def paraphrase_description(description: str, company_name: str = DEFAULT_COMPANY
     prompt = get_paraphrase_prompt(description, company_name, MAX_DESCRIPTION_LENGTH)
     
     try:
-        new_description = generate_content(prompt)
+        new_description = yield LLMCall(prompt)
         return smart_truncate(new_description, MAX_DESCRIPTION_LENGTH)
     except AIServiceError as e:
         # Fallback to original description, but remove "at Arogga Online Pharmacy"
+        record_event('fallback', field='paraphrase')
         modified = description.replace("at Arogga Online Pharmacy", "")  # Remove company name part
         return smart_truncate(modified, MAX_DESCRIPTION_LENGTH)
@@ -0,0 +1,343 @@
+"""
+Near-duplicate index of generated titles and descriptions.
+
+Every text is reduced to a MinHash signature of its character shingles, whose
+agreement with another signature estimates the Jaccard similarity of the two
+texts. The signatures are split into LSH bands stored in an indexed SQLite
+table: texts that share a band are candidate duplicates, so a query looks up a
+handful of buckets instead of comparing against the whole catalog. The index is
+persistent, shared by every worker process and grows one insert at a time.
+
+    python -m utils.duplicate_index add results.ndjson
+    python -m utils.duplicate_index query description "Get Napa (নাপা) at ..."
+    python -m utils.duplicate_index report --field description
+"""
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+
+from .constants import (
+    DUPLICATE_DB_FILE, DUPLICATE_THRESHOLD, DUPLICATE_SHINGLE_SIZE, MINHASH_PERMUTATIONS, LSH_BANDS, INDEXED_FIELDS
+)
+from .sqlite_store import connect, get_db_path, transaction
+
+# Universal hashing modulo a prime just above 2**32; coefficients below 2**31 keep a*x + b within 64 bits
+HASH_PRIME = np.uint64(4294967311)
+MAX_HASH = np.uint64(0xFFFFFFFF)
+HASH_SEED = 1
+
+
+class Duplicate(NamedTuple):
+    """An indexed text similar to a query."""
+    key: str
+    text: str
+    similarity: float
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase a text and collapse its punctuation and whitespace."""
+    return ' '.join(re.sub(r'[^\w\s]', ' ', (text or '').lower()).split())
+
+
+def shingle_hashes(text: str, size: int = DUPLICATE_SHINGLE_SIZE) -> np.ndarray:
+    """Return the 32-bit hashes of the distinct character shingles of a normalized text."""
+    text = normalize_text(text)
+    if len(text) <= size:
+        shingles = {text} if text else set()
+    else:
+        shingles = {text[index:index + size] for index in range(len(text) - size + 1)}
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+         for shingle in shingles),
+        dtype=np.uint64, count=len(shingles)
+    )
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures and their LSH band keys.
+
+    Args:
+        permutations (int): Length of a signature
+        bands (int): Number of LSH bands; must divide ``permutations``
+    """
+
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, bands: int = LSH_BANDS, seed: int = HASH_SEED):
+        if permutations % bands:
+            raise ValueError(f"{bands} bands do not divide {permutations} permutations")
+        rng = np.random.RandomState(seed)
+        self.permutations = permutations
+        self.bands = bands
+        self.rows = permutations // bands
+        self._a = rng.randint(1, 2 ** 31, size=permutations).astype(np.uint64)
+        self._b = rng.randint(0, 2 ** 31, size=permutations).astype(np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        """Return the MinHash signature of a text (all maximal for a text without shingles)."""
+        hashes = shingle_hashes(text)
+        if not len(hashes):
+            return np.full(self.permutations, MAX_HASH, dtype=np.uint64)
+        # One row per permutation, one column per shingle
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % HASH_PRIME
+        return (permuted & MAX_HASH).min(axis=1)
+
+    def band_keys(self, signature: np.ndarray) -> List[int]:
+        """Hash each band of a signature, with its position, to a signed 64-bit bucket key."""
+        keys = []
+        for band in range(self.bands):
+            chunk = band.to_bytes(2, 'little') + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            keys.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), 'little', signed=True))
+        return keys
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        """Estimate the Jaccard similarity of two texts from their signatures."""
+        return float(np.mean(first == second))
+
+
+class DuplicateIndex:
+    """
+    Persistent MinHash/LSH index of texts, grouped by field.
+
+    Each text is stored under a key, normally the product it was generated for,
+    so regenerating a product replaces its entry rather than matching itself.
+    """
+
+    def __init__(self, path: str, hasher: Optional[MinHasher] = None):
+        self.path = path
+        self.hasher = hasher or MinHasher()
+        conn = connect(self.path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                field TEXT NOT NULL,
+                key TEXT NOT NULL,
+                text TEXT NOT NULL,
+                signature BLOB NOT NULL,
+                updated_at REAL NOT NULL,
+                UNIQUE (field, key)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS bands (
+                field TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                document_id INTEGER NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bands_bucket ON bands (field, bucket)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_bands_document ON bands (document_id)')
+
+    def add(self, field: str, key: str, text: str) -> None:
+        """Insert a text, replacing the previous text stored under the same field and key."""
+        signature = self.hasher.signature(text)
+        conn = connect(self.path)
+        with transaction(conn):
+            row = conn.execute('SELECT id FROM documents WHERE field = ? AND key = ?', (field, key)).fetchone()
+            if row is not None:
+                conn.execute('DELETE FROM bands WHERE document_id = ?', (row['id'],))
+                conn.execute('DELETE FROM documents WHERE id = ?', (row['id'],))
+            document_id = conn.execute(
+                'INSERT INTO documents (field, key, text, signature, updated_at) VALUES (?, ?, ?, ?, ?)',
+                (field, key, text, signature.tobytes(), time.time())
+            ).lastrowid
+            conn.executemany(
+                'INSERT INTO bands (field, bucket, document_id) VALUES (?, ?, ?)',
+                [(field, bucket, document_id) for bucket in self.hasher.band_keys(signature)]
+            )
+
+    def find(self, field: str, text: str, threshold: float = DUPLICATE_THRESHOLD,
+             exclude_key: Optional[str] = None, limit: int = 10) -> List[Duplicate]:
+        """
+        Find indexed texts similar to a text.
+
+        Args:
+            field (str): The field to search ("title" or "description")
+            text (str): The text to look up
+            threshold (float): Minimum estimated Jaccard similarity (0-1)
+            exclude_key (str): Key whose own entry is not a duplicate, usually the product's
+            limit (int): Maximum number of matches
+
+        Returns:
+            List[Duplicate]: The matches, most similar first
+        """
+        signature = self.hasher.signature(text)
+        conn = connect(self.path)
+        buckets = self.hasher.band_keys(signature)
+        # Candidates share at least one band bucket with the text
+        rows = conn.execute(
+            f"SELECT d.key, d.text, d.signature FROM documents d WHERE d.id IN ("
+            f"SELECT document_id FROM bands WHERE field = ? AND bucket IN ({', '.join('?' * len(buckets))}))",
+            [field] + buckets
+        ).fetchall()
+
+        matches = []
+        for row in rows:
+            if row['key'] == exclude_key:
+                continue
+            similarity = self.hasher.similarity(signature, np.frombuffer(row['signature'], dtype=np.uint64))
+            if similarity >= threshold:
+                matches.append(Duplicate(row['key'], row['text'], similarity))
+        matches.sort(key=lambda match: -match.similarity)
+        return matches[:limit]
+
+    def report(self, field: str, threshold: float = DUPLICATE_THRESHOLD) -> List[List[Duplicate]]:
+        """
+        Group every indexed text of a field into clusters of near-duplicates.
+
+        Only texts sharing an LSH bucket are compared, so the report never
+        compares all pairs.
+
+        Returns:
+            List[List[Duplicate]]: Clusters of two or more texts, largest first; the
+            similarity of each member is to the cluster's first text
+        """
+        conn = connect(self.path)
+        documents: Dict[int, sqlite3.Row] = {}
+        signatures: Dict[int, np.ndarray] = {}
+        parent: Dict[int, int] = {}
+
+        def root(node: int) -> int:
+            while parent.setdefault(node, node) != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        buckets = conn.execute(
+            'SELECT GROUP_CONCAT(document_id) AS ids FROM bands WHERE field = ? '
+            'GROUP BY bucket HAVING COUNT(*) > 1', (field,)
+        )
+        for bucket in buckets:
+            ids = [int(value) for value in bucket['ids'].split(',')]
+            for document_id in ids:
+                if document_id not in documents:
+                    documents[document_id] = conn.execute(
+                        'SELECT key, text, signature FROM documents WHERE id = ?', (document_id,)
+                    ).fetchone()
+                    signatures[document_id] = np.frombuffer(documents[document_id]['signature'], dtype=np.uint64)
+            first = ids[0]
+            for other in ids[1:]:
+                if root(first) != root(other) and \
+                        self.hasher.similarity(signatures[first], signatures[other]) >= threshold:
+                    parent[root(other)] = root(first)
+
+        clusters: Dict[int, List[int]] = {}
+        for document_id in documents:
+            clusters.setdefault(root(document_id), []).append(document_id)
+        report = []
+        for members in clusters.values():
+            if len(members) < 2:
+                continue
+            head = signatures[members[0]]
+            report.append([
+                Duplicate(documents[member]['key'], documents[member]['text'],
+                          self.hasher.similarity(head, signatures[member]))
+                for member in members
+            ])
+        report.sort(key=len, reverse=True)
+        return report
+
+    def count(self, field: Optional[str] = None) -> int:
+        """Return the number of indexed texts, optionally of one field."""
+        conn = connect(self.path)
+        if field is None:
+            return conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+        return conn.execute('SELECT COUNT(*) FROM documents WHERE field = ?', (field,)).fetchone()[0]
+
+
+def product_key(content: str) -> str:
+    """Key of the product a text was generated for."""
+    return hashlib.sha256(normalize_text(content).encode('utf-8')).hexdigest()[:32]
+
+
+_index: Optional[DuplicateIndex] = None
+_index_lock = threading.Lock()
+_index_failed = False
+
+
+def get_duplicate_index() -> Optional[DuplicateIndex]:
+    """Return the process-wide duplicate index, or None when it is unavailable."""
+    global _index, _index_failed
+    if _index_failed:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None and not _index_failed:
+                try:
+                    _index = DuplicateIndex(get_db_path(DUPLICATE_DB_FILE))
+                except (sqlite3.Error, OSError) as e:
+                    logging.error(f"Disabling the duplicate index: {str(e)}")
+                    _index_failed = True
+    return _index
+
+
+def read_results(path: str) -> Iterable[Dict[str, str]]:
+    """Read generation results (batch, crawl or analyze-url output) from an NDJSON file."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index generated titles and descriptions and report near-duplicates.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    add = subparsers.add_parser('add', help='index the generated fields of NDJSON results')
+    add.add_argument('inputs', nargs='+')
+    query = subparsers.add_parser('query', help='find near-duplicates of a text')
+    query.add_argument('field', choices=INDEXED_FIELDS)
+    query.add_argument('text')
+    report = subparsers.add_parser('report', help='list every cluster of near-duplicates')
+    report.add_argument('--field', choices=INDEXED_FIELDS, default='description')
+    for subparser in (query, report):
+        subparser.add_argument('--threshold', type=float, default=DUPLICATE_THRESHOLD)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    index = get_duplicate_index()
+    if index is None:
+        raise SystemExit('The duplicate index is unavailable')
+
+    if args.command == 'add':
+        added = 0
+        for input_path in args.inputs:
+            for record in read_results(input_path):
+                # Results without the product content are keyed by their URL or title
+                source = record.get('original_content') or record.get('content') or record.get('url') \
+                    or record.get('original_title') or ''
+                for field in INDEXED_FIELDS:
+                    text = record.get(f"generated_{field}")
+                    if isinstance(text, str) and text:
+                        index.add(field, product_key(source or text), text)
+                        added += 1
+        logging.info(f"Indexed {added} texts ({index.count()} in the index)")
+    elif args.command == 'query':
+        for match in index.find(args.field, args.text, args.threshold):
+            print(f"{match.similarity:.2f}  {match.text}")
+    else:
+        clusters = index.report(args.field, args.threshold)
+        for cluster in clusters:
+            print(f"{len(cluster)} near-duplicate {args.field}s:")
+            for member in cluster:
+                print(f"  {member.similarity:.2f}  {member.text}")
+        print(f"{len(clusters)} clusters, {sum(len(cluster) for cluster in clusters)} of "
+              f"{index.count(args.field)} {args.field}s")
+
+
+if __name__ == '__main__':
+    main()
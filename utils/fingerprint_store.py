@@ -0,0 +1,136 @@
+"""
+Persistent fingerprints of the content each product was last generated from.
+
+A product (its URL or SKU) is stored with a hash of its scraped content, a hash
+of the settings it was generated with (company name, generation and keyword
+mode), the prompt template version, the model name and the generated fields.
+A re-run of the catalog compares the new fingerprint with the stored one and only
+regenerates products whose content, settings, template or model changed; the
+others reuse their stored fields without an AI call.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, NamedTuple, Optional
+
+from .ai_service import MODEL_NAME
+from .constants import FINGERPRINT_DB_FILE, DEFAULT_GENERATION_MODE, DEFAULT_KEYWORD_MODE
+from .prompt_templates import PROMPT_TEMPLATE_VERSION
+from .sqlite_store import connect, get_db_path
+
+# Why a product needs generating, in the order they are checked
+CHANGE_REASONS = ('new', 'content', 'settings', 'template', 'model')
+UNCHANGED = 'unchanged'
+
+
+class Fingerprint(NamedTuple):
+    """What a product's generated fields depend on."""
+    content_hash: str
+    settings_hash: str
+    template_version: str
+    model_name: str
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def fingerprint(content: str, company_name: str, mode: Optional[str]) -> Fingerprint:
+    """
+    Fingerprint a product's content and generation settings.
+
+    Whitespace is collapsed first, so a page that only re-indented its markup
+    keeps its fingerprint.
+    """
+    return Fingerprint(
+        content_hash=_digest(' '.join((content or '').split())),
+        settings_hash=_digest({
+            'company_name': company_name, 'mode': mode or DEFAULT_GENERATION_MODE, 'keyword_mode': DEFAULT_KEYWORD_MODE
+        }),
+        template_version=PROMPT_TEMPLATE_VERSION,
+        model_name=MODEL_NAME,
+    )
+
+
+def change_reason(stored: Optional[Fingerprint], current: Fingerprint) -> str:
+    """Return why a product must be regenerated, or ``'unchanged'``."""
+    if stored is None:
+        return 'new'
+    if stored.content_hash != current.content_hash:
+        return 'content'
+    if stored.settings_hash != current.settings_hash:
+        return 'settings'
+    if stored.template_version != current.template_version:
+        return 'template'
+    if stored.model_name != current.model_name:
+        return 'model'
+    return UNCHANGED
+
+
+class FingerprintStore:
+    """SQLite table of product fingerprints and the fields generated for them."""
+
+    def __init__(self, path: str):
+        self.path = path
+        connect(self.path).execute("""
+            CREATE TABLE IF NOT EXISTS product_fingerprints (
+                product_id TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                settings_hash TEXT NOT NULL,
+                template_version TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                result TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def get(self, product_id: str) -> Optional[Dict[str, Any]]:
+        """Return the stored fingerprint and generated fields of a product, or None."""
+        row = connect(self.path).execute(
+            'SELECT * FROM product_fingerprints WHERE product_id = ?', (product_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {
+            'fingerprint': Fingerprint(row['content_hash'], row['settings_hash'], row['template_version'],
+                                       row['model_name']),
+            'result': json.loads(row['result']),
+            'updated_at': row['updated_at'],
+        }
+
+    def put(self, product_id: str, current: Fingerprint, result: Dict[str, Any]) -> None:
+        """Store the fingerprint a product was just generated from, with its generated fields."""
+        connect(self.path).execute(
+            'INSERT OR REPLACE INTO product_fingerprints (product_id, content_hash, settings_hash, template_version, '
+            'model_name, result, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (product_id, current.content_hash, current.settings_hash, current.template_version, current.model_name,
+             json.dumps(result, ensure_ascii=False), time.time())
+        )
+
+    def delete(self, product_id: str) -> None:
+        """Forget a product, so its next run regenerates it."""
+        connect(self.path).execute('DELETE FROM product_fingerprints WHERE product_id = ?', (product_id,))
+
+
+_store: Optional[FingerprintStore] = None
+_store_lock = threading.Lock()
+_store_failed = False
+
+
+def get_fingerprint_store() -> Optional[FingerprintStore]:
+    """Return the process-wide fingerprint store, or None when it is unavailable."""
+    global _store, _store_failed
+    if _store_failed:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None and not _store_failed:
+                try:
+                    _store = FingerprintStore(get_db_path(FINGERPRINT_DB_FILE))
+                except (sqlite3.Error, OSError) as e:
+                    logging.error(f"Disabling incremental regeneration: {str(e)}")
+                    _store_failed = True
+    return _store
@@ -0,0 +1,275 @@
+"""
+Service for generating the SEO fields (title, meta description, keywords) of a product.
+"""
+import asyncio
+import logging
+import sqlite3
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .cache_service import bypass_cache
+from .concurrency import BoundedExecutor, arun_fields, iter_fields, run_fields
+from .condenser import condense_content
+from .constants import (
+    DEFAULT_COMPANY_NAME, DEFAULT_GENERATION_MODE, GENERATION_MODES, GENERATION_PARALLELISM, DUPLICATE_CHECK,
+    DUPLICATE_CHECK_MODES, INDEXED_FIELDS
+)
+from .fingerprint_store import UNCHANGED, change_reason, fingerprint, get_fingerprint_store
+from .metrics import count_events, record_event
+from .title_service import agenerate_title, generate_title, fallback_title
+from .description_service import agenerate_meta_description, generate_meta_description, fallback_meta_description
+from .keyword_service import agenerate_keywords, generate_keywords, fallback_keywords
+from .seo_bundle_service import agenerate_seo_bundle, generate_seo_bundle
+from .product_context import ProductContext, build_product_context
+
+
+def resolve_generation_mode(mode: Optional[str]) -> str:
+    """Return the requested generation mode or the default, raising ValueError for unknown modes."""
+    mode = mode or DEFAULT_GENERATION_MODE
+    if mode not in GENERATION_MODES:
+        raise ValueError(f"Unknown generation mode '{mode}', expected one of: {', '.join(GENERATION_MODES)}")
+    return mode
+
+
+def resolve_duplicate_check(mode: str) -> str:
+    """Return the configured duplicate check mode, turning the check off with a warning for unknown modes."""
+    if mode not in DUPLICATE_CHECK_MODES:
+        logging.warning(f"Unknown duplicate check mode '{mode}', expected one of: "
+                        f"{', '.join(DUPLICATE_CHECK_MODES)}; the check is off")
+        return 'off'
+    return mode
+
+
+_duplicate_check = resolve_duplicate_check(DUPLICATE_CHECK)
+
+
+def resolve_parallelism(parallelism: Optional[int]) -> int:
+    """Clamp a requested per-request parallelism to between 1 and the configured limit."""
+    if parallelism is None:
+        return GENERATION_PARALLELISM
+    return max(1, min(int(parallelism), GENERATION_PARALLELISM))
+
+
+def generate_seo_content(content: str, company_name: str = DEFAULT_COMPANY_NAME, mode: Optional[str] = None,
+                         executor: Optional[BoundedExecutor] = None, parallelism: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Generate title, meta description and keywords for product content.
+
+    In "separate" mode the three generators share no state, so with an executor
+    they run concurrently. A field whose generator raises gets its fallback value
+    while the other fields are kept. The generators are prompted with the content
+    condensed once to the token budget.
+
+    Args:
+        content (str): The product content
+        company_name (str): Company name to include in the generated fields
+        mode (str): "separate" for one AI call per field or "fused" for a single call
+        executor (BoundedExecutor): Shared pool to fan the fields out on, or None to run them in turn
+        parallelism (int): Maximum number of fields generated at once for this request
+
+    Returns:
+        Dict[str, Any]: Dictionary with 'title', 'description' and 'keywords', and
+        'duplicates' when a field is a near-duplicate of another product's
+    """
+    prompt_content = condense_content(content)
+    if resolve_generation_mode(mode) == 'fused':
+        generated = generate_seo_bundle(prompt_content, company_name,
+                                        context=build_product_context(prompt_content, company_name))
+    else:
+        tasks, fallbacks = _field_tasks(prompt_content, company_name)
+        generated = run_fields(tasks, executor, resolve_parallelism(parallelism), fallbacks)
+
+    duplicates = {}
+    for field in INDEXED_FIELDS:
+        generated[field], matches = review_duplicates(field, generated[field], content, company_name, prompt_content)
+        if matches:
+            duplicates[field] = matches
+    if duplicates:
+        generated['duplicates'] = duplicates
+    return generated
+
+
+async def agenerate_seo_content(content: str, company_name: str = DEFAULT_COMPANY_NAME, mode: Optional[str] = None,
+                                parallelism: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Like ``generate_seo_content`` for the async server: the fields' Gemini calls are awaited concurrently.
+
+    The near-duplicate review may generate a field again with blocking calls,
+    so when it is enabled it runs on a worker thread.
+    """
+    prompt_content = condense_content(content)
+    if resolve_generation_mode(mode) == 'fused':
+        generated = await agenerate_seo_bundle(prompt_content, company_name,
+                                               context=build_product_context(prompt_content, company_name))
+    else:
+        tasks, fallbacks = _async_field_tasks(prompt_content, company_name)
+        generated = await arun_fields(tasks, resolve_parallelism(parallelism), fallbacks)
+
+    duplicates = {}
+    reviewed = INDEXED_FIELDS if _duplicate_check != 'off' else ()
+    for field in reviewed:
+        generated[field], matches = await asyncio.to_thread(
+            review_duplicates, field, generated[field], content, company_name, prompt_content
+        )
+        if matches:
+            duplicates[field] = matches
+    if duplicates:
+        generated['duplicates'] = duplicates
+    return generated
+
+
+def iter_seo_content(content: str, company_name: str = DEFAULT_COMPANY_NAME, mode: Optional[str] = None,
+                     executor: Optional[BoundedExecutor] = None, parallelism: Optional[int] = None
+                     ) -> Iterator[Tuple[str, Any]]:
+    """
+    Like ``generate_seo_content``, but yield ``(field, value)`` pairs as each field is ready.
+
+    Near-duplicates found among the fields are yielded last, as a 'duplicates' pair.
+    """
+    prompt_content = condense_content(content)
+    if resolve_generation_mode(mode) == 'fused':
+        context = build_product_context(prompt_content, company_name)
+        fields = iter(generate_seo_bundle(prompt_content, company_name, context=context).items())
+    else:
+        tasks, fallbacks = _field_tasks(prompt_content, company_name)
+        fields = iter_fields(tasks, executor, resolve_parallelism(parallelism), fallbacks)
+
+    duplicates = {}
+    for field, value in fields:
+        if field in INDEXED_FIELDS:
+            value, matches = review_duplicates(field, value, content, company_name, prompt_content)
+            if matches:
+                duplicates[field] = matches
+        yield field, value
+    if duplicates:
+        yield 'duplicates', duplicates
+
+
+def generate_if_changed(product_id: str, content: str, company_name: str = DEFAULT_COMPANY_NAME,
+                        mode: Optional[str] = None, executor: Optional[BoundedExecutor] = None,
+                        parallelism: Optional[int] = None, dry_run: bool = False) -> Tuple[Optional[Dict[str, Any]], str]:
+    """
+    Generate a product's SEO fields unless its content, settings, prompt templates and model are unchanged.
+
+    Args:
+        product_id (str): The product's URL or SKU
+        content (str): The product content
+        company_name (str): Company name to include in the generated fields
+        mode (str): "separate" or "fused"
+        executor (BoundedExecutor): Shared pool to fan the fields out on
+        parallelism (int): Maximum number of fields generated at once for this request
+        dry_run (bool): Only report whether the product would be regenerated
+
+    Returns:
+        Tuple[Optional[Dict[str, Any]], str]: The fields (as ``generate_seo_content``
+        returns them, or the stored ones when unchanged; None on a dry run) and
+        'unchanged' or why the product was regenerated: 'new', 'content',
+        'settings', 'template' or 'model'
+    """
+    store = get_fingerprint_store()
+    current = fingerprint(content, company_name, mode)
+    stored = store.get(product_id) if store is not None else None
+    change = change_reason(stored['fingerprint'] if stored else None, current)
+    record_event('incremental', change=change, dry_run=dry_run)
+    if change == UNCHANGED:
+        return stored['result'], change
+    if dry_run:
+        return None, change
+
+    with count_events() as events:
+        generated = generate_seo_content(content, company_name, mode, executor=executor, parallelism=parallelism)
+    # Fields that fell back to a placeholder are generated again on the next run; other 'fallback' events
+    # (a bundle field asked for again, a short keyword list topped up) still produce real fields
+    if store is not None and not events.get('placeholder'):
+        store.put(product_id, current, generated)
+    return generated, change
+
+
+def response_fields(generated: Dict[str, Any]) -> Dict[str, Any]:
+    """Name the generated fields as the API returns them."""
+    fields = {
+        'generated_title': generated['title'],
+        'generated_description': generated['description'],
+        'generated_keywords': generated['keywords']
+    }
+    if generated.get('duplicates'):
+        fields['duplicates'] = generated['duplicates']
+    return fields
+
+
+def review_duplicates(field: str, value: str, content: str, company_name: str = DEFAULT_COMPANY_NAME,
+                      prompt_content: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Check a generated title or description against the other products' and index it.
+
+    With DUPLICATE_CHECK "regenerate", a near-duplicate is generated once more,
+    bypassing the cache, and the less similar of the two is kept.
+
+    Args:
+        field (str): "title" or "description"
+        value (str): The generated text
+        content (str): The product content, which identifies the product
+        company_name (str): Company name the text was generated for
+        prompt_content (str): The condensed content the text was generated from, when it differs
+
+    Returns:
+        Tuple[str, List[Dict[str, Any]]]: The text to use, and the texts of other
+        products it is a near-duplicate of, with their similarity
+    """
+    if _duplicate_check == 'off' or not value or not content:
+        return value, []
+    # NumPy is only loaded when the check is enabled
+    from .duplicate_index import get_duplicate_index, product_key
+    index = get_duplicate_index()
+    if index is None:
+        return value, []
+
+    key = product_key(content)
+    try:
+        matches = index.find(field, value, exclude_key=key)
+        if matches and _duplicate_check == 'regenerate':
+            record_event('near_duplicate', field=field, action='regenerated')
+            with bypass_cache():
+                candidate = _field_tasks(prompt_content or content, company_name)[0][field]()
+            retry = index.find(field, candidate, exclude_key=key) if candidate else matches
+            if not retry or retry[0].similarity < matches[0].similarity:
+                value, matches = candidate, retry
+        if matches:
+            record_event('near_duplicate', field=field, action='flagged')
+        index.add(field, key, value)
+    except sqlite3.Error as e:
+        logging.error(f"Duplicate check of the {field} failed: {str(e)}")
+        return value, []
+    return value, [
+        {'text': match.text, 'similarity': round(match.similarity, 3)}
+        for match in matches
+    ]
+
+
+def _field_tasks(content: str, company_name: str) -> Tuple[Dict[str, Callable[[], Any]], Dict[str, Callable[[], Any]]]:
+    # The content is analyzed once, before the fields fan out
+    context = build_product_context(content, company_name)
+    tasks = {
+        'title': lambda: generate_title(content, company_name, context),
+        'description': lambda: generate_meta_description(content, company_name, context),
+        'keywords': lambda: generate_keywords(content, company_name=company_name, context=context)
+    }
+    return tasks, _field_fallbacks(content, company_name, context)
+
+
+def _async_field_tasks(content: str, company_name: str
+                       ) -> Tuple[Dict[str, Callable[[], Awaitable[Any]]], Dict[str, Callable[[], Any]]]:
+    context = build_product_context(content, company_name)
+    tasks = {
+        'title': lambda: agenerate_title(content, company_name, context),
+        'description': lambda: agenerate_meta_description(content, company_name, context),
+        'keywords': lambda: agenerate_keywords(content, company_name=company_name, context=context)
+    }
+    return tasks, _field_fallbacks(content, company_name, context)
+
+
+def _field_fallbacks(content: str, company_name: str, context: ProductContext) -> Dict[str, Callable[[], Any]]:
+    return {
+        'title': lambda: fallback_title(content, company_name),
+        'description': lambda: fallback_meta_description(content) if content else '',
+        'keywords': lambda: fallback_keywords(content, company_name, context) if content else []
+    }
@@ -0,0 +1,315 @@
+"""
+Single-pass, streaming extraction of product data from HTML pages.
+
+Instead of building a full document tree and searching it once per selector,
+the page is fed through an event parser as it downloads. One pass collects the
+title, meta description/og:description, the canonical link, the first JSON-LD
+block and the text of every product selector. Script, style and template bodies
+other than JSON-LD are skipped, as BeautifulSoup's ``get_text`` skips them, and
+parsing stops early once the product sections are closed and only the page
+footer is left.
+
+The standard library's ``html.parser`` drives the handlers by default; lxml's C
+parser is used when it is asked for (or with "auto", when it is installed).
+"""
+import json
+from html.parser import HTMLParser
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from lxml import etree
+except ImportError:  # pragma: no cover - optional faster backend
+    etree = None
+
+# (tag, attribute, value) selectors, in the order their text is combined
+PRODUCT_SELECTORS = [
+    ('h1', None, None),  # Product name
+    ('div', 'class', 'product-details'),
+    ('div', 'class', 'product-description'),
+    ('div', 'class', 'product-info'),
+    ('div', 'id', 'product-info'),
+    ('div', 'class', 'details'),
+    ('div', 'class', 'specifications'),
+]
+
+# Elements whose text never counts as page content; <noscript> text does, as in the tree-based extraction
+SKIPPED_TAGS = {'script', 'style', 'template'}
+
+# Elements without a closing tag
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr'
+}
+
+# Only substantial blocks are kept, as in the tree-based extraction
+MIN_BLOCK_LENGTH = 20
+
+
+def available_backends() -> List[str]:
+    """Return the parser backends usable in this environment, fastest first."""
+    return (['lxml'] if etree is not None else []) + ['html.parser']
+
+
+def _matches(tag: str, attrs: Dict[str, str]) -> List[int]:
+    matched = []
+    for index, (selector_tag, attr, value) in enumerate(PRODUCT_SELECTORS):
+        if tag != selector_tag:
+            continue
+        if attr is None:
+            matched.append(index)
+        elif attr == 'class':
+            if value in (attrs.get('class') or '').split():
+                matched.append(index)
+        elif attrs.get(attr) == value:
+            matched.append(index)
+    return matched
+
+
+class ProductPageHandler:
+    """Parser target that collects everything the product extraction needs in one pass."""
+
+    def __init__(self):
+        self.title: Optional[str] = None
+        self.meta_description: Optional[str] = None
+        self.og_description: Optional[str] = None
+        self.canonical_url: str = ''
+        self.json_ld: Optional[str] = None
+        self.done = False
+
+        self._stack: List[str] = []
+        # Open matched elements: (depth, sequence, selector indexes, collected strings)
+        self._collectors: List[Tuple[int, int, List[int], List[str]]] = []
+        self._blocks: List[List[Tuple[int, str]]] = [[] for _ in PRODUCT_SELECTORS]
+        self._sequence = 0
+        self._text: List[str] = []
+        self._skip_depth: Optional[int] = None
+        self._in_title = False
+        self._title_parts: List[str] = []
+        self._in_json_ld = False
+        self._json_ld_parts: List[str] = []
+        self._sections_found = False
+
+    # Parser target interface
+
+    def start(self, tag: str, attrs: Dict[str, str]) -> None:
+        self._flush_text()
+        tag = tag.lower()
+
+        if tag == 'meta':
+            if attrs.get('name') == 'description' and self.meta_description is None:
+                self.meta_description = attrs.get('content', '')
+            elif attrs.get('property') == 'og:description' and self.og_description is None:
+                self.og_description = attrs.get('content', '')
+        elif tag == 'link' and not self.canonical_url:
+            if 'canonical' in (attrs.get('rel') or '').lower().split():
+                self.canonical_url = attrs.get('href', '') or ''
+
+        if tag in VOID_TAGS:
+            return
+
+        self._stack.append(tag)
+        depth = len(self._stack)
+
+        if self._skip_depth is not None:
+            return
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = depth
+            if tag == 'script' and attrs.get('type') == 'application/ld+json' and self.json_ld is None:
+                self._in_json_ld = True
+            return
+        if tag == 'title' and self.title is None:
+            self._in_title = True
+        elif tag == 'footer' and self._sections_found and self.json_ld is not None and not self._collectors:
+            # Only the footer is left once the product sections and JSON-LD are in
+            self.done = True
+            return
+
+        matched = _matches(tag, attrs)
+        if matched:
+            self._collectors.append((depth, self._sequence, matched, []))
+            self._sequence += 1
+
+    def end(self, tag: str) -> None:
+        self._flush_text()
+        tag = tag.lower()
+        if tag not in self._stack:
+            return
+        # Close the element and anything left open inside it
+        depth = len(self._stack) - self._stack[::-1].index(tag)
+        del self._stack[depth - 1:]
+
+        if self._skip_depth is not None and depth <= self._skip_depth:
+            self._skip_depth = None
+            if self._in_json_ld:
+                self._in_json_ld = False
+                self.json_ld = ''.join(self._json_ld_parts)
+        if self._in_title and tag == 'title':
+            self._in_title = False
+            self.title = ''.join(self._title_parts)
+
+        while self._collectors and self._collectors[-1][0] >= depth:
+            _, sequence, matched, parts = self._collectors.pop()
+            text = ' '.join(parts)
+            if text and len(text) > MIN_BLOCK_LENGTH:
+                for index in matched:
+                    self._blocks[index].append((sequence, text))
+                self._sections_found = True
+
+        if tag in ('body', 'html'):
+            self.done = True
+
+    def data(self, data: str) -> None:
+        if self._in_json_ld:
+            self._json_ld_parts.append(data)
+        elif self._skip_depth is None:
+            self._text.append(data)
+
+    def comment(self, text: str) -> None:
+        pass
+
+    def close(self) -> 'ProductPageHandler':
+        self._flush_text()
+        # Finish elements that were still open when the stream ended
+        if self._stack:
+            self.end(self._stack[0])
+        if self._in_title:
+            self.title = ''.join(self._title_parts)
+        return self
+
+    def _flush_text(self) -> None:
+        # A text node may arrive in several chunks; strip it as a whole like get_text(strip=True)
+        if not self._text:
+            return
+        text = ''.join(self._text)
+        self._text = []
+        if self._in_title:
+            self._title_parts.append(text)
+        stripped = text.strip()
+        if stripped:
+            for collector in self._collectors:
+                collector[3].append(stripped)
+
+    # Results
+
+    def content_blocks(self) -> List[str]:
+        """Return the collected blocks grouped by selector, each group in document order."""
+        blocks = []
+        for selector_blocks in self._blocks:
+            blocks.extend(text for _, text in sorted(selector_blocks))
+        return blocks
+
+    def schema_data(self) -> Optional[dict]:
+        """Return the parsed JSON-LD object, if any."""
+        if not self.json_ld:
+            return None
+        try:
+            data = json.loads(self.json_ld)
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+
+class _StdlibParser(HTMLParser):
+    """Adapter that drives a ProductPageHandler from ``html.parser`` events."""
+
+    def __init__(self, handler: ProductPageHandler):
+        super().__init__(convert_charrefs=True)
+        self.handler = handler
+
+    def handle_starttag(self, tag, attrs):
+        self.handler.start(tag, {name: value or '' for name, value in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag.lower() not in VOID_TAGS:
+            self.handler.end(tag)
+
+    def handle_endtag(self, tag):
+        self.handler.end(tag)
+
+    def handle_data(self, data):
+        self.handler.data(data)
+
+
+class StreamingExtractor:
+    """
+    Incremental product page extractor.
+
+    Feed decoded chunks with ``feed`` until it returns False (the rest of the
+    page is not needed) or the stream ends, then call ``result``.
+    """
+
+    def __init__(self, backend: str = 'html.parser'):
+        if backend == 'auto':
+            backend = available_backends()[0]
+        self.backend = backend
+        self.handler = ProductPageHandler()
+        if backend == 'lxml':
+            if etree is None:
+                raise ValueError('The lxml backend is not installed')
+            self._parser = etree.HTMLParser(target=self.handler, recover=True, remove_comments=True)
+        elif backend == 'html.parser':
+            self._parser = _StdlibParser(self.handler)
+        else:
+            raise ValueError(f"Unknown HTML parser backend '{backend}'")
+        self._closed = False
+
+    def feed(self, chunk: str) -> bool:
+        """Parse the next chunk; return False once no more input is needed."""
+        if self.handler.done:
+            return False
+        self._parser.feed(chunk)
+        return not self.handler.done
+
+    def result(self) -> Dict[str, str]:
+        """Finish parsing and return the extracted page record."""
+        if not self._closed:
+            self._closed = True
+            try:
+                self._parser.close()
+            except Exception:
+                # lxml raises on documents it could not parse at all
+                pass
+            self.handler.close()
+        return build_record(self.handler)
+
+
+def build_record(handler: ProductPageHandler) -> Dict[str, str]:
+    """Combine the collected parts into the ``{title, description, content}`` record."""
+    description = handler.meta_description
+    if description is None:
+        description = handler.og_description or ''
+
+    content_parts = handler.content_blocks()
+
+    # Extract structured data if available
+    schema_data = handler.schema_data()
+    if schema_data:
+        if 'description' in schema_data:
+            content_parts.append(schema_data['description'])
+        if 'name' in schema_data:
+            content_parts.insert(0, schema_data['name'])
+
+    # Combine all content and clean it up
+    main_content = ' '.join(str(part) for part in content_parts)
+    main_content = ' '.join(main_content.split())
+
+    # If no content was found, use the meta description
+    if not main_content and description:
+        main_content = description
+
+    return {
+        'title': ' '.join((handler.title or '').split()),
+        'description': ' '.join(description.split()),
+        'content': main_content,
+        'canonical_url': handler.canonical_url.strip()
+    }
+
+
+def extract_page(chunks: Iterable[str], backend: str = 'html.parser') -> Dict[str, str]:
+    """Extract a page record from an iterable of decoded HTML chunks, stopping as early as possible."""
+    extractor = StreamingExtractor(backend)
+    for chunk in chunks:
+        if not extractor.feed(chunk):
+            break
+    return extractor.result()
@@ -0,0 +1,142 @@
+"""
+Persistent store of responses to requests sent with an ``Idempotency-Key`` header.
+
+The first request with a key claims it and runs; its response is stored and
+replayed to every later request with the same key until the key expires. A
+retry that arrives while the original is still running (in any worker process)
+waits for its response instead of running it again. Reusing a key for a
+different request is an error.
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .constants import IDEMPOTENCY_ENABLED, IDEMPOTENCY_DB_FILE, IDEMPOTENCY_TTL, IDEMPOTENCY_WAIT
+from .sqlite_store import connect, get_db_path, transaction
+
+# Seconds between checks on a key whose original request is still running
+POLL_INTERVAL = 0.25
+
+
+class IdempotencyError(Exception):
+    """Raised when a request cannot be run or replayed under its idempotency key."""
+
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+def request_fingerprint(method: str, path: str, query: str, body: bytes) -> str:
+    """Hash what identifies a request, to detect a key reused for a different one."""
+    digest = hashlib.sha256()
+    for part in (method.encode('utf-8'), path.encode('utf-8'), query.encode('utf-8'), body):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """SQLite-backed idempotency keys shared by every worker process."""
+
+    def __init__(self, path: str, ttl: int = IDEMPOTENCY_TTL, wait: int = IDEMPOTENCY_WAIT):
+        self.path = path
+        self.ttl = ttl
+        self.wait = wait
+        conn = connect(self.path)
+        # Pending keys expire after ``wait`` seconds so a crashed worker never holds one forever
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                state TEXT NOT NULL,
+                status INTEGER,
+                content_type TEXT,
+                body BLOB,
+                llm_calls INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at)')
+
+    def _claim(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        # Returns None when the key was free and is now ours, else its current row
+        now = time.time()
+        conn = connect(self.path)
+        with transaction(conn):
+            conn.execute('DELETE FROM idempotency_keys WHERE expires_at < ?', (now,))
+            row = conn.execute('SELECT * FROM idempotency_keys WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                return dict(row)
+            conn.execute(
+                "INSERT INTO idempotency_keys (key, fingerprint, state, created_at, expires_at) "
+                "VALUES (?, ?, 'pending', ?, ?)",
+                (key, fingerprint, now, now + self.wait)
+            )
+        return None
+
+    def acquire(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim a key for a request, or return the stored response to replay.
+
+        Args:
+            key (str): The client's idempotency key
+            fingerprint (str): Fingerprint of the request (see ``request_fingerprint``)
+
+        Returns:
+            None when the caller now owns the key and must run the request, otherwise
+            the completed entry with its status, content_type, body and llm_calls
+
+        Raises:
+            IdempotencyError: If the key belongs to a different request (422) or the
+                original request is still running after the wait (409)
+        """
+        deadline = time.monotonic() + self.wait
+        while True:
+            entry = self._claim(key, fingerprint)
+            if entry is None:
+                return None
+            if entry['fingerprint'] != fingerprint:
+                raise IdempotencyError('Idempotency-Key was already used for a different request', 422)
+            if entry['state'] == 'done':
+                return entry
+            if time.monotonic() >= deadline:
+                raise IdempotencyError('A request with this Idempotency-Key is still in progress', 409)
+            time.sleep(POLL_INTERVAL)
+
+    def complete(self, key: str, status: int, content_type: str, body: bytes, llm_calls: int = 0) -> None:
+        """Store the response of the request that owns a key."""
+        now = time.time()
+        connect(self.path).execute(
+            "UPDATE idempotency_keys SET state = 'done', status = ?, content_type = ?, body = ?, llm_calls = ?, "
+            "expires_at = ? WHERE key = ?",
+            (status, content_type, body, llm_calls, now + self.ttl, key)
+        )
+
+    def release(self, key: str) -> None:
+        """Give up a claimed key without a response, so the next request with it runs again."""
+        connect(self.path).execute("DELETE FROM idempotency_keys WHERE key = ? AND state = 'pending'", (key,))
+
+
+_store: Optional[IdempotencyStore] = None
+_store_lock = threading.Lock()
+_store_failed = False
+
+
+def get_idempotency_store() -> Optional[IdempotencyStore]:
+    """Return the process-wide idempotency store, or None when it is disabled or unavailable."""
+    global _store, _store_failed
+    if not IDEMPOTENCY_ENABLED or _store_failed:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None and not _store_failed:
+                try:
+                    _store = IdempotencyStore(get_db_path(IDEMPOTENCY_DB_FILE))
+                except (sqlite3.Error, OSError) as e:
+                    logging.error(f"Disabling idempotency keys: {str(e)}")
+                    _store_failed = True
+    return _store
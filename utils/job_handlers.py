@@ -0,0 +1,184 @@
+"""
+Handlers that run background jobs inside the job worker processes.
+
+Each handler takes the job's JSON payload and its JobContext and returns a
+JSON-serializable result. Payloads are validated by the API before they are
+queued, so handlers only guard against what can still go wrong while running.
+"""
+import functools
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .batch_service import iter_results, process_batch_item, process_url_item, resolve_batch_concurrency
+from .cache_service import bypass_cache
+from .concurrency import BoundedExecutor
+from .constants import DEFAULT_COMPANY_NAME, GENERATION_WORKERS, BATCH_WORKERS
+from .generation_service import generate_seo_content, resolve_generation_mode, resolve_parallelism, response_fields
+from .job_queue import JobContext
+from .llm_dispatcher import llm_priority
+from .product_description_service import generate_product_description
+from .results_store import record_result
+
+# Worker-process pools, mirroring the ones the web app uses for synchronous requests; the API process that
+# only validates payloads never creates them
+_executors: Optional[Tuple[BoundedExecutor, BoundedExecutor]] = None
+_executors_lock = threading.Lock()
+
+
+def get_executors() -> Tuple[BoundedExecutor, BoundedExecutor]:
+    """Return the worker process's generation and batch pools, creating them with the first job."""
+    global _executors
+    if _executors is None:
+        with _executors_lock:
+            if _executors is None:
+                _executors = (
+                    BoundedExecutor(GENERATION_WORKERS, thread_name_prefix='seo-job-generate'),
+                    BoundedExecutor(BATCH_WORKERS, thread_name_prefix='seo-job-batch'),
+                )
+    return _executors
+
+
+def job_handler(fn: Callable[[Dict[str, Any], JobContext], Any]) -> Callable[[Dict[str, Any], JobContext], Any]:
+    """Run a handler in the batch LLM lane with the cache bypass the job was submitted with."""
+    @functools.wraps(fn)
+    def wrapper(payload: Dict[str, Any], context: JobContext) -> Any:
+        with bypass_cache(bool(payload.get('no_cache'))), llm_priority('batch'):
+            return fn(payload, context)
+    return wrapper
+
+
+def _collect(items, process, concurrency: int, context: JobContext) -> Dict[str, Any]:
+    # Stop feeding new items once the job is cancelled; items already running finish
+    def pending():
+        for item in items:
+            if context.cancelled():
+                return
+            yield item
+
+    results = []
+    failed = 0
+    total = len(items)
+    for line in iter_results(pending(), process, get_executors()[1], concurrency):
+        results.append(line)
+        failed += line['status'] == 'error'
+        context.set_progress({'done': len(results), 'error': failed, 'total': total})
+    context.check_cancelled()
+
+    results.sort(key=lambda line: line['index'])
+    return {'results': results, 'total': total, 'error': failed}
+
+
+@job_handler
+def run_generate_content(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Generate the title, description and keywords for one piece of content."""
+    company_name = payload.get('company_name') or DEFAULT_COMPANY_NAME
+    generated = generate_seo_content(
+        payload['content'], company_name, payload.get('mode'),
+        executor=get_executors()[0], parallelism=payload.get('parallelism')
+    )
+    record_result('seo', generated, company_name, sku=payload.get('sku') or payload.get('id'), source='job')
+    return response_fields(generated)
+
+
+@job_handler
+def run_product_description(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Generate a product description."""
+    company_name = payload.get('company_name') or DEFAULT_COMPANY_NAME
+    product_description = generate_product_description(payload['product_info'], company_name)
+    record_result('product_description', {'product_description': product_description}, company_name,
+                  sku=payload.get('sku') or payload.get('id'), source='job')
+    return {'product_description': product_description}
+
+
+@job_handler
+def run_batch(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Generate SEO content for a list of products."""
+    mode = payload.get('mode')
+    parallelism = payload.get('parallelism')
+
+    def process(item):
+        return process_batch_item(item, mode, get_executors()[0], parallelism, bool(payload.get('incremental')))
+
+    items = list(enumerate(payload['products']))
+    return _collect(items, process, resolve_batch_concurrency(payload.get('concurrency')), context)
+
+
+@job_handler
+def run_analyze_urls(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Fetch a list of URLs and generate SEO content for each."""
+    company_name = payload.get('company_name') or DEFAULT_COMPANY_NAME
+    mode = payload.get('mode')
+    parallelism = payload.get('parallelism')
+
+    def process(item):
+        return process_url_item(item, company_name, mode, get_executors()[0], parallelism,
+                                bool(payload.get('incremental')))
+
+    items = list(enumerate(payload['urls']))
+    return _collect(items, process, resolve_batch_concurrency(payload.get('concurrency')), context)
+
+
+@job_handler
+def run_crawl(payload: Dict[str, Any], context: JobContext) -> Dict[str, Any]:
+    """Crawl a sitemap; a retried job resumes the crawl checkpoint it left behind."""
+    from .crawl_service import CrawlJob, CrawlStore
+    store = CrawlStore()
+    crawl_job_id = payload.get('crawl_job_id') or context.job_id
+    if store.get_job(crawl_job_id):
+        job = CrawlJob.resume(crawl_job_id, store)
+    else:
+        job = CrawlJob(
+            payload['sitemap_url'], job_id=crawl_job_id, store=store,
+            **{key: payload[key] for key in (
+                'include', 'exclude', 'rate', 'concurrency', 'company_name', 'mode', 'generate',
+                'respect_robots', 'max_urls', 'incremental', 'dry_run'
+            ) if payload.get(key) is not None}
+        )
+    progress = job.run(on_progress=context.set_progress, should_stop=context.cancelled)
+    context.check_cancelled()
+    return {'crawl_job_id': crawl_job_id, **progress}
+
+
+def validate_payload(job_type: str, payload: Any) -> Dict[str, Any]:
+    """
+    Check a job payload before it is queued and return it with its options resolved.
+
+    Raises:
+        ValueError: If the job type is unknown or the payload is invalid
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type '{job_type}'. Use one of: {', '.join(JOB_HANDLERS)}")
+    if not isinstance(payload, dict):
+        raise ValueError('Job payload must be a JSON object')
+
+    required = {
+        'generate_content': ('content', 'Content is required'),
+        'product_description': ('product_info', 'Product information is required'),
+        'batch': ('products', 'A list of products is required'),
+        'analyze_urls': ('urls', 'A list of URLs is required'),
+        'crawl': ('sitemap_url', 'A sitemap URL is required'),
+    }
+    field, message = required[job_type]
+    value = payload.get(field)
+    if job_type == 'crawl' and payload.get('crawl_job_id'):
+        value = value or payload['crawl_job_id']
+    if not value or (field in ('products', 'urls') and not isinstance(value, list)):
+        raise ValueError(message)
+
+    payload = dict(payload)
+    if 'mode' in payload:
+        payload['mode'] = resolve_generation_mode(payload['mode'])
+    if 'parallelism' in payload:
+        payload['parallelism'] = resolve_parallelism(payload['parallelism'])
+    if 'concurrency' in payload and job_type != 'crawl':
+        payload['concurrency'] = resolve_batch_concurrency(payload['concurrency'])
+    return payload
+
+
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any], JobContext], Any]] = {
+    'generate_content': run_generate_content,
+    'product_description': run_product_description,
+    'batch': run_batch,
+    'analyze_urls': run_analyze_urls,
+    'crawl': run_crawl,
+}
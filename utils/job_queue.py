@@ -0,0 +1,381 @@
+"""
+Durable background job queue backed by SQLite.
+
+Requests submit work with ``JobQueue.submit`` and return the job id at once.
+Worker processes claim jobs with a lease (visibility timeout) that they keep
+extending while the job runs; if a worker crashes, its lease runs out and
+another worker picks the job up. Failed jobs are retried with exponential
+backoff, and running jobs can be cancelled cooperatively.
+
+Start a worker pool with:
+    python -m utils.job_queue --workers 4
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from .constants import (
+    JOB_DB_FILE, JOB_WORKERS, JOB_VISIBILITY_TIMEOUT, JOB_MAX_ATTEMPTS, JOB_RETRY_BACKOFF, JOB_POLL_INTERVAL
+)
+from .sqlite_store import connect, get_db_path, transaction
+
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled."""
+    pass
+
+
+class JobQueue:
+    """Persistent queue of jobs shared by the web workers and the job workers."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_db_path(JOB_DB_FILE)
+        conn = connect(self.path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                priority INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                run_after REAL NOT NULL,
+                locked_until REAL,
+                worker_id TEXT,
+                cancel_requested INTEGER NOT NULL DEFAULT 0,
+                progress TEXT,
+                result TEXT,
+                error TEXT,
+                callback_url TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, priority, run_after)')
+
+    def submit(self, job_type: str, payload: Dict[str, Any], callback_url: Optional[str] = None,
+               max_attempts: int = JOB_MAX_ATTEMPTS, priority: int = 0) -> str:
+        """Queue a job and return its id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        connect(self.path).execute(
+            'INSERT INTO jobs (id, type, payload, status, priority, max_attempts, run_after, callback_url, '
+            'created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job_id, job_type, json.dumps(payload, ensure_ascii=False), 'queued', priority,
+             max(1, max_attempts), now, callback_url, now, now)
+        )
+        return job_id
+
+    def get(self, job_id: str, include_payload: bool = False) -> Optional[Dict[str, Any]]:
+        """Return the public view of a job, or None if it does not exist."""
+        row = connect(self.path).execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            'id': row['id'],
+            'type': row['type'],
+            'status': row['status'],
+            'attempts': row['attempts'],
+            'max_attempts': row['max_attempts'],
+            'cancel_requested': bool(row['cancel_requested']),
+            'progress': json.loads(row['progress']) if row['progress'] else None,
+            'result': json.loads(row['result']) if row['result'] else None,
+            'error': row['error'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+        if include_payload:
+            job['payload'] = json.loads(row['payload'])
+            job['callback_url'] = row['callback_url']
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job at once, or ask the worker running it to stop."""
+        conn = connect(self.path)
+        now = time.time()
+        with transaction(conn):
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', cancel_requested = 1, updated_at = ? "
+                "WHERE id = ? AND status = 'queued'", (now, job_id)
+            )
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = 'running'",
+                (now, job_id)
+            )
+        return self.get(job_id)
+
+    def claim(self, worker_id: str, visibility_timeout: int = JOB_VISIBILITY_TIMEOUT) -> Optional[Dict[str, Any]]:
+        """
+        Lease the next ready job to ``worker_id``.
+
+        Ready jobs are queued ones whose backoff has passed and running ones whose
+        lease expired because their worker died.
+        """
+        conn = connect(self.path)
+        now = time.time()
+        with transaction(conn):
+            # Jobs abandoned by a crashed worker with no attempts left are failed, not retried
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = COALESCE(error, 'Worker lost'), updated_at = ? "
+                "WHERE status = 'running' AND locked_until < ? AND attempts >= max_attempts", (now, now)
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE (status = 'queued' AND run_after <= ?) "
+                "OR (status = 'running' AND locked_until < ?) ORDER BY priority, run_after LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', worker_id = ?, locked_until = ?, attempts = attempts + 1, "
+                'updated_at = ? WHERE id = ?',
+                (worker_id, now + visibility_timeout, now, row['id'])
+            )
+        return self.get(row['id'], include_payload=True)
+
+    def heartbeat(self, job_id: str, worker_id: str, visibility_timeout: int = JOB_VISIBILITY_TIMEOUT,
+                  progress: Optional[Dict[str, Any]] = None) -> bool:
+        """Extend a job's lease; return True if the job has been cancelled."""
+        conn = connect(self.path)
+        now = time.time()
+        if progress is not None:
+            conn.execute(
+                'UPDATE jobs SET locked_until = ?, progress = ?, updated_at = ? WHERE id = ? AND worker_id = ?',
+                (now + visibility_timeout, json.dumps(progress, ensure_ascii=False), now, job_id, worker_id)
+            )
+        else:
+            conn.execute('UPDATE jobs SET locked_until = ? WHERE id = ? AND worker_id = ?',
+                         (now + visibility_timeout, job_id, worker_id))
+        row = conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def complete(self, job_id: str, worker_id: str, result: Any) -> None:
+        """Mark a job as succeeded with its result."""
+        connect(self.path).execute(
+            "UPDATE jobs SET status = 'succeeded', result = ?, error = NULL, locked_until = NULL, updated_at = ? "
+            "WHERE id = ? AND worker_id = ? AND status = 'running'",
+            (json.dumps(result, ensure_ascii=False), time.time(), job_id, worker_id)
+        )
+
+    def mark_cancelled(self, job_id: str, worker_id: str) -> None:
+        """Record that a running job stopped after a cancellation request."""
+        connect(self.path).execute(
+            "UPDATE jobs SET status = 'cancelled', locked_until = NULL, updated_at = ? "
+            "WHERE id = ? AND worker_id = ? AND status = 'running'",
+            (time.time(), job_id, worker_id)
+        )
+
+    def fail(self, job_id: str, worker_id: str, error: str, backoff: float = JOB_RETRY_BACKOFF,
+             retry: bool = True) -> str:
+        """Requeue a failed job with exponential backoff, or fail it for good; return the new status."""
+        conn = connect(self.path)
+        now = time.time()
+        with transaction(conn):
+            row = conn.execute('SELECT attempts, max_attempts FROM jobs WHERE id = ? AND worker_id = ?',
+                               (job_id, worker_id)).fetchone()
+            if row is None:
+                return 'unknown'
+            if retry and row['attempts'] < row['max_attempts']:
+                delay = backoff * (2 ** (row['attempts'] - 1))
+                delay += random.uniform(0, delay / 2)
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', error = ?, run_after = ?, locked_until = NULL, "
+                    'worker_id = NULL, updated_at = ? WHERE id = ?',
+                    (error, now + delay, now, job_id)
+                )
+                return 'queued'
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, locked_until = NULL, updated_at = ? WHERE id = ?",
+                (error, now, job_id)
+            )
+            return 'failed'
+
+
+class JobContext:
+    """Handed to job handlers to report progress and check for cancellation."""
+
+    def __init__(self, queue: JobQueue, job: Dict[str, Any], worker_id: str,
+                 visibility_timeout: int = JOB_VISIBILITY_TIMEOUT):
+        self.queue = queue
+        self.job = job
+        self.job_id = job['id']
+        self.worker_id = worker_id
+        self.visibility_timeout = visibility_timeout
+        self._cancelled = threading.Event()
+        self._progress: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def cancelled(self) -> bool:
+        """Check whether the job has been cancelled."""
+        return self._cancelled.is_set()
+
+    def check_cancelled(self) -> None:
+        """Raise JobCancelled if the job has been cancelled."""
+        if self._cancelled.is_set():
+            raise JobCancelled(self.job_id)
+
+    def set_progress(self, progress: Dict[str, Any]) -> None:
+        """Record progress; it is saved with the next heartbeat."""
+        with self._lock:
+            self._progress = progress
+
+    def heartbeat(self) -> None:
+        """Extend the lease and pick up cancellation requests."""
+        with self._lock:
+            progress, self._progress = self._progress, None
+        if self.queue.heartbeat(self.job_id, self.worker_id, self.visibility_timeout, progress):
+            self._cancelled.set()
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue()
+    return _queue
+
+
+def send_callback(job: Dict[str, Any], callback_url: str) -> None:
+    """POST the finished job to its callback URL; failures are only logged."""
+    import requests
+    try:
+        requests.post(callback_url, json=job, timeout=10)
+    except Exception as e:
+        logging.error(f"Callback for job {job['id']} to {callback_url} failed: {str(e)}")
+
+
+def _execute(queue: JobQueue, job: Dict[str, Any], worker_id: str, handlers: Dict[str, Callable],
+             visibility_timeout: int) -> str:
+    handler = handlers.get(job['type'])
+    if handler is None:
+        return queue.fail(job['id'], worker_id, f"Unknown job type '{job['type']}'", retry=False)
+
+    context = JobContext(queue, job, worker_id, visibility_timeout)
+    stop_heartbeat = threading.Event()
+
+    def keep_alive():
+        while not stop_heartbeat.wait(max(1.0, visibility_timeout / 3)):
+            try:
+                context.heartbeat()
+            except Exception as e:
+                logging.error(f"Heartbeat for job {job['id']} failed: {str(e)}")
+
+    heartbeat_thread = threading.Thread(target=keep_alive, daemon=True)
+    heartbeat_thread.start()
+    try:
+        # Pick up a cancellation that arrived while the job was queued for a retry
+        context.heartbeat()
+        context.check_cancelled()
+        result = handler(job['payload'], context)
+        context.heartbeat()
+        if context.cancelled():
+            queue.mark_cancelled(job['id'], worker_id)
+            status = 'cancelled'
+        else:
+            queue.complete(job['id'], worker_id, result)
+            status = 'succeeded'
+    except JobCancelled:
+        queue.mark_cancelled(job['id'], worker_id)
+        status = 'cancelled'
+    except Exception as e:
+        logging.error(f"Job {job['id']} failed: {str(e)}")
+        logging.error(traceback.format_exc())
+        status = queue.fail(job['id'], worker_id, str(e))
+    finally:
+        stop_heartbeat.set()
+        heartbeat_thread.join()
+    return status
+
+
+def run_job(queue: JobQueue, job: Dict[str, Any], worker_id: str, handlers: Dict[str, Callable],
+            visibility_timeout: int = JOB_VISIBILITY_TIMEOUT) -> str:
+    """Run one claimed job to completion and return its final status."""
+    status = _execute(queue, job, worker_id, handlers, visibility_timeout)
+    if status in FINISHED_STATUSES and job.get('callback_url'):
+        send_callback(queue.get(job['id']), job['callback_url'])
+    return status
+
+
+def run_worker(worker_id: Optional[str] = None, stop: Optional[threading.Event] = None,
+               path: Optional[str] = None, handlers: Optional[Dict[str, Callable]] = None,
+               visibility_timeout: int = JOB_VISIBILITY_TIMEOUT) -> None:
+    """Claim and run jobs until ``stop`` is set."""
+    if handlers is None:
+        from .job_handlers import JOB_HANDLERS
+        handlers = JOB_HANDLERS
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    stop = stop or threading.Event()
+    queue = JobQueue(path)
+    while not stop.is_set():
+        try:
+            job = queue.claim(worker_id, visibility_timeout)
+        except Exception as e:
+            logging.error(f"Worker {worker_id} could not claim a job: {str(e)}")
+            job = None
+        if job is None:
+            stop.wait(JOB_POLL_INTERVAL)
+            continue
+        run_job(queue, job, worker_id, handlers, visibility_timeout)
+
+
+def _worker_process(path: Optional[str]) -> None:
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    signal.signal(signal.SIGINT, lambda *args: stop.set())
+    run_worker(stop=stop, path=path)
+
+
+def start_workers(count: int = JOB_WORKERS, path: Optional[str] = None) -> list:
+    """Start ``count`` worker processes and return them."""
+    context = multiprocessing.get_context('spawn')
+    processes = []
+    for index in range(count):
+        process = context.Process(target=_worker_process, args=(path,), name=f"seo-job-worker-{index}", daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run background job workers.')
+    parser.add_argument('--workers', type=int, default=JOB_WORKERS)
+    args = parser.parse_args()
+
+    processes = start_workers(args.workers)
+    print(f"Started {len(processes)} job workers")
+
+    def shutdown(*_):
+        for process in processes:
+            process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        shutdown()
+        for process in processes:
+            process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+"""
+Tolerant, incremental parsing of the JSON that models write.
+
+Model output wraps JSON in prose or Markdown fences, breaks strings across
+lines, leaves quotes inside strings unescaped, adds trailing commas, drops
+commas between items and gets cut off at the token limit. JSONStreamParser
+reads such output in a single pass, one chunk at a time as it streams in, and
+returns the value read so far at any point: open objects and lists hold what
+they contain so far and an unterminated string holds the text written so far.
+"""
+import json
+import re
+from typing import Any, List, Optional, Tuple
+
+_STRING_RUNS = {'"': re.compile(r'[^"\\]+'), "'": re.compile(r"[^'\\]+")}
+_WHITESPACE = re.compile(r'[ \t\r\n]+')
+_BAREWORD = re.compile(r'[^\s,:\[\]{}"]+')
+_KEY = re.compile(r'[\w$-]+')
+_ROOT_START = re.compile(r'[{\[]')
+# How far past a quote inside a string is looked at to tell whether it closes the string
+_LOOKAHEAD = 64
+_HEX = re.compile(r'[0-9a-fA-F]{4}')
+_NEXT_KEY = re.compile(r'(["\']?)[\w ]{1,40}\1\s*:')
+_PARTIAL_KEY = re.compile(r'["\']?[\w ]{0,40}(["\']?\s*)?')
+_SURROGATE = re.compile('[\ud800-\udfff]')
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_LITERALS = {'true': True, 'false': False, 'null': None, 'True': True, 'False': False, 'None': None}
+_VALUE_START = set('{["\'-0123456789tfnTFN')
+
+
+class JSONStreamParser:
+    """
+    Parse one JSON object or array from model output fed in chunks.
+
+    Text before the first ``{`` or ``[`` and after the value closes is ignored.
+    ``repaired`` is set when the output was not valid JSON and had to be read
+    tolerantly.
+    """
+
+    def __init__(self):
+        self.root: Any = None
+        self.repaired = False
+        # Open containers, each with the key its next value goes under
+        self._stack: List[List[Any]] = []
+        self._state = 'start'
+        self._chars: List[str] = []
+        self._is_key = False
+        self._quote = '"'
+        self._escape: Optional[str] = None
+        self._pending = ''
+        self._comma = False
+
+    @property
+    def complete(self) -> bool:
+        """Whether the outermost value has been closed."""
+        return self._state == 'done'
+
+    def feed(self, chunk: str) -> None:
+        """Parse the next piece of output."""
+        text, index = chunk, 0
+        while index < len(text) and self._state != 'done':
+            state = self._state
+            if state == 'string':
+                index = self._read_string(text, index)
+            elif state == 'quote':
+                # A quote inside a string only closes it when the following text continues the JSON
+                if self._pending:
+                    text, index, self._pending = self._pending + text[index:], 0, ''
+                closes = self._quote_closes(text[index:index + _LOOKAHEAD])
+                if closes is None:
+                    if len(text) - index < _LOOKAHEAD:
+                        self._pending = text[index:]
+                        break
+                    closes = False
+                if closes:
+                    self._end_string()
+                else:
+                    self.repaired = True
+                    self._chars.append(self._quote)
+                    self._state = 'string'
+            elif state == 'bareword' or state == 'barekey':
+                match = (_BAREWORD if state == 'bareword' else _KEY).match(text, index)
+                if match:
+                    self._chars.append(match.group())
+                    index = match.end()
+                if index < len(text):
+                    index = self._end_bareword(index)
+            elif state == 'start':
+                match = _ROOT_START.search(text, index)
+                if not match:
+                    break
+                self._open(dict if match.group() == '{' else list)
+                index = match.end()
+            else:
+                match = _WHITESPACE.match(text, index)
+                if match:
+                    index = match.end()
+                    continue
+                index = self._read_structure(text, index)
+        self._sync()
+
+    def finish(self) -> Any:
+        """Mark the end of the output and return the value read."""
+        if self._state == 'quote':
+            self._pending = ''
+            self._end_string()
+        elif self._state == 'string' and not self._is_key and isinstance(self._stack[-1][0], list):
+            # A list item cut off midway is dropped; a cut-off text value keeps what was written
+            self._stack[-1][0].pop()
+            self._state = 'after'
+        elif self._state == 'bareword':
+            self._end_bareword(0)
+        if self._state != 'done' and self.root is not None:
+            # Cut off before the outermost value closed
+            self.repaired = True
+        self._sync()
+        return self.value()
+
+    def value(self) -> Any:
+        """Return a copy of the value read so far (None before an object or array starts)."""
+        return _copy(self.root)
+
+    def is_complete(self, key: str) -> bool:
+        """Whether the value of a key of the outermost object has been read to its end."""
+        if self._state == 'done':
+            return True
+        if not isinstance(self.root, dict) or key not in self.root:
+            return False
+        writing = (len(self._stack) > 1 or self._state == 'bareword'
+                   or (self._state in ('string', 'quote') and not self._is_key))
+        return not (writing and self._stack and self._stack[0][1] == key)
+
+    def _read_structure(self, text: str, index: int) -> int:
+        char = text[index]
+        state = self._state
+        container = self._stack[-1][0]
+        if char in '}]':
+            if self._comma or (state == 'value' and isinstance(container, dict)):
+                self.repaired = True
+            self._close(char)
+        elif state == 'key':
+            if char == '"' or char == "'":
+                self._start_string(char, is_key=True)
+            elif char == ',':
+                self.repaired = True
+            else:
+                # An unquoted key
+                self.repaired = True
+                self._chars = []
+                self._state = 'barekey'
+                return index
+        elif state == 'colon':
+            self._state = 'value'
+            if char == ':':
+                return index + 1
+            self.repaired = True
+            return index
+        elif state == 'value':
+            self._comma = False
+            if char == '{' or char == '[':
+                self._open(dict if char == '{' else list)
+            elif char == '"' or char == "'":
+                self._start_string(char, is_key=False)
+            elif char == ',':
+                self.repaired = True
+            else:
+                self._chars = []
+                self._state = 'bareword'
+                return index
+        elif char == ',':
+            self._comma = True
+            self._state = 'key' if isinstance(container, dict) else 'value'
+        elif char in _VALUE_START:
+            # A missing comma between two items
+            self.repaired = True
+            self._state = 'key' if isinstance(container, dict) else 'value'
+            return index
+        else:
+            self.repaired = True
+        return index + 1
+
+    def _read_string(self, text: str, index: int) -> int:
+        if self._escape is not None:
+            return self._read_escape(text, index)
+        match = _STRING_RUNS[self._quote].match(text, index)
+        if match:
+            self._chars.append(match.group())
+            return match.end()
+        if text[index] == '\\':
+            self._escape = ''
+        else:
+            self._state = 'quote'
+        return index + 1
+
+    def _read_escape(self, text: str, index: int) -> int:
+        if self._escape == '':
+            char = text[index]
+            if char == 'u':
+                self._escape = 'u'
+                return index + 1
+            self._chars.append(_ESCAPES.get(char, char))
+            self._escape = None
+            return index + 1
+        needed = 5 - len(self._escape)
+        self._escape += text[index:index + needed]
+        if len(self._escape) == 5:
+            digits = self._escape[1:]
+            self._chars.append(chr(int(digits, 16)) if _HEX.fullmatch(digits) else '\\' + self._escape)
+            self._escape = None
+        return index + needed
+
+    def _quote_closes(self, after: str) -> Optional[bool]:
+        # None until enough of the following text has arrived to tell
+        rest = after.lstrip()
+        if not rest:
+            return None
+        char = rest[0]
+        if self._is_key:
+            return char == ':'
+        if char in '}]':
+            return True
+        if char == '"' or char == "'":
+            # Two strings separated by a line break, or a string followed by a key, are missing their comma
+            if '\n' in after[:len(after) - len(rest)] or _NEXT_KEY.match(rest):
+                return True
+            if isinstance(self._stack[-1][0], dict) and _PARTIAL_KEY.fullmatch(rest):
+                return None
+            return False
+        if char != ',':
+            return False
+        following = rest[1:].lstrip()
+        if not following:
+            return None
+        if isinstance(self._stack[-1][0], dict):
+            if following[0] in '"\'}' or _NEXT_KEY.match(following):
+                return True
+            return None if _PARTIAL_KEY.fullmatch(following) else False
+        return following[0] in _VALUE_START or following[0] == ']'
+
+    def _open(self, kind: type) -> None:
+        container = kind()
+        self._put(container)
+        self._stack.append([container, None])
+        self._state = 'key' if kind is dict else 'value'
+        self._comma = False
+
+    def _close(self, char: str) -> None:
+        kind = dict if char == '}' else list
+        if not any(isinstance(frame[0], kind) for frame in self._stack):
+            self.repaired = True
+            return
+        while True:
+            container = self._stack.pop()[0]
+            if isinstance(container, kind):
+                break
+            self.repaired = True
+        self._comma = False
+        self._state = 'after' if self._stack else 'done'
+
+    def _put(self, value: Any) -> None:
+        if not self._stack:
+            self.root = value
+            return
+        container, key = self._stack[-1]
+        if isinstance(container, list):
+            container.append(value)
+        elif key is not None:
+            container[key] = value
+
+    def _start_string(self, quote: str, is_key: bool) -> None:
+        if quote != '"':
+            self.repaired = True
+        self._quote = quote
+        self._chars = []
+        self._is_key = is_key
+        self._escape = None
+        self._state = 'string'
+        if not is_key:
+            self._put('')
+
+    def _string(self) -> str:
+        text = ''.join(self._chars)
+        if _SURROGATE.search(text):
+            # Characters outside the BMP arrive as two \\u escapes
+            text = text.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
+        return text
+
+    def _end_string(self) -> None:
+        text = self._string()
+        if self._is_key:
+            self._stack[-1][1] = text
+            self._state = 'colon'
+        else:
+            self._set_last(text)
+            self._state = 'after'
+
+    def _end_bareword(self, index: int) -> int:
+        word = ''.join(self._chars)
+        if self._state == 'barekey':
+            if not word:
+                # Not a key either; skip the character
+                self._state = 'key'
+                return index + 1
+            self._stack[-1][1] = word
+            self._state = 'colon'
+            return index
+        if word in _LITERALS:
+            value = _LITERALS[word]
+        else:
+            try:
+                value = json.loads(word)
+            except ValueError:
+                self.repaired = True
+                value = word
+        self._put(value)
+        self._state = 'after'
+        return index
+
+    def _set_last(self, value: Any) -> None:
+        container, key = self._stack[-1]
+        if isinstance(container, list):
+            container[-1] = value
+        elif key is not None:
+            container[key] = value
+
+    def _sync(self) -> None:
+        # Show the string being written in the value read so far
+        if self._state in ('string', 'quote') and not self._is_key:
+            self._set_last(self._string())
+
+
+def _copy(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def parse_json(text: str) -> Tuple[Any, bool]:
+    """
+    Parse the JSON object or array in model output, repairing it when needed.
+
+    Well-formed JSON (and JSON whose only flaw is raw control characters in
+    strings) is parsed with ``json.loads``; anything else goes through
+    JSONStreamParser.
+
+    Returns:
+        Tuple[Any, bool]: The value (None when the output holds no object or array)
+        and whether the output had to be repaired
+    """
+    start = _ROOT_START.search(text)
+    if start is None:
+        return None, True
+    end = text.rfind('}' if start.group() == '{' else ']')
+    if end > start.start():
+        candidate = text[start.start():end + 1]
+        try:
+            return json.loads(candidate), False
+        except ValueError:
+            pass
+        try:
+            # Raw line breaks inside strings are the most common flaw
+            return json.loads(candidate, strict=False), True
+        except ValueError:
+            pass
+    parser = JSONStreamParser()
+    parser.feed(text[start.start():])
+    value = parser.finish()
+    return value, True
@@ -0,0 +1,307 @@
+"""
+Local keyword extraction with TF-IDF statistics learned from the product catalog.
+
+The model counts, for every 1-4 word phrase of the catalog, how many products
+contain it. A product's candidate phrases are then scored by how often they
+occur in it against how common they are across the catalog, so its brand,
+generic name and product type rank above words every product page repeats.
+English and Bengali text are tokenized alike.
+
+Documents are vectorized into sparse count matrices and the document
+frequencies are updated from them, so new products can be added at any time
+without refitting. The fitted model is stored as a compressed ``.npz`` file
+that loads in milliseconds:
+
+    python -m utils.keyword_model fit catalog.ndjson
+    python -m utils.keyword_model update new_products.ndjson
+    python -m utils.keyword_model keywords "Napa Extra 500mg Tablet ..."
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .constants import KEYWORD_MODEL_FILE, KEYWORD_MODEL_MAX_PHRASES, KEYWORD_MAX_WORDS
+from .sqlite_store import get_db_path
+from .tokenizer import STOPWORDS, tokenize
+
+# Numbers and sizes ("500", "১২০", "2.5") never start or end a keyword
+NUMBER_PATTERN = re.compile(r"[0-9০-৯.+-]+")
+
+# Each extra word of a phrase adds this share to its score
+PHRASE_LENGTH_BONUS = 0.25
+# Multi-word phrases that occur once and in no product of the catalog are mostly accidental word sequences
+UNSEEN_PHRASE_WEIGHT = 0.5
+# Search keywords rarely contain function words ("relief of symptoms")
+STOPWORD_PHRASE_WEIGHT = 0.5
+
+
+def _is_edge_word(token: str) -> bool:
+    return token not in STOPWORDS and not NUMBER_PATTERN.fullmatch(token)
+
+
+def iter_phrases(text: str, max_words: int = KEYWORD_MAX_WORDS) -> Iterator[str]:
+    """Yield every candidate phrase of up to ``max_words`` words, one per occurrence."""
+    for tokens in tokenize(text):
+        for start, first in enumerate(tokens):
+            if not _is_edge_word(first):
+                continue
+            for end in range(start, min(start + max_words, len(tokens))):
+                if end == start:
+                    # A strength or pack size ("120mg") is no keyword on its own
+                    if not any(char.isdigit() for char in first):
+                        yield first
+                # A phrase may contain numbers and stopwords ("napa extra 500mg tablet"), but not end with them
+                elif _is_edge_word(tokens[end]):
+                    yield ' '.join(tokens[start:end + 1])
+
+
+class KeywordModel:
+    """
+    Phrase document frequencies of a catalog.
+
+    Args:
+        phrases (List[str]): The vocabulary, in column order
+        doc_freq (np.ndarray): Number of documents containing each phrase
+        n_docs (int): Number of documents the model was fitted on
+    """
+
+    def __init__(self, phrases: Optional[List[str]] = None, doc_freq: Optional[np.ndarray] = None, n_docs: int = 0):
+        self.phrases: List[str] = list(phrases or [])
+        self.vocabulary: Dict[str, int] = {phrase: index for index, phrase in enumerate(self.phrases)}
+        self.doc_freq = np.zeros(len(self.phrases), dtype=np.int64) if doc_freq is None else np.asarray(doc_freq, dtype=np.int64)
+        self.n_docs = n_docs
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def vectorize(self, documents: Iterable[str], grow: bool = False) -> sparse.csr_matrix:
+        """
+        Count the phrases of each document.
+
+        Args:
+            documents (Iterable[str]): The texts to vectorize
+            grow (bool): Add unknown phrases to the vocabulary instead of ignoring them
+
+        Returns:
+            sparse.csr_matrix: One row of phrase counts per document
+        """
+        indptr = [0]
+        indices: List[int] = []
+        for document in documents:
+            for phrase in iter_phrases(document):
+                index = self.vocabulary.get(phrase)
+                if index is None:
+                    if not grow:
+                        continue
+                    index = self.vocabulary[phrase] = len(self.phrases)
+                    self.phrases.append(phrase)
+                indices.append(index)
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.int32)
+        matrix = sparse.csr_matrix((data, np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+                                   shape=(len(indptr) - 1, len(self.phrases)))
+        # Repeated phrases of a row are summed into one count
+        matrix.sum_duplicates()
+        return matrix
+
+    def partial_fit(self, documents: Iterable[str]) -> 'KeywordModel':
+        """Add documents to the model, extending the vocabulary with their new phrases."""
+        with self._lock:
+            matrix = self.vectorize(documents, grow=True)
+            doc_freq = np.zeros(len(self.phrases), dtype=np.int64)
+            doc_freq[:len(self.doc_freq)] = self.doc_freq
+            # Documents containing each phrase, however often
+            doc_freq += np.bincount(matrix.indices, minlength=len(self.phrases))
+            self.doc_freq = doc_freq
+            self.n_docs += matrix.shape[0]
+        return self
+
+    def prune(self, max_phrases: int = KEYWORD_MODEL_MAX_PHRASES) -> None:
+        """Keep the ``max_phrases`` phrases found in the most documents."""
+        with self._lock:
+            if len(self.phrases) <= max_phrases:
+                return
+            # Stable, so ties keep the phrases seen first
+            keep = np.sort(np.argsort(-self.doc_freq, kind='stable')[:max_phrases])
+            self.phrases = [self.phrases[index] for index in keep]
+            self.vocabulary = {phrase: index for index, phrase in enumerate(self.phrases)}
+            self.doc_freq = self.doc_freq[keep]
+
+    def idf(self, doc_freq: np.ndarray) -> np.ndarray:
+        """Smoothed inverse document frequency of phrases found in ``doc_freq`` documents."""
+        return np.log((1 + self.n_docs) / (1 + doc_freq)) + 1
+
+    def score(self, text: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Score the candidate phrases of a text.
+
+        Args:
+            text (str): The product content
+            limit (int): Number of phrases to return, or None for all
+
+        Returns:
+            List[Tuple[str, float]]: Phrases and scores, best first; a phrase that
+            overlaps a better one ("napa" under "napa extra") is left out
+        """
+        counts: Dict[str, int] = {}
+        for phrase in iter_phrases(text):
+            counts[phrase] = counts.get(phrase, 0) + 1
+        if not counts:
+            return []
+
+        candidates = list(counts)
+        term_freq = np.fromiter(counts.values(), dtype=np.float64, count=len(candidates))
+        words = np.fromiter((phrase.count(' ') + 1 for phrase in candidates), dtype=np.float64, count=len(candidates))
+        columns = np.fromiter((self.vocabulary.get(phrase, -1) for phrase in candidates), dtype=np.int64,
+                              count=len(candidates))
+        known = columns >= 0
+        doc_freq = np.zeros(len(candidates), dtype=np.int64)
+        doc_freq[known] = self.doc_freq[columns[known]]
+
+        scores = (1 + np.log(term_freq)) * self.idf(doc_freq) * (1 + PHRASE_LENGTH_BONUS * (words - 1))
+        accidental = (words > 1) & (term_freq == 1) & (doc_freq == 0) & (self.n_docs > 0)
+        scores = np.where(accidental, scores * UNSEEN_PHRASE_WEIGHT, scores)
+        inner_stopwords = np.fromiter((any(word in STOPWORDS for word in phrase.split()[1:-1]) for phrase in candidates),
+                                      dtype=bool, count=len(candidates))
+        scores = np.where(inner_stopwords, scores * STOPWORD_PHRASE_WEIGHT, scores)
+
+        selected: List[Tuple[str, float]] = []
+        for index in np.argsort(-scores, kind='stable'):
+            phrase = candidates[index]
+            padded = f" {phrase} "
+            if any(padded in f" {other} " or f" {other} " in padded for other, _ in selected):
+                continue
+            selected.append((phrase, float(scores[index])))
+            if limit is not None and len(selected) >= limit:
+                break
+        return selected
+
+    def keywords(self, text: str, count: int) -> List[str]:
+        """Return the ``count`` best phrases of a text."""
+        return [phrase for phrase, _ in self.score(text, count)]
+
+    def save(self, path: str) -> None:
+        """Write the model to a compressed ``.npz`` file, replacing it atomically."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with self._lock, open(temp_path, 'wb') as f:
+            np.savez_compressed(
+                f,
+                phrases=np.array(self.phrases, dtype=np.str_),
+                doc_freq=self.doc_freq,
+                n_docs=np.array(self.n_docs, dtype=np.int64),
+            )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'KeywordModel':
+        """Read a model written by ``save``."""
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['phrases'].tolist(), data['doc_freq'], int(data['n_docs']))
+
+
+_model: Optional[KeywordModel] = None
+_model_lock = threading.Lock()
+
+
+def get_model_path() -> str:
+    """Return the path of the fitted model (relative paths are inside the data directory)."""
+    return get_db_path(KEYWORD_MODEL_FILE)
+
+
+def get_keyword_model() -> KeywordModel:
+    """
+    Return the process-wide keyword model, loading it on first use.
+
+    Without a fitted model an empty one is used: phrases are then ranked by
+    frequency and length alone.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                path = get_model_path()
+                model = KeywordModel()
+                if os.path.exists(path):
+                    try:
+                        model = KeywordModel.load(path)
+                    except (OSError, ValueError, KeyError) as e:
+                        logging.error(f"Could not load keyword model {path}: {str(e)}")
+                _model = model
+    return _model
+
+
+def read_documents(path: str) -> Iterator[str]:
+    """
+    Read catalog documents from a file.
+
+    NDJSON lines contribute their "content" (or the "original_content", title and
+    description of analyze-url and crawl results); any other line is one document.
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line
+                continue
+            if isinstance(record, dict):
+                parts = [record.get(field) for field in ('content', 'original_content', 'original_title', 'original_description')]
+                text = ' . '.join(part for part in parts if isinstance(part, str) and part)
+                if text:
+                    yield text
+            elif isinstance(record, str):
+                yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit the local keyword model on the product catalog.')
+    parser.add_argument('command', choices=('fit', 'update', 'keywords', 'info'))
+    parser.add_argument('inputs', nargs='*', help='Catalog files (NDJSON or one document per line), or the text for "keywords"')
+    parser.add_argument('--model', default=None, help='Model file (default: the configured keyword model)')
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--max-phrases', type=int, default=KEYWORD_MODEL_MAX_PHRASES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    path = args.model or get_model_path()
+
+    if args.command == 'keywords':
+        model = KeywordModel.load(path) if os.path.exists(path) else KeywordModel()
+        for phrase, score in model.score(' '.join(args.inputs), args.count):
+            print(f"{score:7.3f}  {phrase}")
+        return
+
+    if args.command == 'info':
+        model = KeywordModel.load(path)
+        print(f"{path}: {model.n_docs} documents, {len(model)} phrases")
+        return
+
+    model = KeywordModel.load(path) if args.command == 'update' and os.path.exists(path) else KeywordModel()
+    for input_path in args.inputs:
+        # Batches bound the memory of the count matrices
+        batch: List[str] = []
+        for document in read_documents(input_path):
+            batch.append(document)
+            if len(batch) >= 1000:
+                model.partial_fit(batch)
+                batch = []
+        model.partial_fit(batch)
+    model.prune(args.max_phrases)
+    model.save(path)
+    logging.info(f"Saved {path}: {model.n_docs} documents, {len(model)} phrases")
+
+
+if __name__ == '__main__':
+    main()
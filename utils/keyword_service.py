@@ -1,16 +1,34 @@
 """
 Service for generating SEO keywords from content.
 """
-from typing import List
+from typing import List, Optional
 
-from .ai_service import generate_content, AIServiceError
-from .constants import MEDICINE_KEYWORDS, DEFAULT_COMPANY_NAME
+from .ai_service import AIServiceError, LLMCall, Steps, arun_steps, run_steps
+from .constants import (
+    DEFAULT_COMPANY_NAME, DEFAULT_KEYWORD_MODE, KEYWORD_MODES, KEYWORD_HYBRID_CANDIDATES, KEYWORD_HYBRID_CONTENT_CHARS
+)
+from .metrics import instrument, record_event
+from .product_context import ProductContext, build_product_context
+from .text_processor import smart_truncate
 
-def is_medicine_product(content: str) -> bool:
-    """Determine if the content is about a medicine product."""
-    return any(keyword in content.lower() for keyword in MEDICINE_KEYWORDS)
+# Keywords in a list that must name the company, as the prompts ask of Gemini
+COMPANY_KEYWORD_COUNT = 3
 
-def generate_keywords(content: str, count: int = 10, company_name: str = DEFAULT_COMPANY_NAME) -> List[str]:
+def _keyword_model():
+    # The TF-IDF model and NumPy/SciPy are loaded the first time phrases are ranked locally
+    from .keyword_model import get_keyword_model
+    return get_keyword_model()
+
+def resolve_keyword_mode(mode: Optional[str]) -> str:
+    """Return the requested keyword mode or the default, raising ValueError for unknown modes."""
+    mode = mode or DEFAULT_KEYWORD_MODE
+    if mode not in KEYWORD_MODES:
+        raise ValueError(f"Unknown keyword mode '{mode}', expected one of: {', '.join(KEYWORD_MODES)}")
+    return mode
+
+@instrument('gen_keywords')
+def generate_keywords(content: str, count: int = 10, company_name: str = DEFAULT_COMPANY_NAME,
+                      context: Optional[ProductContext] = None, mode: Optional[str] = None) -> List[str]:
     """
     Generate SEO-optimized keywords from content including company-specific keywords.
     
@@ -18,18 +36,43 @@ def generate_keywords(content: str, count: int = 10, company_name: str = DEFAULT
         content (str): The content to generate keywords from
         count (int): Number of keywords to generate (default: 10)
         company_name (str): Company name to include in keywords (default: from constants)
+        context (ProductContext): Analysis of the content, built here when not given
+        mode (str): "llm", "local" or "hybrid" (default: from constants)
         
     Returns:
         List[str]: List of generated keywords with some company-specific terms
     """
+    return run_steps(keyword_steps(content, count, company_name, context, mode))
+
+@instrument('gen_keywords')
+async def agenerate_keywords(content: str, count: int = 10, company_name: str = DEFAULT_COMPANY_NAME,
+                             context: Optional[ProductContext] = None, mode: Optional[str] = None) -> List[str]:
+    """Like ``generate_keywords``, awaiting the Gemini call."""
+    return await arun_steps(keyword_steps(content, count, company_name, context, mode))
+
+def keyword_steps(content: str, count: int = 10, company_name: str = DEFAULT_COMPANY_NAME,
+                  context: Optional[ProductContext] = None, mode: Optional[str] = None) -> Steps[List[str]]:
+    """Steps of ``generate_keywords``."""
     if not content:
         return []
     
     # Adjust count to be between 5 and 10
-    keyword_count = max(5, min(count, 10))
+    keyword_count = get_keyword_count(count)
+    context = context or build_product_context(content, company_name)
+    mode = resolve_keyword_mode(mode)
+
+    if mode == 'local':
+        record_event('keywords', source='local')
+        return local_keywords(content, keyword_count, company_name, context)
+
+    if mode == 'hybrid':
+        # The ranked phrases stand in for most of the page, which shortens the prompt
+        candidates = _keyword_model().keywords(context.text, KEYWORD_HYBRID_CANDIDATES)
+        content = (f"{smart_truncate(content, KEYWORD_HYBRID_CONTENT_CHARS)}\n\n"
+                   f"        Candidate keywords from our catalog (prefer these): {', '.join(candidates)}")
     
     # Create different prompts based on content type
-    if is_medicine_product(content):
+    if context.is_medicine:
         prompt = f"""Generate exactly {keyword_count} SEO keywords for a medicine product.
         
         Content: {content}
@@ -70,42 +113,100 @@ def generate_keywords(content: str, count: int = 10, company_name: str = DEFAULT
         """
     
     try:
-        response = generate_content(prompt)
+        response = yield LLMCall(prompt)
         # Split by comma and clean up each keyword
         keywords = [keyword.strip() for keyword in response.split(',')]
-        
-        # Filter out empty keywords and ensure we have the right number
         keywords = [k for k in keywords if k]
-        
-        # If we have too many keywords, trim the list
-        if len(keywords) > keyword_count:
-            keywords = keywords[:keyword_count]
-            
-        # If we have too few keywords, add generic ones to reach minimum count
         if len(keywords) < 5:
-            if is_medicine_product(content):
-                default_keywords = ["medicine", "pharmacy", "health", "treatment", "online medicine", 
-                                   f"{company_name} medicine", f"{company_name} pharmacy", f"{company_name} health products"]
-            else:
-                default_keywords = ["online shopping", "best price", "quality product", "fast delivery", "discount", 
-                                   f"{company_name} shop", f"{company_name} products", f"{company_name} online store"]
-                
-            keywords.extend(default_keywords[:(5 - len(keywords))])
-            
-        # Ensure at least one company brand keyword is included
-        has_company = any(company_name in kw for kw in keywords)
-        if not has_company:
-            if is_medicine_product(content):
-                keywords.append(f"{company_name} medicine")
-            else:
-                keywords.append(f"{company_name} products")
-            
-        return keywords
+            # Top up a short answer with local phrases rather than generic ones
+            record_event('fallback', field='keywords_short')
+            keywords = merge_keywords(keywords, _keyword_model().keywords(context.text, keyword_count))
+        return finalize_keywords(keywords, context.content, keyword_count, company_name, context)
     except AIServiceError:
-        # Fallback to basic keywords with company brand included
-        if is_medicine_product(content):
-            return ["medicine", "pharmacy", "health", "treatment", "online medicine", 
-                   f"{company_name} medicine", f"{company_name} pharmacy"]
+        return fallback_keywords(context.content, company_name, context)
+
+def merge_keywords(keywords: List[str], extra: List[str]) -> List[str]:
+    """Append the extra keywords that are not already in the list, ignoring case."""
+    seen = {k.lower() for k in keywords}
+    return keywords + [k for k in extra if k.lower() not in seen]
+
+def company_keywords(phrases: List[str], company_name: str, is_medicine: bool) -> List[str]:
+    """Company-branded keywords built on the best local phrase."""
+    if is_medicine:
+        branded = [f"{company_name} medicine", f"{company_name} pharmacy"]
+    else:
+        branded = [f"{company_name} products", f"{company_name} online store"]
+    if phrases:
+        branded.insert(0, f"{phrases[0]} {company_name}")
+    return branded[:COMPANY_KEYWORD_COUNT]
+
+def local_keywords(content: str, keyword_count: int, company_name: str = DEFAULT_COMPANY_NAME,
+                   context: Optional[ProductContext] = None) -> List[str]:
+    """
+    Keywords ranked by the local TF-IDF model, without an AI call.
+
+    Args:
+        content (str): The content to extract keywords from
+        keyword_count (int): Number of keywords to return (between 5 and 10)
+        company_name (str): Company name to include in keywords
+        context (ProductContext): Analysis of the content, built here when not given
+
+    Returns:
+        List[str]: The best phrases of the content followed by company-branded keywords
+    """
+    context = context or build_product_context(content, company_name)
+    phrases = _keyword_model().keywords(context.text, keyword_count - COMPANY_KEYWORD_COUNT)
+    keywords = merge_keywords(phrases, company_keywords(phrases, company_name, context.is_medicine))
+    return finalize_keywords(keywords, content, keyword_count, company_name, context)
+
+def get_keyword_count(count: int) -> int:
+    """Clamp the requested keyword count to between 5 and 10."""
+    return max(5, min(count, 10))
+
+def finalize_keywords(keywords: List[str], content: str, keyword_count: int, company_name: str = DEFAULT_COMPANY_NAME,
+                      context: Optional[ProductContext] = None) -> List[str]:
+    """Trim, pad and brand a list of generated keywords."""
+    is_medicine = (context or build_product_context(content, company_name)).is_medicine
+    # Filter out empty keywords and ensure we have the right number
+    keywords = [k for k in keywords if k]
+    
+    # If we have too many keywords, trim the list
+    if len(keywords) > keyword_count:
+        keywords = keywords[:keyword_count]
+        
+    # If we have too few keywords, add generic ones to reach minimum count
+    if len(keywords) < 5:
+        if is_medicine:
+            default_keywords = ["medicine", "pharmacy", "health", "treatment", "online medicine", 
+                               f"{company_name} medicine", f"{company_name} pharmacy", f"{company_name} health products"]
+        else:
+            default_keywords = ["online shopping", "best price", "quality product", "fast delivery", "discount", 
+                               f"{company_name} shop", f"{company_name} products", f"{company_name} online store"]
+            
+        keywords.extend(default_keywords[:(5 - len(keywords))])
+        
+    # Ensure at least one company brand keyword is included
+    has_company = any(company_name in kw for kw in keywords)
+    if not has_company:
+        if is_medicine:
+            keywords.append(f"{company_name} medicine")
         else:
-            return ["online shopping", "best price", "quality product", "fast delivery", "discount", 
-                   f"{company_name} shop", f"{company_name} products"]
+            keywords.append(f"{company_name} products")
+        
+    return keywords
+
+def fallback_keywords(content: str, company_name: str = DEFAULT_COMPANY_NAME,
+                      context: Optional[ProductContext] = None) -> List[str]:
+    """Keywords from the local model with the company brand included, used when the AI service fails."""
+    record_event('fallback', field='keywords')
+    record_event('placeholder', field='keywords')
+    context = context or build_product_context(content, company_name)
+    if _keyword_model().keywords(context.text, 1):
+        return local_keywords(content, get_keyword_count(7), company_name, context)
+    # Content without a single usable phrase still gets the generic keywords
+    if context.is_medicine:
+        return ["medicine", "pharmacy", "health", "treatment", "online medicine", 
+               f"{company_name} medicine", f"{company_name} pharmacy"]
+    else:
+        return ["online shopping", "best price", "quality product", "fast delivery", "discount", 
+               f"{company_name} shop", f"{company_name} products"]
@@ -0,0 +1,577 @@
+"""
+Process-wide dispatcher that every Gemini call goes through.
+
+The dispatcher reuses one model client per model name and admits calls only
+while the request and token budgets (token buckets refilled per minute) and an
+adaptive concurrency limit allow it. The limit grows by one slot per window of
+successful calls and halves whenever the API answers 429 (AIMD). Waiting calls
+are admitted by priority lane, so interactive requests go ahead of batch work
+when the quota is contended. Calls made with a timeout wait for capacity no
+longer than that, and with hedging enabled a call that has not answered after
+the usual (p95) latency is sent a second time; the first answer wins. The
+async server's calls (``agenerate``) share the same limits and queue, but wait
+on the event loop instead of holding a thread.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .constants import (
+    LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_MAX_CONCURRENCY, LLM_MIN_CONCURRENCY,
+    LLM_BACKOFF_BASE, LLM_BACKOFF_MAX, LLM_QUEUE_TIMEOUT, LLM_PRIORITY_LANES, CHARS_PER_TOKEN,
+    BENGALI_CHARS_PER_TOKEN, LLM_HEDGE_ENABLED, LLM_HEDGE_QUANTILE, LLM_HEDGE_MIN_SAMPLES, LLM_LATENCY_WINDOW
+)
+from .concurrency import BoundedExecutor
+from .metrics import record_event, timed
+
+BENGALI_PATTERN = re.compile(r'[\u0980-\u09FF]')
+
+# How often a call waiting on the event loop checks for capacity; threads are woken by the condition instead
+ASYNC_POLL_INTERVAL = 0.01
+
+# Priority lane of the calls made in the current context
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar('llm_priority_lane', default=LLM_PRIORITY_LANES[0])
+# Innermost call counter of the current context
+_counter: contextvars.ContextVar[Optional['CallCounter']] = contextvars.ContextVar('llm_call_counter', default=None)
+
+
+class DispatcherTimeout(Exception):
+    """Raised when a call waited longer than the queue timeout for capacity, or got no answer within its timeout."""
+    pass
+
+
+@contextmanager
+def llm_priority(lane: str) -> Iterator[None]:
+    """Run the enclosed LLM calls in the given priority lane."""
+    if lane not in LLM_PRIORITY_LANES:
+        raise ValueError(f"Unknown priority lane '{lane}', expected one of: {', '.join(LLM_PRIORITY_LANES)}")
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def get_priority() -> str:
+    """Return the priority lane of the current context."""
+    return _lane.get()
+
+
+class CallCounter:
+    """Number of LLM calls made inside a ``count_llm_calls`` block, including its worker threads."""
+
+    def __init__(self, parent: Optional['CallCounter'] = None):
+        self.parent = parent
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def add(self) -> None:
+        # Enclosing counters see the call too
+        counter = self
+        while counter is not None:
+            with counter._lock:
+                counter.calls += 1
+            counter = counter.parent
+
+
+@contextmanager
+def count_llm_calls() -> Iterator[CallCounter]:
+    """Count the LLM calls made inside the ``with`` block."""
+    counter = CallCounter(_counter.get())
+    token = _counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _counter.reset(token)
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """Return the HTTP status carried by an API exception (google.api_core sets ``code``), if any."""
+    code = getattr(error, 'code', None)
+    try:
+        return int(code) if code is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Check whether the API rejected a call for exceeding the quota."""
+    return error_status(error) == 429
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Check whether a failed call is worth retrying; client errors other than 408/429 are not."""
+    status = error_status(error)
+    return status is None or status in (408, 429) or status >= 500
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the number of tokens in a prompt, counting Bengali characters separately."""
+    bengali = len(text) - len(BENGALI_PATTERN.sub('', text))
+    return max(1, math.ceil((len(text) - bengali) / CHARS_PER_TOKEN + bengali / BENGALI_CHARS_PER_TOKEN))
+
+
+class TokenBucket:
+    """Token bucket holding at most ``capacity`` tokens, refilled evenly over a minute."""
+
+    def __init__(self, per_minute: int, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Return how long to wait before ``amount`` tokens are available."""
+        self._refill()
+        # A call larger than the whole bucket waits for a full bucket rather than forever
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def give(self, amount: float) -> None:
+        """Return tokens that were reserved but not used."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class LLMDispatcher:
+    """
+    Rate-limited, priority-aware gateway to the model clients.
+
+    Args:
+        model_factory (Callable): Builds a model client from a model name; defaults to the configured AI backend's
+        requests_per_minute (int): Request budget per minute
+        tokens_per_minute (int): Token budget per minute (prompt and output tokens)
+        max_concurrency (int): Upper bound of the adaptive concurrency limit
+        min_concurrency (int): Lower bound of the adaptive concurrency limit
+        backoff_base (float): First retry delay in seconds; doubles on each retry
+        backoff_max (float): Longest retry delay in seconds
+        queue_timeout (float): Longest a call waits for capacity before DispatcherTimeout
+        hedge (bool): Whether ``generate`` sends a second copy of calls slower than the usual latency
+    """
+
+    def __init__(self, model_factory: Optional[Callable[[str], Any]] = None,
+                 requests_per_minute: int = LLM_REQUESTS_PER_MINUTE, tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, min_concurrency: int = LLM_MIN_CONCURRENCY,
+                 backoff_base: float = LLM_BACKOFF_BASE, backoff_max: float = LLM_BACKOFF_MAX,
+                 queue_timeout: float = LLM_QUEUE_TIMEOUT, hedge: bool = LLM_HEDGE_ENABLED):
+        self.model_factory = model_factory or _default_model_factory
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout
+        self.hedge = hedge
+
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self._models: Dict[str, Any] = {}
+        self._cond = threading.Condition()
+        self._waiting: List[tuple] = []
+        self._sequence = itertools.count()
+        self._last_decrease = 0.0
+        # Durations of the latest successful calls, which set the hedging delay
+        self._latencies = deque(maxlen=LLM_LATENCY_WINDOW)
+        # Threads of hedged calls: a primary and a hedge for each slot
+        self._hedge_pool = BoundedExecutor(2 * self.max_concurrency, thread_name_prefix='llm-hedge')
+        self._counters = {
+            'calls': 0, 'throttled': 0, 'errors': 0, 'timeouts': 0, 'prompt_tokens': 0, 'hedged': 0, 'hedge_wins': 0
+        }
+
+    def get_model(self, model_name: str) -> Any:
+        """Return the cached client for ``model_name``, creating it on first use."""
+        model = self._models.get(model_name)
+        if model is None:
+            with self._cond:
+                model = self._models.get(model_name)
+                if model is None:
+                    model = self._models[model_name] = self.model_factory(model_name)
+        return model
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Return a jittered exponential delay before retry number ``attempt + 1``."""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Return how long a call may take before it is hedged, or None until enough calls were timed."""
+        with self._cond:
+            if len(self._latencies) < LLM_HEDGE_MIN_SAMPLES:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * LLM_HEDGE_QUANTILE))]
+
+    # Admission
+
+    def _acquire(self, lane: str, tokens: int, timeout: Optional[float] = None) -> None:
+        entry = (LLM_PRIORITY_LANES.index(lane), next(self._sequence))
+        queue_timeout = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+        deadline = time.monotonic() + queue_timeout
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    wait = self._admit(entry, tokens)
+                    if wait == 0:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise DispatcherTimeout(f"No LLM capacity within {queue_timeout:.1f}s")
+                    self._cond.wait(min(wait, remaining) if wait else remaining)
+            except BaseException:
+                self._withdraw(entry)
+                raise
+            finally:
+                # The next waiter may be able to go now
+                self._cond.notify_all()
+
+    async def _aacquire(self, lane: str, tokens: int, timeout: Optional[float] = None) -> None:
+        # Like _acquire, but polls instead of blocking the event loop on the condition
+        entry = (LLM_PRIORITY_LANES.index(lane), next(self._sequence))
+        queue_timeout = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+        deadline = time.monotonic() + queue_timeout
+        with self._cond:
+            heapq.heappush(self._waiting, entry)
+        try:
+            while True:
+                with self._cond:
+                    wait = self._admit(entry, tokens)
+                    if wait == 0:
+                        self._cond.notify_all()
+                        return
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters['timeouts'] += 1
+                        raise DispatcherTimeout(f"No LLM capacity within {queue_timeout:.1f}s")
+                await asyncio.sleep(min(wait or ASYNC_POLL_INTERVAL, remaining))
+        except BaseException:
+            with self._cond:
+                self._withdraw(entry)
+                self._cond.notify_all()
+            raise
+
+    def _admit(self, entry: tuple, tokens: int) -> Optional[float]:
+        # Called holding the lock: takes the slot and returns 0 when ``entry`` may go, or else how long to
+        # wait for the rate limits (None while other calls are ahead or every slot is taken)
+        if self._waiting[0] != entry or self.in_flight >= int(self.limit):
+            return None
+        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+        if wait > 0:
+            return wait
+        heapq.heappop(self._waiting)
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        self.in_flight += 1
+        return 0
+
+    def _withdraw(self, entry: tuple) -> None:
+        # Called holding the lock when a waiting call gives up
+        if entry in self._waiting:
+            self._waiting.remove(entry)
+            heapq.heapify(self._waiting)
+
+    def _release(self, throttled: bool, unused_tokens: int = 0) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            if unused_tokens > 0:
+                self.tokens.give(unused_tokens)
+            now = time.monotonic()
+            if throttled:
+                self._counters['throttled'] += 1
+                # Halve at most once per backoff period so one burst of 429s is one decrease
+                if now - self._last_decrease >= self.backoff_base:
+                    self.limit = max(float(self.min_concurrency), self.limit / 2)
+                    self._last_decrease = now
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    # Calls
+
+    @contextmanager
+    def _admitted(self, prompt: str, generation_config: Optional[Dict[str, Any]],
+                  timeout: Optional[float] = None) -> Iterator[Dict[str, int]]:
+        # Holds a slot for the duration of one call; the caller records the tokens it actually used
+        prompt_tokens, reserved = _reservation(prompt, generation_config)
+        with timed('llm_wait'):
+            self._acquire(get_priority(), reserved, timeout)
+        with self._holding(prompt_tokens, reserved) as usage:
+            yield usage
+
+    @asynccontextmanager
+    async def _aadmitted(self, prompt: str, generation_config: Optional[Dict[str, Any]],
+                         timeout: Optional[float] = None) -> AsyncIterator[Dict[str, int]]:
+        prompt_tokens, reserved = _reservation(prompt, generation_config)
+        with timed('llm_wait'):
+            await self._aacquire(get_priority(), reserved, timeout)
+        with self._holding(prompt_tokens, reserved) as usage:
+            yield usage
+
+    @contextmanager
+    def _holding(self, prompt_tokens: int, reserved: int) -> Iterator[Dict[str, int]]:
+        # Counts and times one admitted call, and gives its slot back when it ends
+        usage = {'reserved': reserved, 'used': reserved}
+        counter = _counter.get()
+        if counter is not None:
+            counter.add()
+        throttled = False
+        try:
+            with timed('llm'):
+                yield usage
+        except Exception as e:
+            throttled = is_throttled(e)
+            if not throttled:
+                with self._cond:
+                    self._counters['errors'] += 1
+            logging.warning(f"LLM call failed ({'throttled' if throttled else 'error'}): {str(e)}")
+            raise
+        finally:
+            with self._cond:
+                self._counters['calls'] += 1
+                self._counters['prompt_tokens'] += prompt_tokens
+            self._release(throttled, usage['reserved'] - usage['used'])
+
+    def generate(self, prompt: str, model_name: str, generation_config: Optional[Dict[str, Any]] = None,
+                 safety_settings: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+                 **kwargs) -> Any:
+        """
+        Make one ``generate_content`` call once the lane, rate limits and concurrency limit allow it.
+
+        The call is not retried here; callers retry and use ``backoff_delay``
+        between attempts. A 429 lowers the concurrency limit. With a ``timeout``
+        the call waits for capacity no longer than that, raising
+        DispatcherTimeout, and the client is given the time left for its answer.
+        When hedging is enabled, the call and its hedge run on a bounded pool:
+        a call without an answer after ``hedge_delay()`` is sent again if there
+        is spare capacity, and the first answer is returned.
+        """
+        delay = self.hedge_delay() if self.hedge else None
+        if delay is None:
+            # The client's request timeout bounds the answer, so an unhedged call runs on the caller's thread
+            return self._generate(prompt, model_name, generation_config, safety_settings, timeout, **kwargs)
+
+        expires = time.monotonic() + timeout if timeout is not None else None
+
+        def start() -> Future:
+            left = None if expires is None else max(0.0, expires - time.monotonic())
+            return self._hedge_pool.submit(
+                self._generate, prompt, model_name, generation_config, safety_settings, left, **kwargs
+            )
+
+        primary = start()
+        calls = [primary]
+        try:
+            if expires is None or time.monotonic() + delay < expires:
+                done, _ = wait(calls, timeout=delay)
+                if not done and self._has_spare_capacity():
+                    with self._cond:
+                        self._counters['hedged'] += 1
+                    record_event('llm_hedge')
+                    calls.append(start())
+
+            errors = []
+            while calls:
+                left = None if expires is None else max(0.0, expires - time.monotonic())
+                done, _ = wait(calls, timeout=left, return_when=FIRST_COMPLETED)
+                if not done:
+                    with self._cond:
+                        self._counters['timeouts'] += 1
+                    raise DispatcherTimeout(f"No LLM answer within {timeout:.1f}s")
+                for future in done:
+                    calls.remove(future)
+                    if future.exception() is not None:
+                        errors.append(future.exception())
+                        continue
+                    if future is not primary:
+                        with self._cond:
+                            self._counters['hedge_wins'] += 1
+                    return future.result()
+            raise errors[0]
+        finally:
+            # Calls still queued for a thread are dropped; running ones end by their client timeout
+            for future in calls:
+                future.cancel()
+
+    def _generate(self, prompt: str, model_name: str, generation_config: Optional[Dict[str, Any]],
+                  safety_settings: Optional[Dict[str, Any]], timeout: Optional[float], **kwargs) -> Any:
+        expires = time.monotonic() + timeout if timeout is not None else None
+        with self._admitted(prompt, generation_config, timeout) as usage:
+            started = time.monotonic()
+            response = self.get_model(model_name).generate_content(
+                prompt, generation_config=generation_config, safety_settings=safety_settings,
+                **_with_timeout(kwargs, expires)
+            )
+            usage['used'] = _used_tokens(response, usage['reserved'])
+            with self._cond:
+                self._latencies.append(time.monotonic() - started)
+            return response
+
+    def _has_spare_capacity(self) -> bool:
+        # A hedge never takes a slot another call is waiting for
+        with self._cond:
+            return not self._waiting and self.in_flight < int(self.limit)
+
+    async def agenerate(self, prompt: str, model_name: str, generation_config: Optional[Dict[str, Any]] = None,
+                        safety_settings: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+                        **kwargs) -> Any:
+        """
+        Like ``generate``, but await the model's ``generate_content_async`` on the running event loop.
+
+        Waiting for capacity and for the answer holds no thread. Calls still
+        running when the timeout passes, and hedges that lost, are cancelled.
+        """
+        delay = self.hedge_delay() if self.hedge else None
+        expires = time.monotonic() + timeout if timeout is not None else None
+
+        def start() -> asyncio.Task:
+            left = None if expires is None else max(0.0, expires - time.monotonic())
+            return asyncio.ensure_future(
+                self._agenerate(prompt, model_name, generation_config, safety_settings, left, **kwargs)
+            )
+
+        primary = start()
+        calls = {primary}
+        try:
+            if delay is not None and (expires is None or time.monotonic() + delay < expires):
+                done, _ = await asyncio.wait(calls, timeout=delay)
+                if not done and self._has_spare_capacity():
+                    with self._cond:
+                        self._counters['hedged'] += 1
+                    record_event('llm_hedge')
+                    calls.add(start())
+
+            errors = []
+            while calls:
+                left = None if expires is None else max(0.0, expires - time.monotonic())
+                done, _ = await asyncio.wait(calls, timeout=left, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    with self._cond:
+                        self._counters['timeouts'] += 1
+                    raise DispatcherTimeout(f"No LLM answer within {timeout:.1f}s")
+                for task in done:
+                    calls.discard(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    if task is not primary:
+                        with self._cond:
+                            self._counters['hedge_wins'] += 1
+                    return task.result()
+            raise errors[0]
+        finally:
+            for task in calls:
+                task.cancel()
+
+    async def _agenerate(self, prompt: str, model_name: str, generation_config: Optional[Dict[str, Any]],
+                         safety_settings: Optional[Dict[str, Any]], timeout: Optional[float], **kwargs) -> Any:
+        expires = time.monotonic() + timeout if timeout is not None else None
+        async with self._aadmitted(prompt, generation_config, timeout) as usage:
+            started = time.monotonic()
+            response = await self.get_model(model_name).generate_content_async(
+                prompt, generation_config=generation_config, safety_settings=safety_settings,
+                **_with_timeout(kwargs, expires)
+            )
+            usage['used'] = _used_tokens(response, usage['reserved'])
+            with self._cond:
+                self._latencies.append(time.monotonic() - started)
+            return response
+
+    def stream(self, prompt: str, model_name: str, generation_config: Optional[Dict[str, Any]] = None,
+               safety_settings: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None,
+               **kwargs) -> Iterator[Any]:
+        """Like ``generate`` with ``stream=True``: yield response chunks, holding the slot until the stream ends."""
+        expires = time.monotonic() + timeout if timeout is not None else None
+        with self._admitted(prompt, generation_config, timeout) as usage:
+            response = self.get_model(model_name).generate_content(
+                prompt, generation_config=generation_config, safety_settings=safety_settings, stream=True,
+                **_with_timeout(kwargs, expires)
+            )
+            for chunk in response:
+                # The last chunk carries the usage of the whole response
+                usage['used'] = _used_tokens(chunk, usage['used'])
+                yield chunk
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call counters, the current limits and the hedging delay (None while not hedging)."""
+        delay = self.hedge_delay() if self.hedge else None
+        with self._cond:
+            queued = {lane: 0 for lane in LLM_PRIORITY_LANES}
+            for rank, _ in self._waiting:
+                queued[LLM_PRIORITY_LANES[rank]] += 1
+            return {
+                **self._counters,
+                'in_flight': self.in_flight,
+                'concurrency_limit': round(self.limit, 2),
+                'queued': queued,
+                'hedge_delay': round(delay, 3) if delay is not None else None,
+            }
+
+
+def _with_timeout(kwargs: Dict[str, Any], expires: Optional[float]) -> Dict[str, Any]:
+    # The client gives up on the API call when the time left after queueing runs out
+    if expires is None:
+        return kwargs
+    return {**kwargs, 'request_options': {'timeout': max(0.1, expires - time.monotonic())}}
+
+
+def _reservation(prompt: str, generation_config: Optional[Dict[str, Any]]) -> Tuple[int, int]:
+    # Tokens of the prompt, and the most a call with this config can use
+    prompt_tokens = estimate_tokens(prompt)
+    return prompt_tokens, prompt_tokens + int((generation_config or {}).get('max_output_tokens', 0))
+
+
+def _used_tokens(response: Any, default: int) -> int:
+    usage = getattr(response, 'usage_metadata', None)
+    total = getattr(usage, 'total_token_count', None)
+    return total if isinstance(total, int) and total > 0 else default
+
+
+def _default_model_factory(model_name: str) -> Any:
+    from .ai_service import create_model
+    return create_model(model_name)
+
+
+_dispatcher: Optional[LLMDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> LLMDispatcher:
+    """Return the process-wide dispatcher."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = LLMDispatcher()
+    return _dispatcher
+
+
+def set_dispatcher(dispatcher: Optional[LLMDispatcher]) -> None:
+    """Replace the process-wide dispatcher, e.g. with one backed by a fake model."""
+    global _dispatcher
+    with _dispatcher_lock:
+        _dispatcher = dispatcher
@@ -0,0 +1,319 @@
+"""
+Local parser for medicine product names.
+
+Turns content such as "Sergel 20mg Capsule (Esomeprazole)" into the English and
+Bangla names used in pharmacy titles ("Sergel 20mg Capsule" and
+"সারজেল ২০ মি.গ্রা. ক্যাপসুল") without calling Gemini. Strengths get Bangla
+numerals and units, dosage forms come from a fixed table, and brand names are
+looked up in a loadable dictionary, falling back to rule-based transliteration.
+Every parse carries a confidence so callers can still ask the model when the
+parse is doubtful.
+"""
+import json
+import logging
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from .constants import MEDICINE_BRANDS_FILE
+
+BANGLA_DIGITS = str.maketrans('0123456789', '০১২৩৪৫৬৭৮৯')
+
+# Canonical English spelling and Bangla name of each unit
+UNITS: Dict[str, Tuple[str, str]] = {
+    'mg': ('mg', 'মি.গ্রা.'),
+    'mcg': ('mcg', 'মাইক্রোগ্রাম'),
+    'µg': ('mcg', 'মাইক্রোগ্রাম'),
+    'g': ('g', 'গ্রা.'),
+    'gm': ('gm', 'গ্রা.'),
+    'ml': ('ml', 'মি.লি.'),
+    'iu': ('IU', 'আই.ইউ.'),
+    '%': ('%', '%'),
+}
+
+# Dosage forms, longest first when matched
+FORMS: Dict[str, Tuple[str, str]] = {
+    'tablet': ('Tablet', 'ট্যাবলেট'),
+    'tab': ('Tablet', 'ট্যাবলেট'),
+    'film coated tablet': ('Film Coated Tablet', 'ফিল্ম কোটেড ট্যাবলেট'),
+    'chewable tablet': ('Chewable Tablet', 'চুষে খাওয়ার ট্যাবলেট'),
+    'dispersible tablet': ('Dispersible Tablet', 'ডিসপারসিবল ট্যাবলেট'),
+    'effervescent tablet': ('Effervescent Tablet', 'এফারভেসেন্ট ট্যাবলেট'),
+    'extended release tablet': ('Extended Release Tablet', 'এক্সটেন্ডেড রিলিজ ট্যাবলেট'),
+    'sustained release tablet': ('Sustained Release Tablet', 'সাসটেইনড রিলিজ ট্যাবলেট'),
+    'capsule': ('Capsule', 'ক্যাপসুল'),
+    'cap': ('Capsule', 'ক্যাপসুল'),
+    'delayed release capsule': ('Delayed Release Capsule', 'ডিলেইড রিলিজ ক্যাপসুল'),
+    'syrup': ('Syrup', 'সিরাপ'),
+    'suspension': ('Suspension', 'সাসপেনশন'),
+    'oral suspension': ('Oral Suspension', 'ওরাল সাসপেনশন'),
+    'powder for suspension': ('Powder for Suspension', 'পাউডার ফর সাসপেনশন'),
+    'oral solution': ('Oral Solution', 'ওরাল সলিউশন'),
+    'solution': ('Solution', 'সলিউশন'),
+    'injection': ('Injection', 'ইনজেকশন'),
+    'infusion': ('Infusion', 'ইনফিউশন'),
+    'cream': ('Cream', 'ক্রিম'),
+    'ointment': ('Ointment', 'অয়েন্টমেন্ট'),
+    'gel': ('Gel', 'জেল'),
+    'lotion': ('Lotion', 'লোশন'),
+    'drops': ('Drops', 'ড্রপস'),
+    'eye drops': ('Eye Drops', 'আই ড্রপস'),
+    'ear drops': ('Ear Drops', 'ইয়ার ড্রপস'),
+    'nasal drops': ('Nasal Drops', 'নাসাল ড্রপস'),
+    'pediatric drops': ('Pediatric Drops', 'পেডিয়াট্রিক ড্রপস'),
+    'nasal spray': ('Nasal Spray', 'নাসাল স্প্রে'),
+    'spray': ('Spray', 'স্প্রে'),
+    'inhaler': ('Inhaler', 'ইনহেলার'),
+    'suppository': ('Suppository', 'সাপোজিটরি'),
+    'powder': ('Powder', 'পাউডার'),
+    'sachet': ('Sachet', 'স্যাশে'),
+}
+
+# Confidence earned by each part of a parse
+DOSAGE_FORM_WEIGHT = 0.35
+STRENGTH_WEIGHT = 0.3
+KNOWN_BRAND_WEIGHT = 0.35
+TRANSLITERATED_BRAND_WEIGHT = 0.2
+
+# Words in front of the brand on shop pages
+LEADING_WORDS = {'buy', 'order', 'price', 'of', 'the', 'original', 'new'}
+MAX_BRAND_WORDS = 3
+
+_UNIT = r'(?:mcg|µg|mg|gm|g|ml|iu|%)'
+_AMOUNT = r'\d+(?:\.\d+)?'
+# One dose ("20mg", "10mg/ml", "250mg/5ml") and combined doses ("500mg+125mg", "500+125 mg")
+_DOSE = rf'{_AMOUNT}\s*{_UNIT}?(?:\s*/\s*(?:{_AMOUNT}\s*)?{_UNIT})?'
+STRENGTH_PATTERN = re.compile(rf'(?<![\w.]){_DOSE}(?:\s*\+\s*{_DOSE})*(?![\w])', re.IGNORECASE)
+# A strength always ends in a unit; bare numbers are pack sizes or model numbers
+UNIT_END_PATTERN = re.compile(rf'{_UNIT}$', re.IGNORECASE)
+DOSE_PATTERN = re.compile(
+    rf'({_AMOUNT})\s*({_UNIT})?(?:\s*/\s*({_AMOUNT})?\s*({_UNIT}))?', re.IGNORECASE
+)
+FORM_PATTERN = re.compile(
+    r'(?<![\w])(' + '|'.join(re.escape(form) for form in sorted(FORMS, key=len, reverse=True)) + r')s?(?![\w])',
+    re.IGNORECASE
+)
+# The product name ends where the details start
+HEAD_END_PATTERN = re.compile(r'[\n(|\[,;:]| - | – ')
+
+
+class MedicineName(NamedTuple):
+    """A parsed medicine name; parts that were not found are empty strings."""
+    brand: str
+    strength: str
+    form: str
+    name_en: str
+    name_bn: str
+    confidence: float
+
+
+# Transliteration
+
+# Latin spellings, longest first, as independent vowels, vowel signs and consonants
+VOWELS = {
+    'ee': ('ই', 'ী'), 'oo': ('উ', 'ু'), 'ai': ('আই', 'াই'), 'ay': ('এ', 'ে'), 'ei': ('এই', 'েই'),
+    'ou': ('আউ', 'াউ'), 'au': ('অ', 'ো'), 'ea': ('ই', 'ি'), 'ie': ('আই', 'াই'),
+    'a': ('এ', 'া'), 'e': ('এ', 'ে'), 'i': ('ই', 'ি'), 'o': ('ও', 'ো'), 'u': ('উ', 'ু'),
+}
+CONSONANTS = {
+    'kh': 'খ', 'gh': 'ঘ', 'ch': 'চ', 'jh': 'ঝ', 'th': 'থ', 'dh': 'ধ', 'ph': 'ফ', 'sh': 'শ', 'bh': 'ভ',
+    'ck': 'ক', 'qu': 'কু', 'x': 'ক্স', 'k': 'ক', 'c': 'ক', 'g': 'গ', 'j': 'জ', 't': 'ট',
+    'd': 'ড', 'n': 'ন', 'p': 'প', 'f': 'ফ', 'b': 'ব', 'm': 'ম', 'r': 'র', 'l': 'ল', 's': 'স', 'h': 'হ',
+    'v': 'ভ', 'w': 'ও', 'z': 'জ', 'q': 'ক', 'y': 'য়',
+}
+HASANTA = '্'
+_LATIN_KEYS = sorted(list(VOWELS) + list(CONSONANTS), key=len, reverse=True)
+
+
+def transliterate(word: str) -> str:
+    """
+    Spell a Latin brand name in Bangla by rule, e.g. "Seclo" becomes "সেক্লো".
+
+    The rules are phonetic approximations; known brands should come from the
+    dictionary instead.
+    """
+    text = word.lower()
+    output: List[str] = []
+    previous = None  # 'vowel', 'consonant' or None at the start of a word
+    index = 0
+    while index < len(text):
+        key = next((key for key in _LATIN_KEYS if text.startswith(key, index)), None)
+        if key is None:
+            char = text[index]
+            output.append(char.translate(BANGLA_DIGITS))
+            previous = None
+            index += 1
+            continue
+        # A soft "c" before e, i and y sounds like "s", and a leading "x" like "z"
+        if key == 'c' and text[index + 1:index + 2] in ('e', 'i', 'y'):
+            key_bn, kind = 'স', 'consonant'
+        elif key == 'x' and index == 0:
+            key_bn, kind = 'জ', 'consonant'
+        elif key == 'e' and index == len(text) - 1 and previous == 'consonant':
+            # A final "e" after a consonant is silent ("-ine", "-one")
+            break
+        elif key in VOWELS:
+            independent, sign = VOWELS[key]
+            key_bn, kind = (sign if previous == 'consonant' else independent), 'vowel'
+        elif key == 'y' and previous == 'consonant':
+            # A trailing or medial "y" after a consonant is a vowel sound
+            key_bn, kind = 'ি', 'vowel'
+        else:
+            key_bn, kind = CONSONANTS[key], 'consonant'
+        if kind == 'consonant' and previous == 'consonant':
+            output.append(HASANTA)
+        output.append(key_bn)
+        previous = kind
+        index += len(key)
+    return ''.join(output)
+
+
+class BrandDictionary:
+    """Bangla spellings of brand names, matched case-insensitively on whole leading words."""
+
+    def __init__(self, names: Optional[Dict[str, str]] = None):
+        self.names = {self.normalize(brand): bangla for brand, bangla in (names or {}).items()}
+        self.max_words = max((len(brand.split()) for brand in self.names), default=0)
+
+    @staticmethod
+    def normalize(brand: str) -> str:
+        return ' '.join(brand.lower().split())
+
+    @classmethod
+    def load(cls, path: str) -> 'BrandDictionary':
+        try:
+            with open(path, encoding='utf-8') as f:
+                return cls(json.load(f))
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not load medicine brands {path}: {str(e)}")
+            return cls()
+
+    def lookup(self, brand: str) -> Tuple[str, bool]:
+        """
+        Return the Bangla brand name and whether all of it came from the dictionary.
+
+        The longest known prefix of the brand's words is looked up; the remaining
+        words are transliterated.
+        """
+        words = brand.split()
+        for size in range(min(len(words), self.max_words), 0, -1):
+            bangla = self.names.get(self.normalize(' '.join(words[:size])))
+            if bangla is not None:
+                rest = [transliterate(word) for word in words[size:]]
+                return ' '.join([bangla] + rest), size == len(words)
+        return ' '.join(transliterate(word) for word in words), False
+
+
+_brands: Optional[BrandDictionary] = None
+_brands_lock = threading.Lock()
+
+
+def get_brand_dictionary() -> BrandDictionary:
+    """Return the process-wide brand dictionary, loading it on first use."""
+    global _brands
+    if _brands is None:
+        with _brands_lock:
+            if _brands is None:
+                _brands = BrandDictionary.load(MEDICINE_BRANDS_FILE)
+    return _brands
+
+
+# Parsing
+
+def format_strength(strength: str) -> Tuple[str, str]:
+    """Return the English and Bangla spelling of a strength such as "500mg+125mg" or "250 mg/5 ml"."""
+    doses_en, doses_bn = [], []
+    parts = [part.strip() for part in strength.split('+')]
+    # "500+125 mg": the last unit applies to every dose without one
+    last_unit = None
+    for part in reversed(parts):
+        match = DOSE_PATTERN.fullmatch(part)
+        if match and match.group(2):
+            last_unit = match.group(2)
+            break
+    for part in parts:
+        match = DOSE_PATTERN.fullmatch(part)
+        if not match:
+            return strength, strength.translate(BANGLA_DIGITS)
+        amount, unit, per_amount, per_unit = match.groups()
+        unit_en, unit_bn = UNITS.get((unit or last_unit or '').lower(), ('', ''))
+        english = f"{amount}{unit_en}"
+        bangla = _bangla_quantity(amount, unit_bn)
+        if per_unit:
+            per_en, per_bn = UNITS[per_unit.lower()]
+            english += f"/{per_amount or ''}{per_en}"
+            bangla += f"/{_bangla_quantity(per_amount or '', per_bn)}"
+        doses_en.append(english)
+        doses_bn.append(bangla)
+    return '+'.join(doses_en), '+'.join(doses_bn)
+
+
+def _bangla_quantity(amount: str, unit_bn: str) -> str:
+    # Bangla puts a space between the number and the unit, except for percentages
+    separator = '' if unit_bn == '%' or not amount else ' '
+    return f"{amount.translate(BANGLA_DIGITS)}{separator}{unit_bn}".strip()
+
+
+def _product_head(content: str) -> str:
+    # The product name is at the start of the content, before any details
+    head = HEAD_END_PATTERN.split(content.strip(), maxsplit=1)[0]
+    return ' '.join(head.split())[:120]
+
+
+def _clean_brand(text: str) -> str:
+    words = text.strip(' -–.').split()
+    while words and words[0].lower() in LEADING_WORDS:
+        words.pop(0)
+    return ' '.join(words)
+
+
+def parse_medicine_name(content: str, brands: Optional[BrandDictionary] = None) -> Optional[MedicineName]:
+    """
+    Parse the brand, strength and dosage form at the start of medicine content.
+
+    Args:
+        content (str): Product content starting with the product name
+        brands (BrandDictionary): Brand spellings; defaults to the process-wide dictionary
+
+    Returns:
+        MedicineName: The parsed names with a confidence between 0 and 1, or None
+        if no brand name could be found
+    """
+    head = _product_head(content or '')
+    if not head or not head[0].isascii():
+        return None
+
+    strength_match = next(
+        (match for match in STRENGTH_PATTERN.finditer(head) if UNIT_END_PATTERN.search(match.group(0))), None
+    )
+    form_match = FORM_PATTERN.search(head)
+    if form_match is None and strength_match is None:
+        return None
+    # The brand is what comes before the strength and the form ("Napa 500mg Tablet", "Napa Tab. 500mg")
+    brand_end = min(match.start() for match in (strength_match, form_match) if match)
+    brand = _clean_brand(head[:brand_end])
+    if not brand or not brand[0].isalpha() or len(brand.split()) > MAX_BRAND_WORDS:
+        return None
+
+    confidence = 0.0
+    brand_bn, known = (brands or get_brand_dictionary()).lookup(brand)
+    confidence += KNOWN_BRAND_WEIGHT if known else TRANSLITERATED_BRAND_WEIGHT
+
+    strength_en = strength_bn = ''
+    if strength_match:
+        strength_en, strength_bn = format_strength(strength_match.group(0))
+        confidence += STRENGTH_WEIGHT
+
+    form_en = form_bn = ''
+    if form_match:
+        form_en, form_bn = FORMS[form_match.group(1).lower()]
+        confidence += DOSAGE_FORM_WEIGHT
+
+    return MedicineName(
+        brand=brand,
+        strength=strength_en,
+        form=form_en,
+        name_en=' '.join(part for part in (brand, strength_en, form_en) if part),
+        name_bn=' '.join(part for part in (brand_bn, strength_bn, form_bn) if part),
+        confidence=round(confidence, 2),
+    )
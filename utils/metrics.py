@@ -0,0 +1,331 @@
+"""
+Lightweight latency and event instrumentation.
+
+Each request gets a timeline, kept in a contextvar so the executors' worker
+threads record into it too. ``timed(stage)`` measures one stage (page fetch,
+HTML extraction, an LLM call, a generator...) and ``record_event(event)`` records
+retries, fallbacks and cache results. The app returns the timeline in a
+``Server-Timing`` header, and everything is aggregated into Prometheus
+histograms and counters labelled by endpoint, served at ``/metrics``.
+
+When metrics are disabled, ``timed`` hands back a shared no-op context manager
+and ``record_event`` returns at once.
+"""
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .constants import METRICS_ENABLED, METRICS_BUCKETS
+
+BACKGROUND_ENDPOINT = 'background'
+
+# Help text of the exported metrics
+METRIC_HELP = {
+    'seo_request_duration_seconds': 'Request latency by endpoint',
+    'seo_stage_duration_seconds': 'Time spent in each stage of a request',
+    'seo_events_total': 'Retries, fallbacks and cache results by endpoint',
+    'seo_llm_calls_saved_total': 'LLM calls avoided by coalescing and idempotent replays',
+    'seo_content_tokens_total': 'Estimated tokens of product content before and after condensation',
+}
+
+
+class Timeline:
+    """Stage durations and event counts of one request."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+        self.events: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add_stage(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages.setdefault(stage, []).append(seconds)
+
+    def add_event(self, event: str) -> None:
+        with self._lock:
+            self.events[event] = self.events.get(event, 0) + 1
+
+    def server_timing(self) -> str:
+        """Format the timeline as a Server-Timing header value (durations in milliseconds)."""
+        with self._lock:
+            stages = list(self.stages.items())
+            events = list(self.events.items())
+        entries = []
+        for stage, durations in stages:
+            entry = f"{stage};dur={sum(durations) * 1000:.1f}"
+            if len(durations) > 1:
+                entry += f';desc="{len(durations)} calls"'
+            entries.append(entry)
+        # Events carry no duration; their count goes in the description
+        entries.extend(f'{event};desc="{count}"' for event, count in events)
+        entries.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ', '.join(entries)
+
+
+class Histogram:
+    """Cumulative Prometheus histogram with one series per label set."""
+
+    def __init__(self, buckets: Tuple[float, ...] = METRICS_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.series: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[Tuple[str, str], ...], value: float) -> None:
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                # Bucket counts, then sum and count
+                series = self.series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self, name: str) -> List[str]:
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self.series.items())
+        lines = []
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {series[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {series[-2]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    """Prometheus counter with one series per label set."""
+
+    def __init__(self):
+        self.series: Dict[Tuple[Tuple[str, str], ...], int] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[Tuple[str, str], ...], amount: int = 1) -> None:
+        with self._lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self, name: str) -> List[str]:
+        with self._lock:
+            items = sorted(self.series.items())
+        return [f"{name}{_format_labels(labels)} {value}" for labels, value in items]
+
+
+def _format_value(value: float) -> str:
+    return f"{value:g}"
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+_timeline: contextvars.ContextVar[Optional[Timeline]] = contextvars.ContextVar('metrics_timeline', default=None)
+_event_counts: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar('event_counts', default=None)
+_event_counts_lock = threading.Lock()
+
+request_duration = Histogram()
+stage_duration = Histogram()
+events = Counter()
+calls_saved = Counter()
+content_tokens = Counter()
+
+
+def start_request(endpoint: Optional[str]):
+    """Start the timeline of a request; returns a token for ``finish_request``."""
+    if not METRICS_ENABLED:
+        return None
+    return _timeline.set(Timeline(endpoint or 'unknown'))
+
+
+def current_timeline() -> Optional[Timeline]:
+    """Return the timeline of the current request, if any."""
+    return _timeline.get()
+
+
+def _observe_request(timeline: Timeline, status: Optional[int]) -> None:
+    labels = (('endpoint', timeline.endpoint),)
+    if status is not None:
+        labels += (('status', str(status)),)
+    request_duration.observe(labels, time.perf_counter() - timeline.started)
+
+
+def finish_request(token, status: Optional[int] = None, observe: bool = True) -> None:
+    """
+    End the timeline of a request.
+
+    The request's total latency is recorded unless ``observe`` is False, which
+    is the case for a streamed response that ``track_stream`` records instead.
+    """
+    if token is None:
+        return
+    timeline = _timeline.get()
+    if timeline is not None and observe:
+        _observe_request(timeline, status)
+    _timeline.reset(token)
+
+
+def track_stream(iterable: Iterable[Any], status: Optional[int] = None) -> Iterable[Any]:
+    """
+    Keep the current timeline for a streamed response body.
+
+    The body is produced after the view has returned, so the stages it runs are
+    recorded on the request's timeline and its latency covers the whole stream.
+    """
+    timeline = _timeline.get()
+    if timeline is None:
+        return iterable
+    return _tracked(iterable, timeline, status)
+
+
+def _tracked(iterable: Iterable[Any], timeline: Timeline, status: Optional[int]) -> Iterator[Any]:
+    iterator = iter(iterable)
+    try:
+        while True:
+            # Only while the body is being produced, not between the chunks
+            token = _timeline.set(timeline)
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _timeline.reset(token)
+            yield chunk
+    finally:
+        if hasattr(iterator, 'close'):
+            iterator.close()
+        _observe_request(timeline, status)
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    """Record the duration of a stage that was measured elsewhere."""
+    timeline = _timeline.get()
+    endpoint = timeline.endpoint if timeline is not None else BACKGROUND_ENDPOINT
+    stage_duration.observe((('endpoint', endpoint), ('stage', stage)), seconds)
+    if timeline is not None:
+        timeline.add_stage(stage, seconds)
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+@contextmanager
+def _timer(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def timed(stage: str):
+    """Context manager measuring one stage; a no-op when metrics are disabled."""
+    if not METRICS_ENABLED:
+        return _NOOP_TIMER
+    return _timer(stage)
+
+
+def instrument(stage: str) -> Callable[[Callable], Callable]:
+    """Decorator measuring every call of a function (or coroutine function) as ``stage``; leaves it untouched when disabled."""
+    def decorator(fn: Callable) -> Callable:
+        if not METRICS_ENABLED:
+            return fn
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with _timer(stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_event(event: str, **labels: Any) -> None:
+    """
+    Count an event such as ``record_event('llm_retry', reason='throttled')``.
+
+    The labels become part of the event name in the Server-Timing header
+    (``llm_retry.throttled``) and labels of ``seo_events_total``.
+    """
+    counts = _event_counts.get()
+    if counts is not None:
+        with _event_counts_lock:
+            counts[event] = counts.get(event, 0) + 1
+    if not METRICS_ENABLED:
+        return
+    timeline = _timeline.get()
+    endpoint = timeline.endpoint if timeline is not None else BACKGROUND_ENDPOINT
+    label_items = tuple(sorted((key, str(value)) for key, value in labels.items()))
+    events.inc((('endpoint', endpoint), ('event', event)) + label_items)
+    if timeline is not None:
+        timeline.add_event('.'.join([event] + [value for _, value in label_items]))
+
+
+@contextmanager
+def count_events() -> Iterator[Dict[str, int]]:
+    """Count the events recorded inside the ``with`` block, including its worker threads, by name."""
+    counts: Dict[str, int] = {}
+    token = _event_counts.set(counts)
+    try:
+        yield counts
+    finally:
+        _event_counts.reset(token)
+
+
+def record_saved_calls(reason: str, calls: int) -> None:
+    """Count LLM calls that a duplicate request did not have to make."""
+    if not METRICS_ENABLED or calls <= 0:
+        return
+    timeline = _timeline.get()
+    endpoint = timeline.endpoint if timeline is not None else BACKGROUND_ENDPOINT
+    calls_saved.inc((('endpoint', endpoint), ('reason', reason)), calls)
+
+
+def record_content_tokens(raw: int, condensed: int) -> None:
+    """Count the estimated tokens of product content before and after condensation."""
+    if not METRICS_ENABLED:
+        return
+    timeline = _timeline.get()
+    endpoint = timeline.endpoint if timeline is not None else BACKGROUND_ENDPOINT
+    content_tokens.inc((('endpoint', endpoint), ('stage', 'raw')), raw)
+    content_tokens.inc((('endpoint', endpoint), ('stage', 'condensed')), condensed)
+
+
+def render_prometheus() -> str:
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    for name, metric, kind in (
+        ('seo_request_duration_seconds', request_duration, 'histogram'),
+        ('seo_stage_duration_seconds', stage_duration, 'histogram'),
+        ('seo_events_total', events, 'counter'),
+        ('seo_llm_calls_saved_total', calls_saved, 'counter'),
+        ('seo_content_tokens_total', content_tokens, 'counter'),
+    ):
+        lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.extend(metric.render(name))
+    return '\n'.join(lines) + '\n'
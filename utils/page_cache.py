@@ -0,0 +1,184 @@
+"""
+Persistent cache of extracted pages keyed on canonical URLs.
+
+Each entry keeps the extracted ``{title, description, content}`` record with the
+ETag and Last-Modified validators of the response it came from, so a stale
+entry can be revalidated with a conditional GET and reused on ``304 Not Modified``
+without downloading or parsing the page again.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from .constants import (
+    PAGE_CACHE_ENABLED, PAGE_CACHE_DB_FILE, PAGE_CACHE_MAX_AGE, PAGE_CACHE_MAX_ENTRIES, PAGE_CACHE_MAX_STALE,
+    TRACKING_QUERY_PARAMS, TRACKING_QUERY_PREFIXES
+)
+from .sqlite_store import connect, get_db_path, transaction
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Run the eviction check once every this many stored pages
+EVICTION_INTERVAL = 100
+
+
+def is_tracking_param(name: str) -> bool:
+    """Check whether a query parameter only tracks the visitor."""
+    name = name.lower()
+    return name in TRACKING_QUERY_PARAMS or name.startswith(TRACKING_QUERY_PREFIXES)
+
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a URL so equivalent product URLs share one cache entry.
+
+    The scheme and host are lowercased, default ports and fragments removed,
+    tracking parameters dropped and the remaining query parameters sorted.
+    """
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or 'https').lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or '/'
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(name)
+    ))
+    return urlunsplit((scheme, host, path, query, ''))
+
+
+class PageCache:
+    """SQLite-backed page cache shared by every worker process."""
+
+    def __init__(self, path: str, max_age: int = PAGE_CACHE_MAX_AGE, max_stale: int = PAGE_CACHE_MAX_STALE,
+                 max_entries: int = PAGE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_age = max_age
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._counters = {'hits': 0, 'revalidated': 0, 'misses': 0, 'evictions': 0}
+        conn = connect(self.path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                record TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                validated_at REAL NOT NULL
+            )
+        """)
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_pages_validated ON pages (validated_at)')
+        # Requested URLs whose page declared a different rel=canonical URL
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS aliases (
+                url TEXT PRIMARY KEY,
+                canonical_url TEXT NOT NULL
+            )
+        """)
+
+    def count(self, name: str) -> None:
+        """Increment one of the hit/revalidated/miss counters."""
+        with self._lock:
+            self._counters[name] += 1
+
+    def resolve(self, url: str) -> str:
+        """Follow a rel=canonical alias recorded for a canonicalized URL."""
+        row = connect(self.path).execute('SELECT canonical_url FROM aliases WHERE url = ?', (url,)).fetchone()
+        return row['canonical_url'] if row else url
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """Return the cache entry for a canonicalized URL, or None if missing or too stale."""
+        row = connect(self.path).execute(
+            'SELECT url, record, etag, last_modified, fetched_at, validated_at FROM pages WHERE url = ?',
+            (self.resolve(url),)
+        ).fetchone()
+        if row is None or time.time() - row['validated_at'] > self.max_stale:
+            return None
+        entry = dict(row)
+        entry['record'] = json.loads(entry['record'])
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        """Check whether an entry can be served without revalidation."""
+        return time.time() - entry['validated_at'] <= self.max_age
+
+    def put(self, url: str, record: Dict[str, str], etag: Optional[str], last_modified: Optional[str],
+            canonical_url: Optional[str] = None) -> None:
+        """Store an extracted record, optionally under the page's own canonical URL."""
+        now = time.time()
+        key = canonical_url or url
+        conn = connect(self.path)
+        with transaction(conn):
+            conn.execute(
+                'INSERT OR REPLACE INTO pages (url, record, etag, last_modified, fetched_at, validated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (key, json.dumps(record, ensure_ascii=False), etag, last_modified, now, now)
+            )
+            if key != url:
+                conn.execute('INSERT OR REPLACE INTO aliases (url, canonical_url) VALUES (?, ?)', (url, key))
+        with self._lock:
+            self._writes += 1
+            due = self._writes % EVICTION_INTERVAL == 0
+        if due:
+            self.evict()
+
+    def touch(self, url: str) -> None:
+        """Mark an entry as just revalidated."""
+        connect(self.path).execute('UPDATE pages SET validated_at = ? WHERE url = ?', (time.time(), url))
+
+    def evict(self) -> int:
+        """Drop entries too stale to revalidate, then the least recently validated ones past ``max_entries``."""
+        conn = connect(self.path)
+        with transaction(conn):
+            removed = conn.execute(
+                'DELETE FROM pages WHERE validated_at < ?', (time.time() - self.max_stale,)
+            ).rowcount
+            excess = conn.execute('SELECT COUNT(*) FROM pages').fetchone()[0] - self.max_entries
+            if excess > 0:
+                removed += conn.execute(
+                    'DELETE FROM pages WHERE url IN (SELECT url FROM pages ORDER BY validated_at LIMIT ?)', (excess,)
+                ).rowcount
+            # Aliases of dropped pages would only lead to misses
+            conn.execute('DELETE FROM aliases WHERE canonical_url NOT IN (SELECT url FROM pages)')
+        with self._lock:
+            self._counters['evictions'] += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/revalidate/miss/eviction counters for this process and the number of stored pages."""
+        with self._lock:
+            stats = dict(self._counters)
+        try:
+            stats['entries'] = connect(self.path).execute('SELECT COUNT(*) FROM pages').fetchone()[0]
+        except sqlite3.Error:
+            pass
+        return stats
+
+
+_cache: Optional[PageCache] = None
+_cache_lock = threading.Lock()
+_cache_failed = False
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """Return the process-wide page cache, or None when it is disabled or unavailable."""
+    global _cache, _cache_failed
+    if not PAGE_CACHE_ENABLED or _cache_failed:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None and not _cache_failed:
+                try:
+                    _cache = PageCache(get_db_path(PAGE_CACHE_DB_FILE))
+                except (sqlite3.Error, OSError) as e:
+                    logging.error(f"Disabling page cache: {str(e)}")
+                    _cache_failed = True
+    return _cache
@@ -0,0 +1,118 @@
+"""
+Multi-pattern matching with an Aho-Corasick automaton.
+
+All terms are compiled into one automaton, so a text is scanned once no matter
+how many terms there are: the cost grows with the length of the text and the
+number of matches, not with the size of the term list.
+"""
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def _is_boundary(text: str, index: int) -> bool:
+    # Terms must match whole words: ASCII letters and digits and the Bengali block (letters, vowel signs,
+    # digits) continue a word, so "চা" (tea) does not match inside "চাকরি"
+    if index < 0 or index >= len(text):
+        return True
+    char = text[index]
+    return not ((char.isascii() and char.isalnum()) or '\u0980' <= char <= '\u09ff')
+
+
+class PatternMatcher:
+    """
+    Finds every occurrence of a set of labelled terms in a text.
+
+    Terms and texts are lowercased. Matches must start and end at a word
+    boundary, so "gel" does not match inside "angel".
+
+    Args:
+        terms (Iterable[Tuple[str, str]]): ``(term, label)`` pairs to match
+    """
+
+    def __init__(self, terms: Optional[Iterable[Tuple[str, str]]] = None):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._terms: List[List[Tuple[str, str]]] = [[]]
+        self._fail: List[int] = []
+        self._output: List[List[Tuple[str, str]]] = []
+        self._built = False
+        self.size = 0
+        for term, label in terms or ():
+            self.add(term, label)
+
+    def add(self, term: str, label: str) -> None:
+        """Add a term; the automaton is rebuilt on the next search."""
+        term = ' '.join(term.lower().split())
+        if not term:
+            return
+        node = 0
+        for char in term:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._terms.append([])
+            node = next_node
+        if (term, label) not in self._terms[node]:
+            self._terms[node].append((term, label))
+            self.size += 1
+            self._built = False
+
+    def build(self) -> None:
+        """Compute the failure links breadth first, so the text never has to be scanned again."""
+        fail = [0] * len(self._goto)
+        output = [list(terms) for terms in self._terms]
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                # The failure link is the longest proper suffix of the child that is also a prefix
+                suffix = fail[node]
+                while suffix and char not in self._goto[suffix]:
+                    suffix = fail[suffix]
+                fail[child] = self._goto[suffix].get(char, 0)
+                # Every term ending at that suffix also ends here
+                output[child].extend(output[fail[child]])
+                queue.append(child)
+        self._fail = fail
+        self._output = output
+        self._built = True
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, str, str]]:
+        """Yield ``(start, end, term, label)`` for every match in the lowercased text."""
+        if not self._built:
+            self.build()
+        text = text.lower()
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for term, label in output[node]:
+                start = index - len(term) + 1
+                if _is_boundary(text, start - 1) and _is_boundary(text, index + 1):
+                    yield start, index + 1, term, label
+
+    def findall(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """
+        Return the leftmost-longest matches, none overlapping another.
+
+        A longer term wins over the terms inside it, so "tablet pc" is one match
+        rather than also matching "tablet".
+        """
+        matches = sorted(self.finditer(text), key=lambda match: (match[0], match[0] - match[1]))
+        selected = []
+        end = -1
+        for match in matches:
+            if match[0] >= end:
+                selected.append(match)
+                end = match[1]
+        return selected
+
+    def count_labels(self, text: str) -> Dict[str, int]:
+        """Return the number of leftmost-longest matches of each label in the text."""
+        counts: Dict[str, int] = {}
+        for _, _, _, label in self.findall(text):
+            counts[label] = counts.get(label, 0) + 1
+        return counts
@@ -0,0 +1,152 @@
+"""
+Per-request facts about a product, computed once and shared by every generator.
+
+Building a ``ProductContext`` normalizes the content, classifies it against the
+category taxonomy in a single pass, measures how much of it is Bengali and
+resolves the company name to present, so the title, description, keyword and
+product description services no longer each re-scan the content.
+"""
+import json
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from .constants import (
+    MEDICINE_KEYWORDS, MEDICINE_CATEGORY, TAXONOMY_FILE, BENGALI_TEXT_RATIO,
+    DEFAULT_COMPANY_NAME, DEFAULT_PHARMACY_NAME, DEFAULT_SHOP_NAME
+)
+from .pattern_matcher import PatternMatcher
+from .text_processor import clean_text
+
+# Bengali Unicode block
+BENGALI_PATTERN = re.compile(r'[\u0980-\u09FF]')
+# Bengali terms also match with the definite article or plural attached, e.g. "ট্যাবলেটটি"
+BENGALI_SUFFIXES = ('টি', 'টা', 'গুলো', 'গুলি')
+
+
+@dataclass(frozen=True)
+class ProductContext:
+    """
+    What the generators need to know about a product.
+
+    Attributes:
+        content (str): The content as given
+        text (str): The content with whitespace collapsed
+        categories (Dict[str, int]): Number of taxonomy matches per category
+        category (str): The category with the most matches, or '' when nothing matched
+        is_medicine (bool): Whether the category is medicine
+        bengali_ratio (float): Share of the characters that are Bengali
+        company_name (str): The company name as requested
+        display_company_name (str): The requested name, or the default pharmacy or shop name
+    """
+    content: str
+    text: str
+    categories: Dict[str, int]
+    category: str
+    is_medicine: bool
+    bengali_ratio: float
+    company_name: str
+    display_company_name: str
+
+    @property
+    def is_bengali(self) -> bool:
+        return self.bengali_ratio > BENGALI_TEXT_RATIO
+
+
+def bengali_ratio(text: str) -> float:
+    """Return the share of Bengali characters in a text."""
+    if not text:
+        return 0.0
+    # Counting what the substitution removed avoids building a list of matches
+    return (len(text) - len(BENGALI_PATTERN.sub('', text))) / len(text)
+
+
+def is_bengali_text(text: str) -> bool:
+    """Determine if the text is mostly Bengali."""
+    return bengali_ratio(text) > BENGALI_TEXT_RATIO
+
+
+def _term_variants(term: str) -> Tuple[str, ...]:
+    # Latin terms also match their plural, Bengali terms their suffixed forms
+    if BENGALI_PATTERN.search(term):
+        return (term,) + tuple(term + suffix for suffix in BENGALI_SUFFIXES)
+    if not term.isascii() or term.endswith('s'):
+        return (term,)
+    return (term, f"{term}es" if term.endswith(('x', 'ch', 'sh')) else f"{term}s")
+
+
+def load_taxonomy(path: str = TAXONOMY_FILE) -> PatternMatcher:
+    """Compile the category taxonomy, always including the medicine keywords."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            taxonomy = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.error(f"Could not load taxonomy {path}: {str(e)}")
+        taxonomy = {}
+    taxonomy.setdefault(MEDICINE_CATEGORY, [])
+
+    matcher = PatternMatcher()
+    for category, terms in taxonomy.items():
+        for term in list(terms) + (MEDICINE_KEYWORDS if category == MEDICINE_CATEGORY else []):
+            for variant in _term_variants(term.lower()):
+                matcher.add(variant, category)
+    matcher.build()
+    return matcher
+
+
+_classifier: Optional[PatternMatcher] = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> PatternMatcher:
+    """Return the process-wide taxonomy matcher, compiling it on first use."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = load_taxonomy()
+    return _classifier
+
+
+def resolve_company_name(company_name: str, is_medicine: bool) -> str:
+    """Use a custom company name as given, otherwise the default pharmacy or shop name."""
+    if company_name and company_name != DEFAULT_COMPANY_NAME:
+        return company_name
+    return DEFAULT_PHARMACY_NAME if is_medicine else DEFAULT_SHOP_NAME
+
+
+def build_product_context(content: str, company_name: str = DEFAULT_COMPANY_NAME) -> ProductContext:
+    """
+    Analyze product content once for all generators.
+
+    Args:
+        content (str): The product content
+        company_name (str): Company name requested by the user
+
+    Returns:
+        ProductContext: Classification, script profile and company name of the product
+    """
+    content = content or ''
+    text = clean_text(content)
+    categories = get_classifier().count_labels(text)
+    # Dosage forms such as "tablet" or "emulsion" also name other products, so medicine has to lead outright;
+    # other ties go to the category matched first
+    category = max(categories, key=lambda label: (categories[label], label != MEDICINE_CATEGORY)) if categories else ''
+    is_medicine = category == MEDICINE_CATEGORY
+    return ProductContext(
+        content=content,
+        text=text,
+        categories=categories,
+        category=category,
+        is_medicine=is_medicine,
+        bengali_ratio=bengali_ratio(content),
+        company_name=company_name,
+        display_company_name=resolve_company_name(company_name, is_medicine),
+    )
+
+
+def is_medicine_product(content: str) -> bool:
+    """Determine if the content is about a medicine product."""
+    return build_product_context(content).is_medicine
@@ -1,5 +1,9 @@
 # Templates for AI Prompt Generation
 
+# Version of the generation prompts, here and in the title, description and keyword services.
+# Bump it whenever a prompt changes, so incremental catalog runs regenerate every product.
+PROMPT_TEMPLATE_VERSION = '1'
+
 def get_meta_description_prompt(content: str, company_name: str, max_length: int) -> str:
     """Generate a prompt for SEO-optimized meta description."""
     return f"""
@@ -42,6 +46,59 @@ Requirements:
 12. Ensure a minimum of 160 characters.
 """
 
+def get_seo_bundle_prompt(content: str, company_name: str, description_company: str, is_medicine: bool,
+                          keyword_count: int, max_length: int) -> str:
+    """Generate a single prompt that returns title parts, meta description and keywords as JSON."""
+    if is_medicine:
+        title_fields = """  "name_en": "English Name Strength Type",
+  "name_bn": "বাংলা নাম স্ট্রেংথ টাইপ","""
+        title_rules = """- "name_en"/"name_bn" example: "Sergel 20mg Capsule" / "সারজেল ২০ মি.গ্রা. ক্যাপসুল"
+- Keep strength format exact (mg, ml, etc) and preserve medicine type (Capsule, Tablet, etc)
+- Maintain Bangla numerals and units in "name_bn"
+- Focus only on medicine name, strength, and type"""
+        keyword_rules = """- Include medicine name, generic name, purpose, and symptoms or conditions treated
+- Use Bangla medical terms where appropriate
+- Do not include brand names of other medicines"""
+    else:
+        title_fields = """  "product_info": "Product Type Key Features","""
+        title_rules = """- "product_info" example: "Baby Shoes Winter Plush Soft Sole Newborn Baby Girl Princess"
+- Keep product type concise (e.g., Shoes, Clothes, etc.) and highlight unique selling points
+- Avoid redundancy"""
+        keyword_rules = """- Include product type, features, and benefits
+- Use Bangla product terms where appropriate
+- Avoid generic terms with high competition"""
+
+    return f"""
+Generate SEO metadata for this product:
+"{content}"
+
+Respond with ONLY a JSON object in this exact structure:
+{{
+{title_fields}
+  "meta_description": "Get [Product Name] ([বাংলা নাম]) at [Benefits...]",
+  "keywords": ["keyword 1", "keyword 2"]
+}}
+
+Title rules:
+{title_rules}
+
+Meta description rules:
+- Use EXACTLY this format: "Get [Product Name] ([বাংলা নাম]) at [Benefits...]"
+- Skip Words: 'Daraz', 'Aroggga.com', 'Arogga', 'Daraz.com.bd', 'MedEx', 'Medex.com', 'Medex.com.bd','MedEasy'
+- Keep ALL Bangla (বাংলা) words exactly as written
+- Include specific benefits and uses, focused on key product features
+- Maintain a minimum of {max_length} characters and end with a complete sentence
+- Use NO line breaks or special formatting
+- Always include "{description_company}"
+- Do NOT copy input words directly
+
+Keyword rules:
+- Exactly {keyword_count} keywords, each 1-4 words long
+- Focus on high search volume terms and include both English and Bangla terms
+- At least 3 keywords MUST include the brand name "{company_name}" (your e-commerce name)
+{keyword_rules}
+"""
+
 # Example usage
 if __name__ == "__main__":
     content_example = "Best quality headphones with superior sound and comfort."
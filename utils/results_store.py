@@ -0,0 +1,233 @@
+"""
+Persistent store of every generated result.
+
+Titles, meta descriptions, keywords and product descriptions are recorded as
+they are generated, with the product's SKU and/or URL, the company name and the
+time, so they can be looked up or exported to the shop later instead of being
+lost with the HTTP response. Lookups and exports page by row id (keyset
+pagination): every page is one indexed range query, so reading the hundred
+thousandth page costs the same as the first and an export never holds more
+than one page in memory.
+"""
+import csv
+import io
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .constants import RESULTS_ENABLED, RESULTS_DB_FILE, RESULTS_EXPORT_BATCH_SIZE
+from .sqlite_store import connect, get_db_path
+from .url_service import normalize_url
+
+RESULT_KINDS = ('seo', 'product_description')
+EXPORT_FORMATS = ('ndjson', 'csv')
+CSV_COLUMNS = ('id', 'created_at', 'kind', 'sku', 'url', 'company_name', 'source', 'title', 'description',
+               'keywords', 'product_description')
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a time filter given as Unix seconds or an ISO 8601 date or datetime (UTC unless it has an offset).
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def format_time(timestamp: float) -> str:
+    """Format Unix seconds as an ISO 8601 UTC datetime."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat(timespec='seconds').replace('+00:00', 'Z')
+
+
+class ResultsStore:
+    """SQLite table of generated results, written by every worker process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        conn = connect(self.path)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at REAL NOT NULL,
+                kind TEXT NOT NULL,
+                sku TEXT,
+                url TEXT,
+                company_name TEXT NOT NULL,
+                source TEXT NOT NULL,
+                title TEXT,
+                description TEXT,
+                keywords TEXT,
+                product_description TEXT
+            )
+        """)
+        # Every lookup filters on one of these and pages by id
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_results_sku ON results (sku, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_results_url ON results (url, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_results_company ON results (company_name, id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_results_created ON results (created_at)')
+
+    def add(self, kind: str, fields: Dict[str, Any], company_name: str, sku: Optional[str] = None,
+            url: Optional[str] = None, source: str = '') -> int:
+        """
+        Record one generated result.
+
+        Args:
+            kind (str): "seo" for title, description and keywords, or "product_description"
+            fields (Dict[str, Any]): The generated fields ('title', 'description', 'keywords'
+                or 'product_description')
+            company_name (str): Company name the result was generated for
+            sku (str): The product's SKU or id, when known
+            url (str): The product page's URL, when known
+            source (str): Endpoint or pipeline that generated it
+
+        Returns:
+            int: The id of the new row
+        """
+        keywords = fields.get('keywords')
+        product_description = fields.get('product_description')
+        return connect(self.path).execute(
+            'INSERT INTO results (created_at, kind, sku, url, company_name, source, title, description, keywords, '
+            'product_description) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (time.time(), kind, str(sku) if sku is not None else None, normalize_url(url) if url else None, company_name, source, fields.get('title'), fields.get('description'),
+             json.dumps(keywords, ensure_ascii=False) if keywords is not None else None,
+             json.dumps(product_description, ensure_ascii=False) if product_description is not None else None)
+        ).lastrowid
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        item = dict(row)
+        item['created_at'] = format_time(item['created_at'])
+        for column in ('keywords', 'product_description'):
+            if item[column] is not None:
+                item[column] = json.loads(item[column])
+        return item
+
+    def get(self, result_id: int) -> Optional[Dict[str, Any]]:
+        """Return one result by id, or None."""
+        row = connect(self.path).execute('SELECT * FROM results WHERE id = ?', (result_id,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def _where(self, sku: Optional[str], url: Optional[str], company_name: Optional[str], kind: Optional[str],
+               since: Optional[float], until: Optional[float], after: int) -> Tuple[str, List[Any]]:
+        clauses, params = ['id > ?'], [after]
+        url = normalize_url(url) if url else url
+        for column, value in (('sku', sku), ('url', url), ('company_name', company_name), ('kind', kind)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append('created_at >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('created_at < ?')
+            params.append(until)
+        return ' AND '.join(clauses), params
+
+    def query(self, sku: Optional[str] = None, url: Optional[str] = None, company_name: Optional[str] = None,
+              kind: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+              after: int = 0, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Return one page of results in id order.
+
+        Args:
+            sku (str): Only results for this SKU
+            url (str): Only results for this URL
+            company_name (str): Only results for this company
+            kind (str): Only "seo" or "product_description" results
+            since (float): Only results generated at or after this Unix time
+            until (float): Only results generated before this Unix time
+            after (int): Id of the last result of the previous page (0 for the first page)
+            limit (int): Maximum number of results
+
+        Returns:
+            List[Dict[str, Any]]: The results; the next page starts after the last id
+        """
+        where, params = self._where(sku, url, company_name, kind, since, until, after)
+        rows = connect(self.path).execute(
+            f"SELECT * FROM results WHERE {where} ORDER BY id LIMIT ?", params + [limit]
+        ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def iter_results(self, batch_size: int = RESULTS_EXPORT_BATCH_SIZE, **filters: Any) -> Iterator[Dict[str, Any]]:
+        """Yield every result matching the filters of ``query``, one page at a time."""
+        after = filters.pop('after', 0)
+        while True:
+            page = self.query(after=after, limit=batch_size, **filters)
+            yield from page
+            if len(page) < batch_size:
+                return
+            after = page[-1]['id']
+
+
+def export_ndjson(results: Iterator[Dict[str, Any]]) -> Iterator[str]:
+    """Format results as NDJSON lines."""
+    for item in results:
+        yield json.dumps(item, ensure_ascii=False) + '\n'
+
+
+def export_csv(results: Iterator[Dict[str, Any]], batch_size: int = RESULTS_EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Format results as CSV with a header row, in chunks of ``batch_size`` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
+    for item in results:
+        row = dict(item)
+        if isinstance(row.get('keywords'), list):
+            row['keywords'] = ', '.join(row['keywords'])
+        if row.get('product_description') is not None:
+            row['product_description'] = json.dumps(row['product_description'], ensure_ascii=False)
+        writer.writerow([row.get(column) for column in CSV_COLUMNS])
+        rows += 1
+        if rows % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+_store: Optional[ResultsStore] = None
+_store_lock = threading.Lock()
+_store_failed = False
+
+
+def get_results_store() -> Optional[ResultsStore]:
+    """Return the process-wide results store, or None when it is disabled or unavailable."""
+    global _store, _store_failed
+    if not RESULTS_ENABLED or _store_failed:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None and not _store_failed:
+                try:
+                    _store = ResultsStore(get_db_path(RESULTS_DB_FILE))
+                except (sqlite3.Error, OSError) as e:
+                    logging.error(f"Disabling the results store: {str(e)}")
+                    _store_failed = True
+    return _store
+
+
+def record_result(kind: str, fields: Dict[str, Any], company_name: str, sku: Optional[str] = None,
+                  url: Optional[str] = None, source: str = '') -> None:
+    """Record a generated result; failures are logged and never fail the generation."""
+    store = get_results_store()
+    if store is None:
+        return
+    try:
+        store.add(kind, fields, company_name, sku, url, source)
+    except sqlite3.Error as e:
+        logging.error(f"Could not record a {kind} result: {str(e)}")
@@ -0,0 +1,141 @@
+"""
+Service for generating title, meta description and keywords in a single AI call.
+"""
+import json
+from typing import Any, Dict, List, Optional
+
+from .ai_service import AIServiceError, LLMCall, Steps, arun_steps, run_steps
+from .constants import MAX_DESCRIPTION_LENGTH, DEFAULT_COMPANY_NAME
+from .prompt_templates import get_seo_bundle_prompt
+from .title_service import (
+    title_steps, fallback_title, format_medicine_title, format_regular_title, local_medicine_info
+)
+from .description_service import meta_description_steps, fallback_meta_description, finalize_meta_description
+from .keyword_service import keyword_steps, fallback_keywords, finalize_keywords, get_keyword_count
+from .metrics import instrument, record_event
+from .product_context import ProductContext, build_product_context
+
+
+def parse_bundle_response(response: str) -> Dict[str, Any]:
+    """Extract the JSON object from a bundle response, returning an empty dict when malformed."""
+    start_idx = response.find('{')
+    end_idx = response.rfind('}')
+    if start_idx < 0 or end_idx < start_idx:
+        record_event('invalid_json', stage='bundle')
+        return {}
+    try:
+        data = json.loads(response[start_idx:end_idx + 1])
+    except json.JSONDecodeError:
+        record_event('invalid_json', stage='bundle')
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _get_text(data: Dict[str, Any], key: str) -> str:
+    value = data.get(key)
+    return value.strip() if isinstance(value, str) else ''
+
+
+def _get_keywords(data: Dict[str, Any]) -> Optional[List[str]]:
+    value = data.get('keywords')
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list):
+        return None
+    keywords = [item.strip() for item in value if isinstance(item, str) and item.strip()]
+    return keywords or None
+
+
+@instrument('gen_bundle')
+def generate_seo_bundle(content: str, company_name: str = DEFAULT_COMPANY_NAME, count: int = 10,
+                        context: Optional[ProductContext] = None) -> Dict[str, Any]:
+    """
+    Generate title, meta description and keywords with one fused prompt.
+
+    Every field still goes through its usual formatting. A field that is missing
+    or malformed in the fused response falls back to its own per-field call.
+    When the fused call itself fails, every field gets its local fallback
+    without further calls.
+
+    Args:
+        content (str): The product content
+        company_name (str): Company name to include in the generated fields
+        count (int): Number of keywords to generate
+        context (ProductContext): Analysis of the content, built here when not given
+
+    Returns:
+        Dict[str, Any]: Dictionary with 'title', 'description' and 'keywords'
+    """
+    return run_steps(seo_bundle_steps(content, company_name, count, context))
+
+
+@instrument('gen_bundle')
+async def agenerate_seo_bundle(content: str, company_name: str = DEFAULT_COMPANY_NAME, count: int = 10,
+                               context: Optional[ProductContext] = None) -> Dict[str, Any]:
+    """Like ``generate_seo_bundle``, awaiting the Gemini calls."""
+    return await arun_steps(seo_bundle_steps(content, company_name, count, context))
+
+
+def seo_bundle_steps(content: str, company_name: str = DEFAULT_COMPANY_NAME, count: int = 10,
+                     context: Optional[ProductContext] = None) -> Steps[Dict[str, Any]]:
+    """Steps of ``generate_seo_bundle``."""
+    context = context or build_product_context(content, company_name)
+    if not content:
+        return {
+            'title': (yield from title_steps(content, company_name, context)),
+            'description': '',
+            'keywords': []
+        }
+
+    is_medicine = context.is_medicine
+    keyword_count = get_keyword_count(count)
+    prompt = get_seo_bundle_prompt(
+        content, company_name, context.display_company_name,
+        is_medicine, keyword_count, MAX_DESCRIPTION_LENGTH
+    )
+
+    # A confident local parse of the medicine name wins over the model's
+    local_names = local_medicine_info(content) if is_medicine else None
+    try:
+        data = parse_bundle_response((yield LLMCall(prompt)))
+    except AIServiceError:
+        # The call failed after its retries (quota, throttling or the deadline); per-field calls would fail too
+        return {
+            'title': format_medicine_title(*local_names, company_name) if local_names
+            else fallback_title(content, company_name),
+            'description': fallback_meta_description(content),
+            'keywords': fallback_keywords(content, company_name, context)
+        }
+
+    # Title
+    if local_names:
+        title = format_medicine_title(*local_names, company_name)
+    elif is_medicine and _get_text(data, 'name_en'):
+        title = format_medicine_title(_get_text(data, 'name_en'), _get_text(data, 'name_bn'), company_name)
+    elif not is_medicine and _get_text(data, 'product_info'):
+        title = format_regular_title(_get_text(data, 'product_info'), company_name)
+    else:
+        record_event('fallback', field='bundle_title')
+        title = yield from title_steps(content, company_name, context)
+
+    # Meta description
+    description = _get_text(data, 'meta_description')
+    if description:
+        description = finalize_meta_description(description, content)
+    else:
+        record_event('fallback', field='bundle_description')
+        description = yield from meta_description_steps(content, company_name, context)
+
+    # Keywords
+    keywords = _get_keywords(data)
+    if keywords:
+        keywords = finalize_keywords(keywords, content, keyword_count, company_name, context)
+    else:
+        record_event('fallback', field='bundle_keywords')
+        keywords = yield from keyword_steps(content, count, company_name=company_name, context=context)
+
+    return {
+        'title': title,
+        'description': description,
+        'keywords': keywords
+    }
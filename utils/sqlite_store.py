@@ -0,0 +1,54 @@
+"""
+Shared SQLite helpers for the local persistent stores.
+
+Every store opens its database through ``connect`` so all of them get the same
+settings: WAL journaling (readers never block the single writer), a generous
+busy timeout for concurrent Passenger/gunicorn workers, and one connection per
+thread and process.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from .constants import DATA_DIR
+
+_local = threading.local()
+
+
+def get_db_path(filename: str) -> str:
+    """Return the absolute path of a database file inside the data directory."""
+    return os.path.join(DATA_DIR, filename)
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Return this thread's connection to ``path``, opening it on first use."""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    # Connections must never cross a fork, so key them by process as well
+    key = (os.getpid(), path)
+    conn = connections.get(key)
+    if conn is None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=30000')
+        connections[key] = conn
+    return conn
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Run a block inside ``BEGIN IMMEDIATE`` so concurrent writers queue up cleanly."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
@@ -0,0 +1,210 @@
+"""
+Process start-up: warm-up of the lazily loaded libraries and an import-time profile.
+
+Passenger starts app processes on demand, so the time a new process takes to
+import the app is added to the request that made Passenger spawn it. The app
+therefore imports no heavy library itself: the Gemini client (with its gRPC and
+protobuf stack), NumPy/SciPy for the keyword model and the duplicate index, and
+BeautifulSoup are imported on first use. ``start_warm_up`` loads them in a
+background thread as soon as the process has imported the app (or, with the
+async server, when a worker starts up), so the first requests rarely wait.
+
+Servers that fork workers from a preloaded app should run the master with
+SEO_STARTUP=lazy and call ``start_warm_up('warm')`` in their post-fork hook:
+threads do not survive a fork.
+
+    python -m utils.startup profile app     # where importing the app spends its time
+    python -m utils.startup warm-up         # time each warm-up step
+"""
+import argparse
+import importlib
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .constants import (
+    DUPLICATE_CHECK, DUPLICATE_CHECK_MODES, HTML_PARSER_BACKEND, LOG_FILE, STARTUP_MODE, STARTUP_MODES
+)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Top-level modules of this project, told apart from the libraries in the profile
+PROJECT_MODULES = ('app', 'asgi', 'utils', 'benchmarks')
+
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class ImportTime(NamedTuple):
+    """How long importing one module took, from ``python -X importtime``."""
+    module: str
+    self_seconds: float
+    cumulative_seconds: float
+    depth: int
+
+
+def _call(module: str, function: str) -> Callable[[], Any]:
+    # Each step imports its own module, so the Gemini client does not wait for the other steps' imports
+    return lambda: getattr(importlib.import_module(module, __package__), function)()
+
+
+def _load_gemini_model() -> Any:
+    from .ai_service import MODEL_NAME
+    from .llm_dispatcher import get_dispatcher
+    return get_dispatcher().get_model(MODEL_NAME)
+
+
+def warm_up_steps() -> List[Tuple[str, Callable[[], Any]]]:
+    """Return the named steps that load what the first requests would otherwise load, slowest first."""
+    steps = [
+        # Imports and configures the Gemini client library
+        ('gemini', _load_gemini_model),
+        # Local keyword ranking is also the keyword fallback, whatever the keyword mode
+        ('keyword_model', _call('.keyword_model', 'get_keyword_model')),
+        ('classifier', _call('.product_context', 'get_classifier')),
+        ('medicine_brands', _call('.medicine_parser', 'get_brand_dictionary')),
+        ('page_fetcher', _call('.url_service', 'get_page_fetcher')),
+        ('response_cache', _call('.cache_service', 'get_response_cache')),
+        ('page_cache', _call('.page_cache', 'get_page_cache')),
+        ('results_store', _call('.results_store', 'get_results_store')),
+    ]
+    if DUPLICATE_CHECK != 'off' and DUPLICATE_CHECK in DUPLICATE_CHECK_MODES:
+        steps.append(('duplicate_index', _call('.duplicate_index', 'get_duplicate_index')))
+    if HTML_PARSER_BACKEND == 'soup':
+        steps.append(('beautifulsoup', lambda: importlib.import_module('bs4')))
+    return steps
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    Run every warm-up step in turn.
+
+    A step that fails is logged and skipped; the request that needs it will try again.
+
+    Returns:
+        Dict[str, float]: Seconds each step took, by step name
+    """
+    timings = {}
+    for name, step in warm_up_steps():
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logging.error(f"Warm-up step {name} failed: {str(e)}")
+        timings[name] = time.perf_counter() - start
+    logging.info('Warm-up took ' + ', '.join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items()))
+    return timings
+
+
+_warmed_pid: Optional[int] = None
+_warm_up_lock = threading.Lock()
+
+
+def configure_logging() -> None:
+    """Send the server's errors to LOG_FILE; called by app.py and asgi.py, not by the modules they import."""
+    logging.basicConfig(
+        filename=LOG_FILE,
+        level=logging.ERROR,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+
+def start_warm_up(mode: Optional[str] = None) -> Optional[threading.Thread]:
+    """
+    Warm this process up as STARTUP_MODE (or ``mode``) says, once per process.
+
+    Args:
+        mode (str): "eager" to warm up before returning, "warm" to warm up in a
+            background thread or "lazy" to leave everything to first use
+
+    Returns:
+        Optional[threading.Thread]: The warm-up thread in "warm" mode, otherwise None
+    """
+    global _warmed_pid
+    mode = mode or STARTUP_MODE
+    if mode not in STARTUP_MODES:
+        raise ValueError(f"Unknown start-up mode '{mode}', expected one of: {', '.join(STARTUP_MODES)}")
+    if mode == 'lazy':
+        return None
+    with _warm_up_lock:
+        if _warmed_pid == os.getpid():
+            return None
+        _warmed_pid = os.getpid()
+    if mode == 'eager':
+        warm_up()
+        return None
+    thread = threading.Thread(target=warm_up, name='seo-warm-up', daemon=True)
+    thread.start()
+    return thread
+
+
+def profile_imports(module: str = 'app', env: Optional[Dict[str, str]] = None) -> List[ImportTime]:
+    """
+    Import a module in a fresh interpreter with ``-X importtime`` and return the time every import took.
+
+    Args:
+        module (str): The module to import, from the project root
+        env (Dict[str, str]): Environment of the interpreter; defaults to this process's
+
+    Returns:
+        List[ImportTime]: One entry per imported module, in the order the imports finished
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=PROJECT_ROOT,
+                            env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {result.stderr.strip().splitlines()[-1:]}")
+    timings = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            timings.append(ImportTime(match.group(4), int(match.group(1)) / 1e6, int(match.group(2)) / 1e6,
+                                      len(match.group(3)) // 2))
+    return timings
+
+
+def package_totals(timings: List[ImportTime]) -> Dict[str, float]:
+    """Sum the own import time of every module by top-level package, slowest first."""
+    totals: Dict[str, float] = {}
+    for timing in timings:
+        package = timing.module.split('.')[0]
+        totals[package] = totals.get(package, 0.0) + timing.self_seconds
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def format_profile(module: str, timings: List[ImportTime], top: int = 15) -> str:
+    """Render the import-time profile report."""
+    total = sum(timing.self_seconds for timing in timings)
+    lines = [f"Importing {module} took {total * 1000:.0f} ms ({len(timings)} modules)", '',
+             'Slowest packages (own import time of all their modules):']
+    for package, seconds in list(package_totals(timings).items())[:top]:
+        lines.append(f"  {package:<32} {seconds * 1000:8.1f} ms  {seconds / total:6.1%}")
+    lines += ['', 'Project modules (import time including what they import):']
+    project = [timing for timing in timings if timing.module.split('.')[0] in PROJECT_MODULES]
+    for timing in sorted(project, key=lambda timing: -timing.cumulative_seconds)[:top]:
+        lines.append(f"  {timing.module:<32} {timing.cumulative_seconds * 1000:8.1f} ms")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Profile the start-up of an app process.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    profile = subparsers.add_parser('profile', help='Report where importing a module spends its time')
+    profile.add_argument('module', nargs='?', default='app')
+    profile.add_argument('--top', type=int, default=15)
+
+    subparsers.add_parser('warm-up', help='Time each warm-up step')
+
+    args = parser.parse_args()
+    if args.command == 'profile':
+        print(format_profile(args.module, profile_imports(args.module), args.top))
+    else:
+        for name, seconds in warm_up().items():
+            print(f"{name:<16} {seconds * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Service for streaming analysis results to the browser as Server-Sent Events.
+
+URL analysis sends the extracted page as soon as it is fetched and then each
+generated field as it completes. Product descriptions stream the model's output
+as it is produced, along with every section of the JSON response that can
+already be read from the partial text.
+"""
+import json
+import logging
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .ai_service import AIServiceError, stream_content
+from .concurrency import BoundedExecutor
+from .constants import DEFAULT_COMPANY_NAME
+from .deadline import DeadlineExceeded
+from .generation_service import iter_seo_content
+from .json_repair import JSONStreamParser
+from .metrics import record_event
+from .product_context import build_product_context
+from .product_description_service import (
+    LIST_SECTIONS, TEXT_SECTIONS, fallback_product_description, get_product_description_prompt,
+    get_response_schema, response_sections
+)
+from .results_store import record_result
+from .url_service import extract_meta_from_url
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def stream_analyze_url(url: str, company_name: str = DEFAULT_COMPANY_NAME, mode: Optional[str] = None,
+                       executor: Optional[BoundedExecutor] = None, parallelism: Optional[int] = None) -> Iterator[str]:
+    """
+    Analyze a URL and yield its results as events.
+
+    Events are ``meta`` (the extracted page), one ``field`` per generated field as
+    it completes, ``duplicates`` when a field is a near-duplicate of another
+    product's, and ``done`` with the full result. A page that cannot be
+    extracted (or not before the request deadline) ends the stream with an
+    ``error`` event.
+    """
+    yield sse_event('stage', {'stage': 'fetching'})
+    try:
+        meta_data = extract_meta_from_url(url)
+    except DeadlineExceeded as e:
+        yield sse_event('error', {'error': str(e)})
+        return
+    if not meta_data:
+        yield sse_event('error', {'error': 'Failed to extract metadata from URL'})
+        return
+
+    result = {
+        'original_title': meta_data['title'],
+        'original_description': meta_data.get('description', ''),
+        'original_content': meta_data['content'],
+    }
+    yield sse_event('meta', result)
+    yield sse_event('stage', {'stage': 'generating'})
+
+    generated = {}
+    try:
+        for field, value in iter_seo_content(meta_data['content'], company_name, mode, executor, parallelism):
+            if field == 'duplicates':
+                result['duplicates'] = value
+                yield sse_event('duplicates', value)
+                continue
+            generated[field] = value
+            result[f"generated_{field}"] = value
+            yield sse_event('field', {'name': f"generated_{field}", 'value': value})
+    except Exception as e:
+        logging.error(f"Error in stream_analyze_url: {str(e)}")
+        yield sse_event('error', {'error': str(e)})
+        return
+
+    record_result('seo', generated, company_name, url=url, source='analyze_url')
+    yield sse_event('done', result)
+
+
+def stream_product_description(product_info: str, company_name: str = DEFAULT_COMPANY_NAME) -> Iterator[str]:
+    """
+    Generate a product description and yield the model's output as events.
+
+    Events are ``delta`` (the next piece of raw output), ``section`` whenever a
+    section of the description grows, and ``done`` with the parsed description.
+    When the AI service fails, or nothing in its answer can be read as a
+    description, ``done`` carries the fallback description.
+    """
+    context = build_product_context(product_info, company_name)
+    # The output is parsed once, as it arrives
+    parser = JSONStreamParser()
+    sent: Dict[str, Any] = {}
+    pieces = []
+    try:
+        for text in stream_content(get_product_description_prompt(product_info, context),
+                                   response_schema=get_response_schema()):
+            parser.feed(text)
+            pieces.append(text)
+            yield sse_event('delta', {'text': text})
+            for name, value, complete in partial_sections(parser):
+                if sent.get(name) != (value, complete):
+                    sent[name] = (value, complete)
+                    yield sse_event('section', {'name': name, 'value': value, 'complete': complete})
+        data = parser.finish()
+        if parser.repaired:
+            record_event('invalid_json', stage='product_description')
+        description = response_sections(data, ''.join(pieces))
+        fallback = False
+    except AIServiceError as e:
+        logging.error(f"Error in stream_product_description: {str(e)}")
+        description = None
+    if not description or not any(description.values()):
+        description = fallback_product_description(product_info, context)
+        fallback = True
+
+    record_result('product_description', {'product_description': description}, company_name,
+                  source='product_description')
+    yield sse_event('done', {'product_description': description, 'fallback': fallback})
+
+
+def partial_sections(parser: JSONStreamParser) -> Iterator[Tuple[str, Any, bool]]:
+    """
+    Yield ``(name, value, complete)`` for every description section the parser has started reading.
+
+    Text sections and the last item of list sections are returned as far as
+    they have been written.
+    """
+    data = parser.value()
+    if not isinstance(data, dict):
+        return
+    for name in TEXT_SECTIONS + LIST_SECTIONS:
+        if name in data:
+            yield name, data[name], parser.is_complete(name)
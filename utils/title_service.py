@@ -1,8 +1,31 @@
-from .ai_service import generate_content, AIServiceError
-from .constants import MEDICINE_KEYWORDS, DEFAULT_PHARMACY_NAME, DEFAULT_SHOP_NAME, DEFAULT_COMPANY_NAME, MAX_TITLE_LENGTH
+from typing import Optional, Tuple
+
+from .ai_service import AIServiceError, LLMCall, Steps, arun_steps, run_steps
+from .constants import (
+    DEFAULT_PHARMACY_NAME, DEFAULT_SHOP_NAME, DEFAULT_COMPANY_NAME, MAX_TITLE_LENGTH,
+    MEDICINE_PARSER_ENABLED, MEDICINE_PARSER_MIN_CONFIDENCE
+)
+from .medicine_parser import parse_medicine_name
+from .metrics import instrument, record_event
+from .product_context import ProductContext, build_product_context
+
+def local_medicine_info(content: str) -> Optional[Tuple[str, str]]:
+    """Parse the English and Bangla medicine names locally, or return None when the parse is not confident enough."""
+    if not MEDICINE_PARSER_ENABLED:
+        return None
+    parsed = parse_medicine_name(content)
+    if parsed is None or parsed.confidence < MEDICINE_PARSER_MIN_CONFIDENCE:
+        return None
+    record_event('medicine_name', source='parser')
+    return parsed.name_en, parsed.name_bn
 
 def extract_medicine_info(content: str) -> tuple:
     """Extract medicine name, strength, and type in both English and Bangla."""
+    return run_steps(medicine_info_steps(content))
+
+def medicine_info_steps(content: str) -> Steps[tuple]:
+    """Steps of ``extract_medicine_info``."""
+    record_event('medicine_name', source='llm')
     prompt = f"""Extract medicine information in exact format: "English Name Strength Type|বাংলা নাম স্ট্রেংথ টাইপ"
     Example: "Sergel 20mg Capsule|সারজেল ২০ মি.গ্রা. ক্যাপসুল"
     
@@ -16,18 +39,18 @@ def extract_medicine_info(content: str) -> tuple:
     Content: {content}"""
     
     try:
-        response = generate_content(prompt)
+        response = yield LLMCall(prompt)
         names = response.split('|')
         return names[0].strip(), names[1].strip() if len(names) > 1 else ''
     except AIServiceError:
         return content, ""
 
-def is_medicine_product(content: str) -> bool:
-    """Determine if the content is about a medicine product."""
-    return any(keyword in content.lower() for keyword in MEDICINE_KEYWORDS)
-
 def extract_ecommerce_info(content: str) -> str:
     """Extract product type and key features for non-medicine products."""
+    return run_steps(ecommerce_info_steps(content))
+
+def ecommerce_info_steps(content: str) -> Steps[str]:
+    """Steps of ``extract_ecommerce_info``."""
     prompt = f"""Extract product information in exact format: "Product Type Key Features"
     Example 1: "Shoes Stylish Summer Exclusive Converse Men"
     Example 2: "Baby Shoes Winter Plush Soft Sole Newborn Baby Girl Princess"
@@ -41,7 +64,7 @@ def extract_ecommerce_info(content: str) -> str:
     Content: {content}"""
     
     try:
-        response = generate_content(prompt)
+        response = yield LLMCall(prompt)
         return response.strip()
     except AIServiceError:
         # Fallback to basic information
@@ -74,16 +97,36 @@ def format_regular_title(title: str, company_name: str = DEFAULT_SHOP_NAME) -> s
         return f"{truncated} available at {company_name}"
     return full_title
 
-def generate_title(content: str, company_name: str = DEFAULT_COMPANY_NAME) -> str:
+@instrument('gen_title')
+def generate_title(content: str, company_name: str = DEFAULT_COMPANY_NAME,
+                   context: Optional[ProductContext] = None) -> str:
     """Generate SEO-optimized title with proper formatting."""
+    return run_steps(title_steps(content, company_name, context))
+
+@instrument('gen_title')
+async def agenerate_title(content: str, company_name: str = DEFAULT_COMPANY_NAME,
+                          context: Optional[ProductContext] = None) -> str:
+    """Like ``generate_title``, awaiting the Gemini calls."""
+    return await arun_steps(title_steps(content, company_name, context))
+
+def title_steps(content: str, company_name: str = DEFAULT_COMPANY_NAME,
+                context: Optional[ProductContext] = None) -> Steps[str]:
+    """Steps of ``generate_title``."""
+    context = context or build_product_context(content, company_name)
     try:
-        if is_medicine_product(content):
-            name_en, name_bn = extract_medicine_info(content)
+        if context.is_medicine:
+            # Most pharmacy titles parse locally; the AI service handles the rest
+            name_en, name_bn = local_medicine_info(content) or (yield from medicine_info_steps(content))
             return format_medicine_title(name_en, name_bn, company_name)
         else:
-            ecommerce_info = extract_ecommerce_info(content)
+            ecommerce_info = yield from ecommerce_info_steps(content)
             return format_regular_title(ecommerce_info, company_name)
             
     except AIServiceError:
-        # Fallback to a basic title if AI service fails
-        return format_regular_title(content[:50] + "...", company_name)
+        return fallback_title(content, company_name)
+
+def fallback_title(content: str, company_name: str = DEFAULT_COMPANY_NAME) -> str:
+    """Fallback to a basic title if AI service fails."""
+    record_event('fallback', field='title')
+    record_event('placeholder', field='title')
+    return format_regular_title(content[:50] + "...", company_name)
@@ -0,0 +1,34 @@
+"""
+Tokenization of English and Bengali product text.
+
+Shared by the keyword model and the content condenser, and kept free of
+NumPy/SciPy so that condensing content does not load the keyword model's stack.
+"""
+import re
+from typing import List
+
+# Phrases never cross punctuation; the Bengali danda ends a sentence like a full stop
+SEGMENT_PATTERN = re.compile(r"[.,;:!?()\[\]{}|/\\\"“”•·।॥\n\r\t]+")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:['&+-][a-z0-9]+)*|[ঀ-৿\u200c\u200d]+")
+
+# Words a keyword never starts or ends with
+STOPWORDS = frozenset("""
+a about after all also an and any are as at be been best buy by can do does each for from get has have
+how in into is it its more most no not now of on only or our per shop so such than that the their then
+these this to up use used very was we what when which while who will with within without you your
+এবং ও এর এ এই একটি যা যে না জন্য করে করা হয় হয়ে থেকে সাথে সঙ্গে দিয়ে তার এটি এটা কিন্তু অথবা বা আর
+mg ml gm মি গ্রা লি
+""".split())
+
+# Longer tokens are markup, hashes or URLs rather than words
+MAX_TOKEN_LENGTH = 30
+
+
+def tokenize(text: str) -> List[List[str]]:
+    """Split a text into segments of lowercased English and Bengali tokens."""
+    segments = []
+    for segment in SEGMENT_PATTERN.split((text or '').lower()):
+        tokens = TOKEN_PATTERN.findall(segment)
+        if tokens:
+            segments.append([token for token in tokens if len(token) <= MAX_TOKEN_LENGTH])
+    return segments
@@ -1,147 +1,346 @@
-import requests
-from bs4 import BeautifulSoup
-from typing import Optional, Dict
+from typing import Any, Optional, Dict, Iterator
+from urllib.parse import urljoin, urlsplit
+import codecs
+import os
 import time
 import re
 import logging
+import threading
 import traceback
-import urllib3
-import certifi
 import warnings
 
-# Suppress only the specific InsecureRequestWarning
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-
-# Configure logging
-logging.basicConfig(
-    filename='stderr.log',
-    level=logging.ERROR,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+from .cache_service import is_cache_bypassed
+from .constants import (
+    FETCH_TIMEOUT, FETCH_RETRIES, FETCH_POOL_HOSTS, FETCH_POOL_SIZE, FETCH_PER_HOST_CONCURRENCY,
+    FETCH_MAX_BYTES, HTML_PARSER_BACKEND
 )
+from .deadline import DeadlineExceeded, can_wait, check_deadline, clamp_timeout, expired
+from .html_extractor import extract_page
+from .metrics import record_event, timed
+from .page_cache import canonicalize_url, get_page_cache
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Cache-Control': 'max-age=0'
+}
+
+
+class PageFetcher:
+    """
+    Long-lived, thread-safe page fetcher.
+
+    A single session keeps a connection pool per host, so DNS, TCP and TLS setup
+    is paid once per host instead of once per analysis. A semaphore per host
+    caps how many requests run against the same shop at once. The HTTP stack
+    (requests, urllib3, certifi) is loaded with the first fetcher, in the
+    start-up warm-up or on the first fetch.
+    """
+
+    def __init__(self, pool_hosts: int = FETCH_POOL_HOSTS, pool_size: int = FETCH_POOL_SIZE,
+                 per_host_concurrency: int = FETCH_PER_HOST_CONCURRENCY, timeout: int = FETCH_TIMEOUT,
+                 retries: int = FETCH_RETRIES):
+        import certifi
+        import requests
+        import urllib3
+        from requests.adapters import HTTPAdapter
+
+        # Suppress only the specific InsecureRequestWarning
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+        self.ca_bundle = certifi.where()
+        self.timeout = timeout
+        self.retries = retries
+        self.per_host_concurrency = per_host_concurrency
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._host_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            limit = self._host_limits.get(host)
+            if limit is None:
+                limit = self._host_limits[host] = threading.BoundedSemaphore(self.per_host_concurrency)
+            return limit
+
+    def fetch(self, url: str, headers: Optional[Dict[str, str]] = None, stream: bool = False) -> Any:
+        """
+        Fetch a URL with retries, falling back to an unverified request on SSL errors.
+
+        With ``stream=True`` only the headers are read here; the caller reads the
+        body and must close the response.
+        """
+        import requests
 
-def extract_meta_from_url(url: str) -> Optional[Dict[str, str]]:
-    """Extract meta tags and content from a given URL."""
-    try:
-        # Fix malformed URLs
-        if not url.startswith(('http://', 'https://')):
-            url = 'https://' + url.lstrip('://')
-        
-        logging.info(f"Attempting to fetch URL: {url}")
-            
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Cache-Control': 'max-age=0'
-        }
-        
-        # Create session with longer timeout and retry strategy
-        session = requests.Session()
-        session.headers.update(headers)
-        
         # Configure retry strategy
-        retries = 3
+        retries = self.retries
         backoff_factor = 0.5
-        
-        for attempt in range(retries):
-            try:
-                # First try with SSL verification
-                logging.info(f"Attempt {attempt + 1}/{retries} to fetch URL with SSL verification")
-                response = session.get(url, timeout=30, verify=certifi.where())
-                response.raise_for_status()
-                logging.info("Successfully fetched URL with SSL verification")
-                break
-            except requests.exceptions.SSLError:
-                logging.warning(f"SSL verification failed for {url}, retrying without verification")
+
+        host_limit = self._host_limit(url)
+        if not host_limit.acquire(timeout=clamp_timeout(None)):
+            raise DeadlineExceeded(f"Request deadline exceeded waiting for a connection to {urlsplit(url).netloc}")
+        def last_attempt(attempt: int) -> bool:
+            # Within a request deadline, a failed attempt is only retried if the backoff leaves time for it
+            return attempt == retries - 1 or not can_wait(backoff_factor * (2 ** attempt))
+
+        try:
+            for attempt in range(retries):
+                # Each attempt gets the time left before the deadline
+                check_deadline('fetching the page')
                 try:
-                    response = session.get(url, timeout=30, verify=False)
+                    # First try with SSL verification
+                    logging.info(f"Attempt {attempt + 1}/{retries} to fetch URL with SSL verification")
+                    response = self.session.get(url, headers=headers, timeout=clamp_timeout(self.timeout),
+                                                verify=self.ca_bundle, stream=stream)
                     response.raise_for_status()
-                    logging.info("Successfully fetched URL without SSL verification")
-                    break
+                    logging.info("Successfully fetched URL with SSL verification")
+                    return response
+                except requests.exceptions.SSLError:
+                    logging.warning(f"SSL verification failed for {url}, retrying without verification")
+                    try:
+                        check_deadline('fetching the page without SSL verification')
+                        response = self.session.get(url, headers=headers, timeout=clamp_timeout(self.timeout),
+                                                    verify=False, stream=stream)
+                        response.raise_for_status()
+                        logging.info("Successfully fetched URL without SSL verification")
+                        return response
+                    except requests.exceptions.RequestException as e:
+                        logging.error(f"Request failed without SSL verification: {str(e)}")
+                        if last_attempt(attempt):
+                            raise
+                except requests.exceptions.ConnectionError as e:
+                    logging.error(f"Connection Error on attempt {attempt + 1}: {str(e)}")
+                    if last_attempt(attempt):
+                        raise
+                except requests.exceptions.Timeout as e:
+                    logging.error(f"Timeout Error on attempt {attempt + 1}: {str(e)}")
+                    if last_attempt(attempt):
+                        raise
                 except requests.exceptions.RequestException as e:
-                    logging.error(f"Request failed without SSL verification: {str(e)}")
-                    if attempt == retries - 1:
+                    logging.error(f"Request Error on attempt {attempt + 1}: {str(e)}")
+                    if last_attempt(attempt):
                         raise
-            except requests.exceptions.ConnectionError as e:
-                logging.error(f"Connection Error on attempt {attempt + 1}: {str(e)}")
-                if attempt == retries - 1:
-                    raise
-            except requests.exceptions.Timeout as e:
-                logging.error(f"Timeout Error on attempt {attempt + 1}: {str(e)}")
-                if attempt == retries - 1:
-                    raise
-            except requests.exceptions.RequestException as e:
-                logging.error(f"Request Error on attempt {attempt + 1}: {str(e)}")
-                if attempt == retries - 1:
-                    raise
-            time.sleep(backoff_factor * (2 ** attempt))
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract meta description
-        meta_desc = soup.find('meta', attrs={'name': 'description'}) or soup.find('meta', attrs={'property': 'og:description'})
-        description = meta_desc.get('content', '') if meta_desc else ''
-        
-        # Extract title
-        title = soup.title.string if soup.title else ''
-        
-        # Extract main content
-        content_parts = []
-        
-        # Try multiple selectors for product information
-        selectors = [
-            ('h1', {}),  # Product name
-            ('div', {'class': 'product-details'}),
-            ('div', {'class': 'product-description'}),
-            ('div', {'class': 'product-info'}),
-            ('div', {'id': 'product-info'}),
-            ('div', {'class': 'details'}),
-            ('div', {'class': 'specifications'})
-        ]
-        
-        for tag, attrs in selectors:
-            elements = soup.find_all(tag, attrs)
-            for element in elements:
-                text = element.get_text(strip=True, separator=' ')
-                if text and len(text) > 20:  # Only include substantial content
-                    content_parts.append(text)
-        
-        # Extract structured data if available
-        product_schema = soup.find('script', {'type': 'application/ld+json'})
-        if product_schema:
-            import json
-            try:
-                schema_data = json.loads(product_schema.string)
-                if isinstance(schema_data, dict):
-                    if 'description' in schema_data:
-                        content_parts.append(schema_data['description'])
-                    if 'name' in schema_data:
-                        content_parts.insert(0, schema_data['name'])
-            except:
-                pass
-        
-        # Combine all content and clean it up
-        main_content = ' '.join(content_parts)
-        main_content = ' '.join(main_content.split())  # Remove extra whitespace
-        
-        # If no content was found, use the meta description
-        if not main_content and description:
-            main_content = description
-            
-        # Clean up title and description
-        title = re.sub(r'\s+', ' ', title).strip()
-        description = re.sub(r'\s+', ' ', description).strip()
-        main_content = re.sub(r'\s+', ' ', main_content).strip()
-        
-        return {
-            'title': title,
-            'description': description,
-            'content': main_content
-        }
+                time.sleep(backoff_factor * (2 ** attempt))
+        finally:
+            host_limit.release()
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        self.session.close()
+
+
+_fetcher: Optional[PageFetcher] = None
+_fetcher_pid: Optional[int] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_page_fetcher() -> PageFetcher:
+    """Return the process-wide fetcher, creating a fresh one after a fork."""
+    global _fetcher, _fetcher_pid
+    if _fetcher is None or _fetcher_pid != os.getpid():
+        with _fetcher_lock:
+            if _fetcher is None or _fetcher_pid != os.getpid():
+                _fetcher = PageFetcher()
+                _fetcher_pid = os.getpid()
+    return _fetcher
+
+
+def normalize_url(url: str) -> str:
+    """Fix malformed URLs that are missing their scheme."""
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url.lstrip('://')
+    return url
+
+
+def iter_decoded_chunks(response: Any, max_bytes: int = FETCH_MAX_BYTES,
+                        chunk_size: int = 16384) -> Iterator[str]:
+    """Yield the decoded body of a streamed response, reading at most ``max_bytes`` bytes."""
+    encoding = response.encoding if 'charset' in response.headers.get('Content-Type', '').lower() else None
+    decoder = body_decoder(encoding)
+
+    received = 0
+    for chunk in response.iter_content(chunk_size):
+        check_deadline('the page was read')
+        chunk = chunk[:max_bytes - received]
+        received += len(chunk)
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+        if received >= max_bytes:
+            logging.warning(f"Stopped reading {response.url} at {max_bytes} bytes")
+            break
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def body_decoder(encoding: Optional[str]) -> codecs.IncrementalDecoder:
+    """Return an incremental decoder for a body's declared charset, falling back to UTF-8."""
+    try:
+        return codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+
+def parse_page(html: str) -> Dict[str, str]:
+    """
+    Extract the title, meta description and main product content from an HTML page.
+
+    This builds a full BeautifulSoup tree; ``extract_page`` does the same in one
+    streaming pass and is used unless the "soup" parser backend is configured.
+    """
+    # BeautifulSoup is only loaded by the processes configured to use it
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Extract meta description
+    meta_desc = soup.find('meta', attrs={'name': 'description'}) or soup.find('meta', attrs={'property': 'og:description'})
+    description = meta_desc.get('content', '') if meta_desc else ''
+
+    # Extract title
+    title = soup.title.string if soup.title else ''
+
+    # Extract the page's own canonical URL
+    canonical_link = soup.find('link', rel='canonical')
+    canonical_url = canonical_link.get('href', '') if canonical_link else ''
+
+    # Extract main content
+    content_parts = []
+
+    # Try multiple selectors for product information
+    selectors = [
+        ('h1', {}),  # Product name
+        ('div', {'class': 'product-details'}),
+        ('div', {'class': 'product-description'}),
+        ('div', {'class': 'product-info'}),
+        ('div', {'id': 'product-info'}),
+        ('div', {'class': 'details'}),
+        ('div', {'class': 'specifications'})
+    ]
+
+    for tag, attrs in selectors:
+        elements = soup.find_all(tag, attrs)
+        for element in elements:
+            text = element.get_text(strip=True, separator=' ')
+            if text and len(text) > 20:  # Only include substantial content
+                content_parts.append(text)
+
+    # Extract structured data if available
+    product_schema = soup.find('script', {'type': 'application/ld+json'})
+    if product_schema:
+        import json
+        try:
+            schema_data = json.loads(product_schema.string)
+            if isinstance(schema_data, dict):
+                if 'description' in schema_data:
+                    content_parts.append(schema_data['description'])
+                if 'name' in schema_data:
+                    content_parts.insert(0, schema_data['name'])
+        except:
+            pass
+
+    # Combine all content and clean it up
+    main_content = ' '.join(content_parts)
+    main_content = ' '.join(main_content.split())  # Remove extra whitespace
+
+    # If no content was found, use the meta description
+    if not main_content and description:
+        main_content = description
+
+    # Clean up title and description
+    title = re.sub(r'\s+', ' ', title or '').strip()
+    description = re.sub(r'\s+', ' ', description).strip()
+    main_content = re.sub(r'\s+', ' ', main_content).strip()
+
+    return {
+        'title': title,
+        'description': description,
+        'content': main_content,
+        'canonical_url': canonical_url.strip()
+    }
+
+
+def resolve_canonical_url(url: str, declared: str) -> Optional[str]:
+    """Canonicalize a page's rel=canonical URL, trusting it only on the same host."""
+    if not declared:
+        return None
+    canonical = canonicalize_url(urljoin(url, declared))
+    if urlsplit(canonical).netloc != urlsplit(url).netloc:
+        return None
+    return canonical
+
+
+def extract_meta_from_url(url: str, fetcher: Optional[PageFetcher] = None) -> Optional[Dict[str, str]]:
+    """
+    Extract meta tags and content from a given URL.
+
+    Extracted pages are kept in the page cache under their canonical URL. A fresh
+    entry is returned directly; a stale one is revalidated with a conditional GET
+    and reused without re-parsing when the shop answers 304 Not Modified.
+    """
+    try:
+        url = normalize_url(url)
+        cache = get_page_cache()
+        cache_url = canonicalize_url(url)
+        entry = cache.get(cache_url) if cache else None
+
+        if entry and cache.is_fresh(entry) and not is_cache_bypassed():
+            cache.count('hits')
+            record_event('page_cache', result='hit')
+            return dict(entry['record'])
+
+        headers = {}
+        if entry:
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        logging.info(f"Attempting to fetch URL: {url}")
+
+        with timed('fetch'):
+            response = (fetcher or get_page_fetcher()).fetch(url, headers=headers or None, stream=True)
+        try:
+            if entry and response.status_code == 304:
+                cache.touch(entry['url'])
+                cache.count('revalidated')
+                record_event('page_cache', result='revalidated')
+                return dict(entry['record'])
+
+            # Reading the body is interleaved with parsing, so both count as extraction
+            with timed('extract'):
+                if HTML_PARSER_BACKEND == 'soup':
+                    record = parse_page(''.join(iter_decoded_chunks(response)))
+                else:
+                    record = extract_page(iter_decoded_chunks(response), HTML_PARSER_BACKEND)
+        finally:
+            response.close()
+
+        canonical_url = resolve_canonical_url(cache_url, record.pop('canonical_url', ''))
+        if cache:
+            cache.count('misses')
+            record_event('page_cache', result='miss')
+            cache.put(
+                cache_url, record,
+                response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                canonical_url
+            )
+        return record
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         logging.error(f"Error extracting meta tags: {str(e)}")
         logging.error(traceback.format_exc())
-        return None
\ No newline at end of file
+        if expired():
+            # The fetch timed out because the request ran out of time, not because the shop failed
+            raise DeadlineExceeded(f"Request deadline exceeded while fetching {url}") from e
+        return None